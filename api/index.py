@@ -1,7 +1,14 @@
 """
 Vercel serverless function handler for FastAPI
+
+Runs in fast-startup mode: storage is recovered or seeded by the first request
+instead of during startup. Set FAST_STARTUP=false to opt out.
 """
-from app.main import app
+import os
+
+os.environ.setdefault("FAST_STARTUP", "true")
+
+from app.main import app  # noqa: E402
 
 # This is the handler that Vercel will call
 handler = app
@@ -4,16 +4,19 @@ API Dependencies
 FastAPI dependency injection for authentication, authorization, and services.
 """
 
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.requests import HTTPConnection
 from fastapi.security import HTTPAuthorizationCredentials
 
 from app.api.schemas.auth import User
 from app.core.exceptions import InsufficientPermissions, InvalidToken
+from app.core.principal_cache import get_principal_cache
 from app.core.security import decode_access_token, security
 from app.services.auth import AuthService
 from app.services.shipment import ShipmentService
+from app.storage import run_user_store_call
 
 
 # Authentication dependencies
@@ -21,6 +24,9 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     """
     Dependency to get current authenticated user from JWT token
 
+    Resolved users are served from the principal cache on repeat requests
+    with the same token.
+
     Args:
         credentials: HTTP Bearer credentials
 
@@ -30,18 +36,51 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     Raises:
         InvalidToken: If token is invalid or expired
     """
-    token = credentials.credentials
+    return await resolve_token(credentials.credentials)
+
+
+async def resolve_token(token: str) -> User:
+    """
+    Resolve a bearer token to its user, through the principal cache
+
+    Cache hits return inline; a miss runs in the threadpool when the user store blocks.
+
+    Raises:
+        InvalidToken: If token is invalid or expired
+    """
+    current_user = get_principal_cache().get(token)
+    if current_user is not None:
+        return current_user
+    return await run_user_store_call(_load_principal, token)
+
+
+def _load_principal(token: str) -> User:
+    """Decode token, look its user up and cache the result"""
     token_data = decode_access_token(token)
 
-    if token_data is None:
+    if token_data is None or token_data.username is None:
         raise InvalidToken()
 
+    # Read before the lookup, so a change made while it runs keeps the result out of the cache
+    cache = get_principal_cache()
+    generation = cache.generation(token_data.username)
     user = AuthService.get_user(username=token_data.username)
     if user is None:
         raise InvalidToken()
 
     # Convert UserInDB to User (remove password hash)
-    return User(username=user.username, email=user.email, role=user.role, disabled=user.disabled)
+    current_user = User(username=user.username, email=user.email, role=user.role, disabled=user.disabled)
+    cache.put(token, current_user, token_data.expires_at, generation)
+    return current_user
+
+
+async def is_admin_token(token: str) -> bool:
+    """Whether token belongs to an active admin, for checks made outside dependency injection"""
+    try:
+        user = await resolve_token(token)
+    except InvalidToken:
+        return False
+    return user.role == "admin" and not user.disabled
 
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -62,6 +101,30 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
     return current_user
 
 
+async def get_stream_user(
+    connection: HTTPConnection,
+    access_token: Optional[str] = Query(None, description="Bearer token, for clients that cannot send headers"),
+) -> User:
+    """
+    Authenticate a live stream (SSE or WebSocket)
+
+    Browsers' EventSource and WebSocket cannot set an Authorization header, so
+    the token may also come as the ``access_token`` query parameter.
+
+    Returns:
+        Active user
+
+    Raises:
+        InvalidToken: If no token is given or it is invalid or expired
+        HTTPException: If user is disabled
+    """
+    scheme, _, header_token = connection.headers.get("authorization", "").partition(" ")
+    token = header_token if scheme.lower() == "bearer" and header_token else access_token
+    if not token:
+        raise InvalidToken()
+    return await get_current_active_user(await resolve_token(token))
+
+
 def require_role(allowed_roles: list[str]):
     """
     Dependency factory to check if user has required role
@@ -4,13 +4,14 @@ Authentication Router
 Endpoints for user authentication and registration.
 """
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Depends, status
 
-from app.api.dependencies import CurrentUser
-from app.api.schemas.auth import LoginRequest, RegisterRequest, RegisterResponse, User
+from app.api.dependencies import CurrentUser, require_role
+from app.api.schemas.auth import LoginRequest, RegisterRequest, RegisterResponse, User, UserUpdate
 from app.core.exceptions import InvalidCredentials
 from app.core.security import Token
 from app.services.auth import AuthService
+from app.storage import run_user_store_call
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -26,8 +27,11 @@ async def login(login_data: LoginRequest):
     - Admin: `admin` / `admin123`
     - Courier: `courier` / `courier123`
     - Customer: `customer` / `customer123`
+
+    Password verification runs on a bounded pool; when it is saturated the
+    endpoint returns `503` with `Retry-After` instead of queueing.
     """
-    user = AuthService.authenticate_user(login_data.username, login_data.password)
+    user = await AuthService.authenticate_user_async(login_data.username, login_data.password)
     if not user:
         raise InvalidCredentials()
 
@@ -69,7 +73,7 @@ async def register(register_data: RegisterRequest):
     }
     ```
     """
-    new_user = AuthService.register_user(register_data)
+    new_user = await AuthService.register_user_async(register_data)
 
     return RegisterResponse(
         username=new_user.username,
@@ -88,3 +92,17 @@ async def get_current_user_info(current_user: CurrentUser):
     Requires valid JWT token in Authorization header.
     """
     return current_user
+
+
+@router.patch("/users/{username}", response_model=User)
+async def update_user(username: str, update_data: UserUpdate, current_user: User = Depends(require_role(["admin"]))):
+    """
+    **Update User Role / Status**
+
+    Change a user's `role` and/or `disabled` flag. Takes effect on the user's
+    very next request, including with tokens issued before the change; with
+    several workers, the others pick it up within `LIVE_RELAY_POLL_SECONDS`.
+
+    **Requires:** Admin role
+    """
+    return await run_user_store_call(AuthService.update_user, username, update_data)
@@ -0,0 +1,50 @@
+"""
+Profiles Router
+
+Admin endpoints listing and downloading request profiles.
+"""
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import FileResponse
+
+from app.api.dependencies import require_role
+from app.api.schemas.auth import User
+from app.config import settings
+from app.core.profiling import get_profile_store
+
+router = APIRouter(prefix="/profiles", tags=["Profiling"])
+
+
+@router.get("")
+async def list_profiles(current_user: User = Depends(require_role(["admin"]))):
+    """
+    **List Request Profiles**
+
+    Daftar profil request yang tersimpan, terbaru lebih dulu.
+    Aktifkan dengan `PROFILING_ENABLED=true`, lalu kirim header `X-Profile: 1`
+    (admin) pada request yang ingin diprofilkan, atau set `PROFILE_SAMPLE_RATE`.
+    Nama file dikembalikan di header `X-Profile-Id` pada response tersebut.
+
+    - `.pstats`: cProfile (`python -m pstats <file>`, snakeviz)
+    - `.collapsed`: stack sampling (flamegraph.pl, speedscope)
+
+    **Requires:** Admin role
+    """
+    return {
+        "enabled": settings.PROFILING_ENABLED,
+        "profiler": settings.PROFILER,
+        "sample_rate": settings.PROFILE_SAMPLE_RATE,
+        "profiles": get_profile_store().list(),
+    }
+
+
+@router.get("/{name}")
+async def download_profile(name: str, current_user: User = Depends(require_role(["admin"]))):
+    """
+    **Download Request Profile**
+
+    Mengunduh satu file profil berdasarkan namanya.
+
+    **Requires:** Admin role
+    """
+    return FileResponse(get_profile_store().path(name), media_type="application/octet-stream", filename=name)
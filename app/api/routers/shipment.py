@@ -4,56 +4,138 @@ Shipment Router
 Endpoints for shipment CRUD operations.
 """
 
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Body, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 
 from app.api.dependencies import get_current_active_user, require_role
 from app.api.schemas.auth import User
 from app.api.schemas.shipment import (
+    ShipmentBulkCreationResponse,
     ShipmentCreate,
     ShipmentCreationResponse,
     ShipmentRead,
     ShipmentSummary,
     ShipmentUpdate,
 )
-from app.models.shipment import ShipmentStatus
+from app.core.response_cache import etag_matches
+from app.models.shipment import ExportFormat, ShipmentOrder, ShipmentStatus, SortDirection
+from app.services.export import ExportService
 from app.services.shipment import ShipmentService
+from app.storage import run_storage_call
 
 router = APIRouter(prefix="/shipment", tags=["Shipments"])
 
 
 @router.get("s", response_model=List[ShipmentSummary])
 async def get_all_shipments(
+    response: Response,
     status_filter: Optional[ShipmentStatus] = Query(None, alias="status", description="Filter by shipment status"),
     destination_code: Optional[int] = Query(None, description="Filter by destination code"),
     limit: int = Query(10, ge=1, le=100, description="Maximum number of results"),
+    order_by: ShipmentOrder = Query(ShipmentOrder.id, description="Page order"),
+    sort: SortDirection = Query(SortDirection.asc, description="asc or desc"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value of the previous page"),
+    created_from: Optional[datetime] = Query(None, description="Only shipments created at or after this time"),
+    created_to: Optional[datetime] = Query(None, description="Only shipments created before this time"),
+    updated_since: Optional[datetime] = Query(None, description="Only shipments updated at or after this time"),
     current_user: User = Depends(get_current_active_user),
 ):
     """
     **C0102: Shipment Tracking & Status Update**
 
-    Mengambil daftar shipment dengan opsi filtering berdasarkan status dan destination.
+    Mengambil daftar shipment dengan opsi filtering berdasarkan status, destination,
+    dan rentang waktu (`created_from` / `created_to` / `updated_since`).
     Mengembalikan summary view untuk efisiensi.
 
+    Urutan diatur dengan `order_by` (`id`, `created_at`, `updated_at`) dan `sort` (`asc`, `desc`).
+    Pagination memakai cursor: jika masih ada halaman berikutnya, header
+    `X-Next-Cursor` berisi cursor yang dikirim kembali lewat parameter `cursor`.
+
     **Requires:** Any authenticated user
     """
-    return ShipmentService.get_all_shipments(
-        status_filter=status_filter, destination_filter=destination_code, limit=limit
+    shipments, next_cursor = await run_storage_call(
+        ShipmentService.get_shipments_page,
+        status_filter=status_filter,
+        destination_filter=destination_code,
+        limit=limit,
+        order_by=order_by,
+        cursor=cursor,
+        sort=sort,
+        created_from=created_from,
+        created_to=created_to,
+        updated_since=updated_since,
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return shipments
+
+
+@router.get("s/search", response_model=List[ShipmentSummary])
+async def search_shipments(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find, e.g. 'copper wires Jakarta Selatan'"),
+    limit: int = Query(10, ge=1, le=100, description="Maximum number of results"),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    **Shipment Search**
+
+    Pencarian full-text pada nama & alamat penerima, isi paket, dan nama seller.
+    Semua kata pada `q` harus muncul (AND, tidak case-sensitive); hasil diurutkan
+    dari yang paling relevan (kata langka dan kecocokan pada nama penerima/isi paket
+    bernilai lebih tinggi).
+
+    **Requires:** Any authenticated user
+    """
+    return await run_storage_call(ShipmentService.search_shipments, q, limit)
+
+
+@router.get("s/export")
+async def export_shipments(
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format", description="ndjson or csv"),
+    status_filter: Optional[ShipmentStatus] = Query(None, alias="status", description="Filter by shipment status"),
+    destination_code: Optional[int] = Query(None, description="Filter by destination code"),
+    updated_since: Optional[datetime] = Query(None, description="Only shipments updated at or after this time"),
+    current_user: User = Depends(require_role(["admin"])),
+):
+    """
+    **Shipment Export**
+
+    Mengekspor seluruh shipment beserta tracking events sebagai NDJSON atau CSV.
+    Data dikirim secara streaming, sehingga cocok untuk dataset besar.
+    Gunakan `updated_since` untuk export inkremental.
+
+    **Requires:** Admin role
+    """
+    chunks = ExportService.export_shipments(export_format, status_filter, destination_code, updated_since)
+    return StreamingResponse(
+        chunks,
+        media_type=ExportService.MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="shipments.{export_format.value}"'},
     )
 
 
 @router.get("/{shipment_id}", response_model=ShipmentRead)
-async def get_shipment_by_id(shipment_id: int, current_user: User = Depends(get_current_active_user)):
+async def get_shipment_by_id(shipment_id: int, request: Request, current_user: User = Depends(get_current_active_user)):
     """
     **C0102: Shipment Tracking & Status Update**
 
     Mengambil detail lengkap shipment berdasarkan Tracking Number (ID).
     Mengembalikan Aggregate Root lengkap dengan semua Value Objects dan Tracking Events.
 
+    Response menyertakan header `ETag`; kirim kembali lewat `If-None-Match`
+    untuk mendapat `304 Not Modified` selama shipment belum berubah.
+
     **Requires:** Any authenticated user
     """
-    return ShipmentService.get_shipment_by_id(shipment_id)
+    etag, body = await run_storage_call(ShipmentService.get_shipment_response, shipment_id)
+    headers = {"ETag": etag}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # Already serialized from ShipmentRead; response_model is kept for the schema docs
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.post("", response_model=ShipmentCreationResponse, status_code=status.HTTP_201_CREATED)
@@ -66,12 +148,31 @@ async def create_shipment(shipment: ShipmentCreate, current_user: User = Depends
 
     **Requires:** Admin or Customer role
     """
-    return ShipmentService.create_shipment(shipment)
+    return await run_storage_call(ShipmentService.create_shipment, shipment)
+
+
+@router.post("s/bulk", response_model=ShipmentBulkCreationResponse)
+async def create_shipments_bulk(
+    shipments: List[Any] = Body(..., description="Daftar payload ShipmentCreate"),
+    current_user: User = Depends(require_role(["admin", "customer"])),
+):
+    """
+    **C0101: Shipment Order Creation (Bulk)**
+
+    Membuat banyak shipment sekaligus dalam satu request dan satu operasi tulis.
+    Setiap item divalidasi sendiri; item yang gagal dilaporkan tanpa membatalkan item lain.
+
+    **Requires:** Admin or Customer role
+    """
+    return await run_storage_call(ShipmentService.create_shipments_bulk, shipments)
 
 
 @router.patch("/{shipment_id}", response_model=ShipmentRead)
 async def update_shipment(
-    shipment_id: int, update_data: ShipmentUpdate, current_user: User = Depends(require_role(["admin", "courier"]))
+    shipment_id: int,
+    update_data: ShipmentUpdate,
+    request: Request,
+    current_user: User = Depends(require_role(["admin", "courier"])),
 ):
     """
     **C0102: Shipment Tracking & Status Update**
@@ -79,9 +180,17 @@ async def update_shipment(
     Update shipment details. Jika status berubah, tracking event baru akan dibuat.
     Hanya Aggregate Root yang boleh memodifikasi Internal Entities.
 
+    Kirim `ETag` dari GET sebelumnya lewat header `If-Match` agar update hanya
+    diterapkan jika shipment belum diubah pihak lain; jika sudah berubah, response
+    `412 Precondition Failed` menyertakan `ETag` terbaru. Response sukses menyertakan
+    `ETag` versi baru.
+
     **Requires:** Admin or Courier role
     """
-    return ShipmentService.update_shipment(shipment_id, update_data)
+    etag, body = await run_storage_call(
+        ShipmentService.update_shipment_response, shipment_id, update_data, request.headers.get("if-match")
+    )
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @router.delete("/{shipment_id}")
@@ -94,4 +203,4 @@ async def delete_shipment(shipment_id: int, current_user: User = Depends(require
 
     **Requires:** Admin role
     """
-    return ShipmentService.delete_shipment(shipment_id)
+    return await run_storage_call(ShipmentService.delete_shipment, shipment_id)
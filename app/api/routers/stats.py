@@ -5,10 +5,16 @@ Endpoints for system statistics and health checks.
 """
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
 
 from app.api.dependencies import require_role
 from app.api.schemas.auth import User
-from app.services.shipment import shipments_db
+from app.core.hashing import get_password_hash_pool
+from app.core.metrics import CONTENT_TYPE, REGISTRY
+from app.core.principal_cache import get_principal_cache
+from app.core.tracking_hub import get_tracking_hub
+from app.services.shipment import ShipmentService
+from app.storage import run_storage_call
 
 router = APIRouter(tags=["Statistics"])
 
@@ -23,15 +29,67 @@ async def get_shipment_statistics(current_user: User = Depends(require_role(["ad
 
     **Requires:** Admin role
     """
-    total = len(shipments_db)
+    return await run_storage_call(ShipmentService.get_statistics)
 
-    # Count by status
-    status_counts = {}
-    for shipment in shipments_db.values():
-        status = shipment["current_status"]
-        status_counts[status] = status_counts.get(status, 0) + 1
 
-    return {"total_shipments": total, "by_status": status_counts}
+@router.post("/stats/recount")
+async def recount_shipment_statistics(current_user: User = Depends(require_role(["admin"]))):
+    """
+    **Recount Statistics**
+
+    Menghitung ulang statistik dari seluruh data shipment dan memperbaiki counter.
+    `drift` bernilai true jika counter sebelumnya tidak sesuai.
+
+    **Requires:** Admin role
+    """
+    return await run_storage_call(ShipmentService.recount_statistics)
+
+
+@router.get("/stats/auth")
+async def get_auth_statistics(current_user: User = Depends(require_role(["admin"]))):
+    """
+    **Authentication Statistics**
+
+    - `password_hash_pool`: beban pool bcrypt - jumlah worker, panggilan yang sedang
+      berjalan dan mengantre, antrean terpanjang, serta login/register yang ditolak (503)
+    - `principal_cache`: ukuran cache user per token serta hit/miss, eviction, dan invalidation
+
+    **Requires:** Admin role
+    """
+    return {"password_hash_pool": get_password_hash_pool().stats(), "principal_cache": get_principal_cache().stats()}
+
+
+@router.get("/stats/live")
+async def get_live_statistics(current_user: User = Depends(require_role(["admin"]))):
+    """
+    **Live Tracking Statistics**
+
+    Jumlah subscription SSE/WebSocket aktif dan shipment yang dipantau, serta
+    jumlah pesan yang dipublikasikan, terkirim, di-drop karena client lambat,
+    dan subscription yang diputus.
+
+    **Requires:** Admin role
+    """
+    return get_tracking_hub().stats()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    **Prometheus Metrics**
+
+    Metrik dalam format teks Prometheus:
+
+    - `logixpress_http_request_duration_seconds`: histogram latensi request per method,
+      route template (mis. `/shipment/{shipment_id}`) dan status
+    - `logixpress_http_requests_in_flight`: request yang sedang diproses per method
+    - `logixpress_service_duration_seconds`: histogram latensi operasi service
+      (`shipment.get`, `shipment.update`, `tracking.add_batch`, `password.verify`, ...)
+
+    Setiap worker process melaporkan metriknya sendiri.
+    Tidak memerlukan autentikasi, seperti `/health`.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
 
 
 @router.get("/health")
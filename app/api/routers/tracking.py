@@ -4,33 +4,62 @@ Tracking Router
 Endpoints for shipment tracking events.
 """
 
-from typing import List
+import asyncio
+import json
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, WebSocket, status
+from fastapi.responses import StreamingResponse
 
-from app.api.dependencies import get_current_active_user, require_role
+from app.api.dependencies import get_current_active_user, get_stream_user, require_role
 from app.api.schemas.auth import User
-from app.api.schemas.shipment import TrackingEvent, TrackingEventCreate
+from app.api.schemas.shipment import TrackingBatchResponse, TrackingEvent, TrackingEventCreate
+from app.config import settings
+from app.core.exceptions import LogixpressException
+from app.core.tracking_hub import Subscription, SubscriptionClosed, get_tracking_hub, sse_events
 from app.services.shipment import ShipmentService
+from app.storage import run_storage_call
 
 router = APIRouter(prefix="/shipment", tags=["Tracking"])
 
+_HEARTBEAT = json.dumps({"type": "heartbeat"})
+_CLIENT_DISCONNECTED = "client disconnected"
+
 
 @router.get("/{shipment_id}/tracking", response_model=List[TrackingEvent])
-async def get_shipment_tracking_history(shipment_id: int, current_user: User = Depends(get_current_active_user)):
+async def get_shipment_tracking_history(
+    shipment_id: int,
+    response: Response,
+    since_event_id: Optional[int] = Query(None, ge=0, description="Only events after this event ID"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of events"),
+    current_user: User = Depends(get_current_active_user),
+):
     """
     **Get Tracking History**
 
     Mengambil riwayat tracking events untuk shipment tertentu.
 
+    Untuk polling, kirim `since_event_id` agar hanya event baru yang dikembalikan
+    (list kosong jika belum ada). Header `X-Last-Event-Id` berisi ID yang dipakai
+    sebagai `since_event_id` pada poll berikutnya, termasuk untuk melanjutkan
+    halaman saat `limit` memotong hasil.
+
     **Requires:** Any authenticated user
     """
-    return ShipmentService.get_tracking_history(shipment_id)
+    events, last_event_id = await run_storage_call(
+        ShipmentService.get_tracking_history, shipment_id, since_event_id, limit
+    )
+    if last_event_id is not None:
+        response.headers["X-Last-Event-Id"] = str(last_event_id)
+    return events
 
 
 @router.post("/{shipment_id}/tracking", response_model=TrackingEvent, status_code=status.HTTP_201_CREATED)
 async def add_tracking_event(
-    shipment_id: int, event: TrackingEventCreate, current_user: User = Depends(require_role(["admin", "courier"]))
+    shipment_id: int,
+    event: TrackingEventCreate,
+    request: Request,
+    current_user: User = Depends(require_role(["admin", "courier"])),
 ):
     """
     **Add Tracking Event**
@@ -38,6 +67,108 @@ async def add_tracking_event(
     Menambahkan tracking event baru untuk shipment.
     Event akan otomatis update status shipment.
 
+    Header `If-Match` opsional (`ETag` dari GET shipment): event hanya ditambahkan
+    jika shipment belum berubah, selain itu `412 Precondition Failed`.
+
+    **Requires:** Admin or Courier role
+    """
+    return await run_storage_call(
+        ShipmentService.add_tracking_event, shipment_id, event, request.headers.get("if-match")
+    )
+
+
+@router.post("s/tracking/batch", response_model=TrackingBatchResponse)
+async def add_tracking_events_batch(
+    events: List[Any] = Body(..., description="Daftar scan TrackingBatchItem"),
+    current_user: User = Depends(require_role(["admin", "courier"])),
+):
+    """
+    **Batch Tracking Events**
+
+    Menerima banyak scan tracking sekaligus (misalnya antrean scanner kurir setelah
+    kembali online) untuk banyak shipment. Event diterapkan berurutan dalam satu
+    operasi tulis, transisi status divalidasi per shipment, dan hasil dilaporkan per event.
+
     **Requires:** Admin or Courier role
     """
-    return ShipmentService.add_tracking_event(shipment_id, event)
+    return await run_storage_call(ShipmentService.add_tracking_events_batch, events)
+
+
+@router.get("s/live", response_class=StreamingResponse)
+async def stream_tracking_updates(
+    shipment_ids: List[int] = Query(..., alias="id", description="Shipment IDs to watch (repeat the parameter)"),
+    current_user: User = Depends(get_stream_user),
+):
+    """
+    **Live Tracking (Server-Sent Events)**
+
+    Stream `text/event-stream` berisi update shipment yang dipantau, sebagai
+    pengganti polling `GET /shipment/{id}` atau `/tracking`. Setiap pesan `data:`
+    adalah JSON dengan `type`:
+    - `tracking_event`: tracking event baru (`event`, `current_status`)
+    - `shipment_updated`: shipment diubah lewat PATCH (`current_status`, `updated_at`, `event` jika status berubah)
+    - `lagged`: client terlalu lambat dan `dropped` pesan terlewat; ambil ulang lewat
+      `GET /shipment/{id}/tracking?since_event_id=...`
+
+    Heartbeat berupa komentar SSE dikirim saat stream idle. Event `close` menandai
+    stream diakhiri server (client lambat atau shutdown); sambungkan ulang.
+
+    Token boleh dikirim lewat query parameter `access_token` (EventSource tidak
+    bisa mengirim header).
+
+    **Requires:** Any authenticated user
+    """
+    await run_storage_call(ShipmentService.check_shipments_exist, shipment_ids)
+    hub = get_tracking_hub()
+    watched = hub.check_shipment_ids(shipment_ids)
+    return StreamingResponse(
+        sse_events(hub, watched, settings.LIVE_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("s/live/ws")
+async def websocket_tracking_updates(
+    websocket: WebSocket,
+    shipment_ids: List[int] = Query(..., alias="id"),
+    access_token: Optional[str] = Query(None),
+):
+    """
+    **Live Tracking (WebSocket)**
+
+    Pesan yang sama dengan `GET /shipments/live`, satu JSON per text frame,
+    ditambah `{"type": "heartbeat"}` saat idle. Koneksi ditolak (1008) jika token
+    atau shipment tidak valid, dan ditutup dengan 1013 saat client terlalu lambat
+    atau server shutdown.
+
+    **Requires:** Any authenticated user (header Authorization atau `access_token`)
+    """
+    hub = get_tracking_hub()
+    try:
+        await get_stream_user(websocket, access_token)
+        await run_storage_call(ShipmentService.check_shipments_exist, shipment_ids)
+        subscription = hub.subscribe(shipment_ids)
+    except (LogixpressException, HTTPException) as exc:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(exc.detail))
+        return
+
+    await websocket.accept()
+    disconnect_watcher = asyncio.create_task(_close_on_disconnect(websocket, subscription))
+    try:
+        while True:
+            message = await subscription.receive(settings.LIVE_HEARTBEAT_SECONDS)
+            await websocket.send_text(_HEARTBEAT if message is None else message)
+    except SubscriptionClosed as exc:
+        if exc.reason != _CLIENT_DISCONNECTED:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=exc.reason)
+    finally:
+        disconnect_watcher.cancel()
+        hub.unsubscribe(subscription)
+
+
+async def _close_on_disconnect(websocket: WebSocket, subscription: Subscription) -> None:
+    """Read (and ignore) client frames until the client goes away, then end the subscription"""
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+    subscription.close(_CLIENT_DISCONNECTED)
@@ -34,6 +34,13 @@ class RegisterResponse(BaseModel):
     message: str
 
 
+class UserUpdate(BaseModel):
+    """User role/status update schema (admin only)"""
+
+    role: Optional[str] = None
+    disabled: Optional[bool] = None
+
+
 class User(BaseModel):
     """User model for responses"""
 
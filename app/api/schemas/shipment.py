@@ -58,6 +58,13 @@ class TrackingEventCreate(BaseModel):
     status: ShipmentStatus
 
 
+class TrackingBatchItem(TrackingEventCreate):
+    """Satu scan dari batch tracking event kurir"""
+
+    shipment_id: int = Field(..., description="Tracking number shipment")
+    timestamp: Optional[datetime] = Field(None, description="Waktu scan, default waktu server")
+
+
 # === AGGREGATE ROOT: Shipment Schemas ===
 class ShipmentBase(BaseModel):
     """Base schema untuk Shipment"""
@@ -110,3 +117,36 @@ class ShipmentCreationResponse(BaseModel):
 
     id: int
     message: str
+
+
+class ShipmentBulkItemResult(BaseModel):
+    """Hasil per item pada bulk create"""
+
+    index: int = Field(..., description="Posisi item dalam request")
+    id: Optional[int] = Field(None, description="Tracking number jika berhasil dibuat")
+    error: Optional[str] = Field(None, description="Pesan validasi jika gagal")
+
+
+class ShipmentBulkCreationResponse(BaseModel):
+    """Response bulk create shipment"""
+
+    created: int
+    failed: int
+    results: List[ShipmentBulkItemResult]
+
+
+class TrackingBatchItemResult(BaseModel):
+    """Hasil per event pada batch tracking"""
+
+    index: int = Field(..., description="Posisi event dalam request")
+    shipment_id: Optional[int] = None
+    event_id: Optional[int] = Field(None, description="ID tracking event jika diterima")
+    error: Optional[str] = Field(None, description="Alasan penolakan jika ditolak")
+
+
+class TrackingBatchResponse(BaseModel):
+    """Response batch tracking event"""
+
+    accepted: int
+    rejected: int
+    results: List[TrackingBatchItemResult]
@@ -6,6 +6,7 @@ Uses environment variables with sensible defaults.
 """
 
 from pathlib import Path
+from typing import Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -38,6 +39,45 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Password hashing pool: bcrypt runs on PASSWORD_HASH_WORKERS threads (defaults to one
+    # less than the CPU count, leaving a core for the event loop) and at most
+    # PASSWORD_HASH_QUEUE_SIZE further calls wait; beyond that logins get a 503
+    PASSWORD_HASH_WORKERS: Optional[int] = None
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
+
+    # Resolved users cached per bearer token; entries expire after the TTL (and never
+    # outlive the token), and are dropped when the user is disabled or changes role
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+
+    # Serialized GET /shipment/{id} bodies kept per shipment; an entry is reused only
+    # while the shipment's version is unchanged, so writes never serve stale bodies
+    SHIPMENT_RESPONSE_CACHE_SIZE: int = 10000
+
+    # Shipment writes (updates, tracking events, deletes) take a per-shipment lock hashed
+    # onto this many stripes, so writers of different shipments rarely wait on each other
+    SHIPMENT_LOCK_STRIPES: int = 1024
+
+    # Live tracking (SSE/WebSocket): messages buffered per subscriber, what happens when a
+    # subscriber falls that far behind ("drop_oldest" or "disconnect"), heartbeat interval
+    # on idle streams, and the most shipments one subscription may watch
+    LIVE_QUEUE_SIZE: int = 100
+    LIVE_SLOW_CONSUMER_POLICY: str = "drop_oldest"
+    LIVE_HEARTBEAT_SECONDS: float = 15.0
+    LIVE_MAX_SHIPMENTS: int = 100
+
+    # Shipment status workflow: status -> statuses it may move to (statuses without an
+    # entry are terminal). Regional flows may add statuses, e.g. "held_at_hub"; added
+    # statuses are numbered after the built-in ones, so stored status codes never shift
+    STATUS_TRANSITIONS: dict[str, list[str]] = {
+        "placed": ["in_transit", "cancelled"],
+        "in_transit": ["out_for_delivery", "returned", "cancelled"],
+        "out_for_delivery": ["delivered", "returned"],
+        "delivered": [],
+        "returned": [],
+        "cancelled": [],
+    }
+
     # CORS Configuration
     CORS_ORIGINS: list[str] = [
         "http://localhost",
@@ -54,6 +94,54 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = "development"
     DEBUG: bool = True
 
+    # Serverless cold starts: skip recovering/seeding storage during startup and leave
+    # it to the first request that touches the repository
+    FAST_STARTUP: bool = False
+
+    # Storage backend: "memory" (optionally persisted with the WAL below) or "sqlite"
+    STORAGE_BACKEND: str = "memory"
+    SQLITE_PATH: Optional[Path] = None  # defaults to DATA_DIR / "logixpress.db"
+    SQLITE_POOL_SIZE: int = 8
+
+    # Worker processes: run.py's production profile starts this many (defaults to the CPU
+    # count) and uvicorn reads it as its --workers default. More than one worker needs the
+    # sqlite backend, which every worker shares; live tracking messages and user changes
+    # (dropping cached principals) then travel between workers through the database, each
+    # worker polling it every LIVE_RELAY_POLL_SECONDS
+    WEB_CONCURRENCY: Optional[int] = None
+    LIVE_RELAY_POLL_SECONDS: float = 0.1
+
+    # Request profiling, off by default (no profiling code runs on requests then). When on,
+    # an admin profiles a request by sending "X-Profile: 1", and PROFILE_SAMPLE_RATE of all
+    # requests are profiled too. PROFILER is "cprofile" (pstats of the event loop thread) or
+    # "sampling" (collapsed stacks of every thread every PROFILE_SAMPLE_INTERVAL_MS). Profiles
+    # stop after PROFILE_MAX_SECONDS and go to PROFILES_DIR, keeping the newest PROFILES_KEEP
+    PROFILING_ENABLED: bool = False
+    PROFILER: str = "cprofile"
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_SAMPLE_INTERVAL_MS: float = 1.0
+    PROFILE_MAX_SECONDS: float = 30.0
+    PROFILES_DIR: Optional[Path] = None  # defaults to DATA_DIR / "profiles"
+    PROFILES_KEEP: int = 200
+
+    # Persistence (state files are written under DATA_DIR when enabled)
+    DATA_DIR: Path = PROJECT_DIR / "data"
+    PERSISTENCE_ENABLED: bool = False
+
+    # Write-ahead log: appends within the fsync interval share one fsync (0 = fsync
+    # every append); a snapshot is taken after WAL_SNAPSHOT_EVERY records
+    WAL_FSYNC_INTERVAL_MS: int = 10
+    WAL_SNAPSHOT_EVERY: int = 50000
+
+    # Shipment IDs reserved per high-water mark update
+    ID_BLOCK_SIZE: int = 100
+
+    # Maximum number of shipments accepted by one bulk create request
+    BULK_MAX_ITEMS: int = 1000
+
+    # Maximum number of tracking events accepted by one batch ingest request
+    TRACKING_BATCH_MAX_ITEMS: int = 5000
+
     model_config = SettingsConfigDict(
         env_file=PROJECT_DIR / ".env",
         env_ignore_empty=True,
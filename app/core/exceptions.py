@@ -57,6 +57,15 @@ class InvalidStatusTransition(LogixpressException):
         super().__init__(detail, status.HTTP_400_BAD_REQUEST)
 
 
+class PreconditionFailed(LogixpressException):
+    """Raised when an If-Match precondition no longer holds (the entity changed since it was read)"""
+
+    def __init__(self, entity_name: str, entity_id: int | str, current_etag: str):
+        detail = f"{entity_name} with id {entity_id} has been modified; fetch it again and retry"
+        self.current_etag = current_etag
+        super().__init__(detail, status.HTTP_412_PRECONDITION_FAILED)
+
+
 class DuplicateEntity(LogixpressException):
     """Raised when trying to create a duplicate entity"""
 
@@ -70,3 +79,10 @@ class ValidationError(LogixpressException):
 
     def __init__(self, detail: str):
         super().__init__(detail, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+
+class ServiceUnavailable(LogixpressException):
+    """Raised when a bounded resource is saturated and the request should be retried"""
+
+    def __init__(self, detail: str):
+        super().__init__(detail, status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -0,0 +1,98 @@
+"""
+Password Hashing Pool
+
+Runs bcrypt hashing and verification on a dedicated, bounded thread pool so a
+login never stalls the event loop. bcrypt releases the GIL while it works, so
+threads give real parallelism. Admission is capped at ``workers + queue_size``
+calls; anything beyond that is rejected straight away with ServiceUnavailable
+instead of queueing without bound.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from app.config import settings
+from app.core.exceptions import ServiceUnavailable
+
+T = TypeVar("T")
+
+
+class PasswordHashPool:
+    """Bounded executor for password hashing work"""
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_queued = 0
+        self._completed = 0
+        self._rejected = 0
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """
+        Run func(*args) on the pool and wait for the result
+
+        Raises:
+            ServiceUnavailable: If every worker is busy and the queue is full
+        """
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_size:
+                self._rejected += 1
+                raise ServiceUnavailable("Authentication is busy, please retry shortly")
+            self._in_flight += 1
+            self._peak_queued = max(self._peak_queued, self._in_flight - self.workers)
+
+        try:
+            return await asyncio.wrap_future(self._executor.submit(func, *args))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+
+    def stats(self) -> dict:
+        """Current load and lifetime counters of the pool"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.workers),
+                "peak_queued": self._peak_queued,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        """Stop the worker threads once queued work has finished"""
+        self._executor.shutdown(wait=True)
+
+
+_pool: Optional[PasswordHashPool] = None
+
+
+def get_password_hash_pool() -> PasswordHashPool:
+    """Get the process-wide hashing pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        workers = settings.PASSWORD_HASH_WORKERS or max(1, (os.cpu_count() or 1) - 1)
+        _pool = PasswordHashPool(workers, settings.PASSWORD_HASH_QUEUE_SIZE)
+    return _pool
+
+
+def set_password_hash_pool(pool: Optional[PasswordHashPool]) -> None:
+    """Replace the process-wide hashing pool (None recreates it from settings)"""
+    global _pool
+    _pool = pool
+
+
+def shutdown_password_hash_pool() -> None:
+    """Stop the process-wide hashing pool if it was started; the next call starts a fresh one"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
@@ -0,0 +1,60 @@
+"""
+Striped Locks
+
+Fixed array of locks that keys (e.g. shipment IDs) hash onto, so writers of
+different shipments rarely wait on each other while read-modify-write of a
+single shipment is serialized. Memory stays bounded regardless of how many
+keys exist; two keys that share a stripe only cost some false contention.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Hashable, Iterator, Optional
+
+from app.config import settings
+
+
+class StripedLock:
+    """Lock per key, backed by a fixed number of stripes"""
+
+    def __init__(self, stripes: int):
+        self.stripes = max(1, stripes)
+        self._locks = tuple(threading.Lock() for _ in range(self.stripes))
+
+    def stripe(self, key: Hashable) -> int:
+        """Index of the lock guarding key"""
+        return hash(key) % self.stripes
+
+    @contextmanager
+    def hold(self, *keys: Hashable) -> Iterator[None]:
+        """
+        Hold the locks of every key for the duration of the block
+
+        Stripes are acquired once each, in index order, so callers locking
+        overlapping sets of keys cannot deadlock.
+        """
+        locks = [self._locks[index] for index in sorted({self.stripe(key) for key in keys})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+
+_shipment_locks: Optional[StripedLock] = None
+
+
+def get_shipment_locks() -> StripedLock:
+    """Get the process-wide shipment write locks, creating them on first use"""
+    global _shipment_locks
+    if _shipment_locks is None:
+        _shipment_locks = StripedLock(settings.SHIPMENT_LOCK_STRIPES)
+    return _shipment_locks
+
+
+def set_shipment_locks(locks: Optional[StripedLock]) -> None:
+    """Replace the process-wide shipment write locks (None recreates them from settings)"""
+    global _shipment_locks
+    _shipment_locks = locks
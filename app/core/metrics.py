@@ -0,0 +1,244 @@
+"""
+Metrics
+
+Request and service latency histograms plus in-flight gauges, rendered in the
+Prometheus text format for ``GET /metrics``. Recording takes no lock: every
+thread (the event loop, each threadpool and hash-pool worker) adds into its own
+shard of plain lists, and a scrape sums the shards. Observing a value is a
+thread-local lookup, a bisect over the bucket bounds and two list updates.
+
+A scrape may catch a shard between its bucket and sum updates, so one series
+can be off by the observation in progress; the next scrape is exact again.
+Every worker process keeps its own registry and reports its own numbers.
+"""
+
+import bisect
+import math
+import threading
+import time
+from functools import wraps
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+# PlainTextResponse appends "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Upper bounds in seconds, from cached reads (~100 µs) to bcrypt and large batches
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class MetricsRegistry:
+    """Metric definitions and the per-thread shards holding their values"""
+
+    def __init__(self):
+        # name -> (type, description, label names, bucket bounds)
+        self._metrics: dict[str, tuple[str, str, tuple[str, ...], tuple[float, ...]]] = {}
+        self._shards: list[dict] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def histogram(
+        self, name: str, description: str, labels: tuple[str, ...], buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ) -> "Histogram":
+        """Define a histogram"""
+        self._metrics[name] = ("histogram", description, labels, buckets)
+        return Histogram(self, name, buckets)
+
+    def gauge(self, name: str, description: str, labels: tuple[str, ...]) -> "Gauge":
+        """Define a gauge"""
+        self._metrics[name] = ("gauge", description, labels, ())
+        return Gauge(self, name)
+
+    def shard(self) -> dict:
+        """The calling thread's shard: (metric, label values) -> values"""
+        try:
+            shard: dict = self._local.shard
+            return shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            # Shards of finished threads stay registered: their counts are part of the totals
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def collect(self) -> dict[tuple[str, tuple[str, ...]], list]:
+        """Sum every shard into (metric, label values) -> values"""
+        with self._lock:
+            shards = list(self._shards)
+        totals: dict[tuple[str, tuple[str, ...]], list] = {}
+        for shard in shards:
+            for key, values in dict(shard).items():
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = list(values)
+                else:
+                    for i, value in enumerate(values):
+                        total[i] += value
+        return totals
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)"""
+        series_by_metric: dict[str, list] = {}
+        for (name, label_values), values in sorted(self.collect().items()):
+            series_by_metric.setdefault(name, []).append((label_values, values))
+
+        lines = []
+        for name, (kind, description, label_names, buckets) in self._metrics.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for label_values, values in series_by_metric.get(name, ()):
+                pairs = [f'{label}="{_escape(value)}"' for label, value in zip(label_names, label_values, strict=True)]
+                labels = f"{{{','.join(pairs)}}}" if pairs else ""
+                if kind == "gauge":
+                    lines.append(f"{name}{labels} {_format(values[0])}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + (math.inf,), values[:-1], strict=True):
+                    cumulative += count
+                    bucket_labels = ",".join(pairs + [f'le="{_format(bound)}"'])
+                    lines.append(f"{name}_bucket{{{bucket_labels}}} {cumulative}")
+                lines.append(f"{name}_sum{labels} {_format(values[-1])}")
+                lines.append(f"{name}_count{labels} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+class Histogram:
+    """Distribution of observed values per label set"""
+
+    def __init__(self, registry: MetricsRegistry, name: str, buckets: tuple[float, ...]):
+        self.registry = registry
+        self.name = name
+        self.buckets = buckets
+
+    def observe(self, labels: tuple[str, ...], value: float) -> None:
+        """Record value under labels (label values in definition order)"""
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        values = shard.get(key)
+        if values is None:
+            # One count per bucket, the +Inf bucket, then the sum
+            values = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+
+class Gauge:
+    """Value that goes up and down per label set"""
+
+    def __init__(self, registry: MetricsRegistry, name: str):
+        self.registry = registry
+        self.name = name
+
+    def add(self, labels: tuple[str, ...], amount: float) -> None:
+        """Add amount (negative to subtract) under labels"""
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        values = shard.get(key)
+        if values is None:
+            values = shard[key] = [0]
+        values[0] += amount
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "logixpress_http_request_duration_seconds",
+    "HTTP request latency by method, route template and response status",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "logixpress_http_requests_in_flight", "HTTP requests currently being handled", ("method",)
+)
+SERVICE_DURATION = REGISTRY.histogram(
+    "logixpress_service_duration_seconds", "Latency of service-layer operations", ("operation",)
+)
+
+
+def timed(operation: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    Decorator recording every call's duration, failed calls included
+
+    Args:
+        operation: Value of the ``operation`` label in logixpress_service_duration_seconds
+    """
+    labels = (operation,)
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> T:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                SERVICE_DURATION.observe(labels, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing HTTP requests by method, route template and status
+
+    Routes are labelled with their path template (``/shipment/{shipment_id}``),
+    which the router stores in the scope, so label cardinality stays bounded;
+    requests no route matched are labelled ``unmatched``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        # A plain function returning send's awaitable saves a coroutine frame per message
+        def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            return send(message)
+
+        in_flight = (method,)
+        HTTP_REQUESTS_IN_FLIGHT.add(in_flight, 1)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.add(in_flight, -1)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.observe((method, route, str(status)), elapsed)
@@ -0,0 +1,147 @@
+"""
+Principal Cache
+
+Bounded LRU cache of resolved users keyed by bearer token, so authenticated
+requests skip JWT decoding and the user lookup on repeat calls. Entries live
+for at most ``ttl_seconds`` and never outlive the token itself; user changes
+must call ``invalidate_user`` so a disabled account or a role change takes
+effect on the next request. Other worker processes hear of the change through
+the user store's ``watch_changes`` and invalidate their own caches.
+
+A lookup racing with a change could cache the user as it was before the
+change, after ``invalidate_user`` already ran. Callers therefore read the
+user's ``generation`` before looking the user up and pass it to ``put``,
+which discards the entry if the user was invalidated in between.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.api.schemas.auth import User
+from app.config import settings
+
+
+class PrincipalCache:
+    """LRU/TTL cache of token -> User"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[User, float]] = OrderedDict()
+        self._tokens_by_user: dict[str, set[str]] = {}
+        # Username -> number of invalidations, for users invalidated at least once
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, token: str) -> Optional[User]:
+        """Cached user for token, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self._misses += 1
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._drop(token)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self._hits += 1
+            return user
+
+    def generation(self, username: str) -> int:
+        """Invalidation generation of username, to read before looking the user up"""
+        with self._lock:
+            return self._generations.get(username, 0)
+
+    def put(
+        self, token: str, user: User, token_expires_at: Optional[float] = None, generation: Optional[int] = None
+    ) -> None:
+        """
+        Cache user for token
+
+        Args:
+            token: Bearer token
+            user: Resolved user
+            token_expires_at: Token expiry as a Unix timestamp; the entry is
+                dropped no later than this
+            generation: generation(user.username) read before user was looked
+                up; nothing is cached if the user was invalidated since
+        """
+        if self.max_size <= 0:
+            return
+        now = time.monotonic()
+        expires_at = now + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, now + token_expires_at - time.time())
+
+        with self._lock:
+            if generation is not None and self._generations.get(user.username, 0) != generation:
+                return
+            if token in self._entries:
+                self._drop(token)
+            self._entries[token] = (user, expires_at)
+            self._tokens_by_user.setdefault(user.username, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate_user(self, username: str) -> None:
+        """Drop every cached token resolving to username"""
+        with self._lock:
+            self._generations[username] = self._generations.get(username, 0) + 1
+            for token in self._tokens_by_user.pop(username, ()):
+                self._entries.pop(token, None)
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept"""
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self) -> dict:
+        """Size and lifetime hit/miss counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+    def _drop(self, token: str) -> None:
+        user, _ = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(user.username)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user.username]
+
+
+_cache: Optional[PrincipalCache] = None
+
+
+def get_principal_cache() -> PrincipalCache:
+    """Get the process-wide principal cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        _cache = PrincipalCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+    return _cache
+
+
+def set_principal_cache(cache: Optional[PrincipalCache]) -> None:
+    """Replace the process-wide principal cache (None recreates it from settings)"""
+    global _cache
+    _cache = cache
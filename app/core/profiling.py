@@ -0,0 +1,259 @@
+"""
+Request Profiling
+
+Opt-in profiling of single requests, for finding where a slow endpoint spends
+its time in production. ProfilingMiddleware is only installed when
+``PROFILING_ENABLED`` is set, so with profiling off no request runs any of
+this code. Once enabled, a request is profiled when an admin sends
+``X-Profile: 1`` with it, or when it is picked by ``PROFILE_SAMPLE_RATE``.
+
+Two profilers are available:
+- ``cprofile``: deterministic profile of the event loop thread, saved as a
+  pstats file (``python -m pstats``, snakeviz). Work handed to the threadpool
+  or the password hashing pool shows up only as the time spent awaiting it,
+  and other requests interleaved on the loop are included.
+- ``sampling``: samples the stacks of every thread each
+  ``PROFILE_SAMPLE_INTERVAL_MS``, saved as collapsed stacks (one
+  ``thread;outer;...;inner count`` line per stack, the input of flamegraph.pl
+  and speedscope). It sees threadpool and bcrypt work too, along with
+  whatever else the process was doing.
+
+One request is profiled at a time; others run unprofiled meanwhile. The
+profile's file name is returned in the ``X-Profile-Id`` response header, and
+the files are listed and downloaded through ``/profiles``.
+"""
+
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from types import FrameType
+from typing import Awaitable, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import PROJECT_DIR, settings
+from app.core.exceptions import EntityNotFound
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+_STDLIB = os.path.dirname(os.__file__) + os.sep
+_PROFILE_NAME = re.compile(r"^[0-9TZ]+-[A-Z]+-[A-Za-z0-9_-]+\.(pstats|collapsed)$")
+
+
+class CProfileSession:
+    """cProfile of the calling (event loop) thread"""
+
+    suffix = ".pstats"
+
+    def __init__(self, interval: float):
+        import cProfile
+
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+
+    def save(self, path: Path) -> None:
+        self.profile.dump_stats(path)
+
+
+class SamplingSession:
+    """Stack samples of every thread, taken every interval seconds on a background thread"""
+
+    suffix = ".collapsed"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def save(self, path: Path) -> None:
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in self.samples.most_common()))
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, top in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                frame: Optional[FrameType] = top
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+
+PROFILERS = {"cprofile": CProfileSession, "sampling": SamplingSession}
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(str(PROJECT_DIR)):
+        filename = os.path.relpath(filename, PROJECT_DIR)
+    elif "site-packages" + os.sep in filename:
+        filename = filename.rpartition("site-packages" + os.sep)[2]
+    elif filename.startswith(_STDLIB):
+        filename = filename[len(_STDLIB) :]
+    # co_qualname is new in Python 3.11
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+class ProfileStore:
+    """Directory of saved profiles, keeping the newest keep files"""
+
+    def __init__(self, directory: Path, keep: int):
+        self.directory = directory
+        self.keep = keep
+
+    def new_name(self, method: str, route: str, suffix: str) -> str:
+        """File name for a profile of method route taken now"""
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        slug = re.sub(r"[^A-Za-z0-9_]+", "-", route).strip("-") or "root"
+        return f"{timestamp}-{method}-{slug}{suffix}"
+
+    def save(self, session, name: str) -> None:
+        """Write session's profile as name and drop the oldest files beyond keep"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        session.save(self.directory / name)
+        for stale in self.list()[self.keep :]:
+            (self.directory / stale["name"]).unlink(missing_ok=True)
+
+    def list(self) -> list[dict]:
+        """Saved profiles, newest first"""
+        if not self.directory.is_dir():
+            return []
+        profiles = []
+        for path in self.directory.iterdir():
+            if _PROFILE_NAME.match(path.name):
+                stat = path.stat()
+                created_at = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+                profiles.append({"name": path.name, "size": stat.st_size, "created_at": created_at})
+        return sorted(profiles, key=lambda profile: profile["name"], reverse=True)
+
+    def path(self, name: str) -> Path:
+        """
+        Path of a saved profile
+
+        Raises:
+            EntityNotFound: If name is not a saved profile
+        """
+        path = self.directory / name
+        if not _PROFILE_NAME.match(name) or not path.is_file():
+            raise EntityNotFound("Profile", name)
+        return path
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests asked for by an admin or picked by sampling
+
+    Args:
+        app: ASGI application
+        authorize: Coroutine function telling whether a bearer token may request a profile (admins only)
+        profiler: "cprofile" or "sampling"
+        sample_rate: Fraction of requests profiled without being asked
+        sample_interval: Seconds between stack samples of the sampling profiler
+        max_seconds: Profiling stops once a response has been running this long
+    """
+
+    def __init__(
+        self,
+        app,
+        authorize: Callable[[str], Awaitable[bool]],
+        profiler: str = "cprofile",
+        sample_rate: float = 0.0,
+        sample_interval: float = 0.001,
+        max_seconds: float = 30.0,
+    ):
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler: {profiler} (expected one of {', '.join(PROFILERS)})")
+        self.app = app
+        self.authorize = authorize
+        self.session_class = PROFILERS[profiler]
+        self.sample_rate = sample_rate
+        self.sample_interval = sample_interval
+        self.max_seconds = max_seconds
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/profiles") or not await self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        store = get_profile_store()
+        started = time.perf_counter()
+        session = self.session_class(self.sample_interval)
+        running = True
+        name = None
+
+        def send_profiled(message):
+            nonlocal running, name
+            if message["type"] == "http.response.start":
+                route = getattr(scope.get("route"), "path", "unmatched")
+                name = store.new_name(scope["method"], route, self.session_class.suffix)
+                message = {**message, "headers": [*message.get("headers", []), (PROFILE_ID_HEADER, name.encode())]}
+            if running and time.perf_counter() - started > self.max_seconds:
+                session.stop()
+                running = False
+            return send(message)
+
+        try:
+            await self.app(scope, receive, send_profiled)
+        finally:
+            try:
+                if running:
+                    session.stop()
+                if name is not None:
+                    await run_in_threadpool(store.save, session, name)
+            finally:
+                self._busy.release()
+
+    async def _wanted(self, scope) -> bool:
+        """Whether the request asks for a profile with an admin token, or is sampled"""
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER) not in (b"1", b"true"):
+            return False
+        scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+        return scheme.lower() == "bearer" and bool(token) and await self.authorize(token)
+
+
+# Global profile store instance
+_profile_store: Optional[ProfileStore] = None
+
+
+def get_profile_store() -> ProfileStore:
+    """Get the profile store, creating it from settings on first use"""
+    global _profile_store
+    if _profile_store is None:
+        _profile_store = ProfileStore(settings.PROFILES_DIR or settings.DATA_DIR / "profiles", settings.PROFILES_KEEP)
+    return _profile_store
+
+
+def set_profile_store(store: Optional[ProfileStore]) -> None:
+    """Replace the profile store (None recreates it from settings on next use)"""
+    global _profile_store
+    _profile_store = store
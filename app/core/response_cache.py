@@ -0,0 +1,128 @@
+"""
+Response Cache
+
+Bounded LRU cache of serialized response bodies with their strong ETags.
+Each entry is stored under a key (e.g. a shipment ID) together with the
+state it was rendered from (e.g. repository generation and shipment
+version); a lookup only hits when that state is still current, so writers
+never have to invalidate entries explicitly.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from app.config import settings
+
+
+def make_etag(version: int, body: bytes) -> str:
+    """Strong ETag naming the version and the exact bytes of the body"""
+    return f'"{version}-{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluate an If-None-Match header against the current ETag
+
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match, so a
+    ``W/`` prefix on the client's copy is ignored; ``*`` matches anything.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def etag_matches_version(if_match: str, version: int) -> bool:
+    """
+    Evaluate an If-Match header against the current version
+
+    Compares the version make_etag puts at the front of the ETag, so checking
+    a precondition needs no body. Uses the strong comparison RFC 9110
+    prescribes for If-Match, so ``W/`` tags never match; ``*`` matches any
+    current representation.
+    """
+    prefix = f'"{version}-'
+    for candidate in if_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or (candidate.startswith(prefix) and candidate.endswith('"')):
+            return True
+    return False
+
+
+class ResponseCache:
+    """LRU cache of key -> (state, ETag, body)"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[Hashable, tuple[Hashable, str, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable, state: Hashable) -> Optional[tuple[str, bytes]]:
+        """(ETag, body) cached for key if it was rendered from state, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != state:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key: Hashable, state: Hashable, etag: str, body: bytes) -> None:
+        """Cache body rendered from state under key, replacing any older rendering"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (state, etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def discard(self, key: Hashable) -> None:
+        """Drop the entry for key, if any"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Size and lifetime hit/miss counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+            }
+
+
+_shipment_cache: Optional[ResponseCache] = None
+
+
+def get_shipment_response_cache() -> ResponseCache:
+    """Get the process-wide cache of GET /shipment/{id} bodies, creating it on first use"""
+    global _shipment_cache
+    if _shipment_cache is None:
+        _shipment_cache = ResponseCache(settings.SHIPMENT_RESPONSE_CACHE_SIZE)
+    return _shipment_cache
+
+
+def set_shipment_response_cache(cache: Optional[ResponseCache]) -> None:
+    """Replace the process-wide shipment response cache (None recreates it from settings)"""
+    global _shipment_cache
+    _shipment_cache = cache
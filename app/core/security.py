@@ -3,20 +3,23 @@ Security and Authentication Module
 
 Contains JWT token creation/validation, password hashing, and OAuth2 setup.
 Extracted from the original auth.py for better separation of concerns.
+
+python-jose and passlib are imported on first use rather than at module load,
+keeping them off the serverless cold-start path.
 """
 
 from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi.security import HTTPBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel
 
 from app.config import settings
+from app.core.hashing import get_password_hash_pool
+from app.core.metrics import timed
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context, built on first use so passlib stays out of cold starts
+_pwd_context = None
 
 # HTTP Bearer security scheme
 security = HTTPBearer()
@@ -35,17 +38,40 @@ class TokenData(BaseModel):
 
     username: Optional[str] = None
     role: Optional[str] = None
+    expires_at: Optional[float] = None
 
 
 # Password utilities
+def get_pwd_context():
+    """Get the bcrypt CryptContext, importing passlib on first call"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+@timed("password.hash")
 def get_password_hash(password: str) -> str:
     """Hash a password using bcrypt"""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
+@timed("password.verify")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the bounded hashing pool"""
+    return await get_password_hash_pool().run(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the bounded hashing pool"""
+    return await get_password_hash_pool().run(verify_password, plain_password, hashed_password)
 
 
 # JWT utilities
@@ -60,6 +86,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     Returns:
         Encoded JWT token string
     """
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -81,6 +109,8 @@ def decode_access_token(token: str) -> Optional[TokenData]:
     Returns:
         TokenData if valid, None otherwise
     """
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
@@ -89,6 +119,6 @@ def decode_access_token(token: str) -> Optional[TokenData]:
         if username is None:
             return None
 
-        return TokenData(username=username, role=role)
+        return TokenData(username=username, role=role, expires_at=payload.get("exp"))
     except JWTError:
         return None
@@ -0,0 +1,382 @@
+"""
+Tracking Hub
+
+In-process pub/sub for live shipment updates. Write paths publish one message
+per change; the hub serializes it once and fans it out to every subscription
+watching that shipment. Subscriptions (one per SSE stream or WebSocket) each
+have a bounded queue, so a slow consumer can never hold up the publisher or
+grow memory without limit. When a queue is full the slow consumer policy
+decides what happens:
+
+- ``drop_oldest``: discard the oldest queued message and, before the next
+  delivered one, tell the subscriber how many it missed (``lagged``)
+- ``disconnect``: close the subscription; the client reconnects and catches up
+  from ``GET /shipment/{id}/tracking?since_event_id=...``
+
+Delivery always happens on the event loop the subscriptions live on;
+``publish`` may be called from worker threads (the SQLite backend runs
+service calls in the threadpool).
+
+With several worker processes a subscriber's connection lives on one worker
+while writes land on any of them, so the hub is given a ``LiveRelay``. The hub
+tells it which shipments its subscriptions watch, and the relay carries a
+published message to the other workers' hubs when one of them watches the
+shipment.
+"""
+
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import AsyncIterator, Callable, Iterable, Optional
+
+from app.config import settings
+from app.core.exceptions import ValidationError
+
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "disconnect")
+
+
+class SubscriptionClosed(Exception):
+    """The subscription was closed by the hub, the policy or the client"""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(reason)
+
+
+class Subscription:
+    """One subscriber's bounded queue of serialized messages"""
+
+    __slots__ = ("shipment_ids", "queue_size", "dropped", "close_reason", "_queue", "_waiter")
+
+    def __init__(self, shipment_ids: frozenset[int], queue_size: int):
+        self.shipment_ids = shipment_ids
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.close_reason: Optional[str] = None
+        self._queue: deque[str] = deque()
+        # Future the pending receive waits on; a bare future and timer handle cost far
+        # less than asyncio.wait_for, which starts a task per call
+        self._waiter: Optional[asyncio.Future] = None
+
+    @property
+    def closed(self) -> bool:
+        return self.close_reason is not None
+
+    async def receive(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Next message as a JSON string
+
+        Args:
+            timeout: Seconds to wait for one; None waits indefinitely
+
+        Returns:
+            The message, or None if nothing arrived in time (time for a heartbeat)
+
+        Raises:
+            SubscriptionClosed: Once the subscription is closed
+        """
+        if not self._queue and not self.closed:
+            loop = asyncio.get_running_loop()
+            self._waiter = loop.create_future()
+            timer = None if timeout is None else loop.call_later(timeout, self._wake)
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+                if timer is not None:
+                    timer.cancel()
+        if self.close_reason is not None:
+            raise SubscriptionClosed(self.close_reason)
+        if not self._queue:
+            return None
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            return json.dumps({"type": "lagged", "dropped": dropped})
+        return self._queue.popleft()
+
+    def close(self, reason: str) -> None:
+        """Close the subscription, waking up a pending receive"""
+        if not self.closed:
+            self.close_reason = reason
+            self._queue.clear()
+            self._wake()
+
+    def _push(self, message: str, policy: str) -> bool:
+        """Queue message; False if the policy closed the subscription instead"""
+        if len(self._queue) >= self.queue_size:
+            if policy == "disconnect":
+                self.close("slow consumer")
+                return False
+            self._queue.popleft()
+            self.dropped += 1
+        self._queue.append(message)
+        self._wake()
+        return True
+
+    def _wake(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+class LiveRelay(ABC):
+    """Transport of published messages between the worker processes' hubs"""
+
+    @abstractmethod
+    def send_many(self, messages: list[tuple[int, str]]) -> None:
+        """Pass (shipment_id, serialized message) pairs on to the other workers, in order"""
+
+    @abstractmethod
+    def watch(self, shipment_ids: Iterable[int]) -> None:
+        """Let the other workers know this one has subscribers for shipment_ids; must not block"""
+
+    @abstractmethod
+    def unwatch(self, shipment_ids: Iterable[int]) -> None:
+        """Let the other workers know this one no longer has subscribers for shipment_ids; must not block"""
+
+    @abstractmethod
+    def watched(self, shipment_id: int) -> bool:
+        """Whether another worker has subscribers for shipment_id"""
+
+    @abstractmethod
+    def start(self, deliver: Callable[[int, str], None]) -> None:
+        """Call deliver(shipment_id, payload), from any thread, for each message another worker sends"""
+
+    @abstractmethod
+    def stop(self) -> None:
+        """Stop receiving messages"""
+
+
+class TrackingHub:
+    """Fan-out of shipment updates to live subscriptions"""
+
+    def __init__(self, queue_size: int, policy: str = "drop_oldest", max_shipments: int = 100):
+        """
+        Args:
+            queue_size: Messages buffered per subscription
+            policy: Slow consumer policy, "drop_oldest" or "disconnect"
+            max_shipments: Most shipments one subscription may watch
+
+        Raises:
+            ValueError: If policy is unknown
+        """
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.queue_size = queue_size
+        self.policy = policy
+        self.max_shipments = max_shipments
+        self._subscriptions: dict[int, set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.relay: Optional[LiveRelay] = None
+        self._active = 0
+        self._subscribed = 0
+        self._published = 0
+        self._delivered = 0
+        self._dropped = 0
+        self._disconnected = 0
+
+    def check_shipment_ids(self, shipment_ids: Iterable[int]) -> frozenset[int]:
+        """
+        The distinct shipment_ids, if they may be subscribed to
+
+        Raises:
+            ValidationError: If no shipment or more than max_shipments are given
+        """
+        ids = frozenset(shipment_ids)
+        if not ids or len(ids) > self.max_shipments:
+            raise ValidationError(f"Subscribe to between 1 and {self.max_shipments} shipments")
+        return ids
+
+    def subscribe(self, shipment_ids: Iterable[int]) -> Subscription:
+        """
+        Start receiving messages for shipment_ids; must run on the event loop
+
+        Raises:
+            ValidationError: If no shipment or more than max_shipments are given
+        """
+        ids = self.check_shipment_ids(shipment_ids)
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(ids, self.queue_size)
+        if self.relay is not None:
+            self.relay.watch(ids.difference(self._subscriptions))
+        for shipment_id in ids:
+            self._subscriptions.setdefault(shipment_id, set()).add(subscription)
+        self._active += 1
+        self._subscribed += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop delivering to subscription and close it; must run on the event loop"""
+        registered = False
+        unwatched = []
+        for shipment_id in subscription.shipment_ids:
+            subscribers = self._subscriptions.get(shipment_id)
+            if subscribers is not None and subscription in subscribers:
+                registered = True
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[shipment_id]
+                    unwatched.append(shipment_id)
+        if registered:
+            self._active -= 1
+        if unwatched and self.relay is not None:
+            self.relay.unwatch(unwatched)
+        subscription.close("unsubscribed")
+
+    def attach_relay(self, relay: LiveRelay) -> None:
+        """Exchange published messages with the other worker processes through relay"""
+        self.relay = relay
+        relay.watch(list(self._subscriptions))
+        relay.start(self._relayed)
+
+    def watching(self, shipment_id: int) -> bool:
+        """
+        Whether a subscription here or on another worker watches shipment_id
+
+        Lets publishers skip building messages nobody receives.
+        """
+        return shipment_id in self._subscriptions or (self.relay is not None and self.relay.watched(shipment_id))
+
+    def publish(self, shipment_id: int, message: dict) -> None:
+        """
+        Send message to every subscription watching shipment_id
+
+        Costs a lookup or two when nobody is watching; otherwise the message is
+        serialized once, handed to the relay if another worker watches the
+        shipment and delivered on the event loop. Safe to call from any thread.
+        """
+        if self.relay is not None:
+            self.publish_many([(shipment_id, message)])
+        elif shipment_id in self._subscriptions:
+            self._publish_local(shipment_id, _serialize(shipment_id, message))
+
+    def publish_many(self, messages: list[tuple[int, dict]]) -> None:
+        """Publish (shipment_id, message) pairs like publish, handing them to the relay in one call"""
+        if self.relay is None:
+            for shipment_id, message in messages:
+                self.publish(shipment_id, message)
+            return
+        relay = self.relay
+        payloads = [
+            (shipment_id, _serialize(shipment_id, message))
+            for shipment_id, message in messages
+            if shipment_id in self._subscriptions or relay.watched(shipment_id)
+        ]
+        remote = [(shipment_id, payload) for shipment_id, payload in payloads if relay.watched(shipment_id)]
+        if remote:
+            relay.send_many(remote)
+        for shipment_id, payload in payloads:
+            if shipment_id in self._subscriptions:
+                self._publish_local(shipment_id, payload)
+
+    def close_all(self, reason: str = "shutdown") -> None:
+        """Close every subscription (server shutdown) so open streams end, and stop the relay"""
+        if self.relay is not None:
+            self.relay.stop()
+            self.relay = None
+        for subscription in {s for subscribers in self._subscriptions.values() for s in subscribers}:
+            subscription.close(reason)
+        self._subscriptions.clear()
+        self._active = 0
+
+    def stats(self) -> dict:
+        """Live subscriptions and lifetime delivery counters"""
+        return {
+            "subscriptions": self._active,
+            "shipments_watched": len(self._subscriptions),
+            "queue_size": self.queue_size,
+            "policy": self.policy,
+            "relay": self.relay is not None,
+            "subscribed": self._subscribed,
+            "published": self._published,
+            "delivered": self._delivered,
+            "dropped": self._dropped,
+            "disconnected": self._disconnected,
+        }
+
+    def _publish_local(self, shipment_id: int, payload: str) -> None:
+        """Deliver payload to this worker's subscriptions on their event loop"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._deliver(shipment_id, payload)
+        else:
+            loop.call_soon_threadsafe(self._deliver, shipment_id, payload)
+
+    def _relayed(self, shipment_id: int, payload: str) -> None:
+        """Deliver a message another worker published; called from the relay's thread"""
+        loop = self._loop
+        if shipment_id in self._subscriptions and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._deliver, shipment_id, payload)
+
+    def _deliver(self, shipment_id: int, payload: str) -> None:
+        subscribers = self._subscriptions.get(shipment_id)
+        if not subscribers:
+            return
+        self._published += 1
+        for subscription in list(subscribers):
+            dropped = subscription.dropped
+            if subscription._push(payload, self.policy):
+                self._delivered += 1
+                self._dropped += subscription.dropped - dropped
+            else:
+                self._disconnected += 1
+                self.unsubscribe(subscription)
+
+
+def _serialize(shipment_id: int, message: dict) -> str:
+    return json.dumps({"type": message["type"], "shipment_id": shipment_id, **message}, default=str)
+
+
+async def sse_events(hub: TrackingHub, shipment_ids: Iterable[int], heartbeat_seconds: float) -> AsyncIterator[str]:
+    """
+    Server-Sent Events stream of shipment_ids' messages
+
+    Subscribes once the stream starts and unsubscribes when it ends, so a
+    response that is never sent holds no subscription. Sends a comment line
+    as heartbeat after heartbeat_seconds without a message, which keeps
+    proxies from timing out idle streams, and a final ``close`` event when
+    the hub ends the subscription.
+    """
+    subscription = hub.subscribe(shipment_ids)
+    try:
+        while True:
+            try:
+                message = await subscription.receive(heartbeat_seconds)
+            except SubscriptionClosed as exc:
+                yield f"event: close\ndata: {json.dumps({'reason': exc.reason})}\n\n"
+                return
+            yield ": heartbeat\n\n" if message is None else f"data: {message}\n\n"
+    finally:
+        # Also runs when the client disconnects and the stream is cancelled
+        hub.unsubscribe(subscription)
+
+
+_hub: Optional[TrackingHub] = None
+
+
+def get_tracking_hub() -> TrackingHub:
+    """Get the process-wide tracking hub, creating it on first use"""
+    global _hub
+    if _hub is None:
+        _hub = TrackingHub(settings.LIVE_QUEUE_SIZE, settings.LIVE_SLOW_CONSUMER_POLICY, settings.LIVE_MAX_SHIPMENTS)
+    return _hub
+
+
+def set_tracking_hub(hub: Optional[TrackingHub]) -> None:
+    """Replace the process-wide tracking hub (None recreates it from settings)"""
+    global _hub
+    _hub = hub
+
+
+def shutdown_tracking_hub() -> None:
+    """Close every live subscription so open streams end; the next call starts a fresh hub"""
+    global _hub
+    if _hub is not None:
+        _hub.close_all()
+        _hub = None
@@ -8,12 +8,14 @@ Author: Geraldo Linggom Samuel Tampubolon (18223136)
 Course: TST (Teknologi Sistem Terintegrasi) - ITB
 """
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.requests import Request
 from fastapi.responses import JSONResponse
-from scalar_fastapi import get_scalar_api_reference
 
+from app.api.dependencies import is_admin_token
 from app.api.router import api_router
 from app.config import settings
 from app.core.exceptions import (
@@ -23,8 +25,51 @@ from app.core.exceptions import (
     InvalidCredentials,
     InvalidStatusTransition,
     InvalidToken,
+    PreconditionFailed,
+    ServiceUnavailable,
     ValidationError,
 )
+from app.core.hashing import shutdown_password_hash_pool
+from app.core.metrics import MetricsMiddleware
+from app.core.principal_cache import get_principal_cache
+from app.core.profiling import ProfilingMiddleware
+from app.core.tracking_hub import get_tracking_hub, shutdown_tracking_hub
+from app.services.shipment import shutdown_storage
+from app.storage import get_shipment_repository, get_user_store
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan
+
+    Recovers or seeds storage up front unless FAST_STARTUP defers it to the
+    first request; on shutdown ends live streams, flushes persisted state and
+    stops worker pools. With several worker processes (WEB_CONCURRENCY) the
+    store must be shared: the tracking hub relays live updates through it, and
+    principals cached for a user another worker changed are dropped.
+
+    Raises:
+        RuntimeError: If several workers are configured with a process-local store
+    """
+    workers = settings.WEB_CONCURRENCY or 1
+    if workers > 1:
+        if settings.STORAGE_BACKEND != "sqlite":
+            raise RuntimeError(
+                f"{workers} workers need storage shared between processes: set STORAGE_BACKEND=sqlite "
+                f"(the {settings.STORAGE_BACKEND} backend keeps its data per process)"
+            )
+        relay = get_shipment_repository().live_relay(settings.LIVE_RELAY_POLL_SECONDS)
+        if relay is not None:
+            get_tracking_hub().attach_relay(relay)
+        get_user_store().watch_changes(get_principal_cache().invalidate_user, settings.LIVE_RELAY_POLL_SECONDS)
+    elif not settings.FAST_STARTUP:
+        get_shipment_repository()
+    yield
+    shutdown_tracking_hub()
+    shutdown_storage()
+    shutdown_password_hash_pool()
+
 
 # Initialize FastAPI application
 app = FastAPI(
@@ -35,6 +80,7 @@ app = FastAPI(
     docs_url=settings.DOCS_URL,
     redoc_url=settings.REDOC_URL,
     contact={"name": settings.CONTACT_NAME, "email": settings.CONTACT_EMAIL},
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -44,8 +90,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Last-Event-Id", "X-Profile-Id"],
 )
 
+# Request latency metrics (GET /metrics); added last so it also times CORS handling
+app.add_middleware(MetricsMiddleware)
+
+# On-demand request profiling; not installed at all unless enabled
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        authorize=is_admin_token,
+        profiler=settings.PROFILER,
+        sample_rate=settings.PROFILE_SAMPLE_RATE,
+        sample_interval=settings.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+        max_seconds=settings.PROFILE_MAX_SECONDS,
+    )
+
 # Include API router
 app.include_router(api_router)
 
@@ -86,6 +147,16 @@ async def invalid_status_transition_handler(request: Request, exc: InvalidStatus
     return JSONResponse(status_code=400, content={"detail": exc.detail})
 
 
+@app.exception_handler(PreconditionFailed)
+async def precondition_failed_handler(request: Request, exc: PreconditionFailed):
+    return JSONResponse(status_code=412, content={"detail": exc.detail}, headers={"ETag": exc.current_etag})
+
+
+@app.exception_handler(ServiceUnavailable)
+async def service_unavailable_handler(request: Request, exc: ServiceUnavailable):
+    return JSONResponse(status_code=503, content={"detail": exc.detail}, headers={"Retry-After": "1"})
+
+
 # Root endpoint
 @app.get("/", tags=["Root"])
 async def root():
@@ -103,6 +174,8 @@ async def root():
 @app.get("/scalar", include_in_schema=False)
 async def get_scalar_docs():
     """Alternative API documentation using Scalar"""
+    from scalar_fastapi import get_scalar_api_reference
+
     return get_scalar_api_reference(
         openapi_url=app.openapi_url,
         title=settings.APP_NAME,
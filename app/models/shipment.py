@@ -2,20 +2,164 @@
 Shipment Domain Models
 
 Contains domain models and enums for the shipment bounded context.
+
+The status workflow comes from ``settings.STATUS_TRANSITIONS`` and is
+compiled once into STATUS_MACHINE; ShipmentStatus is built from it, so a
+regional workflow that adds statuses (e.g. ``held_at_hub``) needs no code
+change. When shipments are persisted, the statuses are also saved in code
+order (``DATA_DIR/statuses.json``), so a later start keeps every stored
+code meaning the same status however the workflow is reordered.
 """
 
+import json
+import os
 from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Mapping, Optional, Sequence
+
+from app.config import settings
+from app.core.exceptions import EntityNotFound, InvalidStatusTransition, LogixpressException
+
+# Statuses every workflow has. Their positions are the status codes already stored for
+# shipments, so statuses a workflow adds are always numbered after them
+BUILTIN_STATUSES = ("placed", "in_transit", "out_for_delivery", "delivered", "returned", "cancelled")
+
+
+class StatusMachine:
+    """
+    Status transition graph compiled for constant-time checks
+
+    Statuses are numbered by position (the codes stored for shipments) and the
+    statuses each one may move to are a single integer bitmask, so a check is
+    a shift and an AND. The tables are tuples built once and never change.
+    """
+
+    __slots__ = ("statuses", "codes", "_allowed", "_next")
+
+    def __init__(
+        self,
+        transitions: Mapping[str, Iterable[str]],
+        builtin: Sequence[str] = BUILTIN_STATUSES,
+        known: Sequence[str] = (),
+    ):
+        """
+        Args:
+            transitions: Status -> statuses it may move to; statuses without an entry are terminal
+            builtin: Statuses numbered first, in this order, whether or not transitions mentions them
+            known: Statuses numbered by an earlier run, in code order; they keep their codes
+
+        Raises:
+            ValueError: If a status name is not a valid identifier, or a known status is
+                neither built in nor in transitions
+        """
+        graph = {status: tuple(targets) for status, targets in transitions.items()}
+        statuses = list(known)
+        statuses.extend(status for status in builtin if status not in statuses)
+        mentioned = set(builtin)
+        for status, targets in graph.items():
+            for name in (status, *targets):
+                if not name.isidentifier():
+                    raise ValueError(f"Invalid status name: {name!r}")
+                mentioned.add(name)
+                if name not in statuses:
+                    statuses.append(name)
+        for code, status in enumerate(known):
+            if status not in mentioned:
+                raise ValueError(f"Status {status!r} (code {code}) is stored but missing from the workflow")
+
+        self.statuses: tuple[str, ...] = tuple(statuses)
+        self.codes: dict[str, int] = {status: code for code, status in enumerate(self.statuses)}
+        allowed = [0] * len(statuses)
+        for status, targets in graph.items():
+            for target in targets:
+                allowed[self.codes[status]] |= 1 << self.codes[target]
+        self._allowed = tuple(allowed)
+        self._next = tuple(
+            tuple(status for status in self.statuses if mask >> self.codes[status] & 1) for mask in allowed
+        )
+
+    def allows(self, current: int, new: int) -> bool:
+        """Whether status code current may move to status code new"""
+        return bool(self._allowed[current] >> new & 1)
+
+    def next_statuses(self, current: int) -> tuple[str, ...]:
+        """Statuses status code current may move to, in status order"""
+        return self._next[current]
+
+    def transition_error(self, current: int, new: int) -> InvalidStatusTransition:
+        """The error explaining why status code current may not move to status code new"""
+        valid_next = ", ".join(self._next[current])
+        return InvalidStatusTransition(self.statuses[current], self.statuses[new], valid_next)
+
+    def check_batch(
+        self, statuses: Mapping[int, int], transitions: Sequence[tuple[int, int]]
+    ) -> list[Optional[LogixpressException]]:
+        """
+        Validate many tracking scans at once, as if applied in order
+
+        Each scan is checked against the status left by the accepted scans
+        before it, so a batch may move one shipment through several statuses.
+        Repeating the current status is allowed (a hub scan that changes nothing).
+
+        Args:
+            statuses: Shipment ID -> current status code, for the shipments that exist
+            transitions: (shipment_id, new status code) pairs
+
+        Returns:
+            Per transition, None if accepted or the error rejecting it
+        """
+        current = dict(statuses)
+        allowed = self._allowed
+        errors: list[Optional[LogixpressException]] = []
+        for shipment_id, new in transitions:
+            code = current.get(shipment_id)
+            if code is None:
+                errors.append(EntityNotFound("Shipment", shipment_id))
+            elif code == new or allowed[code] >> new & 1:
+                current[shipment_id] = new
+                errors.append(None)
+            else:
+                errors.append(self.transition_error(code, new))
+        return errors
+
+
+def load_status_names(path: Optional[Path]) -> tuple[str, ...]:
+    """Statuses saved by save_status_names, in code order (empty if none were saved)"""
+    if path is None:
+        return ()
+    try:
+        return tuple(json.loads(path.read_text()))
+    except FileNotFoundError:
+        return ()
+
+
+def save_status_names(path: Path, statuses: Sequence[str]) -> None:
+    """Save statuses in code order for the next start, unless already saved"""
+    if load_status_names(path) == tuple(statuses):
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(json.dumps(list(statuses)))
+    os.replace(temporary, path)
+
 
+def status_names_path() -> Optional[Path]:
+    """Where the status codes of persisted shipments are saved, None if shipments are not persisted"""
+    if settings.STORAGE_BACKEND == "sqlite" or settings.PERSISTENCE_ENABLED:
+        return settings.DATA_DIR / "statuses.json"
+    return None
 
-class ShipmentStatus(str, Enum):
+
+STATUS_MACHINE = StatusMachine(settings.STATUS_TRANSITIONS, known=load_status_names(status_names_path()))
+
+
+class _ShipmentStatus(str, Enum):
     """Status pengiriman - Value Object (Enum)"""
 
-    placed = "placed"
-    in_transit = "in_transit"
-    out_for_delivery = "out_for_delivery"
-    delivered = "delivered"
-    returned = "returned"
-    cancelled = "cancelled"
+    @property
+    def code(self) -> int:
+        """Stored status code"""
+        return STATUS_MACHINE.codes[self.value]
 
     @classmethod
     def get_valid_transitions(cls) -> dict[str, list[str]]:
@@ -25,14 +169,7 @@ class ShipmentStatus(str, Enum):
         Returns:
             Dictionary mapping current status to list of valid next statuses
         """
-        return {
-            cls.placed.value: [cls.in_transit.value, cls.cancelled.value],
-            cls.in_transit.value: [cls.out_for_delivery.value, cls.returned.value, cls.cancelled.value],
-            cls.out_for_delivery.value: [cls.delivered.value, cls.returned.value],
-            cls.delivered.value: [],  # Terminal state
-            cls.returned.value: [],  # Terminal state
-            cls.cancelled.value: [],  # Terminal state
-        }
+        return {status: list(STATUS_MACHINE.next_statuses(code)) for code, status in enumerate(STATUS_MACHINE.statuses)}
 
     def can_transition_to(self, new_status: "ShipmentStatus") -> bool:
         """
@@ -44,5 +181,50 @@ class ShipmentStatus(str, Enum):
         Returns:
             True if transition is valid, False otherwise
         """
-        transitions = self.get_valid_transitions()
-        return new_status.value in transitions.get(self.value, [])
+        return STATUS_MACHINE.allows(self.code, new_status.code)
+
+
+if TYPE_CHECKING:
+    # What type checkers see: the built-in statuses, as a class they can annotate with
+
+    class ShipmentStatus(_ShipmentStatus):
+        """Status pengiriman - Value Object (Enum)"""
+
+        placed = "placed"
+        in_transit = "in_transit"
+        out_for_delivery = "out_for_delivery"
+        delivered = "delivered"
+        returned = "returned"
+        cancelled = "cancelled"
+
+else:
+    # One member per status of the configured workflow, in status code order
+    ShipmentStatus = _ShipmentStatus(
+        "ShipmentStatus",
+        [(status, status) for status in STATUS_MACHINE.statuses],
+        module=__name__,
+        qualname="ShipmentStatus",
+    )
+    ShipmentStatus.__doc__ = _ShipmentStatus.__doc__
+
+
+class ShipmentOrder(str, Enum):
+    """Urutan daftar shipment untuk pagination"""
+
+    id = "id"
+    created_at = "created_at"
+    updated_at = "updated_at"
+
+
+class SortDirection(str, Enum):
+    """Arah urutan daftar shipment"""
+
+    asc = "asc"
+    desc = "desc"
+
+
+class ExportFormat(str, Enum):
+    """Format file export shipment"""
+
+    ndjson = "ndjson"
+    csv = "csv"
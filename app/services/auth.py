@@ -8,42 +8,51 @@ Handles user database operations and authentication workflows.
 from datetime import timedelta
 from typing import Optional
 
-from app.api.schemas.auth import RegisterRequest, User, UserInDB
+from app.api.schemas.auth import RegisterRequest, User, UserInDB, UserUpdate
 from app.config import settings
-from app.core.exceptions import DuplicateEntity, ValidationError
-from app.core.security import create_access_token, get_password_hash, verify_password
-
-# In-memory user database (for demonstration)
-# In production, this would be replaced with actual database
-fake_users_db = {
+from app.core.exceptions import DuplicateEntity, EntityNotFound, ValidationError
+from app.core.principal_cache import get_principal_cache
+from app.core.security import (
+    create_access_token,
+    get_password_hash,
+    get_password_hash_async,
+    verify_password,
+    verify_password_async,
+)
+from app.storage import get_user_store, run_user_store_call, set_user_store_initializer
+from app.storage.users import UserStore
+
+# Seed accounts with their bcrypt hashes precomputed, so nothing is hashed at import.
+# Plain passwords: admin123, courier123, customer123 (see README "Default Users")
+SEED_USERS = {
     "admin": {
         "username": "admin",
         "email": "admin@logixpress.com",
-        "plain_password": "admin123",
+        "hashed_password": "$2b$12$OpGXn5x37/ZFcjLulEnzL.eVdP7mVPoS23C0.b1lM/NUQGeuqx.pu",
         "role": "admin",
         "disabled": False,
     },
     "courier": {
         "username": "courier",
         "email": "courier@logixpress.com",
-        "plain_password": "courier123",
+        "hashed_password": "$2b$12$lFLyjNU56WrgCg8y9srDLemCv/Xxi6NURwEKT9N0sMF0X4gh8FJVm",
         "role": "courier",
         "disabled": False,
     },
     "customer": {
         "username": "customer",
         "email": "customer@example.com",
-        "plain_password": "customer123",
+        "hashed_password": "$2b$12$2T5NmFYomKGKYStL0MD8Yuy79pN194X8q/XpxgYUZcwvIWm9gQowe",
         "role": "customer",
         "disabled": False,
     },
 }
 
-# Hash passwords on module load
-for user_data in fake_users_db.values():
-    if "plain_password" in user_data:
-        user_data["hashed_password"] = get_password_hash(user_data["plain_password"])
-        del user_data["plain_password"]
+
+def seed_users(store: UserStore) -> None:
+    """Add any missing seed account; existing users are left untouched"""
+    for user_data in SEED_USERS.values():
+        store.add(user_data)
 
 
 class AuthService:
@@ -60,13 +69,10 @@ class AuthService:
         Returns:
             UserInDB if found, None otherwise
         """
-        if username in fake_users_db:
-            user_dict = fake_users_db[username].copy()
-            # Convert plain_password to hashed_password if needed (for testing compatibility)
-            if "plain_password" in user_dict:
-                user_dict["hashed_password"] = get_password_hash(user_dict.pop("plain_password"))
-            return UserInDB(**user_dict)
-        return None
+        user_data = get_user_store().get(username)
+        if user_data is None:
+            return None
+        return UserInDB(**user_data)
 
     @staticmethod
     def authenticate_user(username: str, password: str) -> Optional[UserInDB]:
@@ -87,6 +93,28 @@ class AuthService:
             return None
         return user
 
+    @staticmethod
+    async def authenticate_user_async(username: str, password: str) -> Optional[UserInDB]:
+        """
+        Authenticate user with bcrypt verification offloaded to the hashing pool
+
+        Args:
+            username: Username
+            password: Plain text password
+
+        Returns:
+            UserInDB if authentication successful, None otherwise
+
+        Raises:
+            ServiceUnavailable: If the hashing pool is saturated
+        """
+        user = await run_user_store_call(AuthService.get_user, username)
+        if not user:
+            return None
+        if not await verify_password_async(password, user.hashed_password):
+            return None
+        return user
+
     @staticmethod
     def create_access_token_for_user(user: UserInDB) -> str:
         """
@@ -119,32 +147,101 @@ class AuthService:
             DuplicateEntity: If username or email already exists
             ValidationError: If validation fails
         """
-        # Validate role
+        AuthService._validate_registration(register_data)
+        return AuthService._store_user(register_data, get_password_hash(register_data.password))
+
+    @staticmethod
+    async def register_user_async(register_data: RegisterRequest) -> User:
+        """
+        Register a new user with bcrypt hashing offloaded to the hashing pool
+
+        Args:
+            register_data: User registration data
+
+        Returns:
+            Created user
+
+        Raises:
+            DuplicateEntity: If username or email already exists
+            ValidationError: If validation fails
+            ServiceUnavailable: If the hashing pool is saturated
+        """
+        await run_user_store_call(AuthService._validate_registration, register_data)
+        hashed_password = await get_password_hash_async(register_data.password)
+        return await run_user_store_call(AuthService._store_user, register_data, hashed_password)
+
+    @staticmethod
+    def update_user(username: str, update_data: UserUpdate) -> User:
+        """
+        Change a user's role and/or disabled flag
+
+        Cached principals for the user are dropped so the change applies to
+        the next request made with any of their existing tokens.
+
+        Args:
+            username: Username to update
+            update_data: Fields to change; unset fields are left as they are
+
+        Returns:
+            Updated user
+
+        Raises:
+            EntityNotFound: If the user doesn't exist
+            ValidationError: If the role is invalid
+        """
+        if update_data.role is not None:
+            AuthService._validate_role(update_data.role)
+
+        user_data = get_user_store().update(username, update_data.model_dump(exclude_none=True))
+        if user_data is None:
+            raise EntityNotFound("User", username)
+        get_principal_cache().invalidate_user(username)
+
+        return User(
+            username=user_data["username"],
+            email=user_data["email"],
+            role=user_data["role"],
+            disabled=user_data["disabled"],
+        )
+
+    @staticmethod
+    def _validate_role(role: Optional[str]) -> None:
         valid_roles = ["admin", "courier", "customer"]
-        if register_data.role not in valid_roles:
+        if role not in valid_roles:
             raise ValidationError(f"Invalid role. Must be one of: {', '.join(valid_roles)}")
 
-        # Check if username already exists
-        if register_data.username in fake_users_db:
-            raise DuplicateEntity("User", "username")
+    @staticmethod
+    def _validate_registration(register_data: RegisterRequest) -> None:
+        # Validate role
+        AuthService._validate_role(register_data.role)
 
-        # Check if email already exists
-        for user_data in fake_users_db.values():
-            if user_data.get("email") == register_data.email:
-                raise DuplicateEntity("User", "email")
+        # Check if username or email (case-insensitive) already exists
+        conflict = get_user_store().find_conflict(register_data.username, register_data.email)
+        if conflict is not None:
+            raise DuplicateEntity("User", conflict)
 
         # Validate password strength (minimum 6 characters)
         if len(register_data.password) < 6:
             raise ValidationError("Password must be at least 6 characters long")
 
-        # Create new user
-        hashed_password = get_password_hash(register_data.password)
-        fake_users_db[register_data.username] = {
-            "username": register_data.username,
-            "email": register_data.email,
-            "hashed_password": hashed_password,
-            "role": register_data.role,
-            "disabled": False,
-        }
+    @staticmethod
+    def _store_user(register_data: RegisterRequest, hashed_password: str) -> User:
+        # The store re-checks both keys atomically with the insert, so a concurrent
+        # registration that passed validation too cannot create a duplicate
+        conflict = get_user_store().add(
+            {
+                "username": register_data.username,
+                "email": register_data.email,
+                "hashed_password": hashed_password,
+                "role": register_data.role,
+                "disabled": False,
+            }
+        )
+        if conflict is not None:
+            raise DuplicateEntity("User", conflict)
 
         return User(username=register_data.username, email=register_data.email, role=register_data.role, disabled=False)
+
+
+# Seed accounts are added when the user store is first used
+set_user_store_initializer(seed_users)
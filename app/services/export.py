@@ -0,0 +1,111 @@
+"""
+Export Service
+
+Streams shipments with their tracking events as NDJSON or CSV. Records are
+serialized straight from storage batches, without building pydantic models,
+so memory use stays flat however many shipments are exported.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Optional
+
+from app.models.shipment import ExportFormat, ShipmentStatus
+from app.services.shipment import _local_time
+from app.storage import get_shipment_repository
+from app.storage.records import ShipmentRecord
+
+CSV_COLUMNS = (
+    "id",
+    "content",
+    "weight",
+    "dimensions",
+    "fragile",
+    "recipient_name",
+    "recipient_email",
+    "recipient_phone",
+    "recipient_address",
+    "seller_name",
+    "seller_email",
+    "seller_phone",
+    "destination_code",
+    "current_status",
+    "created_at",
+    "updated_at",
+    "tracking_events",
+)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _ndjson_chunks(batches: Iterator[list[tuple[int, ShipmentRecord]]]) -> Iterator[str]:
+    for batch in batches:
+        yield "".join(
+            json.dumps({"id": shipment_id, **shipment.to_dict()}, default=_json_default) + "\n"
+            for shipment_id, shipment in batch
+        )
+
+
+def _csv_chunks(batches: Iterator[list[tuple[int, ShipmentRecord]]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue()
+
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for shipment_id, shipment in batch:
+            writer.writerow(
+                (
+                    shipment_id,
+                    *(getattr(shipment, column) for column in CSV_COLUMNS[1:13]),
+                    shipment.current_status,
+                    shipment.created_at.isoformat(),
+                    shipment.updated_at.isoformat(),
+                    json.dumps([event.to_dict() for event in shipment.tracking_events], default=_json_default),
+                )
+            )
+        yield buffer.getvalue()
+
+
+class ExportService:
+    """Service for bulk shipment export"""
+
+    MEDIA_TYPES = {ExportFormat.ndjson: "application/x-ndjson", ExportFormat.csv: "text/csv"}
+
+    @staticmethod
+    def export_shipments(
+        export_format: ExportFormat = ExportFormat.ndjson,
+        status_filter: Optional[ShipmentStatus] = None,
+        destination_filter: Optional[int] = None,
+        updated_since: Optional[datetime] = None,
+    ) -> Iterator[str]:
+        """
+        Stream shipments with their tracking events, in ID order
+
+        Args:
+            export_format: NDJSON (one shipment object per line) or CSV (tracking
+                events as a JSON array column)
+            status_filter: Filter by status
+            destination_filter: Filter by destination code
+            updated_since: Only shipments updated at or after this time (timezone-aware values
+                are compared in local time, like shipment lists)
+
+        Returns:
+            Lazy iterator of text chunks, one per storage batch
+        """
+        batches = get_shipment_repository().iter_shipments(
+            status=status_filter.value if status_filter else None,
+            destination_code=destination_filter,
+            updated_since=_local_time(updated_since),
+        )
+        if export_format == ExportFormat.csv:
+            return _csv_chunks(batches)
+        return _ndjson_chunks(batches)
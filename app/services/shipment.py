@@ -5,8 +5,13 @@ Business logic for shipment management including CRUD operations,
 status transitions, and tracking events.
 """
 
+import base64
+import binascii
+import json
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
+
+from pydantic import ValidationError as SchemaValidationError
 
 from app.api.schemas.shipment import (
     PackageDetails,
@@ -16,16 +21,237 @@ from app.api.schemas.shipment import (
     ShipmentRead,
     ShipmentSummary,
     ShipmentUpdate,
+    TrackingBatchItem,
     TrackingEvent,
     TrackingEventCreate,
 )
-from app.core.exceptions import EntityNotFound, InvalidStatusTransition
-from app.models.shipment import ShipmentStatus
+from app.config import settings
+from app.core.exceptions import EntityNotFound, LogixpressException, PreconditionFailed, ValidationError
+from app.core.locks import get_shipment_locks
+from app.core.metrics import timed
+from app.core.response_cache import etag_matches_version, get_shipment_response_cache, make_etag
+from app.core.tracking_hub import get_tracking_hub
+from app.models.shipment import STATUS_MACHINE, ShipmentOrder, ShipmentStatus, SortDirection
+from app.storage import get_shipment_repository, get_user_store, set_repository_initializer
+from app.storage.base import ShipmentRepository
+from app.storage.indexes import tokenize
+from app.storage.records import STATUS_CODES, STATUS_VALUES, ShipmentRecord, TrackingEventRecord
+
+# ShipmentStatus members by status code, handed to the schemas as they are
+_STATUSES: tuple[ShipmentStatus, ...] = tuple(ShipmentStatus)
+
+
+def _to_tracking_event(event: TrackingEventRecord) -> TrackingEvent:
+    return TrackingEvent(
+        id=event.id,
+        location=event.location,
+        description=event.description,
+        status=_STATUSES[event.status_code],
+        timestamp=event.timestamp,
+    )
+
+
+def _to_shipment_read(shipment_id: int, shipment: ShipmentRecord) -> ShipmentRead:
+    return ShipmentRead(
+        id=shipment_id,
+        package_details=PackageDetails(
+            content=shipment.content, weight=shipment.weight, dimensions=shipment.dimensions, fragile=shipment.fragile
+        ),
+        recipient=Recipient(
+            name=shipment.recipient_name,
+            email=shipment.recipient_email,
+            phone=shipment.recipient_phone,
+            address=shipment.recipient_address,
+        ),
+        seller=Seller(name=shipment.seller_name, email=shipment.seller_email, phone=shipment.seller_phone),
+        destination_code=shipment.destination_code,
+        current_status=_STATUSES[shipment.status_code],
+        tracking_events=[_to_tracking_event(event) for event in shipment.tracking_events],
+        created_at=shipment.created_at,
+        updated_at=shipment.updated_at,
+    )
+
+
+def _to_shipment_summary(shipment_id: int, shipment: ShipmentRecord) -> ShipmentSummary:
+    return ShipmentSummary(
+        id=shipment_id,
+        content=shipment.content,
+        weight=shipment.weight,
+        current_status=_STATUSES[shipment.status_code],
+        destination_code=shipment.destination_code,
+        recipient_name=shipment.recipient_name,
+        created_at=shipment.created_at,
+    )
+
+
+def _new_shipment(shipment_data: ShipmentCreate, now: datetime) -> tuple[ShipmentRecord, TrackingEventRecord]:
+    """Build a placed shipment and its initial tracking event"""
+    package, recipient, seller = shipment_data.package_details, shipment_data.recipient, shipment_data.seller
+    shipment = ShipmentRecord(
+        package.content,
+        package.weight,
+        package.dimensions,
+        package.fragile,
+        recipient.name,
+        recipient.email,
+        recipient.phone,
+        recipient.address,
+        seller.name,
+        seller.email,
+        seller.phone,
+        shipment_data.destination_code,
+        STATUS_CODES[ShipmentStatus.placed.value],
+        now,
+        now,
+    )
+    initial_event = TrackingEventRecord(
+        0,
+        "Warehouse",
+        "Shipment order created and received at warehouse",
+        STATUS_CODES[ShipmentStatus.placed.value],
+        now,
+    )
+    return shipment, initial_event
+
+
+def _format_errors(exc: SchemaValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"]
+        for error in exc.errors()
+    )
+
+
+def _check_if_match(shipment_id: int, shipment: ShipmentRecord, if_match: Optional[str]) -> None:
+    """Raise PreconditionFailed unless if_match names the shipment's version (None always does)"""
+    if if_match is None or etag_matches_version(if_match, shipment.version):
+        return
+    # Only a failed precondition renders the body, for the current ETag it reports
+    etag, _ = ShipmentService.get_shipment_response(shipment_id)
+    raise PreconditionFailed("Shipment", shipment_id, etag)
+
+
+def _update_shipment(shipment_id: int, update_data: ShipmentUpdate, if_match: Optional[str]) -> None:
+    """
+    Validate and apply a ShipmentUpdate; the caller holds the shipment's lock
+
+    The lock only covers this process, so the write is a compare-and-set on
+    the version that was validated; when another worker process wrote in
+    between, the update is validated again against the new state.
+    """
+    repository = get_shipment_repository()
+    update_dict = update_data.model_dump(exclude_none=True)
+    while True:
+        shipment = repository.get(shipment_id)
+        if shipment is None:
+            raise EntityNotFound("Shipment", shipment_id)
+        _check_if_match(shipment_id, shipment, if_match)
+
+        fields: dict[str, Any] = {}
+        new_event = None
+
+        # Handle status update with validation
+        if "current_status" in update_dict:
+            new_status = ShipmentStatus(update_dict["current_status"])
+
+            # Validate transition
+            if not STATUS_MACHINE.allows(shipment.status_code, new_status.code):
+                raise STATUS_MACHINE.transition_error(shipment.status_code, new_status.code)
+
+            # Create tracking event for status change
+            new_event = TrackingEventRecord(
+                0, "In Transit", f"Status updated to {new_status.value}", STATUS_CODES[new_status.value], datetime.now()
+            )
+            fields["status_code"] = STATUS_CODES[new_status.value]
 
-# In-memory shipment storage (simulating database)
-# In production, this would be replaced with actual database
-shipments_db = {}
-tracking_event_counter = 1
+        # Update fields (only the value object attributes that were sent are replaced)
+        fields.update(update_dict.get("package_details", {}))
+        fields.update((f"recipient_{field}", value) for field, value in update_dict.get("recipient", {}).items())
+        if "destination_code" in update_dict:
+            fields["destination_code"] = update_dict["destination_code"]
+
+        fields["updated_at"] = datetime.now()
+        if repository.update(shipment_id, fields, new_event, expected_version=shipment.version):
+            break
+
+    hub = get_tracking_hub()
+    if hub.watching(shipment_id):
+        message = {
+            "type": "shipment_updated",
+            "current_status": STATUS_VALUES[fields.get("status_code", shipment.status_code)],
+        }
+        message["updated_at"] = fields["updated_at"].isoformat()
+        if new_event is not None:
+            message["event"] = _to_tracking_event(new_event).model_dump(mode="json")
+        hub.publish(shipment_id, message)
+
+
+def _add_event_if_match(shipment_id: int, event: TrackingEventRecord, if_match: str) -> TrackingEventRecord:
+    """
+    Add a tracking event only to the shipment version if_match names; the caller holds the shipment's lock
+
+    Written as a compare-and-set on the checked version, so a write by another
+    worker process between the check and the write fails the precondition
+    rather than slipping through.
+    """
+    repository = get_shipment_repository()
+    while True:
+        shipment = repository.get(shipment_id)
+        if shipment is None:
+            raise EntityNotFound("Shipment", shipment_id)
+        _check_if_match(shipment_id, shipment, if_match)
+        error = STATUS_MACHINE.check_batch({shipment_id: shipment.status_code}, [(shipment_id, event.status_code)])[0]
+        if error is not None:
+            raise error
+        fields = {"status_code": event.status_code, "updated_at": event.timestamp}
+        if repository.update(shipment_id, fields, event, expected_version=shipment.version):
+            return event
+
+
+def _publish_events(events: list[tuple[int, TrackingEventRecord]]) -> None:
+    """Push new tracking events to live subscribers of their shipments, if there are any"""
+    hub = get_tracking_hub()
+    messages = []
+    for shipment_id, event in events:
+        if hub.watching(shipment_id):
+            message: dict[str, Any] = {"type": "tracking_event", "current_status": event.status}
+            message["event"] = _to_tracking_event(event).model_dump(mode="json")
+            messages.append((shipment_id, message))
+    if messages:
+        hub.publish_many(messages)
+
+
+def _encode_cursor(order_by: ShipmentOrder, sort: SortDirection, shipment_id: int, shipment: ShipmentRecord) -> str:
+    """Opaque cursor pointing after the given row"""
+    payload = {"order": order_by.value, "sort": sort.value, "id": shipment_id}
+    if order_by != ShipmentOrder.id:
+        payload[order_by.value] = getattr(shipment, order_by.value).isoformat()
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, order_by: ShipmentOrder, sort: SortDirection) -> Any:
+    """
+    Cursor -> key of the last row already returned
+
+    Raises:
+        ValidationError: If the cursor is malformed or was issued for another order or direction
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        # Cursors issued before descending order existed carry no direction
+        if payload["order"] != order_by.value or payload.get("sort", SortDirection.asc.value) != sort.value:
+            raise ValueError(payload["order"])
+        if order_by != ShipmentOrder.id:
+            return datetime.fromisoformat(payload[order_by.value]), int(payload["id"])
+        return int(payload["id"])
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as exc:
+        raise ValidationError("Invalid pagination cursor") from exc
+
+
+def _local_time(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive local time; convert timezone-aware query values to match"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
 
 
 class ShipmentService:
@@ -46,31 +272,85 @@ class ShipmentService:
         Returns:
             List of shipment summaries
         """
-        result = []
+        return ShipmentService.get_shipments_page(status_filter, destination_filter, limit)[0]
 
-        for shipment_id, shipment_data in shipments_db.items():
-            # Apply filters
-            if status_filter and shipment_data["current_status"] != status_filter.value:
-                continue
-            if destination_filter and shipment_data["destination_code"] != destination_filter:
-                continue
+    @staticmethod
+    @timed("shipment.list")
+    def get_shipments_page(
+        status_filter: Optional[ShipmentStatus] = None,
+        destination_filter: Optional[int] = None,
+        limit: int = 10,
+        order_by: ShipmentOrder = ShipmentOrder.id,
+        cursor: Optional[str] = None,
+        sort: SortDirection = SortDirection.asc,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        updated_since: Optional[datetime] = None,
+    ) -> tuple[list[ShipmentSummary], Optional[str]]:
+        """
+        Get one page of shipments using keyset pagination
 
-            # Create summary
-            summary = ShipmentSummary(
-                id=shipment_id,
-                content=shipment_data["package_details"]["content"],
-                weight=shipment_data["package_details"]["weight"],
-                current_status=shipment_data["current_status"],
-                destination_code=shipment_data["destination_code"],
-                recipient_name=shipment_data["recipient"]["name"],
-                created_at=shipment_data["created_at"],
-            )
-            result.append(summary)
+        Args:
+            status_filter: Filter by status
+            destination_filter: Filter by destination code
+            limit: Maximum number of results
+            order_by: Page order, by ID, creation time or last update time
+            cursor: next_cursor of the previous page, None for the first page
+            sort: Ascending or descending order
+            created_from: Only shipments created at or after this time
+            created_to: Only shipments created before this time
+            updated_since: Only shipments updated at or after this time
+
+        Returns:
+            Shipment summaries and the cursor of the next page (None on the last page)
 
-            if len(result) >= limit:
-                break
+        Raises:
+            ValidationError: If the cursor is invalid or created_from is not before created_to
+        """
+        created_from, created_to, updated_since = map(_local_time, (created_from, created_to, updated_since))
+        if created_from and created_to and created_from >= created_to:
+            raise ValidationError("created_from must be before created_to")
+        after = _decode_cursor(cursor, order_by, sort) if cursor else None
+        rows = get_shipment_repository().list_shipments(
+            status=status_filter.value if status_filter else None,
+            destination_code=destination_filter,
+            limit=limit + 1,
+            order_by=order_by.value,
+            after=after,
+            descending=sort == SortDirection.desc,
+            created_from=created_from,
+            created_to=created_to,
+            updated_since=updated_since,
+        )
 
-        return result
+        # One extra row tells whether another page exists
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(order_by, sort, *rows[-1])
+
+        return [_to_shipment_summary(shipment_id, shipment) for shipment_id, shipment in rows], next_cursor
+
+    @staticmethod
+    @timed("shipment.search")
+    def search_shipments(query: str, limit: int = 10) -> list[ShipmentSummary]:
+        """
+        Full-text search by recipient name or address, package content and seller name
+
+        Args:
+            query: Words that must all occur, e.g. "copper wires Jakarta Selatan"
+            limit: Maximum number of results
+
+        Returns:
+            Shipment summaries, best match first
+
+        Raises:
+            ValidationError: If the query contains no searchable word
+        """
+        if not tokenize(query):
+            raise ValidationError("Search query must contain at least one letter or digit")
+        rows = get_shipment_repository().search(query, limit)
+        return [_to_shipment_summary(shipment_id, shipment) for shipment_id, shipment in rows]
 
     @staticmethod
     def get_shipment_by_id(shipment_id: int) -> ShipmentRead:
@@ -86,24 +366,64 @@ class ShipmentService:
         Raises:
             EntityNotFound: If shipment not found
         """
-        if shipment_id not in shipments_db:
+        shipment_data = get_shipment_repository().get(shipment_id)
+        if shipment_data is None:
             raise EntityNotFound("Shipment", shipment_id)
 
-        shipment_data = shipments_db[shipment_id]
-
-        return ShipmentRead(
-            id=shipment_id,
-            package_details=PackageDetails(**shipment_data["package_details"]),
-            recipient=Recipient(**shipment_data["recipient"]),
-            seller=Seller(**shipment_data["seller"]),
-            destination_code=shipment_data["destination_code"],
-            current_status=shipment_data["current_status"],
-            tracking_events=[TrackingEvent(**event) for event in shipment_data["tracking_events"]],
-            created_at=shipment_data["created_at"],
-            updated_at=shipment_data["updated_at"],
-        )
+        return _to_shipment_read(shipment_id, shipment_data)
+
+    @staticmethod
+    def check_shipments_exist(shipment_ids: list[int]) -> None:
+        """
+        Check shipments exist before subscribing to their live updates
+
+        Raises:
+            EntityNotFound: For the first shipment that does not exist
+        """
+        repository = get_shipment_repository()
+        for shipment_id in shipment_ids:
+            if repository.get_version(shipment_id) is None:
+                raise EntityNotFound("Shipment", shipment_id)
 
     @staticmethod
+    @timed("shipment.get")
+    def get_shipment_response(shipment_id: int) -> tuple[str, bytes]:
+        """
+        Get a shipment as serialized ShipmentRead JSON with its ETag
+
+        Bodies are cached per shipment and reused while the shipment's version
+        is unchanged, so repeat reads skip building the models entirely.
+
+        Args:
+            shipment_id: Shipment tracking number
+
+        Returns:
+            (strong ETag, JSON body)
+
+        Raises:
+            EntityNotFound: If shipment not found
+        """
+        repository = get_shipment_repository()
+        cache = get_shipment_response_cache()
+        version = repository.get_version(shipment_id)
+        if version is None:
+            raise EntityNotFound("Shipment", shipment_id)
+        cached = cache.get(shipment_id, (repository.generation, version))
+        if cached is not None:
+            return cached
+
+        shipment = repository.get(shipment_id)
+        if shipment is None:
+            raise EntityNotFound("Shipment", shipment_id)
+        # Key by the version actually rendered, which a concurrent write may have moved on
+        version = shipment.version
+        body = _to_shipment_read(shipment_id, shipment).model_dump_json().encode()
+        etag = make_etag(version, body)
+        cache.put(shipment_id, (repository.generation, version), etag, body)
+        return etag, body
+
+    @staticmethod
+    @timed("shipment.create")
     def create_shipment(shipment_data: ShipmentCreate) -> dict:
         """
         Create a new shipment
@@ -114,106 +434,96 @@ class ShipmentService:
         Returns:
             Dictionary with shipment ID and message
         """
-        global tracking_event_counter
+        shipment, initial_event = _new_shipment(shipment_data, datetime.now())
+        new_id = get_shipment_repository().create(shipment, initial_event)
 
-        # Generate new ID
-        new_id = max(shipments_db.keys()) + 1 if shipments_db else 12701
-        now = datetime.now()
+        return {"id": new_id, "message": "Shipment created successfully"}
 
-        # Create initial tracking event
-        initial_event = {
-            "id": tracking_event_counter,
-            "location": "Warehouse",
-            "description": "Shipment order created and received at warehouse",
-            "status": ShipmentStatus.placed.value,
-            "timestamp": now,
-        }
-        tracking_event_counter += 1
-
-        # Store shipment
-        shipments_db[new_id] = {
-            "package_details": shipment_data.package_details.model_dump(),
-            "recipient": shipment_data.recipient.model_dump(),
-            "seller": shipment_data.seller.model_dump(),
-            "destination_code": shipment_data.destination_code,
-            "current_status": ShipmentStatus.placed.value,
-            "tracking_events": [initial_event],
-            "created_at": now,
-            "updated_at": now,
-        }
+    @staticmethod
+    @timed("shipment.create_bulk")
+    def create_shipments_bulk(items: list[dict]) -> dict:
+        """
+        Create many shipments in one write
 
-        return {"id": new_id, "message": "Shipment created successfully"}
+        Items are validated one by one, so an invalid item is reported without
+        rejecting the rest of the batch.
+
+        Args:
+            items: Raw ShipmentCreate payloads (anything that is not one is rejected on its own)
+
+        Returns:
+            Number created, number failed and a result per item in request order
+
+        Raises:
+            ValidationError: If the batch is empty or larger than BULK_MAX_ITEMS
+        """
+        if not 1 <= len(items) <= settings.BULK_MAX_ITEMS:
+            raise ValidationError(f"Bulk create accepts between 1 and {settings.BULK_MAX_ITEMS} shipments")
+
+        now = datetime.now()
+        results: list[dict[str, Any]] = []
+        valid = []
+        for index, item in enumerate(items):
+            try:
+                valid.append((index, _new_shipment(ShipmentCreate.model_validate(item), now)))
+            except SchemaValidationError as exc:
+                results.append({"index": index, "id": None, "error": _format_errors(exc)})
+
+        new_ids = get_shipment_repository().create_many([shipment for _, shipment in valid])
+        results.extend(
+            {"index": index, "id": new_id, "error": None} for (index, _), new_id in zip(valid, new_ids, strict=True)
+        )
+        results.sort(key=lambda result: result["index"])
+
+        return {"created": len(new_ids), "failed": len(items) - len(new_ids), "results": results}
 
     @staticmethod
-    def update_shipment(shipment_id: int, update_data: ShipmentUpdate) -> ShipmentRead:
+    def update_shipment(shipment_id: int, update_data: ShipmentUpdate, if_match: Optional[str] = None) -> ShipmentRead:
         """
         Update shipment
 
         Args:
             shipment_id: Shipment ID to update
             update_data: Update data
+            if_match: If-Match header; the update only applies while the shipment's ETag matches it
 
         Returns:
             Updated shipment
 
         Raises:
             EntityNotFound: If shipment not found
+            PreconditionFailed: If the shipment changed since the If-Match ETag was issued
             InvalidStatusTransition: If status transition is invalid
         """
-        global tracking_event_counter
-
-        if shipment_id not in shipments_db:
-            raise EntityNotFound("Shipment", shipment_id)
-
-        shipment = shipments_db[shipment_id]
-        update_dict = update_data.model_dump(exclude_none=True)
-
-        # Handle status update with validation
-        if "current_status" in update_dict:
-            current_status = ShipmentStatus(shipment["current_status"])
-            new_status = update_dict["current_status"]
+        with get_shipment_locks().hold(shipment_id):
+            _update_shipment(shipment_id, update_data, if_match)
+            return ShipmentService.get_shipment_by_id(shipment_id)
 
-            # Validate transition
-            if not current_status.can_transition_to(new_status):
-                valid_transitions = ShipmentStatus.get_valid_transitions()
-                valid_next = ", ".join(valid_transitions[current_status.value])
-                raise InvalidStatusTransition(current_status.value, new_status.value, valid_next)
+    @staticmethod
+    @timed("shipment.update")
+    def update_shipment_response(
+        shipment_id: int, update_data: ShipmentUpdate, if_match: Optional[str] = None
+    ) -> tuple[str, bytes]:
+        """
+        Update shipment and return it like get_shipment_response
 
-            # Create tracking event for status change
-            new_event = {
-                "id": tracking_event_counter,
-                "location": "In Transit",
-                "description": f"Status updated to {new_status.value}",
-                "status": new_status.value,
-                "timestamp": datetime.now(),
-            }
-            tracking_event_counter += 1
-            shipment["tracking_events"].append(new_event)
-
-        # Update fields
-        if "package_details" in update_dict:
-            if isinstance(update_dict["package_details"], dict):
-                shipment["package_details"].update(update_dict["package_details"])
-            else:
-                shipment["package_details"].update(update_dict["package_details"].model_dump())
-        if "recipient" in update_dict:
-            if isinstance(update_dict["recipient"], dict):
-                shipment["recipient"].update(update_dict["recipient"])
-            else:
-                shipment["recipient"].update(update_dict["recipient"].model_dump())
-        if "destination_code" in update_dict:
-            shipment["destination_code"] = update_dict["destination_code"]
-        if "current_status" in update_dict:
-            if isinstance(update_dict["current_status"], str):
-                shipment["current_status"] = update_dict["current_status"]
-            else:
-                shipment["current_status"] = update_dict["current_status"].value
+        The ETag is taken before the shipment's lock is released, so it names
+        exactly the version this update produced.
 
-        shipment["updated_at"] = datetime.now()
+        Returns:
+            (strong ETag, serialized ShipmentRead JSON) of the updated shipment
 
-        return ShipmentService.get_shipment_by_id(shipment_id)
+        Raises:
+            EntityNotFound: If shipment not found
+            PreconditionFailed: If the shipment changed since the If-Match ETag was issued
+            InvalidStatusTransition: If status transition is invalid
+        """
+        with get_shipment_locks().hold(shipment_id):
+            _update_shipment(shipment_id, update_data, if_match)
+            return ShipmentService.get_shipment_response(shipment_id)
 
     @staticmethod
+    @timed("shipment.delete")
     def delete_shipment(shipment_id: int) -> dict:
         """
         Delete shipment
@@ -227,76 +537,160 @@ class ShipmentService:
         Raises:
             EntityNotFound: If shipment not found
         """
-        if shipment_id not in shipments_db:
-            raise EntityNotFound("Shipment", shipment_id)
+        with get_shipment_locks().hold(shipment_id):
+            if not get_shipment_repository().delete(shipment_id):
+                raise EntityNotFound("Shipment", shipment_id)
+            get_shipment_response_cache().discard(shipment_id)
 
-        del shipments_db[shipment_id]
         return {"message": f"Shipment with tracking number {shipment_id} has been deleted"}
 
     @staticmethod
-    def add_tracking_event(shipment_id: int, event_data: TrackingEventCreate) -> TrackingEvent:
+    @timed("tracking.add_event")
+    def add_tracking_event(
+        shipment_id: int, event_data: TrackingEventCreate, if_match: Optional[str] = None
+    ) -> TrackingEvent:
         """
         Add tracking event to shipment
 
         Args:
             shipment_id: Shipment ID
             event_data: Tracking event data
+            if_match: If-Match header; the event is only added while the shipment's ETag matches it
 
         Returns:
             Created tracking event
 
         Raises:
             EntityNotFound: If shipment not found
+            PreconditionFailed: If the shipment changed since the If-Match ETag was issued
+            InvalidStatusTransition: If the shipment may not move to the event status
         """
-        global tracking_event_counter
+        now = datetime.now()
+        event = TrackingEventRecord(0, event_data.location, event_data.description, event_data.status.code, now)
+        repository = get_shipment_repository()
+        with get_shipment_locks().hold(shipment_id):
+            if if_match is None:
+                new_event = repository.add_events([(shipment_id, event)], now, STATUS_MACHINE.check_batch)[0]
+            else:
+                new_event = _add_event_if_match(shipment_id, event, if_match)
+        if isinstance(new_event, LogixpressException):
+            raise new_event
 
-        if shipment_id not in shipments_db:
-            raise EntityNotFound("Shipment", shipment_id)
+        _publish_events([(shipment_id, new_event)])
+        return _to_tracking_event(new_event)
 
-        shipment = shipments_db[shipment_id]
+    @staticmethod
+    @timed("tracking.add_batch")
+    def add_tracking_events_batch(items: list[dict]) -> dict:
+        """
+        Apply a batch of courier scans across many shipments
 
-        new_event = {
-            "id": tracking_event_counter,
-            "location": event_data.location,
-            "description": event_data.description,
-            "status": event_data.status.value,
-            "timestamp": datetime.now(),
-        }
-        tracking_event_counter += 1
+        Events are applied in request order in one write, holding the locks of
+        every shipment in the batch. Each one is checked against the status left
+        by the events before it; unknown shipments, invalid transitions and
+        malformed items are rejected individually.
+
+        Args:
+            items: Raw TrackingBatchItem payloads (anything that is not one is rejected on its own)
+
+        Returns:
+            Number accepted, number rejected and a result per event in request order
+
+        Raises:
+            ValidationError: If the batch is empty or larger than TRACKING_BATCH_MAX_ITEMS
+        """
+        if not 1 <= len(items) <= settings.TRACKING_BATCH_MAX_ITEMS:
+            raise ValidationError(f"Tracking batch accepts between 1 and {settings.TRACKING_BATCH_MAX_ITEMS} events")
 
-        shipment["tracking_events"].append(new_event)
-        shipment["current_status"] = event_data.status.value
-        shipment["updated_at"] = datetime.now()
+        now = datetime.now()
+        results: list[dict[str, Any]] = []
+        valid = []
+        for index, item in enumerate(items):
+            try:
+                scan = TrackingBatchItem.model_validate(item)
+            except SchemaValidationError as exc:
+                # Echo the ID only when it is one; anything else would fail the response model
+                shipment_id = item.get("shipment_id") if isinstance(item, dict) else None
+                if not isinstance(shipment_id, int) or isinstance(shipment_id, bool):
+                    shipment_id = None
+                results.append({"index": index, "shipment_id": shipment_id, "error": _format_errors(exc)})
+                continue
+            event = TrackingEventRecord(
+                0, scan.location, scan.description, STATUS_CODES[scan.status.value], scan.timestamp or now
+            )
+            valid.append((index, scan.shipment_id, event))
+
+        events = [(shipment_id, event) for _, shipment_id, event in valid]
+        with get_shipment_locks().hold(*(shipment_id for shipment_id, _ in events)):
+            outcomes = get_shipment_repository().add_events(events, now, STATUS_MACHINE.check_batch)
+        accepted = []
+        for (index, shipment_id, _), outcome in zip(valid, outcomes, strict=True):
+            if isinstance(outcome, LogixpressException):
+                results.append({"index": index, "shipment_id": shipment_id, "error": outcome.detail})
+            else:
+                results.append({"index": index, "shipment_id": shipment_id, "event_id": outcome.id})
+                accepted.append((shipment_id, outcome))
+        _publish_events(accepted)
+        results.sort(key=lambda result: result["index"])
 
-        return TrackingEvent(**new_event)
+        rejected = sum(1 for result in results if "error" in result)
+        return {"accepted": len(items) - rejected, "rejected": rejected, "results": results}
 
     @staticmethod
-    def get_tracking_history(shipment_id: int) -> list[TrackingEvent]:
+    @timed("tracking.history")
+    def get_tracking_history(
+        shipment_id: int, since_event_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> tuple[list[TrackingEvent], Optional[int]]:
         """
-        Get tracking history for shipment
+        Get tracking history for shipment, optionally only the events after a known one
 
         Args:
             shipment_id: Shipment ID
+            since_event_id: Only events added after the event with this ID
+            limit: Maximum number of events
 
         Returns:
-            List of tracking events
+            (tracking events oldest first, ID to pass as since_event_id on the next
+            poll: the last returned event, else since_event_id)
 
         Raises:
             EntityNotFound: If shipment not found
         """
-        if shipment_id not in shipments_db:
+        events = get_shipment_repository().get_events(shipment_id, since_event_id, limit)
+        if events is None:
             raise EntityNotFound("Shipment", shipment_id)
 
-        shipment = shipments_db[shipment_id]
-        return [TrackingEvent(**event) for event in shipment["tracking_events"]]
+        last_event_id = events[-1].id if events else since_event_id
+        return [_to_tracking_event(event) for event in events], last_event_id
 
+    @staticmethod
+    def get_statistics() -> dict:
+        """
+        Get shipment counts
+
+        Returns:
+            Total number of shipments and the number per status and per destination
+        """
+        return get_shipment_repository().get_counts()
+
+    @staticmethod
+    def recount_statistics() -> dict:
+        """
+        Rebuild shipment counts from a full scan
+
+        Returns:
+            Fresh counts plus ``drift``, True if they differ from the maintained
+            counters (writes racing the recount can also flag it)
+        """
+        repository = get_shipment_repository()
+        maintained = repository.get_counts()
+        recounted = repository.recount()
+        return {**recounted, "drift": recounted != maintained}
 
-# Initialize with sample data
-def initialize_sample_data():
-    """Initialize database with sample shipments"""
-    global shipments_db, tracking_event_counter
 
-    shipments_db = {
+def sample_shipments() -> dict[int, dict]:
+    """Sample shipments seeded into empty storage"""
+    return {
         12701: {
             "package_details": {
                 "content": "aluminum sheets",
@@ -373,8 +767,33 @@ def initialize_sample_data():
         },
     }
 
-    tracking_event_counter = 4
+
+# Initialize with sample data
+def initialize_sample_data(repository: Optional[ShipmentRepository] = None):
+    """Initialize database with sample shipments"""
+    if repository is None:
+        repository = get_shipment_repository()
+    repository.load(sample_shipments())
+
+
+def initialize_storage(repository: Optional[ShipmentRepository] = None):
+    """
+    Recover persisted shipments when available, otherwise seed sample data
+
+    Seeding only fills an empty store, so when several workers start on one
+    database, none wipes shipments another has already seeded or written.
+    """
+    if repository is None:
+        repository = get_shipment_repository()
+    if not repository.recover():
+        repository.seed(sample_shipments())
+
+
+def shutdown_storage():
+    """Flush pending writes and release storage resources"""
+    get_shipment_repository().close()
+    get_user_store().close()
 
 
-# Initialize sample data on module load
-initialize_sample_data()
+# Recover or seed storage when the repository is first used rather than on module load
+set_repository_initializer(initialize_storage)
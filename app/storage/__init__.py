@@ -0,0 +1,168 @@
+"""
+Storage Module - Shipment repositories and the data structures backing them
+
+The active repository and user store are chosen by ``settings.STORAGE_BACKEND``:
+- ``memory``: process-local dicts, optionally made durable by a write-ahead log
+- ``sqlite``: SQLite database in WAL mode under ``DATA_DIR``
+"""
+
+import threading
+from typing import Callable, Optional, TypeVar
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.models.shipment import save_status_names, status_names_path
+from app.storage.base import ShipmentRepository
+from app.storage.records import STATUS_VALUES
+from app.storage.users import UserStore
+
+T = TypeVar("T")
+
+_repository: Optional[ShipmentRepository] = None
+_initializer: Optional[Callable[[ShipmentRepository], None]] = None
+_lock = threading.Lock()
+
+_user_store: Optional[UserStore] = None
+_user_store_initializer: Optional[Callable[[UserStore], None]] = None
+
+
+def create_shipment_repository() -> ShipmentRepository:
+    """
+    Build the repository configured in settings
+
+    Raises:
+        ValueError: If STORAGE_BACKEND is unknown
+    """
+    # Persisted shipments hold status codes: keep them meaning the same statuses next start
+    path = status_names_path()
+    if path is not None:
+        save_status_names(path, STATUS_VALUES)
+
+    if settings.STORAGE_BACKEND == "sqlite":
+        from app.storage.sqlite import SQLiteShipmentRepository
+
+        return SQLiteShipmentRepository(
+            settings.SQLITE_PATH or settings.DATA_DIR / "logixpress.db",
+            pool_size=settings.SQLITE_POOL_SIZE,
+            id_block_size=settings.ID_BLOCK_SIZE,
+        )
+
+    if settings.STORAGE_BACKEND == "memory":
+        from app.storage.id_allocator import IdAllocator
+        from app.storage.memory import InMemoryShipmentRepository
+        from app.storage.wal import WriteAheadLog
+
+        # Tracking numbers and mutations are persisted under DATA_DIR when enabled
+        id_allocator = IdAllocator(
+            start=12701,
+            block_size=settings.ID_BLOCK_SIZE,
+            path=settings.DATA_DIR / "shipment_id.hwm" if settings.PERSISTENCE_ENABLED else None,
+        )
+        wal = (
+            WriteAheadLog(
+                settings.DATA_DIR / "wal",
+                fsync_interval_ms=settings.WAL_FSYNC_INTERVAL_MS,
+                snapshot_every=settings.WAL_SNAPSHOT_EVERY,
+            )
+            if settings.PERSISTENCE_ENABLED
+            else None
+        )
+        return InMemoryShipmentRepository(id_allocator, wal)
+
+    raise ValueError(f"Unknown storage backend: {settings.STORAGE_BACKEND}")
+
+
+def get_shipment_repository() -> ShipmentRepository:
+    """
+    Get the process-wide shipment repository, creating it on first use
+
+    A freshly created repository is passed to the registered initializer
+    (recovery or seeding) before any caller can see it, so that work is paid
+    by the first request rather than at import time.
+    """
+    global _repository
+    repository = _repository
+    if repository is None:
+        with _lock:
+            if _repository is None:
+                repository = create_shipment_repository()
+                if _initializer is not None:
+                    _initializer(repository)
+                _repository = repository
+            repository = _repository
+    return repository
+
+
+def set_shipment_repository(repository: Optional[ShipmentRepository]) -> None:
+    """Replace the process-wide shipment repository (None recreates it from settings)"""
+    global _repository
+    _repository = repository
+
+
+def set_repository_initializer(initializer: Optional[Callable[[ShipmentRepository], None]]) -> None:
+    """Register the function run on each repository created from settings"""
+    global _initializer
+    _initializer = initializer
+
+
+def create_user_store() -> UserStore:
+    """
+    Build the user store configured in settings
+
+    Raises:
+        ValueError: If STORAGE_BACKEND is unknown
+    """
+    from app.storage.users import InMemoryUserStore, SQLiteUserStore
+
+    if settings.STORAGE_BACKEND == "sqlite":
+        return SQLiteUserStore(settings.SQLITE_PATH or settings.DATA_DIR / "logixpress.db", settings.SQLITE_POOL_SIZE)
+    if settings.STORAGE_BACKEND == "memory":
+        return InMemoryUserStore()
+    raise ValueError(f"Unknown storage backend: {settings.STORAGE_BACKEND}")
+
+
+def get_user_store() -> UserStore:
+    """Get the process-wide user store, creating and initializing it on first use"""
+    global _user_store
+    store = _user_store
+    if store is None:
+        with _lock:
+            if _user_store is None:
+                store = create_user_store()
+                if _user_store_initializer is not None:
+                    _user_store_initializer(store)
+                _user_store = store
+            store = _user_store
+    return store
+
+
+def set_user_store(store: Optional[UserStore]) -> None:
+    """Replace the process-wide user store (None recreates it from settings)"""
+    global _user_store
+    _user_store = store
+
+
+def set_user_store_initializer(initializer: Optional[Callable[[UserStore], None]]) -> None:
+    """Register the function run on each user store created from settings"""
+    global _user_store_initializer
+    _user_store_initializer = initializer
+
+
+async def run_storage_call(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a call that goes through the shipment repository
+
+    Blocking backends are run in the threadpool so the event loop stays free;
+    in-memory calls are cheaper to run inline than to hand off.
+    """
+    if get_shipment_repository().blocking:
+        return await run_in_threadpool(func, *args, **kwargs)
+    return func(*args, **kwargs)
+
+
+async def run_user_store_call(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run a call that goes through the user store, in the threadpool if the store blocks"""
+    if get_user_store().blocking:
+        return await run_in_threadpool(func, *args, **kwargs)
+    return func(*args, **kwargs)
@@ -0,0 +1,272 @@
+"""
+Shipment Repository Interface
+
+Storage contract shared by every shipment backend. Shipments and tracking
+events are exchanged as ShipmentRecord / TrackingEventRecord; only load()
+takes dicts shaped like the ShipmentRead schema, for seeding.
+"""
+
+import itertools
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Callable, Iterator, Optional, Union
+
+from app.core.exceptions import LogixpressException
+from app.core.tracking_hub import LiveRelay
+from app.storage.records import ShipmentRecord, TrackingEventRecord
+
+_generations = itertools.count(1)
+
+
+def next_generation() -> int:
+    """Process-unique generation number for a repository's current contents"""
+    return next(_generations)
+
+
+class ShipmentRepository(ABC):
+    """Storage interface for the Shipment aggregate"""
+
+    # Whether calls do blocking I/O and should run off the event loop
+    blocking: bool = False
+
+    _generation: int = 0
+
+    @property
+    def generation(self) -> int:
+        """
+        Changes whenever the contents are replaced wholesale (new repository, load())
+
+        So (generation, shipment ID, version) identifies one state of a shipment
+        even though load() restarts versions. Stores shared between worker
+        processes keep it in the store, so every worker sees the change.
+        """
+        return self._generation
+
+    @abstractmethod
+    def get(self, shipment_id: int) -> Optional[ShipmentRecord]:
+        """Get a shipment with its tracking events, None if not found"""
+
+    @abstractmethod
+    def get_version(self, shipment_id: int) -> Optional[int]:
+        """Current version of a shipment (bumped by every write to it), None if not found"""
+
+    @abstractmethod
+    def list_shipments(
+        self,
+        status: Optional[str] = None,
+        destination_code: Optional[int] = None,
+        limit: int = 10,
+        order_by: str = "id",
+        after: Any = None,
+        descending: bool = False,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        updated_since: Optional[datetime] = None,
+    ) -> list[tuple[int, ShipmentRecord]]:
+        """
+        List shipments in key order, resuming after a cursor key
+
+        Args:
+            status: Only shipments currently in this status
+            destination_code: Only shipments bound to this destination
+            limit: Maximum number of rows
+            order_by: ``id`` (key: shipment ID), ``created_at`` (key: (created_at, shipment ID))
+                or ``updated_at`` (key: (updated_at, shipment ID))
+            after: Key of the last row already returned, None for the first page
+            descending: Largest key first
+            created_from: Only shipments created at or after this time
+            created_to: Only shipments created before this time
+            updated_since: Only shipments updated at or after this time
+
+        Returns:
+            (shipment_id, shipment) pairs; tracking events may be left empty
+        """
+
+    @abstractmethod
+    def search(self, query: str, limit: int = 10) -> list[tuple[int, ShipmentRecord]]:
+        """
+        Full-text search over recipient name and address, package content and seller name
+
+        Args:
+            query: Free text; every word must occur in one of the searched fields
+            limit: Maximum number of results
+
+        Returns:
+            (shipment_id, shipment) pairs, best match first (tracking events not loaded)
+        """
+
+    @abstractmethod
+    def iter_shipments(
+        self,
+        status: Optional[str] = None,
+        destination_code: Optional[int] = None,
+        updated_since: Optional[datetime] = None,
+        batch_size: int = 500,
+    ) -> Iterator[list[tuple[int, ShipmentRecord]]]:
+        """
+        Stream every matching shipment with its tracking events, in ID order
+
+        Rows are fetched batch by batch, so memory use does not grow with the
+        number of shipments.
+
+        Args:
+            status: Only shipments currently in this status
+            destination_code: Only shipments bound to this destination
+            updated_since: Only shipments updated at or after this time
+            batch_size: Shipments per yielded batch
+
+        Returns:
+            Batches of (shipment_id, shipment) pairs
+        """
+
+    @abstractmethod
+    def create(self, shipment: ShipmentRecord, initial_event: TrackingEventRecord) -> int:
+        """
+        Store a new shipment
+
+        Args:
+            shipment: Shipment without tracking events
+            initial_event: First tracking event, its ``id`` is assigned here
+
+        Returns:
+            Allocated shipment ID
+        """
+
+    @abstractmethod
+    def create_many(self, shipments: list[tuple[ShipmentRecord, TrackingEventRecord]]) -> list[int]:
+        """
+        Store several new shipments in one write, with IDs allocated as a block
+
+        Args:
+            shipments: (shipment, initial_event) pairs, event IDs are assigned here
+
+        Returns:
+            Allocated shipment IDs, in input order
+        """
+
+    @abstractmethod
+    def update(
+        self,
+        shipment_id: int,
+        fields: dict,
+        event: Optional[TrackingEventRecord] = None,
+        expected_version: Optional[int] = None,
+    ) -> bool:
+        """
+        Overwrite fields of an existing shipment and bump its version
+
+        Args:
+            shipment_id: Shipment ID
+            fields: ShipmentRecord attribute -> new value
+            event: Tracking event appended in the same write, its ``id`` is assigned here
+            expected_version: Only write while the shipment is still at this version
+                (compare-and-set, which also holds against other worker processes)
+
+        Returns:
+            False if nothing was written: the shipment does not exist or has moved past expected_version
+        """
+
+    @abstractmethod
+    def add_event(
+        self, shipment_id: int, event: TrackingEventRecord, updated_at: datetime
+    ) -> Optional[TrackingEventRecord]:
+        """
+        Append a tracking event, move the shipment to the event status and bump its version
+
+        Returns:
+            The stored event with its ID, None if the shipment does not exist
+        """
+
+    @abstractmethod
+    def add_events(
+        self,
+        events: list[tuple[int, TrackingEventRecord]],
+        updated_at: datetime,
+        validate: Callable[[dict[int, int], list[tuple[int, int]]], list[Optional[LogixpressException]]],
+    ) -> list[Union[TrackingEventRecord, LogixpressException]]:
+        """
+        Append many tracking events, in order, in one write
+
+        The current status of every shipment in the batch is read once and the
+        whole batch is validated in one call before anything is written, so
+        each event is checked against the state left by the events before it.
+
+        Args:
+            events: (shipment_id, event) pairs
+            updated_at: New updated_at of every touched shipment
+            validate: Called as validate(statuses, transitions) with shipment ID ->
+                current status code for the shipments that exist and the
+                (shipment_id, event status code) pairs; returns per pair None to
+                accept the event or the error rejecting it
+
+        Returns:
+            Per input event, the stored event with its ID or the rejection error
+        """
+
+    @abstractmethod
+    def get_events(
+        self, shipment_id: int, since_event_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> Optional[list[TrackingEventRecord]]:
+        """
+        Get tracking events oldest first, None if the shipment does not exist
+
+        Args:
+            shipment_id: Shipment ID
+            since_event_id: Only events with a greater ID (events are numbered in
+                insertion order, so these are the ones added since)
+            limit: At most this many events
+        """
+
+    @abstractmethod
+    def delete(self, shipment_id: int) -> bool:
+        """Delete a shipment, returning False if it did not exist"""
+
+    @abstractmethod
+    def get_counts(self) -> dict:
+        """
+        Shipment counters maintained by the write paths
+
+        Returns:
+            ``total_shipments``, ``by_status`` (status -> count) and
+            ``by_destination`` (destination code -> count)
+        """
+
+    @abstractmethod
+    def recount(self) -> dict:
+        """Rebuild the counters from a full scan and return them like get_counts()"""
+
+    @abstractmethod
+    def load(self, shipments: dict[int, dict]) -> None:
+        """Replace every stored shipment (seeding and tests)"""
+
+    def seed(self, shipments: dict[int, dict]) -> bool:
+        """
+        Load shipments only if the store holds none (first start)
+
+        Backends shared between worker processes check and load in one
+        transaction, so of several workers starting at once exactly one seeds.
+
+        Returns:
+            False if the store already held shipments
+        """
+        if self.get_counts()["total_shipments"]:
+            return False
+        self.load(shipments)
+        return True
+
+    def recover(self) -> bool:
+        """
+        Load previously persisted state
+
+        Returns:
+            False if there was nothing to recover
+        """
+        return False
+
+    def live_relay(self, poll_seconds: float) -> Optional[LiveRelay]:
+        """Relay of live tracking messages between worker processes sharing the store, None if it is process-local"""
+        return None
+
+    # Optional hook, not abstract: stores holding nothing open have nothing to release
+    def close(self) -> None:  # noqa: B027
+        """Release resources and flush pending writes"""
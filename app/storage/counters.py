@@ -0,0 +1,58 @@
+"""
+Shipment Counters
+
+Running totals of shipments per status and per destination, kept up to
+date by the write paths so statistics never have to scan the table.
+"""
+
+from app.storage.records import STATUS_VALUES
+
+
+class ShipmentCounters:
+    """Shipment counts by status code and destination code"""
+
+    def __init__(self):
+        self.total = 0
+        self.by_status: dict[int, int] = {}
+        self.by_destination: dict[int, int] = {}
+
+    def add(self, status_code: int, destination_code: int) -> None:
+        """Count a shipment"""
+        self.total += 1
+        self.by_status[status_code] = self.by_status.get(status_code, 0) + 1
+        self.by_destination[destination_code] = self.by_destination.get(destination_code, 0) + 1
+
+    def remove(self, status_code: int, destination_code: int) -> None:
+        """Uncount a shipment, dropping keys that reach zero"""
+        self.total -= 1
+        _decrement(self.by_status, status_code)
+        _decrement(self.by_destination, destination_code)
+
+    def move_status(self, old_code: int, new_code: int) -> None:
+        """Move a shipment from one status to another"""
+        if old_code == new_code:
+            return
+        _decrement(self.by_status, old_code)
+        self.by_status[new_code] = self.by_status.get(new_code, 0) + 1
+
+    def clear(self) -> None:
+        """Reset every counter to zero"""
+        self.total = 0
+        self.by_status.clear()
+        self.by_destination.clear()
+
+    def as_dict(self) -> dict:
+        """Counts shaped like the /stats response"""
+        return {
+            "total_shipments": self.total,
+            "by_status": {STATUS_VALUES[code]: count for code, count in self.by_status.items()},
+            "by_destination": dict(self.by_destination),
+        }
+
+
+def _decrement(counts: dict[int, int], key: int) -> None:
+    remaining = counts.get(key, 0) - 1
+    if remaining > 0:
+        counts[key] = remaining
+    else:
+        counts.pop(key, None)
@@ -0,0 +1,100 @@
+"""
+ID Allocator
+
+Hands out monotonic IDs in O(1) from blocks reserved against a
+high-water mark. When the mark is persisted to a file, several worker
+processes can reserve blocks from it without colliding, and IDs are
+never reused after a restart.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock, single worker only
+    fcntl = None  # type: ignore[assignment]
+
+
+class IdAllocator:
+    """Monotonic ID allocator backed by reserved blocks"""
+
+    def __init__(self, start: int, block_size: int = 100, path: Optional[Path] = None):
+        """
+        Args:
+            start: First ID to hand out when nothing was reserved before
+            block_size: Number of IDs reserved per high-water mark update
+            path: File holding the persisted high-water mark, None keeps it in memory
+        """
+        self.block_size = max(1, block_size)
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._high_water_mark = start
+        self._next = 0
+        self._limit = 0
+
+    def allocate(self) -> int:
+        """Hand out the next ID"""
+        with self._lock:
+            if self._next >= self._limit:
+                self._next = self._reserve(self.block_size)
+                self._limit = self._next + self.block_size
+            new_id = self._next
+            self._next += 1
+            return new_id
+
+    def allocate_block(self, count: int) -> range:
+        """
+        Hand out count consecutive IDs
+
+        Args:
+            count: Number of IDs needed
+
+        Returns:
+            Range of the allocated IDs
+        """
+        with self._lock:
+            if self._limit - self._next >= count:
+                start = self._next
+            else:
+                start = self._reserve(count)
+            # The rest of the current block stays usable for single allocations
+            if start == self._next:
+                self._next += count
+            return range(start, start + count)
+
+    def ensure_above(self, value: int) -> None:
+        """
+        Make sure every future ID is greater than value
+
+        Used after loading existing records so they are never handed out again.
+        """
+        with self._lock:
+            if value >= self._next:
+                self._next = self._limit = 0
+            self._high_water_mark = max(self._high_water_mark, value + 1)
+
+    def _reserve(self, count: int) -> int:
+        """Move the high-water mark forward by count and return the old mark"""
+        if self.path is None:
+            start = self._high_water_mark
+            self._high_water_mark = start + count
+            return start
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.read(fd, 64).strip()
+            start = max(int(raw) if raw else 0, self._high_water_mark)
+            self._high_water_mark = start + count
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, str(self._high_water_mark).encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)  # closing the descriptor also releases the flock
+        return start
@@ -0,0 +1,474 @@
+"""
+Secondary Indexes
+
+In-memory secondary indexes that map an attribute value to the set of
+shipment IDs holding that value, a sorted index for ordered range scans,
+an inverted index for full-text search, plus a small query planner that
+intersects them.
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Hashable, Iterable, Iterator, Optional
+
+
+class SecondaryIndex:
+    """Attribute value -> set of shipment IDs"""
+
+    def __init__(self):
+        self._postings: dict[Hashable, set[int]] = {}
+
+    def add(self, key: Hashable, shipment_id: int) -> None:
+        """Register shipment_id under key"""
+        self._postings.setdefault(key, set()).add(shipment_id)
+
+    def remove(self, key: Hashable, shipment_id: int) -> None:
+        """Unregister shipment_id from key, dropping empty postings"""
+        posting = self._postings.get(key)
+        if posting is None:
+            return
+        posting.discard(shipment_id)
+        if not posting:
+            del self._postings[key]
+
+    def move(self, old_key: Hashable, new_key: Hashable, shipment_id: int) -> None:
+        """Move shipment_id from old_key to new_key"""
+        if old_key == new_key:
+            return
+        self.remove(old_key, shipment_id)
+        self.add(new_key, shipment_id)
+
+    def get(self, key: Hashable) -> set[int]:
+        """
+        Get the posting set for key
+
+        The returned set is owned by the index and must not be mutated.
+        """
+        return self._postings.get(key, _EMPTY)
+
+    def counts(self) -> dict[Hashable, int]:
+        """Number of IDs under every key"""
+        return {key: len(posting) for key, posting in self._postings.items()}
+
+    def clear(self) -> None:
+        """Drop every posting"""
+        self._postings.clear()
+
+
+_EMPTY: set[int] = set()
+
+
+class SortedIndex:
+    """
+    Keys kept in ascending order so a scan can resume after any key
+
+    Keys are held in sorted blocks of up to 2 * BLOCK_SIZE keys, with the
+    largest key of every block in a separate list to find blocks by binary
+    search. Adding or removing a key therefore shifts one block instead of
+    the whole index, which matters for keys that move on every write (like
+    ``(updated_at, id)``).
+    """
+
+    BLOCK_SIZE = 1000
+    # Keys copied per step while scanning, bounds the cost of stopping early
+    SCAN_CHUNK = 256
+
+    def __init__(self) -> None:
+        self._blocks: list[list[Any]] = []
+        self._maxes: list[Any] = []
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, key: Any) -> None:
+        """Insert key, appending in O(1) when keys arrive in order"""
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+        else:
+            position = bisect_left(self._maxes, key)
+            if position == len(self._blocks):
+                position -= 1
+                self._blocks[position].append(key)
+                self._maxes[position] = key
+            else:
+                insort(self._blocks[position], key)
+            block = self._blocks[position]
+            if len(block) > 2 * self.BLOCK_SIZE:
+                self._blocks[position : position + 1] = [block[: self.BLOCK_SIZE], block[self.BLOCK_SIZE :]]
+                self._maxes.insert(position, block[self.BLOCK_SIZE - 1])
+        self._len += 1
+
+    def remove(self, key: Any) -> None:
+        """Remove key if present"""
+        position = bisect_left(self._maxes, key)
+        if position == len(self._blocks):
+            return
+        block = self._blocks[position]
+        offset = bisect_left(block, key)
+        if block[offset] != key:
+            return
+        del block[offset]
+        self._len -= 1
+        if not block:
+            del self._blocks[position]
+            del self._maxes[position]
+        elif offset == len(block):
+            self._maxes[position] = block[-1]
+
+    def count(self, low: Any = None, high: Any = None) -> int:
+        """Number of keys in [low, high); None leaves that side open"""
+        return max(0, (self._len if high is None else self._rank(high)) - (0 if low is None else self._rank(low)))
+
+    def scan(self, after: Any = None, low: Any = None, high: Any = None, reverse: bool = False) -> Iterator[Any]:
+        """
+        Iterate keys in [low, high) in ascending (or, with reverse, descending) order
+
+        Writes may interleave with a long scan; it resumes after the last key
+        it yielded, so keys are never repeated.
+
+        Args:
+            after: Only keys that come strictly after this one in scan order, None starts at the first key
+            low: Smallest key to include, None for no lower bound
+            high: Keys from this one up are excluded, None for no upper bound
+            reverse: Scan from the largest key down
+        """
+        if reverse:
+            yield from self._scan_down(high if after is None or (high is not None and high <= after) else after, low)
+            return
+        # (key, inclusive) to start from
+        start = (after, False) if after is not None and (low is None or after >= low) else (low, True)
+        while True:
+            chunk = self._chunk_from(*start)
+            if not chunk:
+                return
+            for key in chunk:
+                if high is not None and key >= high:
+                    return
+                yield key
+            # Re-seek by key, the blocks may have changed while the caller held the chunk
+            start = (chunk[-1], False)
+
+    def rebuild(self, keys: Iterable[Any]) -> None:
+        """Replace every key, sorting once instead of inserting one by one"""
+        ordered = sorted(keys)
+        self._blocks = [ordered[start : start + self.BLOCK_SIZE] for start in range(0, len(ordered), self.BLOCK_SIZE)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._len = len(ordered)
+
+    def clear(self) -> None:
+        """Drop every key"""
+        self._blocks.clear()
+        self._maxes.clear()
+        self._len = 0
+
+    def _rank(self, key: Any) -> int:
+        """Number of keys smaller than key"""
+        position = bisect_left(self._maxes, key)
+        before = sum(map(len, self._blocks[:position]))
+        if position == len(self._blocks):
+            return before
+        return before + bisect_left(self._blocks[position], key)
+
+    def _chunk_from(self, key: Any, inclusive: bool) -> list[Any]:
+        """Up to SCAN_CHUNK keys following key (from the first key when key is None), ascending"""
+        if key is None:
+            return self._blocks[0][: self.SCAN_CHUNK] if self._blocks else []
+        find = bisect_left if inclusive else bisect_right
+        position = find(self._maxes, key)
+        if position == len(self._blocks):
+            return []
+        offset = find(self._blocks[position], key)
+        return self._blocks[position][offset : offset + self.SCAN_CHUNK]
+
+    def _chunk_before(self, key: Any) -> list[Any]:
+        """Up to SCAN_CHUNK keys preceding key (up to the last key when key is None), ascending"""
+        position = len(self._blocks) if key is None else bisect_left(self._maxes, key)
+        offset = 0 if position == len(self._blocks) else bisect_left(self._blocks[position], key)
+        if offset == 0:
+            # Every key of the previous block is smaller than key
+            position -= 1
+            if position < 0:
+                return []
+            offset = len(self._blocks[position])
+        return self._blocks[position][max(0, offset - self.SCAN_CHUNK) : offset]
+
+    def _scan_down(self, before: Any, low: Any) -> Iterator[Any]:
+        """Keys smaller than before (every key when None) down to low, largest first"""
+        while True:
+            chunk = self._chunk_before(before)
+            if not chunk:
+                return
+            for key in reversed(chunk):
+                if low is not None and key < low:
+                    return
+                yield key
+            before = chunk[0]
+
+
+def plan_query(postings: list[set[int]]) -> Optional[set[int]]:
+    """
+    Intersect posting sets, starting from the smallest one
+
+    Args:
+        postings: Posting sets of every active filter
+
+    Returns:
+        Matching shipment IDs, or None when no filter is active
+    """
+    if not postings:
+        return None
+
+    ordered = sorted(postings, key=len)
+    result = ordered[0]
+    for posting in ordered[1:]:
+        if not result:
+            break
+        result = result & posting
+    return result
+
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into case-folded, accent-free alphanumeric words
+
+    Matches SQLite's ``unicode61 remove_diacritics`` tokenizer, so both
+    backends agree on what a word is.
+    """
+    folded = text.casefold()
+    if not folded.isascii():
+        folded = "".join(char for char in unicodedata.normalize("NFKD", folded) if not unicodedata.combining(char))
+    return _TOKEN.findall(folded)
+
+
+class TextIndex:
+    """
+    Token -> posting list of the shipments containing it, for ranked AND queries
+
+    Each posting list is an array of ``shipment_id << FIELD_BITS | field mask``
+    sorted by shipment ID (8 bytes per entry), where the mask records which of
+    the indexed fields hold the token. New shipments get increasing IDs, so
+    adding one appends to its lists. A query starts from the candidates of
+    the shortest list and narrows them list by list, scanning lists of
+    similar length and binary searching much longer ones; matches are
+    ranked by the summed weights of the fields each token was found in,
+    scaled by how rare the token is.
+
+    A one-token query ranks by field weight, then ID. Posting lists of at least
+    RANKED_MIN entries also keep their shipment IDs grouped by that rank
+    (another 8 bytes per entry), so such a query reads its best matches off
+    the front of the groups instead of ranking the whole list.
+    """
+
+    FIELD_BITS = 4
+    # Probe a posting list by binary search rather than scanning it when it is this
+    # many times longer than the candidates left
+    PROBE_RATIO = 16
+    # Posting lists this long get the rank-grouped view
+    RANKED_MIN = 1024
+
+    def __init__(self, field_weights: tuple[float, ...]):
+        """
+        Args:
+            field_weights: Weight of each indexed field, in the order texts are passed
+        """
+        if len(field_weights) > self.FIELD_BITS:
+            raise ValueError(f"TextIndex supports at most {self.FIELD_BITS} fields")
+        self.field_weights = field_weights
+        # Summed field weight of every possible field mask
+        self._mask_weights = [
+            sum(weight for field, weight in enumerate(field_weights) if mask >> field & 1)
+            for mask in range(1 << self.FIELD_BITS)
+        ]
+        # Position of each mask when ordered by descending weight (equal weights share one)
+        distinct = sorted(set(self._mask_weights), reverse=True)
+        self._mask_ranks = [distinct.index(weight) for weight in self._mask_weights]
+        self._rank_count = len(distinct)
+        self._postings: dict[str, array] = {}
+        # Token -> shipment IDs of its long posting list, one ascending array per rank
+        self._ranked: dict[str, list[array]] = {}
+        self._documents = 0
+
+    def __len__(self) -> int:
+        return self._documents
+
+    def add(self, shipment_id: int, texts: tuple[str, ...]) -> None:
+        """Index the texts of a new shipment"""
+        for token, mask in self._token_masks(texts).items():
+            self._insert(token, shipment_id << self.FIELD_BITS | mask)
+        self._documents += 1
+
+    def remove(self, shipment_id: int, texts: tuple[str, ...]) -> None:
+        """Unindex a shipment, given the texts it was indexed with"""
+        for token, mask in self._token_masks(texts).items():
+            self._delete(token, shipment_id << self.FIELD_BITS | mask)
+        self._documents -= 1
+
+    def replace(self, shipment_id: int, old_texts: tuple[str, ...], new_texts: tuple[str, ...]) -> None:
+        """Re-index a shipment whose texts changed, touching only the tokens that did"""
+        old, new = self._token_masks(old_texts), self._token_masks(new_texts)
+        for token, mask in old.items():
+            if new.get(token) != mask:
+                self._delete(token, shipment_id << self.FIELD_BITS | mask)
+        for token, mask in new.items():
+            if old.get(token) != mask:
+                self._insert(token, shipment_id << self.FIELD_BITS | mask)
+
+    def search(self, query: str, limit: int) -> list[int]:
+        """
+        Shipments containing every token of query, best match first
+
+        Args:
+            query: Free text, tokenized like the indexed fields
+            limit: Maximum number of shipment IDs
+
+        Returns:
+            Shipment IDs ordered by descending score, then ascending ID
+        """
+        tokens = set(tokenize(query))
+        postings: list[array] = []
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                return []
+            postings.append(posting)
+        if not postings:
+            return []
+
+        if len(postings) == 1:
+            return self._search_one(next(iter(tokens)), postings[0], limit)
+
+        postings.sort(key=len)
+        idfs = [math.log(1 + self._documents / len(posting)) for posting in postings]
+        weights, bits, field_mask = self._mask_weights, self.FIELD_BITS, (1 << self.FIELD_BITS) - 1
+        first_idf = idfs[0]
+        scores = {entry >> bits: first_idf * weights[entry & field_mask] for entry in postings[0]}
+        for posting, idf in zip(postings[1:], idfs[1:], strict=True):
+            if len(scores) * self.PROBE_RATIO < len(posting):
+                # Few candidates left: binary search for each in the long list
+                matched = {}
+                for shipment_id, score in scores.items():
+                    position = bisect_left(posting, shipment_id << bits)
+                    if position < len(posting) and posting[position] >> bits == shipment_id:
+                        matched[shipment_id] = score + idf * weights[posting[position] & field_mask]
+            else:
+                matched = {
+                    entry >> bits: scores[entry >> bits] + idf * weights[entry & field_mask]
+                    for entry in posting
+                    if entry >> bits in scores
+                }
+            scores = matched
+            if not scores:
+                return []
+        return _top([(score, -shipment_id) for shipment_id, score in scores.items()], limit)
+
+    def _search_one(self, token: str, posting: array, limit: int) -> list[int]:
+        ranked = self._ranked.get(token)
+        if ranked is not None:
+            found: list[int] = []
+            for ids in ranked:
+                found.extend(ids[: limit - len(found)])
+                if len(found) >= limit:
+                    break
+            return found
+
+        # With one token the score only depends on the field mask, so rank each entry by
+        # (mask weight, ID) as a single integer and let C code do the comparing
+        ranks, bits = self._mask_ranks, self.FIELD_BITS
+        field_mask, id_bits = (1 << bits) - 1, 64 - bits
+        keys = [ranks[entry & field_mask] << id_bits | entry >> bits for entry in posting]
+        if limit < len(keys):
+            keys = heapq.nsmallest(limit, keys)
+        else:
+            keys.sort()
+        id_mask = (1 << id_bits) - 1
+        return [key & id_mask for key in keys]
+
+    def rebuild(self, documents: Iterable[tuple[int, tuple[str, ...]]]) -> None:
+        """Replace every posting list, sorting each once instead of inserting one by one"""
+        postings: dict[str, list[int]] = {}
+        count = 0
+        for shipment_id, texts in documents:
+            for token, mask in self._token_masks(texts).items():
+                postings.setdefault(token, []).append(shipment_id << self.FIELD_BITS | mask)
+            count += 1
+        self._postings = {token: array("q", sorted(entries)) for token, entries in postings.items()}
+        self._ranked = {
+            token: self._group_by_rank(posting)
+            for token, posting in self._postings.items()
+            if len(posting) >= self.RANKED_MIN
+        }
+        self._documents = count
+
+    def clear(self) -> None:
+        """Drop every posting list"""
+        self._postings.clear()
+        self._ranked.clear()
+        self._documents = 0
+
+    @staticmethod
+    def _token_masks(texts: tuple[str, ...]) -> dict[str, int]:
+        masks: dict[str, int] = {}
+        for field, text in enumerate(texts):
+            for token in tokenize(text):
+                masks[token] = masks.get(token, 0) | 1 << field
+        return masks
+
+    def _group_by_rank(self, posting: array) -> list[array]:
+        """Shipment IDs of a posting list, one ascending array per rank"""
+        ranks, bits, field_mask = self._mask_ranks, self.FIELD_BITS, (1 << self.FIELD_BITS) - 1
+        ranked = [array("q") for _ in range(self._rank_count)]
+        for entry in posting:
+            ranked[ranks[entry & field_mask]].append(entry >> bits)
+        return ranked
+
+    def _insert(self, token: str, entry: int) -> None:
+        posting = self._postings.get(token)
+        if posting is None:
+            self._postings[token] = array("q", (entry,))
+            return
+        if entry > posting[-1]:
+            posting.append(entry)
+        else:
+            posting.insert(bisect_left(posting, entry), entry)
+
+        ranked = self._ranked.get(token)
+        if ranked is not None:
+            ids, shipment_id = ranked[self._mask_ranks[entry & (1 << self.FIELD_BITS) - 1]], entry >> self.FIELD_BITS
+            if not ids or shipment_id > ids[-1]:
+                ids.append(shipment_id)
+            else:
+                ids.insert(bisect_left(ids, shipment_id), shipment_id)
+        elif len(posting) >= self.RANKED_MIN:
+            self._ranked[token] = self._group_by_rank(posting)
+
+    def _delete(self, token: str, entry: int) -> None:
+        posting = self._postings.get(token)
+        if posting is None:
+            return
+        position = bisect_left(posting, entry)
+        if position < len(posting) and posting[position] == entry:
+            del posting[position]
+            if not posting:
+                del self._postings[token]
+                self._ranked.pop(token, None)
+                return
+            ranked = self._ranked.get(token)
+            if ranked is not None:
+                ids, shipment_id = (
+                    ranked[self._mask_ranks[entry & (1 << self.FIELD_BITS) - 1]],
+                    entry >> self.FIELD_BITS,
+                )
+                del ids[bisect_left(ids, shipment_id)]
+
+
+def _top(scored: list[tuple[float, int]], limit: int) -> list[int]:
+    return [-negated_id for _, negated_id in heapq.nlargest(limit, scored)]
@@ -0,0 +1,524 @@
+"""
+In-Memory Shipment Repository
+
+Keeps compact shipment records in a process-local dict with secondary
+indexes and counters on status and destination. Optionally logs every mutation to a
+write-ahead log so state survives restarts.
+
+WAL snapshots are written on a background thread from a frozen copy of the
+shipments dict. While one is being written, a write copies a record the
+snapshot still holds instead of changing it in place.
+"""
+
+import bisect
+import heapq
+import threading
+from datetime import datetime
+from itertools import islice
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+
+from app.core.exceptions import LogixpressException
+from app.storage.base import ShipmentRepository, next_generation
+from app.storage.counters import ShipmentCounters
+from app.storage.id_allocator import IdAllocator
+from app.storage.indexes import SecondaryIndex, SortedIndex, TextIndex, plan_query
+from app.storage.records import SEARCH_FIELD_WEIGHTS, SEARCH_FIELDS, STATUS_CODES, ShipmentRecord, TrackingEventRecord
+from app.storage.wal import WriteAheadLog
+
+
+class InMemoryShipmentRepository(ShipmentRepository):
+    """Dict-backed shipment storage"""
+
+    blocking = False
+
+    def __init__(self, id_allocator: IdAllocator, wal: Optional[WriteAheadLog] = None):
+        """
+        Args:
+            id_allocator: Source of new shipment IDs
+            wal: Write-ahead log for durability, None keeps state in memory only
+        """
+        self.shipments: dict[int, ShipmentRecord] = {}
+        self.status_index = SecondaryIndex()
+        self.destination_index = SecondaryIndex()
+        self.counters = ShipmentCounters()
+        # Keyset pagination orders and date ranges: shipment ID, (created_at, shipment ID)
+        # and (updated_at, shipment ID)
+        self.id_order = SortedIndex()
+        self.created_order = SortedIndex()
+        self.updated_order = SortedIndex()
+        self.text_index = TextIndex(SEARCH_FIELD_WEIGHTS)
+        self.id_allocator = id_allocator
+        self.wal = wal
+        self._next_event_id = 1
+        self._lock = threading.RLock()
+        # Shipments dict of the snapshot being written, and the thread writing it
+        self._frozen: Optional[dict[int, ShipmentRecord]] = None
+        self._snapshotter: Optional[threading.Thread] = None
+        self._generation = next_generation()
+
+    # === Reads ===
+    def get(self, shipment_id: int) -> Optional[ShipmentRecord]:
+        return self.shipments.get(shipment_id)
+
+    def get_version(self, shipment_id: int) -> Optional[int]:
+        shipment = self.shipments.get(shipment_id)
+        return None if shipment is None else shipment.version
+
+    def list_shipments(
+        self,
+        status: Optional[str] = None,
+        destination_code: Optional[int] = None,
+        limit: int = 10,
+        order_by: str = "id",
+        after: Any = None,
+        descending: bool = False,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        updated_since: Optional[datetime] = None,
+    ) -> list[tuple[int, ShipmentRecord]]:
+        postings = []
+        if status:
+            postings.append(self.status_index.get(STATUS_CODES.get(status)))
+        if destination_code:
+            postings.append(self.destination_index.get(destination_code))
+        candidate_ids = plan_query(postings)
+
+        # Date ranges [start, end); each is a key range of its ordered index
+        ranges = {}
+        if created_from or created_to:
+            ranges["created_at"] = (created_from, created_to)
+        if updated_since:
+            ranges["updated_at"] = (updated_since, None)
+
+        order, sort_key, to_id = self._ordering(order_by)
+        low, high = _key_range(*ranges.get(order_by, (None, None)))
+        # Constraint name -> shipment ID predicate, and the other ways to enumerate
+        # candidates (size, constraint it guarantees, IDs): the filter postings and
+        # the date ranges of other orders
+        checks: dict[str, Callable[[int], bool]] = {}
+        sources: list[tuple[int, str, Iterable[int]]] = []
+        if candidate_ids is not None:
+            checks["filters"] = candidate_ids.__contains__
+            sources.append((len(candidate_ids), "filters", candidate_ids))
+        for field, (start, end) in ranges.items():
+            checks[field] = self._range_check(field, start, end)
+            if field != order_by:
+                index, range_low, range_high = self._ordering(field)[0], *_key_range(start, end)
+                ids = map(_second, index.scan(low=range_low, high=range_high))
+                sources.append((index.count(range_low, range_high), field, ids))
+
+        def matcher(guaranteed: str) -> Optional[Callable[[int], bool]]:
+            """Predicate for every constraint except guaranteed, None if nothing is left to check"""
+            predicates = [predicate for name, predicate in checks.items() if name != guaranteed]
+            if len(predicates) <= 1:
+                return predicates[0] if predicates else None
+            return lambda shipment_id: all(predicate(shipment_id) for predicate in predicates)
+
+        # Without other constraints walk the ordered index (within its range) from
+        # the cursor. Otherwise either walk it and skip non-matching rows (about
+        # limit * range / matches steps) or sort the candidates of the smallest
+        # source directly, whichever touches fewer rows. Date ranges correlate
+        # with IDs, so matches may cluster at the far end of the walk: it gives up
+        # once it has touched as many rows as sorting would.
+        scan = order.scan(after, low, high, descending)
+        keys: Optional[list[Any]]
+        if not sources:
+            keys = list(islice(scan, limit))
+        else:
+            size, guaranteed, source = min(sources, key=itemgetter(0))
+            walk_matches = matcher(order_by)
+            if walk_matches is not None and size and size**2 > limit * order.count(low, high):
+                keys = _walk(scan, walk_matches, to_id, limit, budget=size)
+            else:
+                keys = None if size else []
+            if keys is None:
+                matches = matcher(guaranteed)
+                candidates: Iterable[Any] = map(sort_key, source if matches is None else filter(matches, source))
+                if after is not None:
+                    candidates = (key for key in candidates if (key < after if descending else key > after))
+                keys = (heapq.nlargest if descending else heapq.nsmallest)(limit, candidates)
+        return [(to_id(key), self.shipments[to_id(key)]) for key in keys]
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[int, ShipmentRecord]]:
+        return [(shipment_id, self.shipments[shipment_id]) for shipment_id in self.text_index.search(query, limit)]
+
+    def iter_shipments(
+        self,
+        status: Optional[str] = None,
+        destination_code: Optional[int] = None,
+        updated_since: Optional[datetime] = None,
+        batch_size: int = 500,
+    ) -> Iterator[list[tuple[int, ShipmentRecord]]]:
+        status_code = STATUS_CODES.get(status) if status else None
+        batch = []
+        for shipment_id in self.id_order.scan():
+            shipment = self.shipments.get(shipment_id)
+            if (
+                shipment is None
+                or (status and shipment.status_code != status_code)
+                or (destination_code and shipment.destination_code != destination_code)
+                or (updated_since and shipment.updated_at < updated_since)
+            ):
+                continue
+            batch.append((shipment_id, shipment))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def get_events(
+        self, shipment_id: int, since_event_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> Optional[list[TrackingEventRecord]]:
+        shipment = self.shipments.get(shipment_id)
+        if shipment is None:
+            return None
+        events = shipment.tracking_events
+        if since_event_id is None and limit is None:
+            return events
+        # Event IDs grow with every append, so each list is sorted by ID
+        start = 0 if since_event_id is None else bisect.bisect_right(events, since_event_id, key=attrgetter("id"))
+        return events[start : None if limit is None else start + limit]
+
+    def get_counts(self) -> dict:
+        return self.counters.as_dict()
+
+    def recount(self) -> dict:
+        with self._lock:
+            self.counters.clear()
+            for shipment in self.shipments.values():
+                self.counters.add(shipment.status_code, shipment.destination_code)
+            return self.counters.as_dict()
+
+    # === Writes ===
+    def create(self, shipment: ShipmentRecord, initial_event: TrackingEventRecord) -> int:
+        with self._lock:
+            shipment_id = self.id_allocator.allocate()
+            shipment.tracking_events = [self._number_event(initial_event)]
+            self.shipments[shipment_id] = shipment
+            self._index(shipment_id, shipment)
+            self._order(shipment_id, shipment)
+            self.text_index.add(shipment_id, shipment.search_texts)
+            self._log({"op": "create", "id": shipment_id, "shipment": shipment})
+        return shipment_id
+
+    def create_many(self, shipments: list[tuple[ShipmentRecord, TrackingEventRecord]]) -> list[int]:
+        with self._lock:
+            shipment_ids = list(self.id_allocator.allocate_block(len(shipments))) if shipments else []
+            for shipment_id, (shipment, initial_event) in zip(shipment_ids, shipments, strict=True):
+                shipment.tracking_events = [self._number_event(initial_event)]
+                self.shipments[shipment_id] = shipment
+                self._index(shipment_id, shipment)
+                self._order(shipment_id, shipment)
+                self.text_index.add(shipment_id, shipment.search_texts)
+            if shipment_ids:
+                records = [shipment for shipment, _ in shipments]
+                self._log({"op": "create_many", "ids": shipment_ids, "shipments": records})
+        return shipment_ids
+
+    def update(
+        self,
+        shipment_id: int,
+        fields: dict,
+        event: Optional[TrackingEventRecord] = None,
+        expected_version: Optional[int] = None,
+    ) -> bool:
+        with self._lock:
+            shipment = self.shipments.get(shipment_id)
+            if shipment is None or expected_version not in (None, shipment.version):
+                return False
+            self._unindex(shipment_id, shipment)
+            self.updated_order.remove(self._updated_key(shipment_id, shipment))
+            old_texts = shipment.search_texts
+            shipment = self._writable(shipment_id, shipment)
+            for field, value in fields.items():
+                setattr(shipment, field, value)
+            if event is not None:
+                shipment.tracking_events.append(self._number_event(event))
+            shipment.version += 1
+            self._index(shipment_id, shipment)
+            self.updated_order.add(self._updated_key(shipment_id, shipment))
+            if any(field in fields for field in SEARCH_FIELDS):
+                self.text_index.replace(shipment_id, old_texts, shipment.search_texts)
+            self._log({"op": "update", "id": shipment_id, "fields": fields, "event": event})
+        return True
+
+    def add_event(
+        self, shipment_id: int, event: TrackingEventRecord, updated_at: datetime
+    ) -> Optional[TrackingEventRecord]:
+        with self._lock:
+            shipment = self.shipments.get(shipment_id)
+            if shipment is None:
+                return None
+            self._apply_event(shipment_id, shipment, event, updated_at)
+            self._log({"op": "tracking_event", "id": shipment_id, "event": event, "updated_at": updated_at})
+        return event
+
+    def add_events(
+        self,
+        events: list[tuple[int, TrackingEventRecord]],
+        updated_at: datetime,
+        validate: Callable[[dict[int, int], list[tuple[int, int]]], list[Optional[LogixpressException]]],
+    ) -> list[Union[TrackingEventRecord, LogixpressException]]:
+        results: list[Union[TrackingEventRecord, LogixpressException]] = []
+        applied = []
+        with self._lock:
+            shipments = self.shipments
+            statuses = {
+                shipment_id: shipments[shipment_id].status_code
+                for shipment_id in {shipment_id for shipment_id, _ in events}
+                if shipment_id in shipments
+            }
+            errors = validate(statuses, [(shipment_id, event.status_code) for shipment_id, event in events])
+            for (shipment_id, event), error in zip(events, errors, strict=True):
+                if error is not None:
+                    results.append(error)
+                    continue
+                self._apply_event(shipment_id, shipments[shipment_id], event, updated_at)
+                applied.append((shipment_id, event))
+                results.append(event)
+            if applied:
+                self._log({"op": "tracking_batch", "events": applied, "updated_at": updated_at})
+        return results
+
+    def delete(self, shipment_id: int) -> bool:
+        with self._lock:
+            shipment = self.shipments.pop(shipment_id, None)
+            if shipment is None:
+                return False
+            self._unindex(shipment_id, shipment)
+            self.text_index.remove(shipment_id, shipment.search_texts)
+            self.id_order.remove(shipment_id)
+            self.created_order.remove(self._created_key(shipment_id, shipment))
+            self.updated_order.remove(self._updated_key(shipment_id, shipment))
+            self._log({"op": "delete", "id": shipment_id})
+        return True
+
+    def load(self, shipments: dict[int, dict]) -> None:
+        with self._lock:
+            records = {shipment_id: ShipmentRecord.from_dict(shipment) for shipment_id, shipment in shipments.items()}
+            self._restore({"shipments": records, "next_event_id": 1})
+            self._generation = next_generation()
+            if self.wal is not None:
+                self.wal.snapshot(self._snapshot_state())
+
+    # === Persistence ===
+    def recover(self) -> bool:
+        if self.wal is None:
+            return False
+
+        state, records = self.wal.recover()
+        if state is None and not records:
+            return False
+
+        with self._lock:
+            self._restore(state or {"shipments": {}, "next_event_id": 1})
+            for record in records:
+                self._replay(record)
+            self._rebuild_indexes()
+        return True
+
+    def close(self) -> None:
+        snapshotter = self._snapshotter
+        if snapshotter is not None:
+            snapshotter.join()
+        if self.wal is not None:
+            self.wal.close()
+
+    # === Internals ===
+    def _number_event(self, event: TrackingEventRecord) -> TrackingEventRecord:
+        event.id = self._next_event_id
+        self._next_event_id += 1
+        return event
+
+    def _index(self, shipment_id: int, shipment: ShipmentRecord) -> None:
+        self.status_index.add(shipment.status_code, shipment_id)
+        self.destination_index.add(shipment.destination_code, shipment_id)
+        self.counters.add(shipment.status_code, shipment.destination_code)
+
+    def _unindex(self, shipment_id: int, shipment: ShipmentRecord) -> None:
+        self.status_index.remove(shipment.status_code, shipment_id)
+        self.destination_index.remove(shipment.destination_code, shipment_id)
+        self.counters.remove(shipment.status_code, shipment.destination_code)
+
+    def _apply_event(
+        self, shipment_id: int, shipment: ShipmentRecord, event: TrackingEventRecord, updated_at: datetime
+    ) -> None:
+        """Number an event, append it and move the shipment to its status"""
+        shipment = self._writable(shipment_id, shipment)
+        self._number_event(event)
+        shipment.tracking_events.append(event)
+        self.status_index.move(shipment.status_code, event.status_code, shipment_id)
+        self.counters.move_status(shipment.status_code, event.status_code)
+        shipment.status_code = event.status_code
+        self.updated_order.remove(self._updated_key(shipment_id, shipment))
+        shipment.updated_at = updated_at
+        self.updated_order.add(self._updated_key(shipment_id, shipment))
+        shipment.version += 1
+
+    def _order(self, shipment_id: int, shipment: ShipmentRecord) -> None:
+        """Add a new shipment to the ordered indexes (created_at never changes afterwards)"""
+        self.id_order.add(shipment_id)
+        self.created_order.add(self._created_key(shipment_id, shipment))
+        self.updated_order.add(self._updated_key(shipment_id, shipment))
+
+    def _ordering(self, order_by: str) -> tuple[SortedIndex, Callable[[int], Any], Callable[[Any], int]]:
+        """(ordered index, shipment ID -> key, key -> shipment ID) of a list order"""
+        if order_by == "created_at":
+            return self.created_order, self._created_key, _second
+        if order_by == "updated_at":
+            return self.updated_order, self._updated_key, _second
+        return self.id_order, _identity, _identity
+
+    def _created_key(self, shipment_id: int, shipment: Optional[ShipmentRecord] = None) -> tuple[datetime, int]:
+        if shipment is None:
+            shipment = self.shipments[shipment_id]
+        return shipment.created_at, shipment_id
+
+    def _range_check(self, field: str, start: Optional[datetime], end: Optional[datetime]) -> Callable[[int], bool]:
+        """Predicate: shipment's field is in [start, end)"""
+        shipments, value = self.shipments, attrgetter(field)
+        if end is None:
+            return lambda shipment_id: value(shipments[shipment_id]) >= start
+        if start is None:
+            return lambda shipment_id: value(shipments[shipment_id]) < end
+        return lambda shipment_id: start <= value(shipments[shipment_id]) < end
+
+    def _updated_key(self, shipment_id: int, shipment: Optional[ShipmentRecord] = None) -> tuple[datetime, int]:
+        if shipment is None:
+            shipment = self.shipments[shipment_id]
+        return shipment.updated_at, shipment_id
+
+    def _rebuild_indexes(self) -> None:
+        self.status_index.clear()
+        self.destination_index.clear()
+        self.counters.clear()
+        for shipment_id, shipment in self.shipments.items():
+            self._index(shipment_id, shipment)
+        self.id_order.rebuild(self.shipments)
+        self.created_order.rebuild(
+            self._created_key(shipment_id, shipment) for shipment_id, shipment in self.shipments.items()
+        )
+        self.updated_order.rebuild(
+            self._updated_key(shipment_id, shipment) for shipment_id, shipment in self.shipments.items()
+        )
+        self.text_index.rebuild(
+            (shipment_id, shipment.search_texts) for shipment_id, shipment in self.shipments.items()
+        )
+
+    def _restore(self, state: dict) -> None:
+        """Replace contents with a snapshot state"""
+        self.shipments.clear()
+        self.shipments.update(state["shipments"])
+        last_event_id = max(
+            (event.id for shipment in self.shipments.values() for event in shipment.tracking_events), default=0
+        )
+        self._next_event_id = max(state["next_event_id"], last_event_id + 1)
+        if self.shipments:
+            self.id_allocator.ensure_above(max(self.shipments))
+        self._rebuild_indexes()
+
+    def _snapshot_state(self) -> dict:
+        return {"shipments": dict(self.shipments), "next_event_id": self._next_event_id}
+
+    def _writable(self, shipment_id: int, shipment: ShipmentRecord) -> ShipmentRecord:
+        """shipment, or a copy replacing it while the snapshot being written still holds it"""
+        frozen = self._frozen
+        if frozen is not None and frozen.get(shipment_id) is shipment:
+            shipment = shipment.copy()
+            self.shipments[shipment_id] = shipment
+        return shipment
+
+    def _log(self, record: dict) -> None:
+        """Append a mutation to the WAL, starting a background snapshot when due"""
+        if self.wal is None:
+            return
+        self.wal.append(record)
+        if self.wal.should_snapshot() and self._snapshotter is None:
+            self._snapshotter = threading.Thread(
+                target=self._write_snapshot, args=(self.wal,), name="wal-snapshot", daemon=True
+            )
+            self._snapshotter.start()
+
+    def _write_snapshot(self, wal: WriteAheadLog) -> None:
+        """Freeze the current state, then pickle and write it to wal without holding the lock"""
+        try:
+            with self._lock:
+                lsn = wal.begin_snapshot()
+                state = self._snapshot_state()
+                self._frozen = state["shipments"]
+            wal.write_snapshot(lsn, state)
+        finally:
+            with self._lock:
+                self._frozen = None
+                self._snapshotter = None
+
+    def _replay(self, record: dict) -> None:
+        """Re-apply a WAL record (indexes are rebuilt afterwards)"""
+        op = record["op"]
+        if op == "create_many":
+            for shipment_id, shipment in zip(record["ids"], record["shipments"], strict=True):
+                self._replay({"op": "create", "id": shipment_id, "shipment": shipment})
+            return
+        if op == "tracking_batch":
+            for shipment_id, event in record["events"]:
+                self._replay(
+                    {"op": "tracking_event", "id": shipment_id, "event": event, "updated_at": record["updated_at"]}
+                )
+            return
+
+        shipment_id = record["id"]
+        event = None
+        if op == "create":
+            self.shipments[shipment_id] = record["shipment"]
+            event = record["shipment"].tracking_events[-1]
+        elif op == "update":
+            shipment = self.shipments[shipment_id]
+            for field, value in record["fields"].items():
+                setattr(shipment, field, value)
+            event = record["event"]
+            if event is not None:
+                shipment.tracking_events.append(event)
+            shipment.version += 1
+        elif op == "tracking_event":
+            shipment = self.shipments[shipment_id]
+            event = record["event"]
+            shipment.tracking_events.append(event)
+            shipment.status_code = event.status_code
+            shipment.updated_at = record["updated_at"]
+            shipment.version += 1
+        elif op == "delete":
+            self.shipments.pop(shipment_id, None)
+
+        self.id_allocator.ensure_above(shipment_id)
+        if event is not None:
+            self._next_event_id = max(self._next_event_id, event.id + 1)
+
+
+def _walk(
+    keys: Iterator[Any], matches: Callable[[int], bool], to_id: Callable[[Any], int], limit: int, budget: int
+) -> Optional[list[Any]]:
+    """First limit keys whose shipment matches, or None if finding them takes more than budget steps"""
+    found = []
+    for steps, key in enumerate(keys, 1):
+        if steps > budget:
+            return None
+        if matches(to_id(key)):
+            found.append(key)
+            if len(found) == limit:
+                break
+    return found
+
+
+def _key_range(start: Optional[datetime], end: Optional[datetime]) -> tuple[Optional[tuple], Optional[tuple]]:
+    """[start, end) as bounds on (datetime, id) keys: (datetime,) sorts before every key with that time"""
+    return (None if start is None else (start,)), (None if end is None else (end,))
+
+
+def _identity(key: int) -> int:
+    return key
+
+
+def _second(key: tuple[datetime, int]) -> int:
+    return key[1]
@@ -0,0 +1,196 @@
+"""
+Storage Records
+
+Compact internal representation of shipments and tracking events. Value
+objects are flattened into one slotted record per shipment, statuses are
+stored as small ints and low-cardinality strings are interned, so a
+shipment costs a fraction of the equivalent dict of dicts. Records are
+converted to the API schemas only at the service boundary.
+"""
+
+import sys
+from datetime import datetime
+from typing import Optional
+
+from app.models.shipment import STATUS_MACHINE
+
+# Status <-> code mapping, codes are positions in the compiled status workflow
+STATUS_VALUES: tuple[str, ...] = STATUS_MACHINE.statuses
+STATUS_CODES: dict[str, int] = STATUS_MACHINE.codes
+
+PACKAGE_FIELDS = ("content", "weight", "dimensions", "fragile")
+RECIPIENT_FIELDS = ("name", "email", "phone", "address")
+SELLER_FIELDS = ("name", "email", "phone")
+
+# Record fields covered by full-text search and their ranking weights
+SEARCH_FIELDS = ("recipient_name", "recipient_address", "content", "seller_name")
+SEARCH_FIELD_WEIGHTS = (3.0, 1.0, 2.0, 1.0)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return None if value is None else sys.intern(value)
+
+
+class TrackingEventRecord:
+    """Tracking event of a shipment"""
+
+    __slots__ = ("id", "location", "description", "status_code", "timestamp")
+
+    def __init__(self, id: int, location: str, description: str, status_code: int, timestamp: datetime):
+        self.id = id
+        # Hub names and scan descriptions repeat across millions of events
+        self.location = sys.intern(location)
+        self.description = sys.intern(description)
+        self.status_code = status_code
+        self.timestamp = timestamp
+
+    def __reduce__(self):
+        return TrackingEventRecord, (self.id, self.location, self.description, self.status_code, self.timestamp)
+
+    @property
+    def status(self) -> str:
+        return STATUS_VALUES[self.status_code]
+
+    @classmethod
+    def from_dict(cls, event: dict) -> "TrackingEventRecord":
+        """Build from a dict shaped like the TrackingEvent schema"""
+        return cls(
+            event.get("id", 0),
+            event["location"],
+            event["description"],
+            STATUS_CODES[event["status"]],
+            event["timestamp"],
+        )
+
+    def to_dict(self) -> dict:
+        """Dict shaped like the TrackingEvent schema"""
+        return {
+            "id": self.id,
+            "location": self.location,
+            "description": self.description,
+            "status": self.status,
+            "timestamp": self.timestamp,
+        }
+
+
+class ShipmentRecord:
+    """Shipment aggregate with its value objects flattened into slots"""
+
+    __slots__ = (
+        "content",
+        "weight",
+        "dimensions",
+        "fragile",
+        "recipient_name",
+        "recipient_email",
+        "recipient_phone",
+        "recipient_address",
+        "seller_name",
+        "seller_email",
+        "seller_phone",
+        "destination_code",
+        "status_code",
+        "created_at",
+        "updated_at",
+        "version",
+        "tracking_events",
+    )
+
+    def __init__(
+        self,
+        content: str,
+        weight: float,
+        dimensions: Optional[str],
+        fragile: bool,
+        recipient_name: str,
+        recipient_email: str,
+        recipient_phone: str,
+        recipient_address: str,
+        seller_name: str,
+        seller_email: str,
+        seller_phone: str,
+        destination_code: int,
+        status_code: int,
+        created_at: datetime,
+        updated_at: datetime,
+        tracking_events: Optional[list[TrackingEventRecord]] = None,
+        version: int = 1,
+    ):
+        self.content = content
+        self.weight = weight
+        self.dimensions = _intern(dimensions)
+        self.fragile = fragile
+        self.recipient_name = recipient_name
+        self.recipient_email = recipient_email
+        self.recipient_phone = recipient_phone
+        self.recipient_address = recipient_address
+        # Sellers ship many orders each, share one copy of their details
+        self.seller_name = sys.intern(seller_name)
+        self.seller_email = sys.intern(seller_email)
+        self.seller_phone = sys.intern(seller_phone)
+        self.destination_code = destination_code
+        self.status_code = status_code
+        self.created_at = created_at
+        self.updated_at = updated_at
+        # Bumped by every write to the shipment
+        self.version = version
+        self.tracking_events = tracking_events if tracking_events is not None else []
+
+    def __reduce__(self):
+        # Constructor order: version comes last so snapshots taken before it existed still load
+        fields = tuple(getattr(self, slot) for slot in self.__slots__[:-2])
+        return ShipmentRecord, (*fields, self.tracking_events, self.version)
+
+    def copy(self) -> "ShipmentRecord":
+        """Shallow copy with its own tracking event list"""
+        clone = ShipmentRecord.__new__(ShipmentRecord)
+        for slot in self.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        clone.tracking_events = list(self.tracking_events)
+        return clone
+
+    @property
+    def current_status(self) -> str:
+        return STATUS_VALUES[self.status_code]
+
+    @property
+    def search_texts(self) -> tuple[str, ...]:
+        """Values of SEARCH_FIELDS"""
+        return self.recipient_name, self.recipient_address, self.content, self.seller_name
+
+    @classmethod
+    def from_dict(cls, shipment: dict) -> "ShipmentRecord":
+        """Build from a dict shaped like the ShipmentRead schema (without ``id``)"""
+        package, recipient, seller = shipment["package_details"], shipment["recipient"], shipment["seller"]
+        return cls(
+            package["content"],
+            package["weight"],
+            package.get("dimensions"),
+            package.get("fragile", False),
+            recipient["name"],
+            recipient["email"],
+            recipient["phone"],
+            recipient["address"],
+            seller["name"],
+            seller["email"],
+            seller["phone"],
+            shipment["destination_code"],
+            STATUS_CODES[shipment["current_status"]],
+            shipment["created_at"],
+            shipment["updated_at"],
+            [TrackingEventRecord.from_dict(event) for event in shipment.get("tracking_events", [])],
+            shipment.get("version", 1),
+        )
+
+    def to_dict(self) -> dict:
+        """Dict shaped like the ShipmentRead schema (without ``id``)"""
+        return {
+            "package_details": {field: getattr(self, field) for field in PACKAGE_FIELDS},
+            "recipient": {field: getattr(self, f"recipient_{field}") for field in RECIPIENT_FIELDS},
+            "seller": {field: getattr(self, f"seller_{field}") for field in SELLER_FIELDS},
+            "destination_code": self.destination_code,
+            "current_status": self.current_status,
+            "tracking_events": [event.to_dict() for event in self.tracking_events],
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
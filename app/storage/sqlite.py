@@ -0,0 +1,797 @@
+"""
+SQLite Shipment Repository
+
+Stores shipments in a SQLite database in WAL journal mode, so several
+threads and worker processes can read while one writes. Connections are
+pooled and every statement is a constant SQL string, which keeps them in
+sqlite3's per-connection prepared statement cache.
+
+Everything that must agree between worker processes lives in the database:
+ID sequences, the contents generation, and the live tracking messages that
+SQLiteLiveRelay carries from the worker that published them to the others.
+"""
+
+import json
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional, Union, cast
+
+from app.core.exceptions import LogixpressException
+from app.core.tracking_hub import LiveRelay
+from app.storage.base import ShipmentRepository
+from app.storage.id_allocator import IdAllocator
+from app.storage.indexes import tokenize
+from app.storage.records import SEARCH_FIELD_WEIGHTS, STATUS_CODES, STATUS_VALUES, ShipmentRecord, TrackingEventRecord
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shipments (
+    id INTEGER PRIMARY KEY,
+    content TEXT NOT NULL,
+    weight REAL NOT NULL,
+    dimensions TEXT,
+    fragile INTEGER NOT NULL,
+    recipient_name TEXT NOT NULL,
+    recipient_email TEXT NOT NULL,
+    recipient_phone TEXT NOT NULL,
+    recipient_address TEXT NOT NULL,
+    seller_name TEXT NOT NULL,
+    seller_email TEXT NOT NULL,
+    seller_phone TEXT NOT NULL,
+    destination_code INTEGER NOT NULL,
+    status_code INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS ix_shipments_status ON shipments (status_code, id);
+CREATE INDEX IF NOT EXISTS ix_shipments_destination ON shipments (destination_code, id);
+CREATE INDEX IF NOT EXISTS ix_shipments_created_at ON shipments (created_at);
+CREATE INDEX IF NOT EXISTS ix_shipments_updated_at ON shipments (updated_at);
+
+CREATE TABLE IF NOT EXISTS tracking_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    shipment_id INTEGER NOT NULL REFERENCES shipments (id) ON DELETE CASCADE,
+    location TEXT NOT NULL,
+    description TEXT NOT NULL,
+    status_code INTEGER NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_tracking_events_shipment ON tracking_events (shipment_id, id);
+
+CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+-- Live tracking messages published by each worker process, read by the others
+CREATE TABLE IF NOT EXISTS live_messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin INTEGER NOT NULL,
+    shipment_id INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL
+);
+
+-- Shipments each worker process has live subscribers for; only these are relayed
+CREATE TABLE IF NOT EXISTS live_watches (
+    origin INTEGER NOT NULL,
+    shipment_id INTEGER NOT NULL,
+    PRIMARY KEY (origin, shipment_id)
+) WITHOUT ROWID;
+
+-- Shipment counts per status / destination, maintained by the triggers below
+CREATE TABLE IF NOT EXISTS shipment_counters (
+    dimension TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, key)
+);
+
+CREATE TRIGGER IF NOT EXISTS tr_shipments_counters_insert AFTER INSERT ON shipments BEGIN
+    INSERT INTO shipment_counters VALUES ('status', NEW.status_code, 1)
+        ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+    INSERT INTO shipment_counters VALUES ('destination', NEW.destination_code, 1)
+        ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_shipments_counters_delete AFTER DELETE ON shipments BEGIN
+    UPDATE shipment_counters SET count = count - 1 WHERE dimension = 'status' AND key = OLD.status_code;
+    UPDATE shipment_counters SET count = count - 1 WHERE dimension = 'destination' AND key = OLD.destination_code;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_shipments_counters_status AFTER UPDATE OF status_code ON shipments
+WHEN OLD.status_code != NEW.status_code BEGIN
+    UPDATE shipment_counters SET count = count - 1 WHERE dimension = 'status' AND key = OLD.status_code;
+    INSERT INTO shipment_counters VALUES ('status', NEW.status_code, 1)
+        ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_shipments_counters_destination AFTER UPDATE OF destination_code ON shipments
+WHEN OLD.destination_code != NEW.destination_code BEGIN
+    UPDATE shipment_counters SET count = count - 1 WHERE dimension = 'destination' AND key = OLD.destination_code;
+    INSERT INTO shipment_counters VALUES ('destination', NEW.destination_code, 1)
+        ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+END;
+
+-- Full-text index over SEARCH_FIELDS, kept in step with shipments by the triggers below
+CREATE VIRTUAL TABLE IF NOT EXISTS shipments_fts USING fts5 (
+    recipient_name, recipient_address, content, seller_name,
+    content = 'shipments', content_rowid = 'id', tokenize = 'unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS tr_shipments_fts_insert AFTER INSERT ON shipments BEGIN
+    INSERT INTO shipments_fts (rowid, recipient_name, recipient_address, content, seller_name)
+        VALUES (NEW.id, NEW.recipient_name, NEW.recipient_address, NEW.content, NEW.seller_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_shipments_fts_delete AFTER DELETE ON shipments BEGIN
+    INSERT INTO shipments_fts (shipments_fts, rowid, recipient_name, recipient_address, content, seller_name)
+        VALUES ('delete', OLD.id, OLD.recipient_name, OLD.recipient_address, OLD.content, OLD.seller_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_shipments_fts_update
+AFTER UPDATE OF recipient_name, recipient_address, content, seller_name ON shipments BEGIN
+    INSERT INTO shipments_fts (shipments_fts, rowid, recipient_name, recipient_address, content, seller_name)
+        VALUES ('delete', OLD.id, OLD.recipient_name, OLD.recipient_address, OLD.content, OLD.seller_name);
+    INSERT INTO shipments_fts (rowid, recipient_name, recipient_address, content, seller_name)
+        VALUES (NEW.id, NEW.recipient_name, NEW.recipient_address, NEW.content, NEW.seller_name);
+END;
+"""
+
+# Shipment columns mirror ShipmentRecord slots (tracking events live in their own table)
+_FIELDS = ShipmentRecord.__slots__[:-1]
+_SHIPMENT_COLUMNS = "id, " + ", ".join(_FIELDS)
+_DATETIME_FIELDS = ("created_at", "updated_at")
+
+
+@lru_cache(maxsize=None)
+def _list_sql(
+    by_status: bool,
+    by_destination: bool,
+    order_by: str,
+    by_updated_at: bool = False,
+    descending: bool = False,
+    by_created_from: bool = False,
+    by_created_to: bool = False,
+) -> str:
+    """
+    Keyset query resuming after the cursor key of the given order
+
+    Cached, so each filter combination and order maps to one constant
+    statement that stays in sqlite3's prepared statement cache.
+    """
+    columns = "id" if order_by == "id" else f"({order_by}, id)"
+    conditions = [f"{columns} {'<' if descending else '>'} {'?' if order_by == 'id' else '(?, ?)'}"]
+    if by_status:
+        conditions.append("status_code = ?")
+    if by_destination:
+        conditions.append("destination_code = ?")
+    if by_updated_at:
+        conditions.append("updated_at >= ?")
+    if by_created_from:
+        conditions.append("created_at >= ?")
+    if by_created_to:
+        conditions.append("created_at < ?")
+    direction = " DESC" if descending else ""
+    order = f"id{direction}" if order_by == "id" else f"{order_by}{direction}, id{direction}"
+    return f"SELECT {_SHIPMENT_COLUMNS} FROM shipments WHERE {' AND '.join(conditions)} ORDER BY {order} LIMIT ?"
+
+
+_EXPORT_SQL = {
+    (by_status, by_destination, by_updated_at): _list_sql(by_status, by_destination, "id", by_updated_at)
+    for by_status in (False, True)
+    for by_destination in (False, True)
+    for by_updated_at in (False, True)
+}
+# Cursor keys of the first page, past every row in each direction: IDs are positive
+# 64-bit integers, ISO timestamps start with a digit (before "~")
+_FIRST_ID = {False: 0, True: 2**63 - 1}
+_FIRST_TIMESTAMP = {False: "", True: "~"}
+_UPDATE_SQL = {field: f"UPDATE shipments SET {field} = ? WHERE id = ?" for field in _FIELDS}
+_BUMP_VERSION_SQL = "UPDATE shipments SET version = version + 1 WHERE id = ?"
+_BUMP_VERSION_IF_SQL = "UPDATE shipments SET version = version + 1 WHERE id = ? AND version = ?"
+# Contents generation: random rather than counted, so databases created apart never share one
+_GENERATION_SQL = "SELECT value FROM sequences WHERE name = 'generation'"
+_INIT_GENERATION_SQL = "INSERT OR IGNORE INTO sequences (name, value) VALUES ('generation', ?)"
+_SET_GENERATION_SQL = "UPDATE sequences SET value = ? WHERE name = 'generation'"
+_RAISE_SEQUENCE_SQL = "INSERT INTO sequences (name, value) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = MAX(value, excluded.value)"
+# Current status of a batch of shipments, IDs passed as one JSON array so the statement stays constant
+_BATCH_STATUS_SQL = "SELECT id, status_code FROM shipments WHERE id IN (SELECT value FROM json_each(?))"
+_APPLY_EVENT_SQL = "UPDATE shipments SET status_code = ?, updated_at = ?, version = version + 1 WHERE id = ?"
+_INSERT_SHIPMENT_SQL = f"INSERT INTO shipments ({_SHIPMENT_COLUMNS}) VALUES ({', '.join('?' * (len(_FIELDS) + 1))})"
+_INSERT_EVENT_SQL = (
+    "INSERT INTO tracking_events (shipment_id, location, description, status_code, timestamp) VALUES (?, ?, ?, ?, ?)"
+)
+_INSERT_EVENT_WITH_ID_SQL = (
+    "INSERT INTO tracking_events (id, shipment_id, location, description, status_code, timestamp) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+_SELECT_EVENTS_SQL = (
+    "SELECT id, location, description, status_code, timestamp FROM tracking_events WHERE shipment_id = ? ORDER BY id"
+)
+# Seeks ix_tracking_events_shipment straight to the first newer event; LIMIT -1 means no limit
+_SELECT_EVENTS_SINCE_SQL = (
+    "SELECT id, location, description, status_code, timestamp FROM tracking_events "
+    "WHERE shipment_id = ? AND id > ? ORDER BY id LIMIT ?"
+)
+# Best matches first: bm25 is lower for better matches, weighted like SEARCH_FIELD_WEIGHTS
+_SEARCH_SQL = (
+    "WITH hits AS ("
+    f"SELECT rowid, bm25(shipments_fts, {', '.join(str(weight) for weight in SEARCH_FIELD_WEIGHTS)}) AS score "
+    "FROM shipments_fts WHERE shipments_fts MATCH ? ORDER BY score, rowid LIMIT ?"
+    f") SELECT {_SHIPMENT_COLUMNS} FROM hits JOIN shipments ON shipments.id = hits.rowid ORDER BY score, id"
+)
+_SELECT_EVENT_RANGE_SQL = (
+    "SELECT shipment_id, id, location, description, status_code, timestamp FROM tracking_events "
+    "WHERE shipment_id BETWEEN ? AND ? ORDER BY shipment_id, id"
+)
+
+
+_INSERT_LIVE_SQL = "INSERT INTO live_messages (origin, shipment_id, payload, created) VALUES (?, ?, ?, ?)"
+_SELECT_LIVE_SQL = "SELECT seq, origin, shipment_id, payload FROM live_messages WHERE seq > ? ORDER BY seq"
+_PRUNE_LIVE_SQL = "DELETE FROM live_messages WHERE created < ?"
+_WATCH_SQL = "INSERT OR IGNORE INTO live_watches (origin, shipment_id) VALUES (?, ?)"
+_UNWATCH_SQL = "DELETE FROM live_watches WHERE origin = ? AND shipment_id = ?"
+_UNWATCH_ALL_SQL = "DELETE FROM live_watches WHERE origin = ?"
+_SELECT_WATCHED_SQL = "SELECT DISTINCT shipment_id FROM live_watches WHERE origin != ?"
+
+
+def _statements(script: str) -> Iterator[str]:
+    """Split a schema script into statements (trigger bodies hold semicolons of their own)"""
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ""
+
+
+def _encode(field: str, value):
+    """Python value -> column value"""
+    if field in _DATETIME_FIELDS:
+        return value.isoformat()
+    return value
+
+
+def _row_to_shipment(row: sqlite3.Row) -> ShipmentRecord:
+    # Columns after the ID line up with the ShipmentRecord arguments up to updated_at
+    values = list(row)
+    values[4] = bool(values[4])
+    values[-3:] = (datetime.fromisoformat(values[-3]), datetime.fromisoformat(values[-2]), None, values[-1])
+    return ShipmentRecord(*values[1:])
+
+
+def _row_to_event(row: sqlite3.Row) -> TrackingEventRecord:
+    return TrackingEventRecord(
+        row["id"], row["location"], row["description"], row["status_code"], datetime.fromisoformat(row["timestamp"])
+    )
+
+
+def _counts_from_rows(rows: list[sqlite3.Row]) -> dict:
+    by_status = {STATUS_VALUES[key]: count for dimension, key, count in rows if dimension == "status"}
+    return {
+        "total_shipments": sum(by_status.values()),
+        "by_status": by_status,
+        "by_destination": {key: count for dimension, key, count in rows if dimension == "destination"},
+    }
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared between threads"""
+
+    def __init__(self, path: Path, size: int = 8):
+        self.path = Path(path)
+        self.size = max(1, size)
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        # First, so workers opening a new database at once wait for each other's WAL switch
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection, opening one if the pool is not full yet"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            conn = self._connect() if create else self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        """Close every idle connection"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+
+
+class SQLiteIdAllocator(IdAllocator):
+    """IdAllocator whose high-water mark lives in the sequences table"""
+
+    def __init__(self, repository: "SQLiteShipmentRepository", name: str, start: int, block_size: int = 100):
+        super().__init__(start=start, block_size=block_size)
+        self.repository = repository
+        self.name = name
+
+    def _reserve(self, count: int) -> int:
+        with self.repository.transaction() as conn:
+            row = conn.execute("SELECT value FROM sequences WHERE name = ?", (self.name,)).fetchone()
+            start = max(int(row["value"]) if row else 0, self._high_water_mark)
+            self._high_water_mark = start + count
+            conn.execute(
+                "INSERT INTO sequences (name, value) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+                (self.name, self._high_water_mark),
+            )
+        return start
+
+
+class SQLiteShipmentRepository(ShipmentRepository):
+    """SQLite-backed shipment storage"""
+
+    blocking = True
+
+    def __init__(self, path: Path, pool_size: int = 8, id_block_size: int = 100):
+        """
+        Args:
+            path: Database file, created with its schema if missing
+            pool_size: Maximum number of open connections
+            id_block_size: Shipment IDs reserved per sequence update
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.pool = ConnectionPool(path, pool_size)
+        # One write transaction, so workers starting together create and migrate the schema once
+        with self.transaction() as conn:
+            had_search = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'shipments_fts'").fetchone()
+            for statement in _statements(SCHEMA):
+                conn.execute(statement)
+            # Databases created before shipments carried a version
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(shipments)")}
+            if "version" not in columns:
+                conn.execute("ALTER TABLE shipments ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+            # ... or before full-text search: index the existing shipments
+            if had_search is None:
+                conn.execute("INSERT INTO shipments_fts (shipments_fts) VALUES ('rebuild')")
+            conn.execute(_INIT_GENERATION_SQL, (secrets.randbits(62),))
+        self.id_allocator = SQLiteIdAllocator(self, "shipment_id", start=12701, block_size=id_block_size)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in one write transaction"""
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def read_transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run reads against one snapshot of the database, unaffected by commits made meanwhile"""
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN DEFERRED")
+            try:
+                yield conn
+            finally:
+                conn.execute("COMMIT")
+
+    @property
+    def generation(self) -> int:
+        """Contents generation, shared by every worker process using the database"""
+        with self.pool.connection() as conn:
+            return int(conn.execute(_GENERATION_SQL).fetchone()[0])
+
+    # === Reads ===
+    def get(self, shipment_id: int) -> Optional[ShipmentRecord]:
+        # The shipment row and its events come from the same snapshot, so they agree on the version
+        with self.read_transaction() as conn:
+            row = conn.execute(f"SELECT {_SHIPMENT_COLUMNS} FROM shipments WHERE id = ?", (shipment_id,)).fetchone()
+            if row is None:
+                return None
+            shipment = _row_to_shipment(row)
+            shipment.tracking_events = [
+                _row_to_event(event) for event in conn.execute(_SELECT_EVENTS_SQL, (shipment_id,))
+            ]
+        return shipment
+
+    def get_version(self, shipment_id: int) -> Optional[int]:
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT version FROM shipments WHERE id = ?", (shipment_id,)).fetchone()
+        return None if row is None else row["version"]
+
+    def list_shipments(
+        self,
+        status: Optional[str] = None,
+        destination_code: Optional[int] = None,
+        limit: int = 10,
+        order_by: str = "id",
+        after: Any = None,
+        descending: bool = False,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        updated_since: Optional[datetime] = None,
+    ) -> list[tuple[int, ShipmentRecord]]:
+        if order_by in ("created_at", "updated_at"):
+            timestamp, shipment_id = after if after is not None else (None, _FIRST_ID[descending])
+            params = [timestamp.isoformat() if timestamp else _FIRST_TIMESTAMP[descending], shipment_id]
+        else:
+            order_by = "id"
+            params = [after or _FIRST_ID[descending]]
+
+        # Status code 0 is a valid filter, so test presence rather than truthiness
+        filters = (bool(status), bool(destination_code), bool(updated_since))
+        values = (status and STATUS_CODES.get(status, -1), destination_code, updated_since and updated_since.isoformat())
+        params.extend(value for value, enabled in zip(values, filters, strict=True) if enabled)
+        params.extend(value.isoformat() for value in (created_from, created_to) if value)
+        sql = _list_sql(*filters[:2], order_by, filters[2], descending, bool(created_from), bool(created_to))
+        with self.pool.connection() as conn:
+            rows = conn.execute(sql, (*params, limit)).fetchall()
+        return [(row["id"], _row_to_shipment(row)) for row in rows]
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[int, ShipmentRecord]]:
+        # Quote every token so FTS5 query syntax in user input is taken literally
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        match = " ".join(f'"{token}"' for token in tokens)
+        with self.pool.connection() as conn:
+            rows = conn.execute(_SEARCH_SQL, (match, limit)).fetchall()
+        return [(row["id"], _row_to_shipment(row)) for row in rows]
+
+    def iter_shipments(
+        self,
+        status: Optional[str] = None,
+        destination_code: Optional[int] = None,
+        updated_since: Optional[datetime] = None,
+        batch_size: int = 500,
+    ) -> Iterator[list[tuple[int, ShipmentRecord]]]:
+        filters = (bool(status), bool(destination_code), bool(updated_since))
+        values = (status and STATUS_CODES.get(status, -1), destination_code, updated_since and updated_since.isoformat())
+        params = [value for value, enabled in zip(values, filters, strict=True) if enabled]
+        sql = _EXPORT_SQL[filters]
+
+        # Each batch reads its shipments and their events in one short read transaction;
+        # none spans the export
+        last_id = 0
+        while True:
+            with self.read_transaction() as conn:
+                rows = conn.execute(sql, (last_id, *params, batch_size)).fetchall()
+                if not rows:
+                    return
+                batch = {row["id"]: _row_to_shipment(row) for row in rows}
+                last_id = rows[-1]["id"]
+                # Events of every shipment in the ID range, skipping filtered-out ones
+                for row in conn.execute(_SELECT_EVENT_RANGE_SQL, (rows[0]["id"], last_id)):
+                    shipment = batch.get(row["shipment_id"])
+                    if shipment is not None:
+                        shipment.tracking_events.append(_row_to_event(row))
+            yield list(batch.items())
+
+    def get_events(
+        self, shipment_id: int, since_event_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> Optional[list[TrackingEventRecord]]:
+        params: tuple[int, ...]
+        if since_event_id is None and limit is None:
+            sql, params = _SELECT_EVENTS_SQL, (shipment_id,)
+        else:
+            sql = _SELECT_EVENTS_SINCE_SQL
+            params = (shipment_id, 0 if since_event_id is None else since_event_id, -1 if limit is None else limit)
+        with self.read_transaction() as conn:
+            if conn.execute("SELECT 1 FROM shipments WHERE id = ?", (shipment_id,)).fetchone() is None:
+                return None
+            return [_row_to_event(row) for row in conn.execute(sql, params)]
+
+    def get_counts(self) -> dict:
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT dimension, key, count FROM shipment_counters WHERE count > 0").fetchall()
+        return _counts_from_rows(rows)
+
+    def recount(self) -> dict:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM shipment_counters")
+            conn.execute(
+                "INSERT INTO shipment_counters SELECT 'status', status_code, COUNT(*) FROM shipments GROUP BY status_code"
+            )
+            conn.execute(
+                "INSERT INTO shipment_counters "
+                "SELECT 'destination', destination_code, COUNT(*) FROM shipments GROUP BY destination_code"
+            )
+            rows = conn.execute("SELECT dimension, key, count FROM shipment_counters").fetchall()
+        return _counts_from_rows(rows)
+
+    # === Writes ===
+    def create(self, shipment: ShipmentRecord, initial_event: TrackingEventRecord) -> int:
+        shipment_id = self.id_allocator.allocate()
+        with self.transaction() as conn:
+            self._insert(conn, shipment_id, shipment)
+            self._insert_event(conn, shipment_id, initial_event)
+        shipment.tracking_events = [initial_event]
+        return shipment_id
+
+    def create_many(self, shipments: list[tuple[ShipmentRecord, TrackingEventRecord]]) -> list[int]:
+        if not shipments:
+            return []
+        shipment_ids = list(self.id_allocator.allocate_block(len(shipments)))
+        with self.transaction() as conn:
+            for shipment_id, (shipment, initial_event) in zip(shipment_ids, shipments, strict=True):
+                self._insert(conn, shipment_id, shipment)
+                self._insert_event(conn, shipment_id, initial_event)
+        for shipment, initial_event in shipments:
+            shipment.tracking_events = [initial_event]
+        return shipment_ids
+
+    def update(
+        self,
+        shipment_id: int,
+        fields: dict,
+        event: Optional[TrackingEventRecord] = None,
+        expected_version: Optional[int] = None,
+    ) -> bool:
+        with self.transaction() as conn:
+            if expected_version is None:
+                cursor = conn.execute(_BUMP_VERSION_SQL, (shipment_id,))
+            else:
+                cursor = conn.execute(_BUMP_VERSION_IF_SQL, (shipment_id, expected_version))
+            if cursor.rowcount == 0:
+                return False
+            for field, value in fields.items():
+                conn.execute(_UPDATE_SQL[field], (_encode(field, value), shipment_id))
+            if event is not None:
+                self._insert_event(conn, shipment_id, event)
+        return True
+
+    def add_event(
+        self, shipment_id: int, event: TrackingEventRecord, updated_at: datetime
+    ) -> Optional[TrackingEventRecord]:
+        with self.transaction() as conn:
+            cursor = conn.execute(_APPLY_EVENT_SQL, (event.status_code, updated_at.isoformat(), shipment_id))
+            if cursor.rowcount == 0:
+                return None
+            self._insert_event(conn, shipment_id, event)
+        return event
+
+    def add_events(
+        self,
+        events: list[tuple[int, TrackingEventRecord]],
+        updated_at: datetime,
+        validate: Callable[[dict[int, int], list[tuple[int, int]]], list[Optional[LogixpressException]]],
+    ) -> list[Union[TrackingEventRecord, LogixpressException]]:
+        results: list[Union[TrackingEventRecord, LogixpressException]] = []
+        ids = json.dumps(sorted({shipment_id for shipment_id, _ in events}))
+        with self.transaction() as conn:
+            statuses = dict(conn.execute(_BATCH_STATUS_SQL, (ids,)).fetchall())
+            errors = validate(statuses, [(shipment_id, event.status_code) for shipment_id, event in events])
+            for (shipment_id, event), error in zip(events, errors, strict=True):
+                if error is not None:
+                    results.append(error)
+                    continue
+                conn.execute(_APPLY_EVENT_SQL, (event.status_code, updated_at.isoformat(), shipment_id))
+                self._insert_event(conn, shipment_id, event)
+                results.append(event)
+        return results
+
+    def delete(self, shipment_id: int) -> bool:
+        with self.transaction() as conn:
+            return conn.execute("DELETE FROM shipments WHERE id = ?", (shipment_id,)).rowcount > 0
+
+    def load(self, shipments: dict[int, dict]) -> None:
+        with self.transaction() as conn:
+            self._replace(conn, shipments)
+        if shipments:
+            self.id_allocator.ensure_above(max(shipments))
+
+    def seed(self, shipments: dict[int, dict]) -> bool:
+        with self.transaction() as conn:
+            if conn.execute("SELECT 1 FROM shipments LIMIT 1").fetchone() is not None:
+                return False
+            self._replace(conn, shipments)
+        if shipments:
+            self.id_allocator.ensure_above(max(shipments))
+        return True
+
+    def live_relay(self, poll_seconds: float) -> "SQLiteLiveRelay":
+        """Relay of live tracking messages between the worker processes sharing this database"""
+        return SQLiteLiveRelay(self.pool, poll_seconds)
+
+    # === Persistence ===
+    def recover(self) -> bool:
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT 1 FROM shipments LIMIT 1").fetchone() is not None
+
+    def close(self) -> None:
+        self.pool.close()
+
+    # === Internals ===
+    def _replace(self, conn: sqlite3.Connection, shipments: dict[int, dict]) -> None:
+        """Replace every shipment and start a new generation, inside the caller's transaction"""
+        conn.execute("DELETE FROM tracking_events")
+        conn.execute("DELETE FROM shipments")
+        for shipment_id, shipment in shipments.items():
+            record = ShipmentRecord.from_dict(shipment)
+            self._insert(conn, shipment_id, record)
+            for event in record.tracking_events:
+                conn.execute(
+                    _INSERT_EVENT_WITH_ID_SQL,
+                    (
+                        event.id,
+                        shipment_id,
+                        event.location,
+                        event.description,
+                        event.status_code,
+                        event.timestamp.isoformat(),
+                    ),
+                )
+        conn.execute(_SET_GENERATION_SQL, (secrets.randbits(62),))
+        # Other workers reserve their next ID blocks from the sequence, so it must pass the loaded IDs too
+        if shipments:
+            conn.execute(_RAISE_SEQUENCE_SQL, (self.id_allocator.name, max(shipments) + 1))
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, shipment_id: int, shipment: ShipmentRecord) -> None:
+        conn.execute(
+            _INSERT_SHIPMENT_SQL,
+            (shipment_id, *(_encode(field, getattr(shipment, field)) for field in _FIELDS)),
+        )
+
+    @staticmethod
+    def _insert_event(conn: sqlite3.Connection, shipment_id: int, event: TrackingEventRecord) -> None:
+        """Insert an event, setting its ``id`` to the assigned row ID"""
+        cursor = conn.execute(
+            _INSERT_EVENT_SQL,
+            (shipment_id, event.location, event.description, event.status_code, event.timestamp.isoformat()),
+        )
+        # Set by the INSERT just run, so never None here
+        event.id = cast(int, cursor.lastrowid)
+
+
+class SQLiteLiveRelay(LiveRelay):
+    """
+    LiveRelay through the live_messages table of a database shared by worker processes
+
+    Each worker records the shipments it has subscribers for in live_watches,
+    and only messages about shipments another worker watches are appended to
+    live_messages. A background thread writes this worker's watch changes,
+    reads the other workers' watches and polls for the messages they appended,
+    handing them to the local tracking hub. A new subscription hears other
+    workers' updates within about two poll intervals, and messages older than
+    retention_seconds are pruned as new ones are sent; a subscriber that misses
+    some catches up from the tracking history like after any disconnect.
+    Watches of a worker that died without stopping stay behind, which only
+    costs relaying messages nobody reads.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(
+        self, pool: ConnectionPool, poll_seconds: float, retention_seconds: float = 60.0, origin: Optional[int] = None
+    ):
+        """
+        Args:
+            pool: Connections to the shared database
+            poll_seconds: Delay between polls for other workers' messages
+            retention_seconds: Age after which messages are pruned
+            origin: Identifies this worker's own messages (defaults to the process ID)
+        """
+        self.pool = pool
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self.origin = os.getpid() if origin is None else origin
+        self._sent = 0
+        # Watch changes not written yet (shipment ID -> watched) and the other workers' watches
+        self._pending_watches: dict[int, bool] = {}
+        self._remote_watches: frozenset[int] = frozenset()
+        self._watch_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, shipment_ids: Iterable[int]) -> None:
+        with self._watch_lock:
+            self._pending_watches.update(dict.fromkeys(shipment_ids, True))
+
+    def unwatch(self, shipment_ids: Iterable[int]) -> None:
+        with self._watch_lock:
+            self._pending_watches.update(dict.fromkeys(shipment_ids, False))
+
+    def watched(self, shipment_id: int) -> bool:
+        return shipment_id in self._remote_watches
+
+    def send_many(self, messages: list[tuple[int, str]]) -> None:
+        now = time.time()
+        rows = [(self.origin, shipment_id, payload, now) for shipment_id, payload in messages]
+        with self.pool.connection() as conn:
+            # One commit for the whole batch rather than one per message
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(_INSERT_LIVE_SQL, rows)
+                if self._sent // self.PRUNE_EVERY != (self._sent + len(rows)) // self.PRUNE_EVERY:
+                    conn.execute(_PRUNE_LIVE_SQL, (now - self.retention_seconds,))
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        self._sent += len(rows)
+
+    def start(self, deliver: Callable[[int, str], None]) -> None:
+        """Call deliver(shipment_id, payload) from a background thread for each message other workers send"""
+        with self.pool.connection() as conn:
+            # Rows left by an earlier process with this origin (a reused process ID)
+            conn.execute(_UNWATCH_ALL_SQL, (self.origin,))
+            last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM live_messages").fetchone()[0]
+            self._read_watches(conn)
+        self._thread = threading.Thread(target=self._poll, args=(deliver, last_seq), name="live-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling and withdraw this worker's watches"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self.pool.connection() as conn:
+            conn.execute(_UNWATCH_ALL_SQL, (self.origin,))
+
+    def _poll(self, deliver: Callable[[int, str], None], last_seq: int) -> None:
+        while not self._stopped.wait(self.poll_seconds):
+            try:
+                with self.pool.connection() as conn:
+                    self._write_watches(conn)
+                    self._read_watches(conn)
+                    rows = conn.execute(_SELECT_LIVE_SQL, (last_seq,)).fetchall()
+            except sqlite3.OperationalError:
+                # Busy beyond the timeout: the next poll picks up where this one stopped
+                continue
+            for seq, origin, shipment_id, payload in rows:
+                last_seq = seq
+                if origin != self.origin:
+                    deliver(shipment_id, payload)
+
+    def _write_watches(self, conn: sqlite3.Connection) -> None:
+        """Write the watch changes made since the last poll"""
+        with self._watch_lock:
+            pending, self._pending_watches = self._pending_watches, {}
+        if not pending:
+            return
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for shipment_id, watched in pending.items():
+                    conn.execute(_WATCH_SQL if watched else _UNWATCH_SQL, (self.origin, shipment_id))
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        except sqlite3.OperationalError:
+            # Retried on the next poll, unless changed again meanwhile
+            with self._watch_lock:
+                self._pending_watches = {**pending, **self._pending_watches}
+            raise
+
+    def _read_watches(self, conn: sqlite3.Connection) -> None:
+        rows = conn.execute(_SELECT_WATCHED_SQL, (self.origin,)).fetchall()
+        self._remote_watches = frozenset(shipment_id for (shipment_id,) in rows)
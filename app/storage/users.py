@@ -0,0 +1,283 @@
+"""
+User Stores
+
+Users are keyed by username and indexed by a normalized (trimmed, case-folded)
+email, so both uniqueness checks are O(1) lookups and ``add`` checks and
+inserts in one atomic step:
+
+- ``InMemoryUserStore``: dict plus email index behind a lock; atomic across
+  the threads of one process
+- ``SQLiteUserStore``: users table with UNIQUE constraints in the shared
+  SQLite database; atomic across worker processes as well. Updates are also
+  recorded in user_changes, which the other workers poll to drop principals
+  they cached for the changed user
+
+User dicts have the keys username, email, hashed_password, role and disabled.
+"""
+
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from app.storage.sqlite import ConnectionPool
+
+USER_FIELDS = ("username", "email", "hashed_password", "role", "disabled")
+
+USERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    email_key TEXT NOT NULL UNIQUE,
+    hashed_password TEXT NOT NULL,
+    role TEXT NOT NULL,
+    disabled INTEGER NOT NULL
+);
+
+-- Users changed by update(), polled by every worker process
+CREATE TABLE IF NOT EXISTS user_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+_SELECT_USER_SQL = "SELECT username, email, hashed_password, role, disabled FROM users WHERE username = ?"
+_INSERT_USER_SQL = (
+    "INSERT INTO users (username, email, email_key, hashed_password, role, disabled) VALUES (?, ?, ?, ?, ?, ?)"
+)
+_CONFLICT_SQL = (
+    "SELECT EXISTS (SELECT 1 FROM users WHERE username = ?), EXISTS (SELECT 1 FROM users WHERE email_key = ?)"
+)
+_UPDATE_USER_SQL = {
+    field: f"UPDATE users SET {field} = ? WHERE username = ?" for field in ("hashed_password", "role", "disabled")
+}
+_INSERT_CHANGE_SQL = "INSERT INTO user_changes (username, created) VALUES (?, ?)"
+_SELECT_CHANGES_SQL = "SELECT seq, username FROM user_changes WHERE seq > ? ORDER BY seq"
+_PRUNE_CHANGES_SQL = "DELETE FROM user_changes WHERE created < ?"
+
+
+def normalize_email(email: str) -> str:
+    """Key an email by its trimmed, case-folded form"""
+    return email.strip().casefold()
+
+
+class UserStore(ABC):
+    """Storage for user accounts"""
+
+    # True when calls block on I/O (mirrors ShipmentRepository.blocking)
+    blocking: bool = False
+
+    @abstractmethod
+    def get(self, username: str) -> Optional[dict]:
+        """User dict by username, or None"""
+
+    @abstractmethod
+    def find_conflict(self, username: str, email: str) -> Optional[str]:
+        """Name of the field ("username" or "email") already taken, or None"""
+
+    @abstractmethod
+    def add(self, user: dict) -> Optional[str]:
+        """
+        Insert a user unless its username or email is taken
+
+        The check and the insert are atomic, so of two concurrent adds with the
+        same username or email exactly one succeeds.
+
+        Returns:
+            None on success, otherwise the conflicting field name
+        """
+
+    @abstractmethod
+    def update(self, username: str, fields: dict) -> Optional[dict]:
+        """
+        Change hashed_password, role and/or disabled of a user
+
+        Returns:
+            Updated user dict, or None if the user doesn't exist
+        """
+
+    @abstractmethod
+    def load(self, users: dict[str, dict]) -> None:
+        """Replace every user (seeding and tests)"""
+
+    # Optional hook, not abstract: only stores shared between processes have changes to watch
+    def watch_changes(self, on_change: Callable[[str], None], poll_seconds: float) -> None:  # noqa: B027
+        """
+        Call on_change(username), from a background thread, for users updated by other processes
+
+        A process-local store has no other processes to hear from, so by default
+        nothing is watched. close() stops watching.
+        """
+
+    # Optional hook, not abstract: in-memory stores hold nothing to release
+    def close(self) -> None:  # noqa: B027
+        """Release resources held by the store"""
+
+
+class InMemoryUserStore(UserStore):
+    """Process-local user store"""
+
+    def __init__(self):
+        self.users: dict[str, dict] = {}
+        self.email_index: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[dict]:
+        user = self.users.get(username)
+        return dict(user) if user is not None else None
+
+    def find_conflict(self, username: str, email: str) -> Optional[str]:
+        return self._conflict(username, normalize_email(email))
+
+    def add(self, user: dict) -> Optional[str]:
+        email_key = normalize_email(user["email"])
+        with self._lock:
+            conflict = self._conflict(user["username"], email_key)
+            if conflict is None:
+                self.users[user["username"]] = {field: user[field] for field in USER_FIELDS}
+                self.email_index[email_key] = user["username"]
+            return conflict
+
+    def update(self, username: str, fields: dict) -> Optional[dict]:
+        with self._lock:
+            user = self.users.get(username)
+            if user is None:
+                return None
+            user.update(fields)
+            return dict(user)
+
+    def load(self, users: dict[str, dict]) -> None:
+        with self._lock:
+            self.users = {username: {field: user[field] for field in USER_FIELDS} for username, user in users.items()}
+            self.email_index = {normalize_email(user["email"]): username for username, user in users.items()}
+
+    def _conflict(self, username: str, email_key: str) -> Optional[str]:
+        if username in self.users:
+            return "username"
+        if email_key in self.email_index:
+            return "email"
+        return None
+
+
+class SQLiteUserStore(UserStore):
+    """User store in the SQLite database shared by every worker"""
+
+    blocking = True
+
+    # Seconds a user_changes row is kept; watchers poll far more often than this
+    CHANGE_RETENTION_SECONDS = 60.0
+
+    def __init__(self, path: Path, pool_size: int = 8):
+        """
+        Args:
+            path: Database file, created with the users table if missing
+            pool_size: Maximum number of open connections
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(USERS_SCHEMA)
+        self._stopped = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in one write transaction"""
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def get(self, username: str) -> Optional[dict]:
+        with self.pool.connection() as conn:
+            row = conn.execute(_SELECT_USER_SQL, (username,)).fetchone()
+        return self._row_to_user(row) if row is not None else None
+
+    def find_conflict(self, username: str, email: str) -> Optional[str]:
+        with self.pool.connection() as conn:
+            username_taken, email_taken = conn.execute(_CONFLICT_SQL, (username, normalize_email(email))).fetchone()
+        if username_taken:
+            return "username"
+        return "email" if email_taken else None
+
+    def add(self, user: dict) -> Optional[str]:
+        try:
+            with self.transaction() as conn:
+                self._insert(conn, user)
+        except sqlite3.IntegrityError as exc:
+            # "UNIQUE constraint failed: users.username" / "...: users.email_key"
+            return "email" if "email_key" in str(exc) else "username"
+        return None
+
+    def update(self, username: str, fields: dict) -> Optional[dict]:
+        now = time.time()
+        with self.transaction() as conn:
+            for field, value in fields.items():
+                conn.execute(_UPDATE_USER_SQL[field], (value, username))
+            row = conn.execute(_SELECT_USER_SQL, (username,)).fetchone()
+            if row is not None:
+                # Committed with the change itself, so no worker can miss it
+                conn.execute(_INSERT_CHANGE_SQL, (username, now))
+                conn.execute(_PRUNE_CHANGES_SQL, (now - self.CHANGE_RETENTION_SECONDS,))
+        return self._row_to_user(row) if row is not None else None
+
+    def load(self, users: dict[str, dict]) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM users")
+            for user in users.values():
+                self._insert(conn, user)
+
+    def watch_changes(self, on_change: Callable[[str], None], poll_seconds: float) -> None:
+        """Poll user_changes every poll_seconds; this process's own updates are reported too"""
+        with self.pool.connection() as conn:
+            last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM user_changes").fetchone()[0]
+        self._stopped.clear()
+        self._watcher = threading.Thread(
+            target=self._poll_changes, args=(on_change, poll_seconds, last_seq), name="user-changes", daemon=True
+        )
+        self._watcher.start()
+
+    def close(self) -> None:
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        self.pool.close()
+
+    def _poll_changes(self, on_change: Callable[[str], None], poll_seconds: float, last_seq: int) -> None:
+        while not self._stopped.wait(poll_seconds):
+            try:
+                with self.pool.connection() as conn:
+                    rows = conn.execute(_SELECT_CHANGES_SQL, (last_seq,)).fetchall()
+            except sqlite3.OperationalError:
+                # Busy beyond the timeout: the next poll picks up where this one stopped
+                continue
+            for seq, username in rows:
+                last_seq = seq
+                on_change(username)
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, user: dict) -> None:
+        conn.execute(
+            _INSERT_USER_SQL,
+            (
+                user["username"],
+                user["email"],
+                normalize_email(user["email"]),
+                user["hashed_password"],
+                user["role"],
+                int(user["disabled"]),
+            ),
+        )
+
+    @staticmethod
+    def _row_to_user(row: sqlite3.Row) -> dict:
+        return {**dict(row), "disabled": bool(row["disabled"])}
@@ -0,0 +1,241 @@
+"""
+Write-Ahead Log
+
+Append-only log of state mutations with group-commit fsync batching and
+periodic compact snapshots. Records are arbitrary picklable dicts; the
+caller decides how to apply them on recovery.
+
+On-disk layout under the log directory:
+    wal-<lsn>.log        Segments of length-prefixed, CRC-checked frames.
+                         <lsn> is the sequence number of the first record.
+    snapshot-<lsn>.pkl   Full state covering every record before <lsn>.
+"""
+
+import os
+import pickle
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Optional
+
+_FRAME_HEADER = struct.Struct("<II")  # payload length, crc32
+_SEGMENT_PREFIX = "wal-"
+_SNAPSHOT_PREFIX = "snapshot-"
+
+
+def _lsn_of(path: Path) -> int:
+    """Parse the sequence number out of a segment or snapshot file name"""
+    return int(path.stem.split("-", 1)[1])
+
+
+def _read_frames(path: Path) -> tuple[list[dict], int]:
+    """
+    Read every intact frame of a segment
+
+    Returns:
+        Decoded records and the byte offset where the intact prefix ends.
+        A torn or corrupt tail (crash mid-write) stops the scan.
+    """
+    data = path.read_bytes()
+    records = []
+    offset = 0
+    while offset + _FRAME_HEADER.size <= len(data):
+        length, crc = _FRAME_HEADER.unpack_from(data, offset)
+        start = offset + _FRAME_HEADER.size
+        payload = data[start : start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        records.append(pickle.loads(payload))
+        offset = start + length
+    return records, offset
+
+
+class WriteAheadLog:
+    """Durable append-only mutation log"""
+
+    def __init__(self, directory: Path, fsync_interval_ms: int = 10, snapshot_every: int = 50000):
+        """
+        Args:
+            directory: Directory holding segments and snapshots
+            fsync_interval_ms: Group-commit window; appends within it share one fsync.
+                0 makes every append fsync before returning.
+            snapshot_every: Number of records after which should_snapshot() turns true
+        """
+        self.directory = Path(directory)
+        self.fsync_interval = fsync_interval_ms / 1000
+        self.snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._lsn = 0
+        self._records_since_snapshot = 0
+        self._dirty = False
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    # === Recovery ===
+    def recover(self) -> tuple[Any, list[dict]]:
+        """
+        Load the latest snapshot and the log tail written after it
+
+        Returns:
+            Snapshot state (None if no snapshot exists) and the records to replay, in order
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        snapshots = sorted(self.directory.glob(f"{_SNAPSHOT_PREFIX}*.pkl"), key=_lsn_of)
+        state, snapshot_lsn = None, 0
+        if snapshots:
+            snapshot_lsn = _lsn_of(snapshots[-1])
+            state = pickle.loads(snapshots[-1].read_bytes())
+
+        records: list[dict] = []
+        segments = [path for path in self._segments() if _lsn_of(path) >= snapshot_lsn]
+        for path in segments:
+            segment_records, valid_end = _read_frames(path)
+            records.extend(segment_records)
+            if path is segments[-1] and valid_end < path.stat().st_size:
+                # Drop the torn tail so new frames are appended after intact ones
+                os.truncate(path, valid_end)
+
+        with self._lock:
+            self._lsn = snapshot_lsn + len(records)
+            self._records_since_snapshot = len(records)
+            self._open_segment(_lsn_of(segments[-1]) if segments else self._lsn)
+        return state, records
+
+    # === Appending ===
+    def append(self, record: dict) -> None:
+        """
+        Append a mutation record
+
+        The frame is written to the OS before returning, so it survives a process
+        crash; the fsync that makes it survive power loss is batched with other
+        appends within fsync_interval_ms.
+        """
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        frame = _FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            fd = self._fd
+            if fd is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                fd = self._open_segment(self._lsn)
+            os.write(fd, frame)
+            self._lsn += 1
+            self._records_since_snapshot += 1
+            if self.fsync_interval <= 0:
+                os.fsync(fd)
+                return
+            self._dirty = True
+        self._start_flusher()
+
+    def should_snapshot(self) -> bool:
+        """Whether enough records accumulated to make a snapshot worthwhile"""
+        return self._records_since_snapshot >= self.snapshot_every
+
+    def sync(self) -> None:
+        """Force pending appends to disk"""
+        with self._lock:
+            self._sync_locked()
+
+    # === Snapshots ===
+    def snapshot(self, state: Any) -> None:
+        """
+        Write a compact snapshot of state and discard the log it supersedes
+
+        state must reflect every record appended so far.
+        """
+        self.write_snapshot(self.begin_snapshot(), state)
+
+    def begin_snapshot(self) -> int:
+        """
+        Start a new segment for the records that follow a snapshot
+
+        The caller captures the state to snapshot with no append in between,
+        then hands it to write_snapshot, which may run on another thread while
+        appends continue.
+
+        Returns:
+            Sequence number the snapshot covers (every record before it)
+        """
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            lsn = self._lsn
+            self._sync_locked()
+            self._close_segment()
+            self._open_segment(lsn)
+            self._records_since_snapshot = 0
+        return lsn
+
+    def write_snapshot(self, lsn: int, state: Any) -> None:
+        """Write state as the snapshot covering records before lsn and discard the log it supersedes"""
+        data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        target = self.directory / f"{_SNAPSHOT_PREFIX}{lsn:020d}.pkl"
+        tmp = target.with_suffix(".tmp")
+        with open(tmp, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp, target)
+        self._fsync_directory()
+
+        # Older segments and snapshots are fully covered by the new snapshot
+        for path in self._segments():
+            if _lsn_of(path) < lsn:
+                path.unlink(missing_ok=True)
+        for path in self.directory.glob(f"{_SNAPSHOT_PREFIX}*.pkl"):
+            if _lsn_of(path) < lsn:
+                path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """Flush and close the log"""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        with self._lock:
+            self._sync_locked()
+            self._close_segment()
+        self._stop.clear()
+
+    # === Internals ===
+    def _segments(self) -> list[Path]:
+        return sorted(self.directory.glob(f"{_SEGMENT_PREFIX}*.log"), key=_lsn_of)
+
+    def _open_segment(self, lsn: int) -> int:
+        path = self.directory / f"{_SEGMENT_PREFIX}{lsn:020d}.log"
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        return self._fd
+
+    def _close_segment(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _sync_locked(self) -> None:
+        if self._fd is not None and self._dirty:
+            os.fsync(self._fd)
+        self._dirty = False
+
+    def _fsync_directory(self) -> None:
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:  # pragma: no cover - directories cannot be opened on Windows
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _start_flusher(self) -> None:
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="wal-flusher", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        """Group commit: one fsync covers every append made since the previous one"""
+        while not self._stop.wait(self.fsync_interval):
+            with self._lock:
+                self._sync_locked()
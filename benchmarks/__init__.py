@@ -0,0 +1 @@
+"""Benchmarks Module - Performance scripts, run with ``python -m benchmarks.<name>``"""
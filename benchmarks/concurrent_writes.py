@@ -0,0 +1,119 @@
+"""
+Concurrent Write Benchmark
+
+Runs PATCH-equivalent ShipmentService updates from 1..N threads, each
+thread writing its own shipment or all of them the same one, and reports
+throughput. Latency (sleeping outside the GIL, like a disk or network round
+trip) can be injected at two points of every update:
+
+- ``--read-latency-ms``: into every shipment read (an update reads the
+  shipment it validates, then again for its response body), made under the
+  shipment's striped lock only. Updates of different shipments overlap here,
+  updates of one shipment are serialized.
+- ``--write-latency-ms``: into the repository write itself, where a write's
+  real I/O happens (the WAL append under the in-memory repository's lock, the
+  SQLite write transaction). Every write is serialized here, whichever
+  shipment it is for, so this part does not scale with threads.
+
+With --stripes 1 every update shares one lock, which is the global-lock
+baseline.
+
+Usage:
+    python -m benchmarks.concurrent_writes --threads 1,2,4,8 --writes 200 --read-latency-ms 2 --write-latency-ms 1
+"""
+
+import argparse
+import threading
+import time
+from contextlib import contextmanager
+
+from app.api.schemas.shipment import ShipmentUpdate
+from app.core.locks import StripedLock, set_shipment_locks
+from app.services.shipment import ShipmentService, initialize_sample_data
+from app.storage import get_shipment_repository
+from benchmarks.storage_backends import make_order
+
+
+def run(threads: int, writes: int, shipment_ids: list[int]) -> float:
+    """Writes per second of threads threads doing writes updates each, thread i on shipment_ids[i]"""
+    barrier = threading.Barrier(threads + 1)
+    update = ShipmentUpdate(destination_code=12345)
+
+    def worker(shipment_id: int) -> None:
+        barrier.wait()
+        for _ in range(writes):
+            ShipmentService.update_shipment(shipment_id, update)
+
+    workers = [threading.Thread(target=worker, args=(shipment_ids[i],)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return threads * writes / (time.perf_counter() - start)
+
+
+def add_latency(repository, read_latency: float, write_latency: float) -> None:
+    """Sleep read_latency in every shipment read and write_latency inside every repository write"""
+    if read_latency:
+        get = repository.get
+
+        def slow_get(*call_args, **call_kwargs):
+            time.sleep(read_latency)
+            return get(*call_args, **call_kwargs)
+
+        repository.get = slow_get
+
+    if not write_latency:
+        return
+    if hasattr(repository, "_log"):
+        # In-memory repository: every mutation is logged while its lock is held
+        log = repository._log
+
+        def slow_log(record):
+            time.sleep(write_latency)
+            log(record)
+
+        repository._log = slow_log
+    else:
+        transaction = repository.transaction
+
+        @contextmanager
+        def slow_transaction():
+            with transaction() as conn:
+                time.sleep(write_latency)
+                yield conn
+
+        repository.transaction = slow_transaction
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", default="1,2,4,8", help="Comma-separated thread counts")
+    parser.add_argument("--writes", type=int, default=200, help="Updates per thread")
+    parser.add_argument("--read-latency-ms", type=float, default=2.0, help="Latency of the read each update validates")
+    parser.add_argument("--write-latency-ms", type=float, default=0.0, help="Latency inside the repository write")
+    parser.add_argument("--stripes", type=int, default=1024, help="Lock stripes (1 = one global lock)")
+    args = parser.parse_args()
+    counts = [int(count) for count in args.threads.split(",")]
+
+    initialize_sample_data()
+    set_shipment_locks(StripedLock(args.stripes))
+    repository = get_shipment_repository()
+    ids = [ShipmentService.create_shipment(make_order(i))["id"] for i in range(max(counts))]
+    add_latency(repository, args.read_latency_ms / 1000, args.write_latency_ms / 1000)
+
+    print(
+        f"{args.writes} updates per thread, {args.read_latency_ms} ms read + {args.write_latency_ms} ms write "
+        f"latency per update, {args.stripes} lock stripes\n"
+    )
+    print(f"{'threads':>7}  {'different shipments':>20}  {'same shipment':>14}")
+    for count in counts:
+        different = run(count, args.writes, ids)
+        same = run(count, args.writes, [ids[0]] * count)
+        print(f"{count:>7}  {different:>16.0f}/s  {same:>10.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Date Range Query Benchmark
+
+Fills the in-memory repository with shipments created over 30 days, then
+measures ShipmentService.get_shipments_page with created/updated ranges,
+alone and combined with a status filter, in both directions, against a
+full-scan baseline. Also reports the cost of a tracking event write, which
+moves the shipment in the updated_at index.
+
+Usage:
+    python -m benchmarks.date_ranges --shipments 1000000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from app.models.shipment import ShipmentOrder, ShipmentStatus, SortDirection
+from app.services.shipment import ShipmentService
+from app.storage import get_shipment_repository
+from app.storage.records import TrackingEventRecord
+
+STATUSES = [status.value for status in ShipmentStatus]
+START = datetime(2024, 12, 1)
+DAYS = 30
+
+
+def populate(size: int) -> None:
+    """Fill the repository with size shipments created evenly over DAYS days, updated an hour later"""
+    package_details = {"content": "bench", "weight": 1.0, "dimensions": None, "fragile": False}
+    recipient = {"name": "Bench", "email": "bench@example.com", "phone": "0", "address": "Bench"}
+    seller = {"name": "Bench", "email": "bench@example.com", "phone": "0"}
+    step = timedelta(days=DAYS) / size
+
+    shipments = {}
+    for offset in range(size):
+        created_at = START + offset * step
+        shipments[10000 + offset] = {
+            "package_details": package_details,
+            "recipient": recipient,
+            "seller": seller,
+            "destination_code": 20000 + offset % 500,
+            "current_status": STATUSES[offset % len(STATUSES)],
+            "tracking_events": [],
+            "created_at": created_at,
+            "updated_at": created_at + timedelta(hours=1),
+        }
+    get_shipment_repository().load(shipments)
+
+
+def full_scan(limit: int, status=None, created_from=None, created_to=None, updated_since=None) -> list[int]:
+    """Baseline: filter every row, then sort the matches by creation time"""
+    matches = [
+        (shipment.created_at, shipment_id)
+        for shipment_id, shipment in get_shipment_repository().shipments.items()
+        if (status is None or shipment.current_status == status.value)
+        and (created_from is None or shipment.created_at >= created_from)
+        and (created_to is None or shipment.created_at < created_to)
+        and (updated_since is None or shipment.updated_at >= updated_since)
+    ]
+    return [shipment_id for _, shipment_id in sorted(matches)[:limit]]
+
+
+def timed(func, repeat: int) -> float:
+    """Average wall time of func in microseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shipments", type=int, default=1000000, help="Shipments in the table")
+    parser.add_argument("--repeat", type=int, default=50, help="Iterations per measurement")
+    parser.add_argument("--limit", type=int, default=100, help="Page size")
+    args = parser.parse_args()
+
+    populate(args.shipments)
+    yesterday = START + timedelta(days=DAYS - 2)
+    last_hour = START + timedelta(days=DAYS)
+    queries = {
+        "created yesterday": {"created_from": yesterday, "created_to": yesterday + timedelta(days=1)},
+        "+ delivered, newest first": {
+            "created_from": yesterday,
+            "created_to": yesterday + timedelta(days=1),
+            "status_filter": ShipmentStatus.delivered,
+            "order_by": ShipmentOrder.created_at,
+            "sort": SortDirection.desc,
+        },
+        "updated in last hour": {
+            "updated_since": last_hour,
+            "order_by": ShipmentOrder.updated_at,
+            "sort": SortDirection.desc,
+        },
+        "+ in_transit, by ID": {"updated_since": last_hour, "status_filter": ShipmentStatus.in_transit},
+    }
+
+    print(f"{args.shipments} shipments over {DAYS} days, pages of {args.limit}")
+    print(f"{'query':<28} {'indexed (us)':>14} {'full scan (us)':>16}")
+    for label, params in queries.items():
+        indexed = timed(
+            lambda params=params: ShipmentService.get_shipments_page(limit=args.limit, **params), args.repeat
+        )
+        scan_params = {key: value for key, value in params.items() if key not in ("order_by", "sort")}
+        scan_params["status"] = scan_params.pop("status_filter", None)
+        scan = timed(lambda scan_params=scan_params: full_scan(args.limit, **scan_params), max(1, args.repeat // 25))
+        print(f"{label:<28} {indexed:>14.1f} {scan:>16.1f}")
+
+    repository = get_shipment_repository()
+    shipment_ids = list(repository.shipments)[:: max(1, args.shipments // 1000)]
+    now = datetime.now()
+    start = time.perf_counter()
+    for shipment_id in shipment_ids:
+        event = TrackingEventRecord(None, "Bench", "Bench", repository.shipments[shipment_id].status_code, now)
+        repository.add_event(shipment_id, event, now)
+    write = (time.perf_counter() - start) / len(shipment_ids) * 1e6
+    print(f"tracking event write (moves the updated_at key): {write:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
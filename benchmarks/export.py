@@ -0,0 +1,66 @@
+"""
+Shipment Export Benchmark
+
+Streams the whole table through ExportService and reports throughput and
+the peak memory allocated while exporting, which should stay flat as the
+table grows.
+
+Usage:
+    python -m benchmarks.export --sizes 10000,100000,1000000
+"""
+
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+
+from app.models.shipment import ExportFormat
+from app.services.export import ExportService
+from app.storage import get_shipment_repository
+
+
+def populate(size: int) -> None:
+    """Fill the repository with size shipments carrying one tracking event each"""
+    now = datetime.now()
+    shipments = {}
+    for offset in range(size):
+        shipments[10000 + offset] = {
+            "package_details": {"content": f"item {offset}", "weight": 1.5, "dimensions": None, "fragile": False},
+            "recipient": {"name": f"Recipient {offset}", "email": "r@example.com", "phone": "0", "address": "Jakarta"},
+            "seller": {"name": "Bench Store", "email": "store@example.com", "phone": "021"},
+            "destination_code": 11000 + offset % 100,
+            "current_status": "placed",
+            "tracking_events": [
+                {"id": offset, "location": "Warehouse", "description": "Created", "status": "placed", "timestamp": now}
+            ],
+            "created_at": now,
+            "updated_at": now,
+        }
+    get_shipment_repository().load(shipments)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma separated table sizes")
+    args = parser.parse_args()
+
+    print(f"{'shipments':>10} {'format':>7} {'rows/s':>10} {'MB out':>8} {'peak KB':>8}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        populate(size)
+        for export_format in ExportFormat:
+            written = 0
+            tracemalloc.start()
+            start = time.perf_counter()
+            for chunk in ExportService.export_shipments(export_format):
+                written += len(chunk)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(
+                f"{size:>10} {export_format.value:>7} {size / elapsed:>10.0f} "
+                f"{written / 1e6:>8.1f} {peak / 1024:>8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Live Tracking Fan-out Benchmark
+
+Subscribes many concurrent consumers to the tracking hub on one event loop
+(one worker), spread over a number of shipments, then publishes tracking
+events at a fixed rate and reports publish-to-receive latency, fan-out
+throughput and memory per subscription. Each consumer runs the same receive
+loop as the SSE/WebSocket endpoints minus the socket write, so the numbers
+are the hub's share of the cost.
+
+With ``--shipments 1`` every subscriber watches the same shipment, the worst
+case for fan-out.
+
+Usage:
+    python -m benchmarks.live_fanout --subscribers 10000 --shipments 100 --messages 200
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import time
+import tracemalloc
+
+from app.core.tracking_hub import SubscriptionClosed, TrackingHub
+
+
+async def consume(subscription, shipment_id: int, published: dict[int, list[float]], latencies: list[float]) -> None:
+    """Receive until closed, recording how long after publishing each message arrived"""
+    received = 0
+    try:
+        while True:
+            message = await subscription.receive(timeout=15.0)
+            if message is None:
+                continue
+            if message.startswith('{"type": "lagged"'):
+                received += json.loads(message)["dropped"]
+                continue
+            latencies.append(time.perf_counter() - published[shipment_id][received])
+            received += 1
+    except SubscriptionClosed:
+        pass
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * fraction) - 1)]
+
+
+async def run(subscribers: int, shipments: int, messages: int, interval: float, queue_size: int) -> None:
+    hub = TrackingHub(queue_size=queue_size, max_shipments=1)
+    published: dict[int, list[float]] = {shipment_id: [] for shipment_id in range(shipments)}
+    latencies: list[float] = []
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    consumers = []
+    for n in range(subscribers):
+        shipment_id = n % shipments
+        subscription = hub.subscribe([shipment_id])
+        consumers.append(asyncio.create_task(consume(subscription, shipment_id, published, latencies)))
+    # Let every consumer reach its first receive
+    await asyncio.sleep(0)
+    subscribe_seconds = time.perf_counter() - start
+    per_subscription = (tracemalloc.get_traced_memory()[0] - before) / subscribers
+    tracemalloc.stop()
+
+    print(f"{subscribers} subscribers over {shipments} shipments, queue of {queue_size}")
+    print(f"subscribe: {subscribe_seconds * 1e3:.0f} ms total, {per_subscription / 1024:.1f} KiB per subscription")
+
+    start = time.perf_counter()
+    for n in range(messages):
+        due = start + n * interval
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        shipment_id = n % shipments
+        published[shipment_id].append(time.perf_counter())
+        hub.publish(shipment_id, {"type": "tracking_event", "event": {"id": n, "status": "in_transit"}})
+    expected = sum(len(published[n % shipments]) for n in range(subscribers))
+    while len(latencies) + hub.stats()["dropped"] < expected:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    hub.close_all()
+    await asyncio.gather(*consumers)
+    stats = hub.stats()
+    print(
+        f"published {stats['published']} messages, delivered {stats['delivered']} "
+        f"({stats['delivered'] / elapsed:,.0f}/s), dropped {stats['dropped']}"
+    )
+    if latencies:
+        print(
+            f"latency (ms): p50 {statistics.median(latencies) * 1e3:.2f}  "
+            f"p99 {percentile(latencies, 0.99) * 1e3:.2f}  max {max(latencies) * 1e3:.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=10000, help="Concurrent subscriptions")
+    parser.add_argument("--shipments", type=int, default=100, help="Shipments the subscribers are spread over")
+    parser.add_argument("--messages", type=int, default=200, help="Tracking events published")
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="Gap between published events")
+    parser.add_argument("--queue-size", type=int, default=100, help="Messages buffered per subscription")
+    args = parser.parse_args()
+    asyncio.run(run(args.subscribers, args.shipments, args.messages, args.interval_ms / 1e3, args.queue_size))
+
+
+if __name__ == "__main__":
+    main()
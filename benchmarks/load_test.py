@@ -0,0 +1,449 @@
+"""
+End-to-End Load Test
+
+Seeds a synthetic dataset through ShipmentService (shipments spread over
+every status, with tracking histories of hub scans leading up to it) and
+drives ``app.main:app`` with a mixed workload:
+
+- ``list``: GET /shipments filtered by a random status, 50 per page
+- ``get``: GET /shipment/{id} of a random shipment
+- ``track``: POST /shipment/{id}/tracking, a hub scan of an in-transit shipment
+- ``stats``: GET /stats
+- ``login``: POST /auth/login as the courier (bcrypt on the hashing pool),
+  sent by ``--login-clients`` clients of their own so a closed-loop client
+  is not held up for the length of a bcrypt queue
+
+The workload runs twice: over an in-process ASGI transport (httpx, no
+sockets; measures the application alone) and over a real uvicorn server on a
+local port, driven by keep-alive clients in separate processes. Both serve
+the seeded data directly, so the application's lifespan is not run.
+
+Seeding goes through the same service calls as the API (bulk create, then
+tracking batches), at roughly 2-3k shipments per second with their histories
+on one core, so 1M shipments take several minutes.
+
+Reports requests per second and p50/p95/p99 latency per endpoint and writes
+them as JSON (with the git commit) so runs can be compared across commits;
+``--compare`` prints the change against an earlier result file.
+
+Usage:
+    python -m benchmarks.load_test --shipments 10000 --seconds 10 --concurrency 16
+    python -m benchmarks.load_test --shipments 1000000 --transports uvicorn --compare old.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from app.config import PROJECT_DIR, settings
+from benchmarks.workers import free_port, request
+
+# Final status of the seeded shipments, and the scans that lead there after "placed"
+STATUS_MIX = {
+    "placed": 0.15,
+    "in_transit": 0.35,
+    "out_for_delivery": 0.15,
+    "delivered": 0.28,
+    "returned": 0.04,
+    "cancelled": 0.03,
+}
+ROUTES = {
+    "placed": [],
+    "in_transit": ["in_transit"],
+    "out_for_delivery": ["in_transit", "out_for_delivery"],
+    "delivered": ["in_transit", "out_for_delivery", "delivered"],
+    "returned": ["in_transit", "returned"],
+    "cancelled": ["cancelled"],
+}
+HUBS = ["Jakarta Hub", "Bandung Hub", "Semarang Hub", "Surabaya Hub", "Medan Hub", "Makassar Hub", "Denpasar Hub"]
+DEFAULT_MIX = "get=55,list=20,track=15,stats=10"
+LOGIN_MIX = {"login": 1.0}
+COURIER_LOGIN = {"username": "courier", "password": "courier123"}
+
+
+def seed(shipments: int, seed_value: int = 42) -> dict:
+    """
+    Replace the shipments with a synthetic dataset created through ShipmentService
+
+    Returns:
+        {"ids": every shipment ID, "in_transit": IDs of in-transit shipments, "events": tracking events}
+    """
+    from app.services.shipment import ShipmentService
+    from app.storage import get_shipment_repository
+
+    rng = random.Random(seed_value)
+    get_shipment_repository().load({})
+    ids = []
+    for start in range(0, shipments, settings.BULK_MAX_ITEMS):
+        orders = [_order(rng, offset) for offset in range(start, min(shipments, start + settings.BULK_MAX_ITEMS))]
+        ids.extend(result["id"] for result in ShipmentService.create_shipments_bulk(orders)["results"])
+
+    statuses, weights = list(STATUS_MIX), list(STATUS_MIX.values())
+    in_transit = []
+    scans = []
+    events = len(ids)
+    now = datetime.now()
+    for shipment_id in ids:
+        status = rng.choices(statuses, weights)[0]
+        route = list(ROUTES[status])
+        if status == "in_transit":
+            in_transit.append(shipment_id)
+        if route[:1] == ["in_transit"]:
+            # Hub-to-hub legs before the shipment moved on
+            route[1:1] = ["in_transit"] * rng.randrange(4)
+        if len(scans) + len(route) > settings.TRACKING_BATCH_MAX_ITEMS:
+            events += ShipmentService.add_tracking_events_batch(scans)["accepted"]
+            scans = []
+        timestamp = now - timedelta(days=rng.uniform(1, 30))
+        for scan_status in route:
+            timestamp += timedelta(hours=rng.uniform(1, 12))
+            scans.append(
+                {
+                    "shipment_id": shipment_id,
+                    "location": rng.choice(HUBS),
+                    "description": f"Scan: {scan_status.replace('_', ' ')}",
+                    "status": scan_status,
+                    "timestamp": timestamp,
+                }
+            )
+    if scans:
+        events += ShipmentService.add_tracking_events_batch(scans)["accepted"]
+    return {"ids": ids, "in_transit": in_transit, "events": events}
+
+
+def _order(rng: random.Random, offset: int) -> dict:
+    return {
+        "package_details": {
+            "content": rng.choice(["documents", "electronics", "clothing", "spare parts", "books"]),
+            "weight": round(rng.uniform(0.2, 25.0), 1),
+            "dimensions": rng.choice(["20x15x5", "40x30x20", "60x40x40"]),
+            "fragile": rng.random() < 0.2,
+        },
+        "recipient": {
+            "name": f"Recipient {offset}",
+            "email": f"recipient{offset}@example.com",
+            "phone": f"0812{offset:08d}",
+            "address": f"Jl. Merdeka No. {offset % 500 + 1}, {rng.choice(HUBS).removesuffix(' Hub')}",
+        },
+        "seller": {"name": f"Store {offset % 200}", "email": f"store{offset % 200}@example.com", "phone": "021555000"},
+        "destination_code": 11000 + rng.randrange(500),
+    }
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """Parse "get=50,list=20,..." into endpoint -> weight"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("login", "list", "get", "track", "stats"):
+            raise SystemExit(f"Unknown endpoint in --mix: {name}")
+        weights[name] = float(weight)
+    return weights
+
+
+def next_request(rng: random.Random, mix: dict[str, float], dataset: dict) -> tuple[str, str, str, Optional[dict]]:
+    """Pick the next request: (endpoint, method, path, JSON body)"""
+    endpoint = rng.choices(list(mix), list(mix.values()))[0]
+    if endpoint == "login":
+        return endpoint, "POST", "/auth/login", COURIER_LOGIN
+    if endpoint == "list":
+        return endpoint, "GET", f"/shipments?status={rng.choice(list(STATUS_MIX))}&limit=50", None
+    if endpoint == "get":
+        return endpoint, "GET", f"/shipment/{rng.choice(dataset['ids'])}", None
+    if endpoint == "track":
+        scan = {"location": rng.choice(HUBS), "description": "Scan: in transit", "status": "in_transit"}
+        return endpoint, "POST", f"/shipment/{rng.choice(dataset['in_transit'])}/tracking", scan
+    return endpoint, "GET", "/stats", None
+
+
+def _record(results: dict, endpoint: str, status: int, latency: float) -> None:
+    entry = results.setdefault(endpoint, {"latencies": [], "errors": {}})
+    if 200 <= status < 300:
+        entry["latencies"].append(latency)
+    else:
+        entry["errors"][str(status)] = entry["errors"].get(str(status), 0) + 1
+
+
+async def _drive_asgi(mix: dict, dataset: dict, token: str, concurrency: int, logins: int, seconds: float) -> dict:
+    import httpx
+
+    from app.main import app
+
+    results: dict = {}
+    headers = {"Authorization": f"Bearer {token}"}
+    deadline = time.perf_counter() + seconds
+
+    async def client_loop(http: httpx.AsyncClient, seed_value: int, client_mix: dict) -> None:
+        rng = random.Random(seed_value)
+        while (start := time.perf_counter()) < deadline:
+            endpoint, method, path, body = next_request(rng, client_mix, dataset)
+            response = await http.request(method, path, json=body, headers=headers)
+            _record(results, endpoint, response.status_code, time.perf_counter() - start)
+            # The in-process transport only suspends on real awaits; let the other clients in
+            await asyncio.sleep(0)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        await asyncio.gather(
+            *(client_loop(http, i, mix) for i in range(concurrency)),
+            *(client_loop(http, concurrency + i, LOGIN_MIX) for i in range(logins)),
+        )
+    return results
+
+
+def run_asgi(mix: dict, dataset: dict, token: str, concurrency: int, logins: int, seconds: float) -> dict:
+    """Drive the app over the in-process ASGI transport with concurrency + logins concurrent clients"""
+    return asyncio.run(_drive_asgi(mix, dataset, token, concurrency, logins, seconds))
+
+
+def drive_http(
+    port: int, mix: dict, dataset: dict, token: str, connections: int, logins: int, seconds: float, seed_value: int
+) -> dict:
+    """Client process: connections + logins keep-alive connections for seconds; returns per-endpoint results"""
+    import http.client
+
+    results: dict = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(client_seed: int, client_mix: dict) -> None:
+        rng = random.Random(client_seed)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        local: dict = {}
+        while (start := time.perf_counter()) < deadline:
+            endpoint, method, path, body = next_request(rng, client_mix, dataset)
+            status, _ = request(conn, method, path, body, "" if endpoint == "login" else token)
+            _record(local, endpoint, status, time.perf_counter() - start)
+        conn.close()
+        with lock:
+            _merge(results, local)
+
+    threads = [
+        threading.Thread(target=client, args=(seed_value * 1000 + i, mix if i < connections else LOGIN_MIX))
+        for i in range(connections + logins)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run_uvicorn(
+    pool: ProcessPoolExecutor,
+    processes: int,
+    mix: dict,
+    dataset: dict,
+    token: str,
+    connections: int,
+    logins: int,
+    seconds: float,
+) -> dict:
+    """Serve the app with uvicorn on a local port and drive it from processes client processes"""
+    import uvicorn
+
+    from app.main import app
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        per_process = [connections // processes + (i < connections % processes) for i in range(processes)]
+        futures = [
+            pool.submit(drive_http, port, mix, dataset, token, count, logins if i == 0 else 0, seconds, i)
+            for i, count in enumerate(per_process)
+            if count or i == 0
+        ]
+        results: dict = {}
+        for future in futures:
+            _merge(results, future.result())
+        return results
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def _merge(results: dict, other: dict) -> None:
+    for endpoint, entry in other.items():
+        _add(results.setdefault(endpoint, {"latencies": [], "errors": {}}), entry)
+
+
+def _add(entry: dict, other: dict) -> None:
+    entry["latencies"].extend(other["latencies"])
+    for status, count in other["errors"].items():
+        entry["errors"][status] = entry["errors"].get(status, 0) + count
+
+
+def summarize(results: dict, seconds: float) -> dict:
+    """Per endpoint and in total: requests, errors, requests/s and p50/p95/p99 in milliseconds"""
+    summary = {}
+    everything = {"latencies": [], "errors": {}}
+    for endpoint in sorted(results):
+        _add(everything, results[endpoint])
+        summary[endpoint] = _summary(results[endpoint], seconds)
+    summary["total"] = _summary(everything, seconds)
+    return summary
+
+
+def _summary(entry: dict, seconds: float) -> dict:
+    latencies = sorted(entry["latencies"])
+
+    def percentile(q: float) -> Optional[float]:
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 3)
+
+    return {
+        "requests": len(latencies),
+        "errors": entry["errors"],
+        "rps": round(len(latencies) / seconds, 1),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def print_summary(transport: str, summary: dict, baseline: Optional[dict]) -> None:
+    print(f"\n{transport}")
+    print(f"{'endpoint':<9} {'requests/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  errors")
+    for endpoint, row in summary.items():
+        line = (
+            f"{endpoint:<9} {row['rps']:>10.1f} {_ms(row['p50_ms'])} {_ms(row['p95_ms'])} {_ms(row['p99_ms'])}  "
+            f"{sum(row['errors'].values()) or '-'}"
+        )
+        old = (baseline or {}).get(endpoint)
+        if old and old["rps"]:
+            line += f"  (rps {_change(row['rps'], old['rps'])}, p99 {_change(row['p99_ms'], old['p99_ms'])})"
+        print(line)
+
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value:>8.2f}" if value is not None else f"{'-':>8}"
+
+
+def _change(new: Optional[float], old: Optional[float]) -> str:
+    if not new or not old:
+        return "n/a"
+    return f"{(new - old) / old:+.0%}"
+
+
+def git_commit() -> Optional[str]:
+    """Commit of the working tree, with "-dirty" if it has uncommitted changes"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_DIR, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shipments", type=int, default=10000, help="Synthetic shipments to seed (10k-1M)")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory", help="Storage backend")
+    parser.add_argument("--transports", default="asgi,uvicorn", help="Comma-separated: asgi, uvicorn")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Endpoint weights")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Measured duration per transport")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients / keep-alive connections")
+    parser.add_argument("--login-clients", type=int, default=1, help="Extra clients that only log in")
+    parser.add_argument("--client-processes", type=int, default=min(4, os.cpu_count() or 1), help="uvicorn load")
+    parser.add_argument("--output", type=Path, help="Result file (default: benchmarks/results/load_test-*.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier result file to compare against")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+    transports = args.transports.split(",")
+
+    # Client processes are spawned before the dataset exists so they do not copy it
+    pool = ProcessPoolExecutor(args.client_processes, mp_context=multiprocessing.get_context("spawn"))
+    if "uvicorn" in transports:
+        for future in [pool.submit(time.sleep, 0) for _ in range(args.client_processes)]:
+            future.result()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        settings.STORAGE_BACKEND = args.backend
+        settings.DATA_DIR = Path(data_dir)
+        settings.PERSISTENCE_ENABLED = False
+        from app.core.security import create_access_token
+        from app.services.shipment import shutdown_storage
+
+        start = time.perf_counter()
+        dataset = seed(args.shipments)
+        seed_seconds = time.perf_counter() - start
+        print(
+            f"Seeded {len(dataset['ids'])} shipments with {dataset['events']} tracking events "
+            f"({args.backend}) in {seed_seconds:.1f}s; {args.concurrency} clients, {args.seconds:g}s per transport"
+        )
+        token = create_access_token({"sub": "admin", "role": "admin"})
+        workload = {"ids": dataset["ids"], "in_transit": dataset["in_transit"]}
+
+        baseline = json.loads(args.compare.read_text())["transports"] if args.compare else {}
+        summaries = {}
+        for transport in transports:
+            if transport == "asgi":
+                results = run_asgi(mix, workload, token, args.concurrency, args.login_clients, args.seconds)
+            elif transport == "uvicorn":
+                results = run_uvicorn(
+                    pool,
+                    args.client_processes,
+                    mix,
+                    workload,
+                    token,
+                    args.concurrency,
+                    args.login_clients,
+                    args.seconds,
+                )
+            else:
+                raise SystemExit(f"Unknown transport: {transport}")
+            summaries[transport] = summarize(results, args.seconds)
+            print_summary(transport, summaries[transport], baseline.get(transport))
+        shutdown_storage()
+    pool.shutdown()
+
+    commit = git_commit()
+    output = args.output or PROJECT_DIR / "benchmarks" / "results" / f"load_test-{commit or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parameters": {
+            "shipments": args.shipments,
+            "events": dataset["events"],
+            "backend": args.backend,
+            "mix": mix,
+            "seconds": args.seconds,
+            "concurrency": args.concurrency,
+            "login_clients": args.login_clients,
+            "client_processes": args.client_processes,
+            "seed_seconds": round(seed_seconds, 2),
+        },
+        "transports": summaries,
+    }
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Login Storm Benchmark
+
+Measures GET /shipment/{id} latency on its own and while a storm of
+concurrent logins is running against the same event loop, once with bcrypt
+on the bounded hashing pool and once with bcrypt run inline (the old
+behaviour). With the pool, read p99 should stay close to the baseline and
+excess logins are shed with 503s.
+
+Usage:
+    python -m benchmarks.login_storm --duration 3 --logins 16
+"""
+
+import argparse
+import asyncio
+import itertools
+import math
+import statistics
+import time
+from typing import Optional
+
+import httpx
+
+from app.core.hashing import PasswordHashPool, get_password_hash_pool, set_password_hash_pool
+from app.main import app
+
+
+class InlineHashPool:
+    """Stand-in pool that hashes on the event loop"""
+
+    async def run(self, func, *args):
+        return func(*args)
+
+
+async def read_latencies(client: httpx.AsyncClient, headers: dict, duration: float, interval: float) -> list[float]:
+    """
+    Latency of shipment reads issued on a fixed schedule for duration seconds, in milliseconds
+
+    Latency is measured from when each read was due rather than when it was
+    sent, so time the event loop spends blocked counts against the read.
+    """
+    latencies = []
+    start = time.perf_counter()
+    end = start + duration
+    for index in itertools.count():
+        due = start + index * interval
+        if due >= end or time.perf_counter() >= end:
+            break
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        response = await client.get("/shipment/12701", headers=headers)
+        latencies.append((time.perf_counter() - due) * 1e3)
+        assert response.status_code == 200
+    return latencies
+
+
+async def login_loop(client: httpx.AsyncClient, stop: asyncio.Event, outcomes: dict) -> None:
+    """Log in repeatedly until stop is set, counting responses per status code"""
+    while not stop.is_set():
+        response = await client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+        outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+        # The in-process transport never suspends on its own; stand in for network I/O,
+        # and back off after a 503 the way a client honouring Retry-After would
+        await asyncio.sleep(0.05 if response.status_code == 503 else 0)
+
+
+def p99(latencies: list[float]) -> float:
+    ordered = sorted(latencies)
+    return ordered[max(0, math.ceil(len(ordered) * 0.99) - 1)]
+
+
+async def run(duration: float, interval: float, logins: int, workers: Optional[int], queue_size: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        baseline = await read_latencies(client, headers, duration, interval)
+        print(f"{'mode':<10} {'reads':>6} {'p50 (ms)':>9} {'p99 (ms)':>9} {'logins ok':>10} {'503s':>6}")
+        print(
+            f"{'baseline':<10} {len(baseline):>6} {statistics.median(baseline):>9.2f} {p99(baseline):>9.2f} "
+            f"{'-':>10} {'-':>6}"
+        )
+
+        for mode, pool in (
+            ("inline", InlineHashPool()),
+            ("pool", PasswordHashPool(workers, queue_size) if workers else get_password_hash_pool()),
+        ):
+            set_password_hash_pool(pool)
+            if isinstance(pool, PasswordHashPool):
+                print(f"# pool: {pool.workers} workers, queue of {pool.queue_size}")
+            stop, outcomes = asyncio.Event(), {}
+            storm = [asyncio.create_task(login_loop(client, stop, outcomes)) for _ in range(logins)]
+            latencies = await read_latencies(client, headers, duration, interval)
+            stop.set()
+            await asyncio.gather(*storm)
+            print(
+                f"{mode:<10} {len(latencies):>6} {statistics.median(latencies):>9.2f} {p99(latencies):>9.2f} "
+                f"{outcomes.get(200, 0):>10} {outcomes.get(503, 0):>6}"
+            )
+            if isinstance(pool, PasswordHashPool):
+                pool.shutdown()
+        set_password_hash_pool(None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds of reads measured per mode")
+    parser.add_argument("--interval-ms", type=float, default=10.0, help="Gap between scheduled reads")
+    parser.add_argument("--logins", type=int, default=16, help="Concurrent login loops in the storm")
+    parser.add_argument("--workers", type=int, help="Hashing pool threads (default: from settings)")
+    parser.add_argument("--queue-size", type=int, default=8, help="Hashing pool queue bound, used with --workers")
+    args = parser.parse_args()
+    asyncio.run(run(args.duration, args.interval_ms / 1e3, args.logins, args.workers, args.queue_size))
+
+
+if __name__ == "__main__":
+    main()
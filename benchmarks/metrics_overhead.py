@@ -0,0 +1,102 @@
+"""
+Metrics Overhead Benchmark
+
+Measures what recording costs per request: a single histogram observation,
+a call through the ``timed`` service decorator compared to a plain call, and
+a request through MetricsMiddleware compared to the bare ASGI app (called
+directly, so the numbers are the middleware's own cost). Also records from
+several threads at once to show observations do not contend.
+
+Usage:
+    python -m benchmarks.metrics_overhead --iterations 200000 --threads 4
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+
+from app.core.metrics import HTTP_REQUEST_DURATION, MetricsMiddleware, timed
+
+
+def per_call_us(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def middleware_us(iterations: int) -> tuple[float, float]:
+    """Microseconds per request for the bare app and the app behind MetricsMiddleware"""
+
+    class Route:
+        path = "/shipment/{shipment_id}"
+
+    async def app(scope, receive, send):
+        scope["route"] = Route
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    async def drive(asgi_app) -> float:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await asgi_app({"type": "http", "method": "GET", "path": "/shipment/1"}, receive, send)
+        return (time.perf_counter() - start) / iterations * 1e6
+
+    return asyncio.run(drive(app)), asyncio.run(drive(MetricsMiddleware(app)))
+
+
+def threaded_observations(threads: int, iterations: int) -> float:
+    """Observations per second with threads threads recording the same series"""
+    barrier = threading.Barrier(threads + 1)
+    labels = ("GET", "/bench", "200")
+
+    def worker() -> None:
+        barrier.wait()
+        for _ in range(iterations):
+            HTTP_REQUEST_DURATION.observe(labels, 0.001)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return threads * iterations / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200000, help="Calls per measurement")
+    parser.add_argument("--threads", type=int, default=4, help="Threads recording concurrently")
+    args = parser.parse_args()
+
+    labels = ("GET", "/bench", "200")
+    observe = per_call_us(lambda: HTTP_REQUEST_DURATION.observe(labels, 0.0042), args.iterations)
+
+    def plain() -> None:
+        pass
+
+    plain_call = per_call_us(plain, args.iterations)
+    timed_call = per_call_us(timed("bench.noop")(plain), args.iterations)
+    bare, measured = middleware_us(args.iterations // 4)
+
+    print(f"histogram observe        {observe:6.2f} µs")
+    print(
+        f"timed() decorator        {timed_call - plain_call:6.2f} µs  ({plain_call:.2f} -> {timed_call:.2f} µs per call)"
+    )
+    print(f"MetricsMiddleware        {measured - bare:6.2f} µs  ({bare:.2f} -> {measured:.2f} µs per request)")
+    single = threaded_observations(1, args.iterations)
+    many = threaded_observations(args.threads, args.iterations)
+    print(f"observations/s           {single:,.0f} on 1 thread, {many:,.0f} on {args.threads} threads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Cursor Pagination Benchmark
+
+Pages through a large table with ShipmentService.get_shipments_page and
+reports the latency of the first page against pages deep into the table,
+for both orders and with a status filter.
+
+Usage:
+    python -m benchmarks.pagination --shipments 1000000 --pages 200
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from app.models.shipment import ShipmentOrder, ShipmentStatus
+from app.services.shipment import ShipmentService
+from app.storage import get_shipment_repository
+
+STATUSES = [status.value for status in ShipmentStatus]
+
+
+def populate(size: int) -> None:
+    """Fill the repository with size shipments spread over every status"""
+    package_details = {"content": "bench", "weight": 1.0, "dimensions": None, "fragile": False}
+    recipient = {"name": "Bench", "email": "bench@example.com", "phone": "0", "address": "Bench"}
+    seller = {"name": "Bench", "email": "bench@example.com", "phone": "0"}
+    start = datetime(2024, 1, 1)
+
+    shipments = {}
+    for offset in range(size):
+        shipments[10000 + offset] = {
+            "package_details": package_details,
+            "recipient": recipient,
+            "seller": seller,
+            "destination_code": 20000 + offset % 500,
+            "current_status": STATUSES[offset % 3],
+            "tracking_events": [],
+            "created_at": start + timedelta(seconds=offset),
+            "updated_at": start,
+        }
+    get_shipment_repository().load(shipments)
+
+
+def walk(pages: int, limit: int, **filters) -> list[float]:
+    """Latency of each consecutive page in microseconds"""
+    latencies, cursor = [], None
+    for _ in range(pages):
+        start = time.perf_counter()
+        _, cursor = ShipmentService.get_shipments_page(limit=limit, cursor=cursor, **filters)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        if cursor is None:
+            break
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shipments", type=int, default=1000000, help="Shipments in the table")
+    parser.add_argument("--pages", type=int, default=200, help="Consecutive pages to fetch")
+    parser.add_argument("--limit", type=int, default=100, help="Page size")
+    args = parser.parse_args()
+
+    populate(args.shipments)
+    print(f"{'walk':<26} {'page 1 (us)':>12} {'last page (us)':>15} {'mean (us)':>10}")
+    for order_by in ShipmentOrder:
+        for status in (None, ShipmentStatus.in_transit):
+            latencies = walk(args.pages, args.limit, order_by=order_by, status_filter=status)
+            label = f"{order_by.value}" + (f" + {status.value}" if status else "")
+            mean = sum(latencies) / len(latencies)
+            print(f"{label:<26} {latencies[0]:>12.1f} {latencies[-1]:>15.1f} {mean:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Shipment Search Benchmark
+
+Fills the in-memory repository with synthetic shipments (varied recipient
+names, addresses, contents and sellers), then reports how long building the
+inverted index takes, how much memory it holds, and the latency of
+ShipmentService.search_shipments for a selective multi-word query and a
+common single word, against a full-scan baseline that tokenizes every row.
+
+Usage:
+    python -m benchmarks.search --sizes 10000,100000,1000000
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from app.services.shipment import ShipmentService
+from app.storage import get_shipment_repository
+from app.storage.indexes import TextIndex, tokenize
+from app.storage.records import SEARCH_FIELD_WEIGHTS
+
+FIRST_NAMES = (
+    "Andi Budi Citra Dewi Eko Fajar Gita Hadi Indra Joko Kartika Lestari Made Nur Oka Putri Rudi Sari Tono Wati".split()
+)
+LAST_NAMES = "Santoso Wijaya Pratama Saputra Hidayat Kusuma Lubis Siregar Nasution Halim Gunawan Setiawan".split()
+STREETS = "Sudirman Thamrin Gatot Subroto Diponegoro Merdeka Pemuda Veteran Pahlawan Asia Afrika Kartini".split()
+CITIES = [
+    "Jakarta Selatan",
+    "Jakarta Barat",
+    "Bandung",
+    "Surabaya",
+    "Medan",
+    "Semarang",
+    "Makassar",
+    "Denpasar",
+    "Yogyakarta",
+    "Palembang",
+]
+MATERIALS = "Copper Steel Aluminum Plastic Cotton Leather Glass Rubber Ceramic Bamboo Teak Silk".split()
+ITEMS = "wires pipes sheets rods fabric bags bottles tiles panels boxes cables shoes".split()
+QUERIES = {"multi-word": "andi santoso copper wires jakarta", "common word": "jakarta"}
+
+
+def populate(size: int) -> None:
+    """Fill the in-memory repository with size shipments of random searchable text"""
+    rng = random.Random(42)
+    now = datetime.now()
+    shipments = {}
+    for offset in range(size):
+        recipient = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        shipments[10000 + offset] = {
+            "package_details": {
+                "content": f"{rng.choice(MATERIALS)} {rng.choice(ITEMS)}",
+                "weight": 1.0,
+                "dimensions": None,
+                "fragile": False,
+            },
+            "recipient": {
+                "name": recipient,
+                "email": "bench@example.com",
+                "phone": "0",
+                "address": f"Jl. {rng.choice(STREETS)} No. {rng.randint(1, 300)}, {rng.choice(CITIES)}",
+            },
+            "seller": {
+                "name": f"Toko {rng.choice(LAST_NAMES)} {offset % 1000}",
+                "email": "bench@example.com",
+                "phone": "0",
+            },
+            "destination_code": 20000 + offset % 500,
+            "current_status": "placed",
+            "tracking_events": [],
+            "created_at": now,
+            "updated_at": now,
+        }
+    get_shipment_repository().load(shipments)
+
+
+def full_scan(query: str, limit: int) -> list[int]:
+    """Baseline: tokenize every row; ranking needs all matches, so the scan cannot stop early"""
+    wanted = set(tokenize(query))
+    matches = [
+        shipment_id
+        for shipment_id, shipment in get_shipment_repository().shipments.items()
+        if wanted <= set(tokenize(" ".join(text or "" for text in shipment.search_texts)))
+    ]
+    return matches[:limit]
+
+
+def index_footprint() -> tuple[float, float]:
+    """(seconds, MiB) to build a fresh index over the repository's shipments"""
+    documents = [
+        (shipment_id, shipment.search_texts) for shipment_id, shipment in get_shipment_repository().shipments.items()
+    ]
+    start = time.perf_counter()
+    TextIndex(SEARCH_FIELD_WEIGHTS).rebuild(documents)
+    seconds = time.perf_counter() - start
+    # Measured on a second build, since tracing slows building down severalfold
+    tracemalloc.start()
+    index = TextIndex(SEARCH_FIELD_WEIGHTS)
+    index.rebuild(documents)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del index
+    return seconds, size / 2**20
+
+
+def timed(func, repeat: int) -> float:
+    """Average wall time of func in microseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma separated table sizes")
+    parser.add_argument("--repeat", type=int, default=50, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    print(
+        f"{'shipments':>10} {'build (s)':>10} {'index (MiB)':>12} {'query':>12} {'indexed (us)':>14} {'full scan (us)':>16}"
+    )
+    for size in (int(value) for value in args.sizes.split(",")):
+        populate(size)
+        build, footprint = index_footprint()
+        for name, query in QUERIES.items():
+            indexed = timed(lambda query=query: ShipmentService.search_shipments(query, 10), args.repeat)
+            scan = timed(lambda query=query: full_scan(query, 10), max(1, args.repeat // 10))
+            print(f"{size:>10} {build:>10.2f} {footprint:>12.1f} {name:>12} {indexed:>14.1f} {scan:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Filtered Shipment List Benchmark
+
+Measures ShipmentService.get_all_shipments with status and destination
+filters as the table grows, against a full-scan baseline.
+
+Usage:
+    python -m benchmarks.shipment_filters --sizes 10000,100000,1000000
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from app.models.shipment import ShipmentStatus
+from app.services.shipment import ShipmentService
+from app.storage import get_shipment_repository
+
+STATUSES = [status.value for status in ShipmentStatus]
+MATCHING = 20
+
+
+def populate(size: int) -> None:
+    """Fill the in-memory repository with size shipments, MATCHING of which hit the benchmark filter"""
+    # Nested value objects are shared between rows to keep the benchmark's own footprint small
+    package_details = {"content": "bench", "weight": 1.0, "dimensions": None, "fragile": False}
+    recipient = {"name": "Bench", "email": "bench@example.com", "phone": "0", "address": "Bench"}
+    seller = {"name": "Bench", "email": "bench@example.com", "phone": "0"}
+    now = datetime.now()
+
+    shipments = {}
+    step = size // MATCHING
+    for offset in range(size):
+        if offset % step == 0:
+            status, destination = ShipmentStatus.out_for_delivery.value, 11002
+        else:
+            status, destination = STATUSES[offset % 3], 20000 + offset % 500
+        shipments[10000 + offset] = {
+            "package_details": package_details,
+            "recipient": recipient,
+            "seller": seller,
+            "destination_code": destination,
+            "current_status": status,
+            "tracking_events": [],
+            "created_at": now,
+            "updated_at": now,
+        }
+    get_shipment_repository().load(shipments)
+
+
+def full_scan(status: str, destination: int, limit: int) -> list[int]:
+    """Baseline: the pre-index linear scan"""
+    result = []
+    for shipment_id, shipment in get_shipment_repository().shipments.items():
+        if shipment.current_status == status and shipment.destination_code == destination:
+            result.append(shipment_id)
+            if len(result) >= limit:
+                break
+    return result
+
+
+def timed(func, repeat: int) -> float:
+    """Average wall time of func in microseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma separated table sizes")
+    parser.add_argument("--repeat", type=int, default=200, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    print(f"{'shipments':>10} {'indexed (us)':>14} {'full scan (us)':>16}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        populate(size)
+        indexed = timed(
+            lambda: ShipmentService.get_all_shipments(
+                status_filter=ShipmentStatus.out_for_delivery, destination_filter=11002, limit=100
+            ),
+            args.repeat,
+        )
+        scan = timed(lambda: full_scan(ShipmentStatus.out_for_delivery.value, 11002, 100), max(1, args.repeat // 20))
+        print(f"{size:>10} {indexed:>14.1f} {scan:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
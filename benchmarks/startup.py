@@ -0,0 +1,91 @@
+"""
+Cold Start Benchmark
+
+Imports the serverless entry point (api/index.py) in fresh interpreters with
+``-X importtime`` and reports the median import time per module. Exits with
+status 1 when the entry point or any single app module goes over its budget,
+or when a module that should load lazily (crypto backends, docs UI) shows up
+at import time, so it can run as a regression check in CI.
+
+Usage:
+    python -m benchmarks.startup --runs 5 --budget-ms 1500 --module-budget-ms 100
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from app.config import PROJECT_DIR
+
+ENTRY_POINT = "api.index"
+
+# Imported on first use only; loading any of these at startup is a regression
+LAZY_MODULES = ("passlib", "jose", "scalar_fastapi")
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_times(runs: int) -> dict[str, tuple[float, float]]:
+    """Median (self ms, cumulative ms) per module over runs fresh imports"""
+    samples: dict[str, list[tuple[int, int]]] = defaultdict(list)
+    # The first interpreter also writes bytecode caches; keep it out of the sample
+    for run in range(runs + 1):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {ENTRY_POINT}"],
+            cwd=PROJECT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        if run == 0:
+            continue
+        for line in result.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                samples[match.group(4)].append((int(match.group(1)), int(match.group(2))))
+
+    return {
+        module: (
+            statistics.median(own for own, _ in values) / 1e3,
+            statistics.median(cumulative for _, cumulative in values) / 1e3,
+        )
+        for module, values in samples.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to take the median over")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Budget for importing the entry point")
+    parser.add_argument("--module-budget-ms", type=float, default=100.0, help="Budget for any one app module (self)")
+    args = parser.parse_args()
+
+    times = import_times(args.runs)
+    print(f"{'module':<50} {'self (ms)':>10} {'cumul. (ms)':>12}")
+    for module, (own, cumulative) in sorted(times.items(), key=lambda item: item[1][1], reverse=True)[: args.top]:
+        print(f"{module:<50} {own:>10.1f} {cumulative:>12.1f}")
+
+    failures = []
+    total = times[ENTRY_POINT][1]
+    print(f"\n{ENTRY_POINT}: {total:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if total > args.budget_ms:
+        failures.append(f"{ENTRY_POINT} took {total:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+    for module, (own, _) in times.items():
+        if module.split(".")[0] in ("app", "api") and own > args.module_budget_ms:
+            failures.append(f"{module} took {own:.1f} ms itself, over the {args.module_budget_ms:.0f} ms budget")
+    for module in times:
+        if module.split(".")[0] in LAZY_MODULES:
+            failures.append(f"{module} is imported at startup but should load lazily")
+            break
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
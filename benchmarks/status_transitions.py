@@ -0,0 +1,139 @@
+"""
+Status Transition Benchmark
+
+Measures validating a batch of status transitions with the compiled status
+machine against the former per-event path (a ShipmentStatus lookup and a
+freshly built transition dict per event), and reading the current statuses
+of a SQLite batch with one json_each statement against one SELECT per
+event. Finally reports the cost per scan of a full tracking batch on both
+repositories.
+
+Usage:
+    python -m benchmarks.status_transitions --transitions 100000 --batch 5000
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.models.shipment import STATUS_MACHINE, ShipmentStatus
+from app.services.shipment import ShipmentService
+from app.storage import set_shipment_repository
+from app.storage.id_allocator import IdAllocator
+from app.storage.memory import InMemoryShipmentRepository
+from app.storage.records import STATUS_VALUES
+from app.storage.sqlite import _BATCH_STATUS_SQL, SQLiteShipmentRepository
+from benchmarks.storage_backends import make_order
+
+LEGACY_TRANSITIONS = {
+    "placed": ["in_transit", "cancelled"],
+    "in_transit": ["out_for_delivery", "returned", "cancelled"],
+    "out_for_delivery": ["delivered", "returned"],
+    "delivered": [],
+    "returned": [],
+    "cancelled": [],
+}
+
+
+def legacy_check(statuses: dict[int, int], transitions: list[tuple[int, int]]) -> list[Optional[str]]:
+    """Baseline: validate one event at a time through ShipmentStatus, rebuilding the graph per check"""
+    current = dict(statuses)
+    errors: list[Optional[str]] = []
+    for shipment_id, new in transitions:
+        code = current.get(shipment_id)
+        if code is None:
+            errors.append("not found")
+            continue
+        if code != new:
+            status = ShipmentStatus(STATUS_VALUES[code])
+            valid = {key: list(value) for key, value in LEGACY_TRANSITIONS.items()}
+            if ShipmentStatus(STATUS_VALUES[new]).value not in valid[status.value]:
+                errors.append(f"invalid: {', '.join(valid[status.value])}")
+                continue
+        current[shipment_id] = new
+        errors.append(None)
+    return errors
+
+
+def best_of(func, repeat: int = 5) -> float:
+    """Fastest wall time of func() over repeat runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def scan_stream(count: int) -> tuple[dict[int, int], list[tuple[int, int]]]:
+    """Placed shipments and count scans moving them along the workflow, with repeats and 1% invalid scans"""
+    rng = random.Random(42)
+    path = [STATUS_MACHINE.codes[status] for status in ("in_transit", "in_transit", "out_for_delivery", "delivered")]
+    shipments = max(1, count // len(path))
+    statuses = {shipment_id: STATUS_MACHINE.codes["placed"] for shipment_id in range(shipments)}
+    transitions = []
+    for step in range(count):
+        new = path[step // shipments % len(path)]
+        transitions.append((step % shipments, rng.randrange(len(STATUS_VALUES)) if rng.random() < 0.01 else new))
+    return statuses, transitions
+
+
+def bench_validation(count: int) -> None:
+    statuses, transitions = scan_stream(count)
+    legacy = best_of(lambda: legacy_check(statuses, transitions))
+    compiled = best_of(lambda: STATUS_MACHINE.check_batch(statuses, transitions))
+    print(f"\nValidate {count:,} scans")
+    print(f"  per-event ShipmentStatus   {legacy:8.1f} ms  ({legacy / count * 1e6:6.0f} ns/scan)")
+    print(f"  compiled check_batch       {compiled:8.1f} ms  ({compiled / count * 1e6:6.0f} ns/scan)")
+
+
+def bench_repository(name: str, repository, batch: int) -> None:
+    set_shipment_repository(repository)
+    repository.load({})
+    ids = [ShipmentService.create_shipment(make_order(i))["id"] for i in range(batch)]
+    if isinstance(repository, SQLiteShipmentRepository):
+        params = json.dumps(ids)
+        with repository.pool.connection() as conn:
+            one_by_one = best_of(
+                lambda: [
+                    conn.execute("SELECT status_code FROM shipments WHERE id = ?", (shipment_id,)).fetchone()
+                    for shipment_id in ids
+                ]
+            )
+            one_statement = best_of(lambda: dict(conn.execute(_BATCH_STATUS_SQL, (params,)).fetchall()))
+        print(f"\nRead the statuses of {batch:,} shipments ({name})")
+        print(f"  one SELECT per event       {one_by_one:8.1f} ms")
+        print(f"  one json_each statement    {one_statement:8.1f} ms")
+
+    scans = [
+        {"shipment_id": shipment_id, "location": "Hub", "description": "Scan", "status": "in_transit"}
+        for shipment_id in ids
+    ]
+    elapsed = best_of(lambda: ShipmentService.add_tracking_events_batch(scans), repeat=3)
+    print(f"\nTracking batch of {batch:,} scans ({name})")
+    print(f"  total                      {elapsed:8.1f} ms  ({elapsed / batch * 1000:6.1f} µs/scan)")
+
+
+def bench_storage(batch: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite = SQLiteShipmentRepository(Path(tmp) / "bench.db")
+        bench_repository("memory", InMemoryShipmentRepository(IdAllocator(start=12701)), batch)
+        bench_repository("sqlite", sqlite, batch)
+        sqlite.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transitions", type=int, default=100000, help="Transitions validated in one batch")
+    parser.add_argument("--batch", type=int, default=5000, help="Scans per tracking batch")
+    args = parser.parse_args()
+    bench_validation(args.transitions)
+    bench_storage(args.batch)
+
+
+if __name__ == "__main__":
+    main()
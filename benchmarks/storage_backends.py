@@ -0,0 +1,100 @@
+"""
+Storage Backend Comparison
+
+Runs the same ShipmentService workload against the in-memory and the
+SQLite repository and reports the average latency of each operation.
+
+Usage:
+    python -m benchmarks.storage_backends --shipments 20000 --operations 2000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app.api.schemas.shipment import PackageDetails, Recipient, Seller, ShipmentCreate, TrackingEventCreate
+from app.models.shipment import ShipmentStatus
+from app.services.shipment import ShipmentService
+from app.storage import set_shipment_repository
+from app.storage.id_allocator import IdAllocator
+from app.storage.memory import InMemoryShipmentRepository
+from app.storage.sqlite import SQLiteShipmentRepository
+
+
+def make_order(offset: int) -> ShipmentCreate:
+    """Build a shipment order bound to one of 50 destinations"""
+    return ShipmentCreate(
+        package_details=PackageDetails(content=f"item {offset}", weight=1.5, dimensions="10x10x10"),
+        recipient=Recipient(name=f"Recipient {offset}", email="recipient@example.com", phone="0812", address="Jakarta"),
+        seller=Seller(name="Bench Store", email="store@example.com", phone="021"),
+        destination_code=11000 + offset % 50,
+    )
+
+
+def timed(func, count: int) -> float:
+    """Average wall time of func(i) over count calls, in microseconds"""
+    start = time.perf_counter()
+    for i in range(count):
+        func(i)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def run(repository, shipments: int, operations: int) -> dict[str, float]:
+    """Seed the repository through the service, then time each operation"""
+    set_shipment_repository(repository)
+    repository.load({})
+    orders = [make_order(i) for i in range(shipments + operations)]
+    ids = [ShipmentService.create_shipment(orders[i])["id"] for i in range(shipments)]
+    rng = random.Random(42)
+    scan = TrackingEventCreate(location="Hub", description="Scan", status=ShipmentStatus.in_transit)
+    batch = [order.model_dump() for order in orders[:100]]
+    scans = [
+        {"shipment_id": shipment_id, "location": "Hub", "description": "Scan", "status": "in_transit"}
+        for shipment_id in ids[:100]
+    ]
+
+    return {
+        "create": timed(lambda i: ShipmentService.create_shipment(orders[shipments + i]), operations),
+        "bulk create/item": timed(lambda i: ShipmentService.create_shipments_bulk(batch), max(1, operations // 100))
+        / len(batch),
+        "get": timed(lambda i: ShipmentService.get_shipment_by_id(rng.choice(ids)), operations),
+        "list filtered": timed(
+            lambda i: ShipmentService.get_all_shipments(
+                status_filter=ShipmentStatus.in_transit, destination_filter=11000 + i % 50, limit=20
+            ),
+            operations,
+        ),
+        "tracking event": timed(lambda i: ShipmentService.add_tracking_event(rng.choice(ids), scan), operations),
+        "tracking batch/item": timed(
+            lambda i: ShipmentService.add_tracking_events_batch(scans), max(1, operations // 100)
+        )
+        / len(scans),
+        "stats": timed(lambda i: ShipmentService.get_statistics(), max(1, operations // 10)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shipments", type=int, default=20000, help="Shipments seeded before timing")
+    parser.add_argument("--operations", type=int, default=2000, help="Calls per timed operation")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        backends = {
+            "memory": InMemoryShipmentRepository(IdAllocator(start=12701)),
+            "sqlite": SQLiteShipmentRepository(Path(directory) / "bench.db"),
+        }
+        results = {}
+        for name, repository in backends.items():
+            results[name] = run(repository, args.shipments, args.operations)
+            repository.close()
+
+    print(f"{'operation (us)':<20}" + "".join(f"{name:>12}" for name in results))
+    for operation in results["memory"]:
+        print(f"{operation:<20}" + "".join(f"{timings[operation]:>12.1f}" for timings in results.values()))
+
+
+if __name__ == "__main__":
+    main()
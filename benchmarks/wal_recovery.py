@@ -0,0 +1,78 @@
+"""
+WAL Recovery Benchmark
+
+Writes a snapshot of N shipments plus a WAL tail of mutations, then times
+how long startup recovery (snapshot load + tail replay) takes.
+
+Usage:
+    python -m benchmarks.wal_recovery --shipments 1000000 --tail 50000
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from app.storage.id_allocator import IdAllocator
+from app.storage.memory import InMemoryShipmentRepository
+from app.storage.records import STATUS_CODES, ShipmentRecord, TrackingEventRecord
+from app.storage.wal import WriteAheadLog
+
+
+def make_shipment(offset: int, now: datetime) -> ShipmentRecord:
+    """Build a realistic shipment record"""
+    return ShipmentRecord.from_dict(
+        {
+            "package_details": {"content": f"item {offset}", "weight": 1.5, "dimensions": "10x10x10", "fragile": False},
+            "recipient": {
+                "name": f"Recipient {offset}",
+                "email": "recipient@example.com",
+                "phone": "081234567890",
+                "address": f"Jl. Benchmark No. {offset}, Jakarta",
+            },
+            "seller": {"name": "Bench Store", "email": "store@example.com", "phone": "021-5551234"},
+            "destination_code": 11000 + offset % 100,
+            "current_status": "placed",
+            "tracking_events": [
+                {"id": offset, "location": "Warehouse", "description": "Created", "status": "placed", "timestamp": now}
+            ],
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shipments", type=int, default=1000000, help="Shipments in the snapshot")
+    parser.add_argument("--tail", type=int, default=50000, help="Tracking-event records after the snapshot")
+    args = parser.parse_args()
+
+    now = datetime.now()
+    with tempfile.TemporaryDirectory() as directory:
+        wal = WriteAheadLog(Path(directory), fsync_interval_ms=10)
+        wal.recover()
+        shipments = {10000 + i: make_shipment(i, now) for i in range(args.shipments)}
+
+        start = time.perf_counter()
+        wal.snapshot({"shipments": shipments, "next_event_id": args.shipments + 1})
+        print(f"snapshot write:  {time.perf_counter() - start:8.2f} s  ({args.shipments} shipments)")
+
+        start = time.perf_counter()
+        for i in range(args.tail):
+            event = TrackingEventRecord(args.shipments + 1 + i, "Hub", "Scan", STATUS_CODES["in_transit"], now)
+            wal.append({"op": "tracking_event", "id": 10000 + i % args.shipments, "event": event, "updated_at": now})
+        wal.close()
+        print(f"tail append:     {time.perf_counter() - start:8.2f} s  ({args.tail} records, group commit)")
+        del shipments
+
+        repository = InMemoryShipmentRepository(IdAllocator(start=10000), WriteAheadLog(Path(directory)))
+        start = time.perf_counter()
+        repository.recover()
+        print(f"recovery:        {time.perf_counter() - start:8.2f} s  ({len(repository.shipments)} shipments)")
+        repository.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Worker Process Benchmark
+
+Starts the production profile (``run.py --profile production``) with 1, 2,
+4 and 8 worker processes on a fresh SQLite database and drives it over
+HTTP: every client connection keeps its socket open and sends a mix of
+GET /shipment/{id} (reads, cached per worker) and PATCH /shipment/{id}
+(writes through the shared database). Reports requests per second and
+latency percentiles per worker count.
+
+Clients run in their own processes so the load generator is not held back
+by one GIL; on a machine with few cores clients and workers compete for the
+same CPUs, so compare worker counts up to the core count.
+
+Usage:
+    python -m benchmarks.workers --workers 1,2,4,8 --connections 32 --seconds 10 --write-ratio 0.1
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import PROJECT_DIR
+
+SHIPMENTS = 200
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(conn: http.client.HTTPConnection, method: str, path: str, body=None, token: str = "") -> tuple[int, bytes]:
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    conn.request(method, path, body=None if body is None else json.dumps(body), headers=headers)
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def start_server(workers: int, port: int, data_dir: str) -> subprocess.Popen:
+    """Start the production profile and wait until it answers"""
+    env = {**os.environ, "DATA_DIR": data_dir, "STORAGE_BACKEND": "sqlite"}
+    server = subprocess.Popen(
+        [sys.executable, "run.py", "--profile", "production", "--host", "127.0.0.1"]
+        + ["--port", str(port), "--workers", str(workers)],
+        cwd=PROJECT_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            if request(conn, "GET", "/health")[0] == 200:
+                conn.close()
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"Server with {workers} workers did not start")
+
+
+def prepare(port: int) -> tuple[str, list[int]]:
+    """Log in as admin and create the shipments the load works on"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    _, body = request(conn, "POST", "/auth/login", {"username": "admin", "password": "admin123"})
+    token = json.loads(body)["access_token"]
+    order = {
+        "package_details": {"content": "bench", "weight": 1.5, "dimensions": "10x10x10"},
+        "recipient": {"name": "Recipient", "email": "recipient@example.com", "phone": "0812", "address": "Jakarta"},
+        "seller": {"name": "Bench Store", "email": "store@example.com", "phone": "021"},
+        "destination_code": 11002,
+    }
+    _, body = request(conn, "POST", "/shipments/bulk", [order] * SHIPMENTS, token)
+    conn.close()
+    return token, [result["id"] for result in json.loads(body)["results"]]
+
+
+def load(port: int, token: str, ids: list[int], connections: int, seconds: float, write_ratio: float) -> list[float]:
+    """Run connections keep-alive clients for seconds; returns the latency (s) of every successful request"""
+    latencies: list[float] = []
+    failures = []
+    deadline = time.perf_counter() + seconds
+
+    def client(seed: int) -> None:
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while (start := time.perf_counter()) < deadline:
+            shipment_id = rng.choice(ids)
+            if rng.random() < write_ratio:
+                status, _ = request(
+                    conn, "PATCH", f"/shipment/{shipment_id}", {"destination_code": rng.randrange(11000, 11050)}, token
+                )
+            else:
+                status, _ = request(conn, "GET", f"/shipment/{shipment_id}", token=token)
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                failures.append(status)
+        conn.close()
+
+    clients = [threading.Thread(target=client, args=(os.getpid() * 1000 + i,)) for i in range(connections)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    if failures:
+        print(f"  {len(failures)} failed requests (statuses {sorted(set(failures))})")
+    return latencies
+
+
+def run(workers: int, connections: int, client_processes: int, seconds: float, write_ratio: float) -> tuple:
+    port = free_port()
+    with tempfile.TemporaryDirectory() as data_dir:
+        server = start_server(workers, port, data_dir)
+        try:
+            token, ids = prepare(port)
+            per_process = [
+                connections // client_processes + (i < connections % client_processes) for i in range(client_processes)
+            ]
+            with ProcessPoolExecutor(client_processes) as pool:
+                futures = [
+                    pool.submit(load, port, token, ids, count, seconds, write_ratio) for count in per_process if count
+                ]
+                latencies = sorted(latency for future in futures for latency in future.result())
+        finally:
+            server.terminate()
+            server.wait()
+    if not latencies:
+        return 0.0, 0.0, 0.0
+    return (
+        len(latencies) / seconds,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99)] * 1000,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated worker process counts")
+    parser.add_argument("--connections", type=int, default=32, help="Concurrent keep-alive client connections")
+    parser.add_argument("--client-processes", type=int, default=min(4, os.cpu_count() or 1), help="Load generators")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Measured duration per worker count")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="Share of requests that are PATCHes")
+    args = parser.parse_args()
+
+    print(
+        f"{os.cpu_count()} CPUs, {args.connections} connections from {args.client_processes} client processes, "
+        f"{args.write_ratio:.0%} writes, {args.seconds:g}s per run\n"
+    )
+    print(f"{'workers':>7}  {'requests/s':>10}  {'p50 ms':>7}  {'p99 ms':>7}")
+    for workers in (int(count) for count in args.workers.split(",")):
+        throughput, p50, p99 = run(workers, args.connections, args.client_processes, args.seconds, args.write_ratio)
+        print(f"{workers:>7}  {throughput:>10.0f}  {p50:>7.1f}  {p99:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,65 @@
 """
 Run script for LOGIXPress API
 
-This script starts the FastAPI development server with auto-reload.
-For production, use: uvicorn app.main:app --host 0.0.0.0 --port 8000
+Development profile (default): one process on 127.0.0.1:8000 with auto-reload.
+
+    python run.py
+
+Production profile: listens on 0.0.0.0:$PORT with one worker process per CPU
+core, or WEB_CONCURRENCY / --workers of them. Workers are separate processes
+that only share what is in the SQLite store, so the profile selects the
+sqlite backend unless STORAGE_BACKEND is configured explicitly.
+
+    python run.py --profile production
 """
 
+import argparse
+import os
+import sys
+
 import uvicorn
 
-if __name__ == "__main__":
+from app.config import settings
+
+
+def production_workers(workers: int = 0) -> int:
+    """Worker processes to start: workers if given, else WEB_CONCURRENCY, else the CPU count"""
+    return workers or settings.WEB_CONCURRENCY or os.cpu_count() or 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=("development", "production"), default="development")
+    parser.add_argument("--host", help="Bind address (development: 127.0.0.1, production: 0.0.0.0)")
+    parser.add_argument("--port", type=int, help="Port (development: 8000, production: $PORT or 8000)")
+    parser.add_argument("--workers", type=int, default=0, help="Production worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if args.profile == "development":
+        uvicorn.run(
+            "app.main:app", host=args.host or "127.0.0.1", port=args.port or 8000, reload=True, log_level="info"
+        )
+        return
+
+    workers = production_workers(args.workers)
+    if workers > 1:
+        if "STORAGE_BACKEND" not in settings.model_fields_set:
+            os.environ["STORAGE_BACKEND"] = "sqlite"
+        elif settings.STORAGE_BACKEND != "sqlite":
+            sys.exit(
+                f"{workers} workers need STORAGE_BACKEND=sqlite, the {settings.STORAGE_BACKEND} backend is per process"
+            )
+    # Read by every worker's settings, so each knows it is one of several
+    os.environ["WEB_CONCURRENCY"] = str(workers)
     uvicorn.run(
         "app.main:app",
-        host="127.0.0.1",
-        port=8000,
-        reload=True,
-        log_level="info"
+        host=args.host or "0.0.0.0",
+        port=args.port or int(os.environ.get("PORT", 8000)),
+        workers=workers,
+        proxy_headers=True,
+        log_level="info",
     )
 
+
+if __name__ == "__main__":
+    main()
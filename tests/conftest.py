@@ -9,9 +9,11 @@ from datetime import datetime
 import pytest
 from fastapi.testclient import TestClient
 
+from app.core.principal_cache import get_principal_cache
+from app.core.tracking_hub import shutdown_tracking_hub
 from app.main import app
-from app.services.auth import fake_users_db
-from app.services.shipment import shipments_db
+from app.services.auth import SEED_USERS
+from app.storage import get_shipment_repository, get_user_store
 
 
 @pytest.fixture(scope="function")
@@ -24,36 +26,11 @@ def client():
 def reset_db():
     """Reset in-memory databases before each test"""
     # Clear and reinitialize users
-    fake_users_db.clear()
-    fake_users_db.update(
-        {
-            "admin": {
-                "username": "admin",
-                "email": "admin@logixpress.com",
-                "plain_password": "admin123",
-                "role": "admin",
-                "disabled": False,
-            },
-            "courier": {
-                "username": "courier",
-                "email": "courier@logixpress.com",
-                "plain_password": "courier123",
-                "role": "courier",
-                "disabled": False,
-            },
-            "customer": {
-                "username": "customer",
-                "email": "customer@example.com",
-                "plain_password": "customer123",
-                "role": "customer",
-                "disabled": False,
-            },
-        }
-    )
+    get_principal_cache().clear()
+    get_user_store().load(SEED_USERS)
 
     # Clear and reinitialize shipments
-    shipments_db.clear()
-    shipments_db.update(
+    get_shipment_repository().load(
         {
             12701: {
                 "package_details": {
@@ -89,8 +66,9 @@ def reset_db():
     yield
 
     # Cleanup after test
-    fake_users_db.clear()
-    shipments_db.clear()
+    shutdown_tracking_hub()
+    get_user_store().load({})
+    get_shipment_repository().load({})
 
 
 @pytest.fixture
@@ -134,3 +112,43 @@ def sample_shipment_data():
 def auth_headers(admin_token):
     """Authorization headers with admin token"""
     return {"Authorization": f"Bearer {admin_token}"}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def shipment_repository(request, tmp_path):
+    """Empty shipment repository of every backend"""
+    from app.storage.id_allocator import IdAllocator
+    from app.storage.memory import InMemoryShipmentRepository
+    from app.storage.sqlite import SQLiteShipmentRepository
+
+    if request.param == "sqlite":
+        repository = SQLiteShipmentRepository(tmp_path / "test.db", pool_size=2)
+    else:
+        repository = InMemoryShipmentRepository(IdAllocator(start=12701))
+    yield repository
+    repository.close()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def user_store(request, tmp_path):
+    """Empty user store of every backend"""
+    from app.storage.users import InMemoryUserStore, SQLiteUserStore
+
+    store = SQLiteUserStore(tmp_path / "users.db", pool_size=4) if request.param == "sqlite" else InMemoryUserStore()
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path, reset_db):
+    """Serve the API from a SQLite repository seeded like reset_db"""
+    from app.storage import set_shipment_repository
+    from app.storage.sqlite import SQLiteShipmentRepository
+
+    original = get_shipment_repository()
+    repository = SQLiteShipmentRepository(tmp_path / "api.db")
+    repository.load({shipment_id: original.get(shipment_id).to_dict() for shipment_id in (12701,)})
+    set_shipment_repository(repository)
+    yield repository
+    set_shipment_repository(original)
+    repository.close()
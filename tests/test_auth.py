@@ -5,7 +5,17 @@ Tests for user authentication, registration, and authorization.
 Covers: login, register, token validation, role-based access.
 """
 
-from app.core.security import get_password_hash, verify_password
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.api.schemas.auth import User
+from app.core.exceptions import ServiceUnavailable
+from app.core.hashing import PasswordHashPool, get_password_hash_pool, set_password_hash_pool
+from app.core.principal_cache import PrincipalCache, get_principal_cache
+from app.core.security import get_password_hash, verify_password, verify_password_async
 
 
 class TestAuthEndpoints:
@@ -66,6 +76,26 @@ class TestAuthEndpoints:
         assert response.status_code == 400
         assert "email" in response.json()["detail"].lower()
 
+    def test_register_duplicate_email_different_case(self, client, reset_db):
+        """Test email uniqueness ignores case"""
+        response = client.post(
+            "/auth/register", json={"username": "newuser", "email": "Admin@LOGIXPress.com", "password": "password123"}
+        )
+        assert response.status_code == 400
+        assert "email" in response.json()["detail"].lower()
+
+    def test_register_race_lost_after_hashing(self, client, reset_db, monkeypatch):
+        """Test the atomic insert rejects a duplicate that appeared after validation"""
+        from app.storage import get_user_store
+
+        store = get_user_store()
+        monkeypatch.setattr(store, "find_conflict", lambda username, email: None)
+        response = client.post(
+            "/auth/register", json={"username": "newuser", "email": "courier@logixpress.com", "password": "password123"}
+        )
+        assert response.status_code == 400
+        assert "email" in response.json()["detail"].lower()
+
     def test_register_short_password(self, client, reset_db):
         """Test registration with password < 6 characters"""
         response = client.post(
@@ -154,3 +184,270 @@ class TestPasswordSecurity:
         assert hash1 != hash2
         assert verify_password(password, hash1) is True
         assert verify_password(password, hash2) is True
+
+
+def _occupy(pool, release):
+    """Hold one pool slot from a background thread until release is set"""
+    thread = threading.Thread(target=asyncio.run, args=(pool.run(release.wait),))
+    thread.start()
+    while pool.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+    return thread
+
+
+class TestPasswordHashPool:
+    """Test the bounded bcrypt pool"""
+
+    def test_verify_runs_on_pool(self):
+        """Test verification result and completion counter"""
+        hashed = get_password_hash("testpassword123")
+        before = get_password_hash_pool().stats()["completed"]
+        assert asyncio.run(verify_password_async("testpassword123", hashed)) is True
+        assert asyncio.run(verify_password_async("wrongpassword", hashed)) is False
+        assert get_password_hash_pool().stats()["completed"] == before + 2
+
+    def test_saturated_pool_rejects(self):
+        """Test calls beyond workers + queue fail fast"""
+        pool = PasswordHashPool(workers=1, queue_size=0)
+        release = threading.Event()
+        thread = _occupy(pool, release)
+
+        with pytest.raises(ServiceUnavailable):
+            asyncio.run(pool.run(str, "x"))
+        release.set()
+        thread.join()
+
+        assert asyncio.run(pool.run(str, "x")) == "x"
+        stats = pool.stats()
+        assert stats["rejected"] == 1
+        assert stats["completed"] == 2
+        assert stats["in_flight"] == 0
+        pool.shutdown()
+
+    def test_queue_depth_tracked(self):
+        """Test calls waiting behind busy workers are reported as queued"""
+        pool = PasswordHashPool(workers=1, queue_size=1)
+        release = threading.Event()
+        first = _occupy(pool, release)
+        second = threading.Thread(target=asyncio.run, args=(pool.run(release.wait),))
+        second.start()
+        while pool.stats()["in_flight"] < 2:
+            time.sleep(0.001)
+
+        assert pool.stats()["queued"] == 1
+        release.set()
+        first.join()
+        second.join()
+        assert pool.stats()["peak_queued"] == 1
+        pool.shutdown()
+
+    def test_login_returns_503_when_saturated(self, client, reset_db):
+        """Test login fails fast with Retry-After while the pool is full"""
+        pool = PasswordHashPool(workers=1, queue_size=0)
+        set_password_hash_pool(pool)
+        release = threading.Event()
+        thread = _occupy(pool, release)
+        try:
+            response = client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "1"
+        finally:
+            release.set()
+            thread.join()
+            set_password_hash_pool(None)
+            pool.shutdown()
+
+    def test_pool_stats_endpoint(self, client, auth_headers, reset_db):
+        """Test admin can read pool statistics"""
+        response = client.get("/stats/auth", headers=auth_headers)
+        assert response.status_code == 200
+        pool_stats = response.json()["password_hash_pool"]
+        assert {"workers", "queue_size", "in_flight", "queued", "peak_queued", "rejected"} <= pool_stats.keys()
+
+    def test_pool_stats_requires_admin(self, client, courier_token, reset_db):
+        """Test non-admin cannot read pool statistics"""
+        response = client.get("/stats/auth", headers={"Authorization": f"Bearer {courier_token}"})
+        assert response.status_code == 403
+
+
+def _user(username="admin", role="admin"):
+    return User(username=username, email=f"{username}@example.com", role=role, disabled=False)
+
+
+class TestPrincipalCache:
+    """Test the token -> user cache"""
+
+    def test_hit_and_miss(self):
+        """Test lookups are counted and return the cached user"""
+        cache = PrincipalCache(max_size=10, ttl_seconds=60)
+        assert cache.get("token") is None
+        cache.put("token", _user())
+        assert cache.get("token").username == "admin"
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+        assert stats["hit_ratio"] == 0.5
+
+    def test_ttl_expiry(self):
+        """Test entries expire after the TTL"""
+        cache = PrincipalCache(max_size=10, ttl_seconds=0.01)
+        cache.put("token", _user())
+        time.sleep(0.02)
+        assert cache.get("token") is None
+        assert cache.stats()["size"] == 0
+
+    def test_entry_never_outlives_token(self):
+        """Test an already expired token is not served from the cache"""
+        cache = PrincipalCache(max_size=10, ttl_seconds=60)
+        cache.put("token", _user(), token_expires_at=time.time() - 1)
+        assert cache.get("token") is None
+
+    def test_lru_eviction(self):
+        """Test the least recently used token is evicted at capacity"""
+        cache = PrincipalCache(max_size=2, ttl_seconds=60)
+        cache.put("a", _user("a"))
+        cache.put("b", _user("b"))
+        cache.get("a")
+        cache.put("c", _user("c"))
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidate_user(self):
+        """Test every token of a user is dropped, others are kept"""
+        cache = PrincipalCache(max_size=10, ttl_seconds=60)
+        cache.put("a1", _user("a"))
+        cache.put("a2", _user("a"))
+        cache.put("a2", _user("a"))
+        cache.put("b1", _user("b"))
+        cache.invalidate_user("a")
+        assert cache.get("a1") is None and cache.get("a2") is None
+        assert cache.get("b1") is not None
+        assert cache.stats()["invalidations"] == 2
+
+    def test_put_after_invalidation_discarded(self):
+        """Test a user looked up before an invalidation is not cached after it"""
+        cache = PrincipalCache(max_size=10, ttl_seconds=60)
+        generation = cache.generation("a")
+        cache.invalidate_user("a")
+        cache.put("a1", _user("a"), generation=generation)
+        assert cache.get("a1") is None
+        cache.put("a1", _user("a"), generation=cache.generation("a"))
+        assert cache.get("a1") is not None
+
+    def test_disabled_cache(self):
+        """Test a zero-size cache stores nothing"""
+        cache = PrincipalCache(max_size=0, ttl_seconds=60)
+        cache.put("token", _user())
+        assert cache.get("token") is None
+
+    def test_repeat_requests_hit_cache(self, client, auth_headers, reset_db):
+        """Test the second request with a token is served from the cache"""
+        client.get("/auth/me", headers=auth_headers)
+        hits = get_principal_cache().stats()["hits"]
+        response = client.get("/auth/me", headers=auth_headers)
+        assert response.status_code == 200
+        assert get_principal_cache().stats()["hits"] == hits + 1
+
+    def test_disabled_user_rejected_immediately(self, client, auth_headers, courier_token, reset_db):
+        """Test disabling a user invalidates their cached principal"""
+        courier_headers = {"Authorization": f"Bearer {courier_token}"}
+        assert client.get("/auth/me", headers=courier_headers).status_code == 200
+
+        response = client.patch("/auth/users/courier", json={"disabled": True}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["disabled"] is True
+
+        response = client.get("/auth/me", headers=courier_headers)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Inactive user"
+
+    def test_lookup_racing_with_disable(self, courier_token, reset_db):
+        """Test a lookup that read the user before it was disabled does not cache the stale principal"""
+        from app.api.dependencies import _load_principal
+        from app.api.schemas.auth import UserUpdate
+        from app.services.auth import AuthService
+        from app.storage import get_user_store, set_user_store
+        from app.storage.users import InMemoryUserStore
+
+        class RacingUserStore(InMemoryUserStore):
+            def get(self, username):
+                # The admin's update lands between this lookup and the cache put
+                user = super().get(username)
+                AuthService.update_user(username, UserUpdate(disabled=True))
+                return user
+
+        original = get_user_store()
+        store = RacingUserStore()
+        store.load({"courier": original.get("courier")})
+        set_user_store(store)
+        try:
+            get_principal_cache().clear()
+            assert _load_principal(courier_token).disabled is False
+            assert InMemoryUserStore.get(store, "courier")["disabled"] is True
+            assert get_principal_cache().get(courier_token) is None
+        finally:
+            set_user_store(original)
+
+    def test_role_change_applies_immediately(self, client, auth_headers, courier_token, reset_db):
+        """Test a role change is visible with an existing token"""
+        courier_headers = {"Authorization": f"Bearer {courier_token}"}
+        assert client.get("/stats", headers=courier_headers).status_code == 403
+
+        response = client.patch("/auth/users/courier", json={"role": "admin"}, headers=auth_headers)
+        assert response.json()["role"] == "admin"
+        assert client.get("/stats", headers=courier_headers).status_code == 200
+
+    def test_update_user_validation(self, client, auth_headers, courier_token, reset_db):
+        """Test unknown users, invalid roles and non-admin callers are rejected"""
+        assert client.patch("/auth/users/ghost", json={"disabled": True}, headers=auth_headers).status_code == 404
+        assert client.patch("/auth/users/courier", json={"role": "boss"}, headers=auth_headers).status_code == 422
+        response = client.patch(
+            "/auth/users/customer", json={"disabled": True}, headers={"Authorization": f"Bearer {courier_token}"}
+        )
+        assert response.status_code == 403
+
+    def test_blocking_user_store_used_off_the_loop(self, client, auth_headers, reset_db):
+        """Test lookups, registration and updates leave the event loop when the user store blocks"""
+        from app.storage import get_user_store, set_user_store
+        from app.storage.users import InMemoryUserStore
+
+        on_loop = []
+
+        def record_caller():
+            try:
+                on_loop.append(asyncio.get_running_loop() is not None)
+            except RuntimeError:
+                on_loop.append(False)
+
+        class BlockingUserStore(InMemoryUserStore):
+            blocking = True
+
+            def get(self, username):
+                record_caller()
+                return super().get(username)
+
+            def update(self, username, fields):
+                record_caller()
+                return super().update(username, fields)
+
+        original = get_user_store()
+        store = BlockingUserStore()
+        store.load({username: original.get(username) for username in ("admin", "courier", "customer")})
+        set_user_store(store)
+        try:
+            get_principal_cache().clear()
+            assert client.get("/auth/me", headers=auth_headers).status_code == 200
+            response = client.post("/auth/login", json={"username": "courier", "password": "courier123"})
+            assert response.status_code == 200
+            response = client.patch("/auth/users/customer", json={"disabled": True}, headers=auth_headers)
+            assert response.status_code == 200
+        finally:
+            set_user_store(original)
+        assert on_loop == [False, False, False]
+
+    def test_cache_stats_endpoint(self, client, auth_headers, reset_db):
+        """Test admin can read principal cache statistics"""
+        response = client.get("/stats/auth", headers=auth_headers)
+        assert {"size", "hits", "misses", "hit_ratio", "evictions", "invalidations"} <= (
+            response.json()["principal_cache"].keys()
+        )
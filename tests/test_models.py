@@ -4,7 +4,22 @@ Model Tests
 Tests for domain models and business logic.
 """
 
-from app.models.shipment import ShipmentStatus
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.core.exceptions import EntityNotFound, InvalidStatusTransition
+from app.models.shipment import (
+    BUILTIN_STATUSES,
+    STATUS_MACHINE,
+    ShipmentStatus,
+    StatusMachine,
+    load_status_names,
+    save_status_names,
+)
 
 
 class TestShipmentStatus:
@@ -58,3 +73,108 @@ class TestShipmentStatus:
         for status in terminal_states:
             for target in ShipmentStatus:
                 assert status.can_transition_to(target) is False
+
+
+class TestStatusMachine:
+    """Test the compiled status workflow"""
+
+    REGIONAL = {
+        "placed": ["in_transit", "cancelled"],
+        "in_transit": ["held_at_hub", "out_for_delivery"],
+        "held_at_hub": ["in_transit", "returned"],
+        "out_for_delivery": ["delivered"],
+    }
+
+    def test_matches_enum(self):
+        """Test the default machine numbers statuses like ShipmentStatus and agrees with it"""
+        assert STATUS_MACHINE.statuses == tuple(status.value for status in ShipmentStatus)
+        for status in ShipmentStatus:
+            assert status.code == STATUS_MACHINE.codes[status.value]
+            for target in ShipmentStatus:
+                assert STATUS_MACHINE.allows(status.code, target.code) is status.can_transition_to(target)
+
+    def test_regional_statuses(self):
+        """Test added statuses are numbered after the built-in ones"""
+        machine = StatusMachine(self.REGIONAL)
+        assert machine.statuses[:6] == BUILTIN_STATUSES
+        assert machine.statuses[6:] == ("held_at_hub",)
+        codes = machine.codes
+        assert machine.allows(codes["in_transit"], codes["held_at_hub"])
+        assert machine.allows(codes["held_at_hub"], codes["in_transit"])
+        assert not machine.allows(codes["held_at_hub"], codes["delivered"])
+        assert machine.next_statuses(codes["held_at_hub"]) == ("in_transit", "returned")
+        assert machine.next_statuses(codes["returned"]) == ()
+        error = machine.transition_error(codes["placed"], codes["held_at_hub"])
+        assert error.detail.endswith("Valid next status: in_transit, cancelled")
+
+    def test_known_statuses_keep_codes(self):
+        """Test statuses numbered by an earlier run keep their codes when the workflow is reordered"""
+        known = StatusMachine(self.REGIONAL).statuses
+        reordered = {"held_at_hub": ["returned"], **self.REGIONAL, "placed": ["on_hold", "in_transit"]}
+        machine = StatusMachine(reordered, known=known)
+        assert machine.statuses == (*known, "on_hold")
+        with pytest.raises(ValueError, match="held_at_hub"):
+            StatusMachine({"placed": ["in_transit"]}, known=known)
+
+    def test_status_names_saved(self, tmp_path):
+        """Test status names round-trip through their file, which is only rewritten when they change"""
+        path = tmp_path / "data" / "statuses.json"
+        assert load_status_names(path) == load_status_names(None) == ()
+        save_status_names(path, STATUS_MACHINE.statuses)
+        assert load_status_names(path) == STATUS_MACHINE.statuses
+        written = path.stat().st_mtime_ns
+        save_status_names(path, list(STATUS_MACHINE.statuses))
+        assert path.stat().st_mtime_ns == written
+
+    def test_invalid_status_name(self):
+        """Test status names must be identifiers"""
+        with pytest.raises(ValueError):
+            StatusMachine({"placed": ["held at hub"]})
+
+    def test_check_batch(self):
+        """Test a batch is checked as if applied in order"""
+        machine = StatusMachine(self.REGIONAL)
+        codes = machine.codes
+        transitions = [
+            (1, codes["in_transit"]),
+            (1, codes["held_at_hub"]),
+            (2, codes["delivered"]),
+            (3, codes["in_transit"]),
+            (1, codes["held_at_hub"]),
+            (1, codes["returned"]),
+        ]
+        errors = machine.check_batch({1: codes["placed"], 2: codes["placed"]}, transitions)
+        assert errors[:2] == [None, None]
+        assert isinstance(errors[2], InvalidStatusTransition)
+        assert isinstance(errors[3], EntityNotFound)
+        assert errors[4:] == [None, None]
+
+    def test_configured_workflow(self):
+        """Test STATUS_TRANSITIONS from the environment adds ShipmentStatus members"""
+        script = (
+            "from app.models.shipment import ShipmentStatus;"
+            "from app.storage.records import STATUS_CODES;"
+            "print(ShipmentStatus('held_at_hub').code, STATUS_CODES['held_at_hub'],"
+            " ShipmentStatus.in_transit.can_transition_to(ShipmentStatus.held_at_hub))"
+        )
+        env = {**os.environ, "STATUS_TRANSITIONS": json.dumps(self.REGIONAL)}
+        output = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+        assert output.stdout.split() == ["6", "6", "True"]
+
+    def test_stored_codes_survive_reordering(self, tmp_path):
+        """Test a restart with a reordered workflow keeps the codes saved by the first start"""
+        script = (
+            "from app.storage import create_shipment_repository;"
+            "from app.storage.records import STATUS_CODES;"
+            "create_shipment_repository().close();"
+            "print(STATUS_CODES['held_at_hub'], STATUS_CODES.get('on_hold'))"
+        )
+        env = {**os.environ, "STORAGE_BACKEND": "sqlite", "DATA_DIR": str(tmp_path)}
+        regional = {"placed": ["on_hold", "in_transit"], "in_transit": ["held_at_hub"], "on_hold": ["held_at_hub"]}
+        outputs = []
+        for workflow in (self.REGIONAL, regional):
+            env["STATUS_TRANSITIONS"] = json.dumps(workflow)
+            result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+            outputs.append(result.stdout.split())
+        assert outputs == [["6", "None"], ["6", "7"]]
+        assert json.loads((tmp_path / "statuses.json").read_text())[6:] == ["held_at_hub", "on_hold"]
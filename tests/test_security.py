@@ -5,12 +5,15 @@ Tests for JWT token security, authorization, and access control.
 Covers: token validation, expiration, role-based access, injection attacks.
 """
 
+import subprocess
+import sys
 from datetime import timedelta
 
 from jose import jwt
 
-from app.config import settings
-from app.core.security import create_access_token, decode_access_token
+from app.config import PROJECT_DIR, settings
+from app.core.security import create_access_token, decode_access_token, verify_password
+from app.services.auth import SEED_USERS
 
 
 class TestJWTSecurity:
@@ -196,3 +199,25 @@ class TestSecurityVulnerabilities:
                 response = client.delete(endpoint)
 
             assert response.status_code == 403, f"{method} {endpoint} should require auth"
+
+
+class TestColdStart:
+    """Test the serverless entry point stays cheap to import"""
+
+    def test_entry_point_defers_crypto_and_docs_imports(self):
+        """Test api.index loads neither crypto backends nor the docs UI"""
+        script = (
+            "import sys, api.index; "
+            "print(sorted(m for m in ('passlib', 'jose', 'scalar_fastapi') if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script], cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+        )
+        assert result.stdout.strip() == "[]"
+
+    def test_seed_users_are_prehashed(self):
+        """Test seed accounts ship bcrypt hashes matching the documented passwords"""
+        for username in ("admin", "courier", "customer"):
+            hashed = SEED_USERS[username]["hashed_password"]
+            assert hashed.startswith("$2b$")
+            assert verify_password(f"{username}123", hashed)
@@ -4,13 +4,18 @@ Service Layer Tests
 Tests for business logic in service layer.
 """
 
+import threading
+import time
+from datetime import datetime
+
 import pytest
 
 from app.api.schemas.auth import RegisterRequest
 from app.api.schemas.shipment import PackageDetails, Recipient, Seller, ShipmentCreate
-from app.core.exceptions import DuplicateEntity, EntityNotFound
+from app.core.exceptions import DuplicateEntity, EntityNotFound, PreconditionFailed
 from app.services.auth import AuthService
 from app.services.shipment import ShipmentService
+from app.storage import get_shipment_repository
 
 
 class TestAuthService:
@@ -84,6 +89,154 @@ class TestShipmentService:
         for shipment in shipments:
             assert shipment.current_status == "placed"
 
+    def test_get_all_shipments_combined_filters(self, reset_db):
+        """Test status and destination filters are intersected"""
+        from app.models.shipment import ShipmentStatus
+
+        shipments = ShipmentService.get_all_shipments(
+            status_filter=ShipmentStatus.placed, destination_filter=11002, limit=10
+        )
+        assert [s.id for s in shipments] == [12701]
+
+        shipments = ShipmentService.get_all_shipments(status_filter=ShipmentStatus.placed, destination_filter=11003)
+        assert shipments == []
+
+    def test_get_shipments_page(self, reset_db):
+        """Test walking every page with the returned cursor"""
+        from app.models.shipment import ShipmentOrder
+
+        shipment_data = ShipmentCreate(
+            package_details=PackageDetails(content="Test Package", weight=5.5),
+            recipient=Recipient(name="John Doe", email="john@example.com", phone="0812", address="Test Address"),
+            seller=Seller(name="Test Store", email="store@example.com", phone="0813"),
+            destination_code=11002,
+        )
+        ShipmentService.create_shipment(shipment_data)
+        ShipmentService.create_shipment(shipment_data)
+        for order_by in ShipmentOrder:
+            ids, cursor = [], None
+            while True:
+                page, cursor = ShipmentService.get_shipments_page(limit=2, order_by=order_by, cursor=cursor)
+                ids.extend(s.id for s in page)
+                if cursor is None:
+                    break
+            assert sorted(ids) == [s.id for s in ShipmentService.get_all_shipments(limit=100)]
+            assert len(ids) == 3
+
+    def test_get_shipments_page_invalid_cursor(self, reset_db):
+        """Test malformed cursors and cursors of another order are rejected"""
+        from app.core.exceptions import ValidationError
+        from app.models.shipment import ShipmentOrder
+
+        shipment_data = ShipmentCreate(
+            package_details=PackageDetails(content="Test Package", weight=5.5),
+            recipient=Recipient(name="John Doe", email="john@example.com", phone="0812", address="Test Address"),
+            seller=Seller(name="Test Store", email="store@example.com", phone="0813"),
+            destination_code=11002,
+        )
+        ShipmentService.create_shipment(shipment_data)
+        _, cursor = ShipmentService.get_shipments_page(limit=1)
+        for bad in ("not-a-cursor", cursor[:-2]):
+            with pytest.raises(ValidationError):
+                ShipmentService.get_shipments_page(cursor=bad)
+        with pytest.raises(ValidationError):
+            ShipmentService.get_shipments_page(order_by=ShipmentOrder.created_at, cursor=cursor)
+
+    def test_create_shipments_bulk(self, reset_db):
+        """Test valid items are created in one block while invalid ones are reported"""
+        shipment_data = ShipmentCreate(
+            package_details=PackageDetails(content="Test Package", weight=5.5),
+            recipient=Recipient(name="John Doe", email="john@example.com", phone="0812", address="Test Address"),
+            seller=Seller(name="Test Store", email="store@example.com", phone="0813"),
+            destination_code=11002,
+        ).model_dump()
+        too_heavy = {**shipment_data, "package_details": {"content": "Anvil", "weight": 30}}
+
+        result = ShipmentService.create_shipments_bulk([shipment_data, too_heavy, shipment_data])
+        assert (result["created"], result["failed"]) == (2, 1)
+        assert [item["index"] for item in result["results"]] == [0, 1, 2]
+        assert "package_details.weight" in result["results"][1]["error"]
+        first, second = result["results"][0]["id"], result["results"][2]["id"]
+        assert second == first + 1
+        assert [e.status for e in ShipmentService.get_tracking_history(second)[0]] == ["placed"]
+        assert ShipmentService.get_statistics()["total_shipments"] == 3
+
+    def test_create_shipments_bulk_limits(self, reset_db, monkeypatch):
+        """Test empty and oversized batches are rejected"""
+        from app.config import settings
+        from app.core.exceptions import ValidationError
+
+        monkeypatch.setattr(settings, "BULK_MAX_ITEMS", 2)
+        for items in ([], [{}, {}, {}]):
+            with pytest.raises(ValidationError):
+                ShipmentService.create_shipments_bulk(items)
+        result = ShipmentService.create_shipments_bulk([{}, {}])
+        assert (result["created"], result["failed"]) == (0, 2)
+
+    def test_add_tracking_events_batch(self, reset_db):
+        """Test scans are applied in order with per-event results"""
+        scans = [
+            {"shipment_id": 12701, "location": "Hub A", "description": "Picked up", "status": "in_transit"},
+            {"shipment_id": 12701, "location": "Hub B", "description": "Sorted", "status": "in_transit"},
+            {"shipment_id": 12701, "location": "Hub B", "description": "Back", "status": "placed"},
+            {"shipment_id": 99999, "location": "Hub", "description": "Scan", "status": "in_transit"},
+            {"shipment_id": 12701, "location": "Hub B", "description": "Bad"},
+            {
+                "shipment_id": 12701,
+                "location": "Van",
+                "description": "Out",
+                "status": "out_for_delivery",
+                "timestamp": "2024-12-02T08:00:00",
+            },
+        ]
+        result = ShipmentService.add_tracking_events_batch(scans)
+        assert (result["accepted"], result["rejected"]) == (3, 3)
+        errors = [item.get("error") for item in result["results"]]
+        assert errors[:2] == [None, None]
+        assert "Invalid status transition" in errors[2]
+        assert "not found" in errors[3]
+        assert "status" in errors[4]
+        assert result["results"][4]["shipment_id"] == 12701
+
+        history, last_event_id = ShipmentService.get_tracking_history(12701)
+        assert [e.location for e in history] == ["Warehouse Jakarta", "Hub A", "Hub B", "Van"]
+        assert history[-1].timestamp == datetime(2024, 12, 2, 8, 0, 0)
+        assert last_event_id == history[-1].id
+        assert ShipmentService.get_shipment_by_id(12701).current_status == "out_for_delivery"
+
+    def test_add_tracking_events_batch_limits(self, reset_db, monkeypatch):
+        """Test empty and oversized batches are rejected"""
+        from app.config import settings
+        from app.core.exceptions import ValidationError
+
+        monkeypatch.setattr(settings, "TRACKING_BATCH_MAX_ITEMS", 1)
+        for items in ([], [{}, {}]):
+            with pytest.raises(ValidationError):
+                ShipmentService.add_tracking_events_batch(items)
+        assert ShipmentService.add_tracking_events_batch(["not an object"])["rejected"] == 1
+
+    def test_filters_follow_writes(self, reset_db):
+        """Test indexes are kept up to date by writes"""
+        from app.api.schemas.shipment import ShipmentUpdate, TrackingEventCreate
+        from app.models.shipment import ShipmentStatus
+
+        ShipmentService.update_shipment(
+            12701, ShipmentUpdate(current_status=ShipmentStatus.in_transit, destination_code=11003)
+        )
+        assert ShipmentService.get_all_shipments(status_filter=ShipmentStatus.placed) == []
+        moved = ShipmentService.get_all_shipments(status_filter=ShipmentStatus.in_transit, destination_filter=11003)
+        assert [s.id for s in moved] == [12701]
+
+        ShipmentService.add_tracking_event(
+            12701,
+            TrackingEventCreate(location="Hub", description="Out", status=ShipmentStatus.out_for_delivery),
+        )
+        assert ShipmentService.get_all_shipments(status_filter=ShipmentStatus.in_transit) == []
+        assert len(ShipmentService.get_all_shipments(status_filter=ShipmentStatus.out_for_delivery)) == 1
+
+        ShipmentService.delete_shipment(12701)
+        assert ShipmentService.get_all_shipments(destination_filter=11003) == []
+
     def test_get_shipment_by_id_exists(self, reset_db):
         """Test getting existing shipment"""
         shipment = ShipmentService.get_shipment_by_id(12701)
@@ -109,6 +262,19 @@ class TestShipmentService:
         assert "id" in result
         assert "message" in result
 
+    def test_create_shipment_does_not_reuse_deleted_id(self, reset_db):
+        """Test deleting the highest shipment does not free its ID"""
+        shipment_data = ShipmentCreate(
+            package_details=PackageDetails(content="Test Package", weight=5.5),
+            recipient=Recipient(name="John Doe", email="john@example.com", phone="0812", address="Test Address"),
+            seller=Seller(name="Test Store", email="store@example.com", phone="0813"),
+            destination_code=11002,
+        )
+        first_id = ShipmentService.create_shipment(shipment_data)["id"]
+        ShipmentService.delete_shipment(first_id)
+        second_id = ShipmentService.create_shipment(shipment_data)["id"]
+        assert second_id > first_id
+
     def test_delete_shipment_exists(self, reset_db):
         """Test deleting existing shipment"""
         result = ShipmentService.delete_shipment(12701)
@@ -118,7 +284,383 @@ class TestShipmentService:
         with pytest.raises(EntityNotFound):
             ShipmentService.get_shipment_by_id(12701)
 
+    def test_update_and_track_not_exists(self, reset_db):
+        """Test writes to a non-existent shipment"""
+        from app.api.schemas.shipment import ShipmentUpdate, TrackingEventCreate
+        from app.models.shipment import ShipmentStatus
+
+        with pytest.raises(EntityNotFound):
+            ShipmentService.update_shipment(99999, ShipmentUpdate(destination_code=1))
+        with pytest.raises(EntityNotFound):
+            ShipmentService.add_tracking_event(
+                99999, TrackingEventCreate(location="Hub", description="Scan", status=ShipmentStatus.in_transit)
+            )
+
     def test_delete_shipment_not_exists(self, reset_db):
         """Test deleting non-existent shipment"""
         with pytest.raises(EntityNotFound):
             ShipmentService.delete_shipment(99999)
+
+
+class TestShipmentConcurrency:
+    """Stress tests for concurrent writers (striped locks and If-Match)"""
+
+    THREADS = 8
+    WRITES = 5
+    READ_LATENCY = 0.01
+
+    @staticmethod
+    def run_threads(count, target):
+        """Start count threads running target(i) together and wait for them, returning the wall time"""
+        barrier = threading.Barrier(count)
+
+        def run(i):
+            barrier.wait()
+            target(i)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def test_one_writer_wins_per_etag(self, reset_db):
+        """Test concurrent updates sent with the same If-Match: exactly one applies, the rest get 412"""
+        from app.api.schemas.shipment import ShipmentUpdate
+
+        for _ in range(10):
+            etag, _ = ShipmentService.get_shipment_response(12701)
+            outcomes = []
+
+            def update(i, etag=etag, outcomes=outcomes):
+                try:
+                    ShipmentService.update_shipment(12701, ShipmentUpdate(destination_code=i), if_match=etag)
+                    outcomes.append(i)
+                except PreconditionFailed:
+                    outcomes.append(None)
+
+            self.run_threads(self.THREADS, update)
+            winners = [i for i in outcomes if i is not None]
+            assert len(winners) == 1
+            assert ShipmentService.get_shipment_by_id(12701).destination_code == winners[0]
+        assert get_shipment_repository().get_version(12701) == 11
+
+    def test_writes_to_different_shipments_run_in_parallel(self, reset_db, monkeypatch):
+        """Test updates of different shipments do not wait on each other's stripe, while one shipment's are serialized"""
+        from app.api.schemas.shipment import ShipmentUpdate
+
+        shipment_data = ShipmentCreate(
+            package_details=PackageDetails(content="Test Package", weight=5.5),
+            recipient=Recipient(name="John Doe", email="john@example.com", phone="0812", address="Test Address"),
+            seller=Seller(name="Test Store", email="store@example.com", phone="0813"),
+            destination_code=11002,
+        )
+        repository = get_shipment_repository()
+        ids = [ShipmentService.create_shipment(shipment_data)["id"] for _ in range(self.THREADS)]
+        # A read that waits on I/O without holding the GIL; it runs under the shipment's stripe only,
+        # while the repository write itself stays serialized behind the repository's own lock
+        get = repository.get
+        calls = []
+
+        def slow_get(*args, **kwargs):
+            calls.append(args)
+            time.sleep(self.READ_LATENCY)
+            return get(*args, **kwargs)
+
+        monkeypatch.setattr(repository, "get", slow_get)
+        reads = len(calls)
+        ShipmentService.update_shipment(ids[0], ShipmentUpdate(destination_code=0))
+        reads_per_write = len(calls) - reads
+        serial = self.THREADS * self.WRITES * reads_per_write * self.READ_LATENCY
+
+        def write(shipment_id):
+            for n in range(self.WRITES):
+                ShipmentService.update_shipment(shipment_id, ShipmentUpdate(destination_code=n))
+
+        different = self.run_threads(self.THREADS, lambda i: write(ids[i]))
+        same = self.run_threads(self.THREADS, lambda i: write(ids[0]))
+        # Different shipments overlap their reads: about WRITES * reads_per_write * READ_LATENCY in total
+        assert different < serial / 2
+        assert same >= serial
+        assert [repository.get_version(shipment_id) for shipment_id in ids[1:]] == [1 + self.WRITES] * (
+            self.THREADS - 1
+        )
+        assert repository.get_version(ids[0]) == 2 + self.WRITES * (self.THREADS + 1)
+
+    def test_write_from_another_worker_is_not_lost(self, reset_db, monkeypatch):
+        """Test a write landing between validation and update (another process) is revalidated or fails If-Match"""
+        from app.api.schemas.shipment import ShipmentUpdate, TrackingEventCreate
+        from app.core.exceptions import InvalidStatusTransition
+        from app.storage.records import STATUS_CODES
+
+        repository = get_shipment_repository()
+        update = repository.update
+        pending = []
+
+        def update_after_other_worker(shipment_id, fields, event=None, expected_version=None):
+            # Another worker process writes the shipment just before this write lands
+            if pending:
+                update(shipment_id, pending.pop())
+            return update(shipment_id, fields, event, expected_version)
+
+        monkeypatch.setattr(repository, "update", update_after_other_worker)
+        pending.append({"destination_code": 99999})
+        ShipmentService.update_shipment(12701, ShipmentUpdate(current_status="in_transit"))
+        shipment = ShipmentService.get_shipment_by_id(12701)
+        assert (shipment.current_status, shipment.destination_code, len(shipment.tracking_events)) == (
+            "in_transit",
+            99999,
+            2,
+        )
+
+        # Validated against in_transit, then the other worker delivers it
+        pending.append({"status_code": STATUS_CODES["delivered"]})
+        with pytest.raises(InvalidStatusTransition):
+            ShipmentService.update_shipment(12701, ShipmentUpdate(current_status="out_for_delivery"))
+
+        assert ShipmentService.get_shipment_by_id(12701).current_status == "delivered"
+
+        # With If-Match the other worker's write fails the precondition instead
+        shipment_id = ShipmentService.create_shipment(
+            ShipmentCreate(
+                package_details=PackageDetails(content="Test Package", weight=5.5),
+                recipient=Recipient(name="John Doe", email="john@example.com", phone="0812", address="Test Address"),
+                seller=Seller(name="Test Store", email="store@example.com", phone="0813"),
+                destination_code=11002,
+            )
+        )["id"]
+        scan = TrackingEventCreate(location="Hub", description="Scan", status="in_transit")
+        for write in (
+            lambda etag: ShipmentService.update_shipment(
+                shipment_id, ShipmentUpdate(destination_code=1), if_match=etag
+            ),
+            lambda etag: ShipmentService.add_tracking_event(shipment_id, scan, etag),
+        ):
+            etag, _ = ShipmentService.get_shipment_response(shipment_id)
+            pending.append({"destination_code": 99999})
+            with pytest.raises(PreconditionFailed):
+                write(etag)
+        etag, _ = ShipmentService.get_shipment_response(shipment_id)
+        assert ShipmentService.add_tracking_event(shipment_id, scan, etag).status == "in_transit"
+        assert ShipmentService.get_shipment_by_id(shipment_id).destination_code == 99999
+
+
+class TestShipmentPersistence:
+    """Test WAL logging and recovery of shipment state"""
+
+    def test_repository_seeded_on_first_use(self, reset_db):
+        """Test a repository created from settings is seeded when first fetched, not at import"""
+        from app.storage import get_shipment_repository, set_shipment_repository
+
+        original = get_shipment_repository()
+        try:
+            set_shipment_repository(None)
+            repository = get_shipment_repository()
+            assert repository is not original
+            assert repository.get(12701) is not None
+            assert get_shipment_repository() is repository
+        finally:
+            set_shipment_repository(original)
+
+    def test_lifespan_warms_storage_unless_fast_startup(self, reset_db, monkeypatch):
+        """Test startup seeds storage eagerly, and leaves it to the first request in fast-startup mode"""
+        from fastapi.testclient import TestClient
+
+        import app.storage as storage
+        from app.config import settings
+        from app.main import app
+
+        original = storage.get_shipment_repository()
+        try:
+            for fast_startup, warmed in ((True, False), (False, True)):
+                monkeypatch.setattr(settings, "FAST_STARTUP", fast_startup)
+                storage.set_shipment_repository(None)
+                with TestClient(app):
+                    assert (storage._repository is not None) is warmed
+        finally:
+            storage.set_shipment_repository(original)
+
+    def test_lifespan_with_several_workers(self, reset_db, tmp_path, monkeypatch):
+        """Test several workers refuse the per-process memory store and relay live updates and user changes over SQLite"""
+        from fastapi.testclient import TestClient
+
+        import app.storage as storage
+        from app.config import settings
+        from app.core.tracking_hub import get_tracking_hub
+        from app.main import app
+
+        original = storage.get_shipment_repository()
+        original_users = storage.get_user_store()
+        monkeypatch.setattr(settings, "WEB_CONCURRENCY", 4)
+        with pytest.raises(RuntimeError, match="STORAGE_BACKEND=sqlite"):
+            with TestClient(app):
+                pass
+
+        monkeypatch.setattr(settings, "STORAGE_BACKEND", "sqlite")
+        monkeypatch.setattr(settings, "DATA_DIR", tmp_path)
+        try:
+            storage.set_shipment_repository(None)
+            storage.set_user_store(None)
+            with TestClient(app):
+                assert get_tracking_hub().relay is not None
+                assert storage.get_shipment_repository().get(12701) is not None
+                assert storage.get_user_store()._watcher is not None
+            assert storage.get_user_store()._watcher is None
+        finally:
+            storage.set_shipment_repository(original)
+            storage.set_user_store(original_users)
+
+    def test_recover_replays_all_mutations(self, reset_db, tmp_path):
+        """Test create, update, tracking event and delete survive a restart"""
+        from app.api.schemas.shipment import ShipmentUpdate, TrackingEventCreate
+        from app.models.shipment import ShipmentStatus
+        from app.services.shipment import initialize_storage, shutdown_storage
+        from app.storage import get_shipment_repository, set_shipment_repository
+        from app.storage.id_allocator import IdAllocator
+        from app.storage.memory import InMemoryShipmentRepository
+        from app.storage.wal import WriteAheadLog
+
+        def restart():
+            set_shipment_repository(
+                InMemoryShipmentRepository(IdAllocator(start=12701), WriteAheadLog(tmp_path, fsync_interval_ms=0))
+            )
+            initialize_storage()
+
+        original = get_shipment_repository()
+        try:
+            restart()  # nothing persisted yet: seeds and snapshots
+            shipment_data = ShipmentCreate(
+                package_details=PackageDetails(content="Persisted", weight=2.0),
+                recipient=Recipient(name="Jane", email="jane@example.com", phone="0812", address="Bandung"),
+                seller=Seller(name="Store", email="store@example.com", phone="0813"),
+                destination_code=40111,
+            )
+            new_id = ShipmentService.create_shipment(shipment_data)["id"]
+            ShipmentService.update_shipment(new_id, ShipmentUpdate(current_status=ShipmentStatus.in_transit))
+            ShipmentService.add_tracking_event(
+                new_id,
+                TrackingEventCreate(location="Hub", description="Sorted", status=ShipmentStatus.out_for_delivery),
+            )
+            bulk = ShipmentService.create_shipments_bulk([shipment_data.model_dump(), shipment_data.model_dump()])
+            ShipmentService.add_tracking_events_batch(
+                [
+                    {"shipment_id": item["id"], "location": "Hub", "description": "Scan", "status": "in_transit"}
+                    for item in bulk["results"]
+                ]
+            )
+            ShipmentService.delete_shipment(12701)
+            expected = {
+                shipment_id: shipment.to_dict() for shipment_id, shipment in get_shipment_repository().shipments.items()
+            }
+            shutdown_storage()
+
+            restart()
+            recovered = get_shipment_repository().shipments
+            assert {shipment_id: shipment.to_dict() for shipment_id, shipment in recovered.items()} == expected
+            filtered = ShipmentService.get_all_shipments(status_filter=ShipmentStatus.out_for_delivery)
+            assert [s.id for s in filtered] == [new_id]
+            event = ShipmentService.add_tracking_event(
+                new_id, TrackingEventCreate(location="Home", description="Done", status=ShipmentStatus.delivered)
+            )
+            assert event.id > max(e["id"] for e in expected[new_id]["tracking_events"])
+            shutdown_storage()
+        finally:
+            set_shipment_repository(original)
+
+    def test_mutations_trigger_snapshot(self, tmp_path):
+        """Test the WAL is compacted once enough records accumulate"""
+        from app.storage.id_allocator import IdAllocator
+        from app.storage.memory import InMemoryShipmentRepository
+        from app.storage.records import ShipmentRecord, TrackingEventRecord
+        from app.storage.wal import WriteAheadLog
+
+        repository = InMemoryShipmentRepository(
+            IdAllocator(start=1), WriteAheadLog(tmp_path, fsync_interval_ms=0, snapshot_every=1)
+        )
+        repository.load({})
+        now = datetime.now()
+        repository.create(
+            ShipmentRecord(
+                "rods",
+                2.0,
+                None,
+                False,
+                "Ani",
+                "ani@example.com",
+                "0812",
+                "Jakarta",
+                "Store",
+                "s@example.com",
+                "021",
+                1,
+                0,
+                now,
+                now,
+            ),
+            TrackingEventRecord(0, "Warehouse", "Created", 0, now),
+        )
+        repository.close()
+
+        state, records = WriteAheadLog(tmp_path).recover()
+        assert list(state["shipments"]) == [1]
+        assert records == []
+
+    def test_snapshot_written_off_the_write_path(self, tmp_path):
+        """Test writes proceed while a snapshot is written, without changing the frozen state"""
+        from app.storage.id_allocator import IdAllocator
+        from app.storage.memory import InMemoryShipmentRepository
+        from app.storage.records import ShipmentRecord, TrackingEventRecord
+        from app.storage.wal import WriteAheadLog
+
+        writing, release = threading.Event(), threading.Event()
+
+        class SlowWriteAheadLog(WriteAheadLog):
+            def write_snapshot(self, lsn, state):
+                writing.set()
+                assert release.wait(5)
+                super().write_snapshot(lsn, state)
+
+        repository = InMemoryShipmentRepository(
+            IdAllocator(start=1), SlowWriteAheadLog(tmp_path, fsync_interval_ms=0, snapshot_every=2)
+        )
+        now = datetime.now()
+        shipment_id = repository.create(
+            ShipmentRecord(
+                "rods",
+                2.0,
+                None,
+                False,
+                "Ani",
+                "ani@example.com",
+                "0812",
+                "Jakarta",
+                "Store",
+                "s@example.com",
+                "021",
+                1,
+                0,
+                now,
+                now,
+            ),
+            TrackingEventRecord(0, "Warehouse", "Created", 0, now),
+        )
+        assert repository.update(shipment_id, {"content": "pipes"})
+        # The second record started a snapshot, which is now blocked writing
+        assert writing.wait(5)
+        assert repository.add_event(shipment_id, TrackingEventRecord(1, "Hub", "Picked up", 0, now), now)
+        assert repository.get(shipment_id).version == 3
+        release.set()
+        repository.close()
+
+        state, records = WriteAheadLog(tmp_path).recover()
+        assert state["shipments"][shipment_id].version == 2
+        assert len(state["shipments"][shipment_id].tracking_events) == 1
+        assert [record["op"] for record in records] == ["tracking_event"]
+
+        recovered = InMemoryShipmentRepository(IdAllocator(start=1), WriteAheadLog(tmp_path))
+        assert recovered.recover()
+        shipment = recovered.get(shipment_id)
+        assert (shipment.content, shipment.version, len(shipment.tracking_events)) == ("pipes", 3, 2)
+        recovered.close()
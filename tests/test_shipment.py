@@ -2,9 +2,23 @@
 Shipment Tests
 
 Tests for shipment CRUD operations, status transitions, and permissions.
-Covers: create, read, update, delete, filtering, role-based access.
+Covers: create, read, update, delete, filtering, export, role-based access.
 """
 
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+from app.core.locks import StripedLock
+from app.core.response_cache import (
+    ResponseCache,
+    etag_matches,
+    etag_matches_version,
+    get_shipment_response_cache,
+    make_etag,
+)
+from app.services.shipment import initialize_sample_data
 
 
 class TestShipmentCRUD:
@@ -120,6 +134,56 @@ class TestShipmentCRUD:
         data = response.json()
         assert len(data) <= 1
 
+    def test_get_shipments_cursor_pagination(self, client, admin_token, reset_db, sample_shipment_data):
+        """Test paging through shipments with X-Next-Cursor, keeping filters"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        for _ in range(3):
+            client.post("/shipment", json=sample_shipment_data, headers=headers)
+
+        for order_by in ("id", "created_at"):
+            ids, params = [], {"status": "placed", "limit": 2, "order_by": order_by}
+            while True:
+                response = client.get("/shipments", params=params, headers=headers)
+                assert response.status_code == 200
+                ids.extend(shipment["id"] for shipment in response.json())
+                if "X-Next-Cursor" not in response.headers:
+                    break
+                params["cursor"] = response.headers["X-Next-Cursor"]
+            assert len(ids) == 4
+            assert len(set(ids)) == 4
+
+    def test_get_shipments_invalid_cursor(self, client, admin_token, reset_db):
+        """Test a malformed cursor is rejected"""
+        response = client.get("/shipments?cursor=bogus", headers={"Authorization": f"Bearer {admin_token}"})
+        assert response.status_code == 422
+
+    def test_get_shipments_date_ranges_and_sort(self, client, admin_token, reset_db, sample_shipment_data):
+        """Test created/updated ranges, descending order and cursors bound to their direction"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        started = datetime.now()
+        new_ids = [client.post("/shipment", json=sample_shipment_data, headers=headers).json()["id"] for _ in range(2)]
+        client.patch("/shipment/12701", json={"current_status": "in_transit"}, headers=headers)
+
+        response = client.get("/shipments", params={"created_from": started.isoformat()}, headers=headers)
+        assert [shipment["id"] for shipment in response.json()] == new_ids
+        response = client.get("/shipments", params={"created_to": started.isoformat()}, headers=headers)
+        assert [shipment["id"] for shipment in response.json()] == [12701]
+        # Timezone-aware values are compared in local time
+        aware = started.astimezone().isoformat()
+        params = {"updated_since": aware, "order_by": "updated_at", "sort": "desc"}
+        response = client.get("/shipments", params=params, headers=headers)
+        assert [shipment["id"] for shipment in response.json()] == [12701, *reversed(new_ids)]
+
+        response = client.get("/shipments", params={"sort": "desc", "limit": 2}, headers=headers)
+        assert [shipment["id"] for shipment in response.json()] == list(reversed(new_ids))
+        cursor = response.headers["X-Next-Cursor"]
+        response = client.get("/shipments", params={"sort": "desc", "limit": 2, "cursor": cursor}, headers=headers)
+        assert [shipment["id"] for shipment in response.json()] == [12701]
+        assert client.get("/shipments", params={"cursor": cursor}, headers=headers).status_code == 422
+
+        params = {"created_from": started.isoformat(), "created_to": started.isoformat()}
+        assert client.get("/shipments", params=params, headers=headers).status_code == 422
+
     def test_update_shipment_status(self, client, admin_token, reset_db):
         """Test updating shipment status"""
         response = client.patch(
@@ -188,6 +252,37 @@ class TestShipmentCRUD:
         assert response.status_code == 404
 
 
+class TestShipmentSearch:
+    """Test full-text shipment search"""
+
+    def test_search_follows_writes(self, client, admin_token, sample_shipment_data, reset_db):
+        """Test search finds new shipments, reflects updates and drops deleted ones"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        package = {**sample_shipment_data["package_details"], "content": "Aluminum rods"}
+        created = client.post("/shipment", json={**sample_shipment_data, "package_details": package}, headers=headers)
+        created = created.json()["id"]
+
+        response = client.get("/shipments/search", params={"q": "ALUMINUM"}, headers=headers)
+        assert response.status_code == 200
+        assert [row["id"] for row in response.json()] == [12701, created]
+        assert response.json()[0]["recipient_name"] == "Ahmad Suryadi"
+        assert [row["id"] for row in client.get("/shipments/search?q=rods+doe", headers=headers).json()] == [created]
+
+        recipient = {**sample_shipment_data["recipient"], "address": "Jl. Kemang, Jakarta Selatan"}
+        client.patch(f"/shipment/{created}", json={"recipient": recipient}, headers=headers)
+        assert [row["id"] for row in client.get("/shipments/search?q=kemang", headers=headers).json()] == [created]
+        client.delete("/shipment/12701", headers=headers)
+        assert client.get("/shipments/search?q=aluminum+sudirman", headers=headers).json() == []
+
+    def test_search_validation(self, client, admin_token, reset_db):
+        """Test queries without words, oversized limits and anonymous calls are rejected"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        assert client.get("/shipments/search?q=--", headers=headers).status_code == 422
+        assert client.get("/shipments/search?q=", headers=headers).status_code == 422
+        assert client.get("/shipments/search?q=ahmad&limit=101", headers=headers).status_code == 422
+        assert client.get("/shipments/search?q=ahmad").status_code in (401, 403)
+
+
 class TestShipmentWorkflow:
     """Test complete shipment workflow"""
 
@@ -225,3 +320,292 @@ class TestShipmentWorkflow:
         )
         assert update3.status_code == 200
         assert update3.json()["current_status"] == "delivered"
+
+
+class TestShipmentBulkCreate:
+    """Test bulk shipment creation"""
+
+    def test_bulk_create_partial_failure(self, client, customer_token, reset_db, sample_shipment_data):
+        """Test one invalid item does not reject the batch"""
+        invalid = {**sample_shipment_data, "recipient": {**sample_shipment_data["recipient"], "email": "nope"}}
+        response = client.post(
+            "/shipments/bulk",
+            json=[sample_shipment_data, invalid, sample_shipment_data],
+            headers={"Authorization": f"Bearer {customer_token}"},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["created"], data["failed"]) == (2, 1)
+        assert data["results"][1]["id"] is None
+        assert "recipient.email" in data["results"][1]["error"]
+        for item in (data["results"][0], data["results"][2]):
+            shipment = client.get(f"/shipment/{item['id']}", headers={"Authorization": f"Bearer {customer_token}"})
+            assert shipment.json()["current_status"] == "placed"
+
+    def test_bulk_create_non_object_items(self, client, admin_token, reset_db, sample_shipment_data):
+        """Test items that are not objects are rejected one by one"""
+        response = client.post(
+            "/shipments/bulk",
+            json=[42, sample_shipment_data, "text"],
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["created"], data["failed"]) == (1, 2)
+        assert [item["id"] is None for item in data["results"]] == [True, False, True]
+
+    def test_bulk_create_empty(self, client, admin_token, reset_db):
+        """Test an empty batch is rejected"""
+        response = client.post("/shipments/bulk", json=[], headers={"Authorization": f"Bearer {admin_token}"})
+        assert response.status_code == 422
+
+    def test_bulk_create_courier_forbidden(self, client, courier_token, reset_db, sample_shipment_data):
+        """Test couriers cannot create shipments in bulk"""
+        response = client.post(
+            "/shipments/bulk", json=[sample_shipment_data], headers={"Authorization": f"Bearer {courier_token}"}
+        )
+        assert response.status_code == 403
+
+
+class TestShipmentExport:
+    """Test streaming shipment export"""
+
+    def test_export_ndjson(self, client, admin_token, reset_db, sample_shipment_data):
+        """Test every shipment is exported with its tracking events"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        new_id = client.post("/shipment", json=sample_shipment_data, headers=headers).json()["id"]
+
+        response = client.get("/shipments/export", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["id"] for row in rows] == [12701, new_id]
+        assert rows[1]["recipient"]["name"] == sample_shipment_data["recipient"]["name"]
+        assert [event["status"] for event in rows[1]["tracking_events"]] == ["placed"]
+
+    def test_export_csv(self, client, admin_token, reset_db):
+        """Test CSV export flattens shipments into one row each"""
+        response = client.get("/shipments/export?format=csv", headers={"Authorization": f"Bearer {admin_token}"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 1
+        assert rows[0]["id"] == "12701"
+        assert rows[0]["current_status"] == "placed"
+        assert json.loads(rows[0]["tracking_events"])[0]["location"] == "Warehouse Jakarta"
+
+    def test_export_filters(self, client, admin_token, reset_db, sample_shipment_data):
+        """Test status, destination and updated_since filters"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        new_id = client.post("/shipment", json=sample_shipment_data, headers=headers).json()["id"]
+        client.patch(f"/shipment/{new_id}", json={"current_status": "in_transit"}, headers=headers)
+
+        def ids(params):
+            response = client.get("/shipments/export", params=params, headers=headers)
+            return [json.loads(line)["id"] for line in response.text.splitlines()]
+
+        assert ids({"status": "in_transit"}) == [new_id]
+        assert ids({"destination_code": 99999}) == []
+        assert ids({"updated_since": "2025-01-01T00:00:00"}) == [new_id]
+        assert ids({"updated_since": "2000-01-01T00:00:00", "status": "placed"}) == [12701]
+
+    def test_export_timezone_aware_since(self, client, admin_token, reset_db, sample_shipment_data):
+        """Test a timezone-aware updated_since is compared in local time"""
+        assert_export_since_aware(client, admin_token, sample_shipment_data)
+
+    def test_export_non_admin_forbidden(self, client, courier_token, reset_db):
+        """Test only admins can export"""
+        response = client.get("/shipments/export", headers={"Authorization": f"Bearer {courier_token}"})
+        assert response.status_code == 403
+
+
+def assert_export_since_aware(client, admin_token, sample_shipment_data):
+    """Export with updated_since in UTC and in a +07:00 offset matches the shipments written after it"""
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    started = datetime.now().astimezone()
+    new_id = client.post("/shipment", json=sample_shipment_data, headers=headers).json()["id"]
+    for since in (started.astimezone(timezone.utc), started.astimezone(timezone(timedelta(hours=7)))):
+        response = client.get("/shipments/export", params={"updated_since": since.isoformat()}, headers=headers)
+        assert response.status_code == 200
+        assert [json.loads(line)["id"] for line in response.text.splitlines()] == [new_id]
+    earlier = (started - timedelta(days=3650)).astimezone(timezone.utc).isoformat()
+    response = client.get("/shipments/export", params={"updated_since": earlier}, headers=headers)
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [12701, new_id]
+
+
+class TestSQLiteBackend:
+    """Test the API served from the SQLite repository"""
+
+    def test_export_timezone_aware_since(self, client, admin_token, sample_shipment_data, sqlite_backend):
+        """Test a timezone-aware updated_since is compared in local time on SQLite"""
+        assert_export_since_aware(client, admin_token, sample_shipment_data)
+
+    def test_crud_and_tracking(self, client, admin_token, sample_shipment_data, sqlite_backend):
+        """Test the shipment lifecycle end to end on SQLite"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        shipment_id = client.post("/shipment", json=sample_shipment_data, headers=headers).json()["id"]
+        assert shipment_id > 12701
+
+        listed = client.get("/shipments?status=placed&destination_code=11002", headers=headers).json()
+        assert [row["id"] for row in listed] == [12701, shipment_id]
+
+        bulk = client.post("/shipments/bulk", json=[sample_shipment_data] * 2, headers=headers).json()
+        bulk_ids = [item["id"] for item in bulk["results"]]
+        assert bulk_ids == [shipment_id + 1, shipment_id + 2]
+        for bulk_id in bulk_ids:
+            assert client.delete(f"/shipment/{bulk_id}", headers=headers).status_code == 200
+
+        updated = client.patch(
+            f"/shipment/{shipment_id}",
+            json={"current_status": "in_transit", "recipient": {**sample_shipment_data["recipient"], "name": "Jo"}},
+            headers=headers,
+        )
+        assert updated.status_code == 200
+        assert updated.json()["recipient"]["name"] == "Jo"
+
+        event = client.post(
+            f"/shipment/{shipment_id}/tracking",
+            json={"location": "Hub", "description": "Out", "status": "out_for_delivery"},
+            headers=headers,
+        )
+        assert event.status_code == 201
+        batch = client.post(
+            "/shipments/tracking/batch",
+            json=[
+                {"shipment_id": 12701, "location": "Hub", "description": "Scan", "status": "cancelled"},
+                {"shipment_id": 12701, "location": "Hub", "description": "Scan", "status": "in_transit"},
+            ],
+            headers=headers,
+        ).json()
+        assert (batch["accepted"], batch["rejected"]) == (1, 1)
+        assert client.get("/shipment/12701", headers=headers).json()["current_status"] == "cancelled"
+        history = client.get(f"/shipment/{shipment_id}/tracking", headers=headers).json()
+        assert [e["status"] for e in history] == ["placed", "in_transit", "out_for_delivery"]
+
+        stats = client.get("/stats", headers=headers).json()
+        assert stats == {
+            "total_shipments": 2,
+            "by_status": {"cancelled": 1, "out_for_delivery": 1},
+            "by_destination": {"11002": 2},
+        }
+
+        exported = client.get("/shipments/export?status=out_for_delivery", headers=headers).text.splitlines()
+        assert [event["status"] for event in json.loads(exported[0])["tracking_events"]] == [
+            "placed",
+            "in_transit",
+            "out_for_delivery",
+        ]
+
+        assert client.delete(f"/shipment/{shipment_id}", headers=headers).status_code == 200
+        assert client.get(f"/shipment/{shipment_id}", headers=headers).status_code == 404
+
+
+class TestShipmentETag:
+    """Test the cached GET /shipment/{id} body and conditional requests"""
+
+    def test_not_modified_until_written(self, client, admin_token, reset_db):
+        """Test If-None-Match gets 304 until the shipment changes"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        first = client.get("/shipment/12701", headers=headers)
+        etag = first.headers["etag"]
+        assert etag.startswith('"1-')
+        assert first.json()["id"] == 12701
+
+        again = client.get("/shipment/12701", headers=headers)
+        assert again.content == first.content
+        assert again.headers["etag"] == etag
+        assert get_shipment_response_cache().stats()["hits"] >= 1
+
+        for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            cached = client.get("/shipment/12701", headers={**headers, "If-None-Match": if_none_match})
+            assert cached.status_code == 304
+            assert cached.headers["etag"] == etag
+            assert cached.content == b""
+        assert client.get("/shipment/12701", headers={**headers, "If-None-Match": '"other"'}).status_code == 200
+
+        client.patch("/shipment/12701", json={"current_status": "in_transit"}, headers=headers)
+        changed = client.get("/shipment/12701", headers={**headers, "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"].startswith('"2-')
+        assert changed.json()["current_status"] == "in_transit"
+
+        client.post(
+            "/shipment/12701/tracking",
+            json={"location": "Hub", "description": "Out", "status": "out_for_delivery"},
+            headers=headers,
+        )
+        assert client.get("/shipment/12701", headers=headers).headers["etag"].startswith('"3-')
+
+    def test_if_match(self, client, admin_token, courier_token, reset_db):
+        """Test PATCH and tracking POST only apply while If-Match names the current version"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        etag = client.get("/shipment/12701", headers=headers).headers["etag"]
+
+        updated = client.patch(
+            "/shipment/12701", json={"destination_code": 7}, headers={**headers, "If-Match": f'"other", {etag}'}
+        )
+        assert updated.status_code == 200
+        assert updated.json()["destination_code"] == 7
+        new_etag = updated.headers["etag"]
+        assert new_etag.startswith('"2-')
+        assert client.get("/shipment/12701", headers=headers).headers["etag"] == new_etag
+
+        for stale in (etag, f"W/{new_etag}"):
+            conflict = client.patch(
+                "/shipment/12701", json={"destination_code": 8}, headers={**headers, "If-Match": stale}
+            )
+            assert conflict.status_code == 412
+            assert conflict.headers["etag"] == new_etag
+        assert client.get("/shipment/12701", headers=headers).json()["destination_code"] == 7
+
+        scan = {"location": "Hub", "description": "Scan", "status": "in_transit"}
+        courier = {"Authorization": f"Bearer {courier_token}"}
+        response = client.post("/shipment/12701/tracking", json=scan, headers={**courier, "If-Match": etag})
+        assert response.status_code == 412
+        response = client.post("/shipment/12701/tracking", json=scan, headers={**courier, "If-Match": new_etag})
+        assert response.status_code == 201
+        response = client.post("/shipment/12701/tracking", json=scan, headers={**courier, "If-Match": "*"})
+        assert response.status_code == 201
+        missing = client.patch("/shipment/99999", json={"destination_code": 8}, headers={**headers, "If-Match": "*"})
+        assert missing.status_code == 404
+
+    def test_reset_and_delete_invalidate(self, client, admin_token, reset_db):
+        """Test reloading the repository or deleting the shipment never serves the cached body"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        client.patch("/shipment/12701", json={"current_status": "in_transit"}, headers=headers)
+        assert client.get("/shipment/12701", headers=headers).json()["current_status"] == "in_transit"
+
+        initialize_sample_data()
+        assert client.get("/shipment/12701", headers=headers).json()["current_status"] == "placed"
+
+        client.delete("/shipment/12701", headers=headers)
+        assert client.get("/shipment/12701", headers=headers).status_code == 404
+
+    def test_cache_is_bounded(self):
+        """Test the cache evicts least recently used entries and checks the rendered state"""
+        cache = ResponseCache(max_size=2)
+        cache.put(1, "v1", '"a"', b"1")
+        cache.put(2, "v1", '"b"', b"2")
+        assert cache.get(1, "v1") == ('"a"', b"1")
+        cache.put(3, "v1", '"c"', b"3")
+        assert cache.get(2, "v1") is None
+        assert cache.get(1, "v2") is None
+        assert cache.stats()["evictions"] == 1
+
+        ResponseCache(max_size=0).put(1, "v1", '"a"', b"1")
+        assert make_etag(1, b"x") != make_etag(1, b"y") != make_etag(2, b"y")
+        assert not etag_matches(None, make_etag(1, b"x"))
+        assert etag_matches_version(f'"other", {make_etag(12, b"x")}', 12)
+        assert not etag_matches_version(make_etag(12, b"x"), 1)
+        assert not etag_matches_version(f"W/{make_etag(12, b'x')}", 12)
+        assert etag_matches_version("*", 3)
+
+    def test_striped_lock(self):
+        """Test keys map onto a bounded set of locks acquired once each, in order"""
+        locks = StripedLock(4)
+        assert locks.stripe(1) == locks.stripe(5) != locks.stripe(2)
+        with locks.hold(5, 1, 2, 1):
+            held = [lock.locked() for lock in locks._locks]
+            assert held == [index in (locks.stripe(1), locks.stripe(2)) for index in range(4)]
+        assert not any(lock.locked() for lock in locks._locks)
+        assert StripedLock(0).stripes == 1
@@ -4,6 +4,17 @@ Statistics and Health Tests
 Tests for statistics endpoints and health checks.
 """
 
+import pstats
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import is_admin_token
+from app.config import settings
+from app.core.metrics import MetricsRegistry, timed
+from app.core.profiling import ProfileStore, ProfilingMiddleware, set_profile_store
+from app.main import app
 
 
 class TestStatistics:
@@ -32,6 +43,39 @@ class TestStatistics:
         # Check total matches sum of status counts
         status_sum = sum(data["by_status"].values())
         assert data["total_shipments"] == status_sum
+        assert data["total_shipments"] == sum(data["by_destination"].values())
+
+    def test_stats_follow_writes(self, client, admin_token, reset_db, sample_shipment_data):
+        """Test counters are updated by shipment writes"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        before = client.get("/stats", headers=headers).json()
+        client.post("/shipment/", json=sample_shipment_data, headers=headers)
+        client.delete("/shipment/12701", headers=headers)
+
+        data = client.get("/stats", headers=headers).json()
+        assert data["total_shipments"] == before["total_shipments"]
+        assert data["by_status"] == {"placed": 1}
+        assert data["by_destination"] == {str(sample_shipment_data["destination_code"]): 1}
+
+    def test_recount(self, client, admin_token, reset_db):
+        """Test admin recount reports and repairs counter drift"""
+        from app.storage import get_shipment_repository
+
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        response = client.post("/stats/recount", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["drift"] is False
+
+        get_shipment_repository().counters.clear()
+        data = client.post("/stats/recount", headers=headers).json()
+        assert data["drift"] is True
+        assert data["total_shipments"] == 1
+        assert client.get("/stats", headers=headers).json()["total_shipments"] == 1
+
+    def test_recount_as_non_admin_forbidden(self, client, courier_token, reset_db):
+        """Test non-admin cannot trigger a recount"""
+        response = client.post("/stats/recount", headers={"Authorization": f"Bearer {courier_token}"})
+        assert response.status_code == 403
 
 
 class TestHealthCheck:
@@ -58,3 +102,183 @@ class TestHealthCheck:
         assert "message" in data
         assert "version" in data
         assert "LOGIXPress" in data["message"]
+
+
+class TestMetrics:
+    """Test latency metrics and the /metrics endpoint"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test observations land in the first bucket whose bound they do not exceed"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("op_seconds", "Op latency", ("op",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(("read",), value)
+        lines = registry.render().splitlines()
+        assert lines[:2] == ["# HELP op_seconds Op latency", "# TYPE op_seconds histogram"]
+        assert lines[2:] == [
+            'op_seconds_bucket{op="read",le="0.1"} 2',
+            'op_seconds_bucket{op="read",le="1.0"} 3',
+            'op_seconds_bucket{op="read",le="+Inf"} 4',
+            'op_seconds_sum{op="read"} 2.65',
+            'op_seconds_count{op="read"} 4',
+        ]
+
+    def test_threads_record_into_their_own_shards(self):
+        """Test concurrent observations from many threads all add up"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("op_seconds", "Op latency", ("op",), buckets=(1.0,))
+        gauge = registry.gauge("busy", "Busy workers", ())
+
+        def worker():
+            for _ in range(1000):
+                histogram.observe(("write",), 0.5)
+            gauge.add((), 1)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert 'op_seconds_count{op="write"} 8000' in registry.render()
+        assert "busy 8" in registry.render()
+        assert len(registry._shards) == 8
+
+    def test_label_values_are_escaped(self):
+        """Test quotes, backslashes and newlines in label values are escaped"""
+        registry = MetricsRegistry()
+        registry.gauge("g", "Gauge", ("name",)).add(('a"b\\c\nd',), 1)
+        assert 'g{name="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+    def test_timed_records_failed_calls(self, client):
+        """Test the service timer records calls that raise"""
+
+        @timed("test.failing")
+        def failing():
+            raise ValueError("boom")
+
+        try:
+            failing()
+        except ValueError:
+            pass
+        assert 'logixpress_service_duration_seconds_count{operation="test.failing"} 1' in client.get("/metrics").text
+
+    def test_metrics_endpoint(self, client, admin_token, reset_db):
+        """Test request latency is reported per route template, method and status"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        for shipment_id in (12701, 99999):
+            client.get(f"/shipment/{shipment_id}", headers=headers)
+        client.get("/no-such-route")
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+        text = response.text
+        assert "# TYPE logixpress_http_request_duration_seconds histogram" in text
+        assert 'method="GET",route="/shipment/{shipment_id}",status="200",le="+Inf"}' in text
+        assert 'route="/no-such-route"' not in text
+        assert 'logixpress_http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}' in text
+        assert 'logixpress_http_requests_in_flight{method="GET"} 1' in text
+        assert 'logixpress_service_duration_seconds_count{operation="shipment.get"}' in text
+
+    def test_password_verification_is_timed(self, client):
+        """Test bcrypt verification during login is reported"""
+        client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+        assert 'operation="password.verify"' in client.get("/metrics").text
+
+    def test_metrics_no_auth_required(self, client):
+        """Test /metrics can be scraped without a token"""
+        assert client.get("/metrics").status_code == 200
+
+
+class TestProfiling:
+    """Test on-demand request profiling and the /profiles endpoints"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        store = ProfileStore(tmp_path / "profiles", keep=2)
+        set_profile_store(store)
+        yield store
+        set_profile_store(None)
+
+    def profiled_client(self, **options):
+        return TestClient(ProfilingMiddleware(app, authorize=is_admin_token, **options))
+
+    def test_admin_header_profiles_request(self, store, admin_token, reset_db):
+        """Test an admin's X-Profile header saves a pstats profile named in X-Profile-Id"""
+        client = self.profiled_client()
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        response = client.get("/shipments", headers={**headers, "X-Profile": "1"})
+        assert response.status_code == 200
+        name = response.headers["X-Profile-Id"]
+        assert name.endswith("-GET-shipments.pstats")
+
+        listing = client.get("/profiles", headers=headers).json()
+        assert [profile["name"] for profile in listing["profiles"]] == [name]
+        download = client.get(f"/profiles/{name}", headers=headers)
+        assert download.status_code == 200
+        stats = pstats.Stats(str(store.path(name)))
+        assert any(function == "get_shipments_page" for _, _, function in stats.stats)
+        assert len(download.content) == listing["profiles"][0]["size"]
+
+    def test_header_ignored_without_admin(self, store, courier_token, reset_db):
+        """Test X-Profile from anonymous or non-admin callers is ignored"""
+        client = self.profiled_client()
+        for headers in ({}, {"Authorization": f"Bearer {courier_token}"}, {"Authorization": "Bearer invalid"}):
+            response = client.get("/health", headers={**headers, "X-Profile": "1"})
+            assert "X-Profile-Id" not in response.headers
+        assert client.get("/health").status_code == 200
+        assert store.list() == []
+
+    def test_sampling_profiler_and_rate(self, store, reset_db):
+        """Test sampled requests get collapsed stacks and only the newest profiles are kept"""
+        client = self.profiled_client(profiler="sampling", sample_rate=1.0, sample_interval=0.0005)
+        names = [client.get("/health").headers["X-Profile-Id"] for _ in range(3)]
+        assert all(name.endswith("-GET-health.collapsed") for name in names)
+        assert [profile["name"] for profile in store.list()] == names[:0:-1]
+        for line in store.path(names[-1]).read_text().splitlines():
+            stack, _, count = line.rpartition(" ")
+            assert ";" in stack and int(count) > 0
+
+    def test_profile_stops_after_max_seconds(self, store, reset_db):
+        """Test a long response is only profiled up to max_seconds"""
+        client = self.profiled_client(sample_rate=1.0, max_seconds=0)
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert store.path(response.headers["X-Profile-Id"]).stat().st_size > 0
+
+    def test_one_request_profiled_at_a_time(self, store, reset_db):
+        """Test requests arriving while another is profiled run unprofiled"""
+        middleware = ProfilingMiddleware(app, authorize=is_admin_token, sample_rate=1.0)
+        middleware._busy.acquire()
+        try:
+            response = TestClient(middleware).get("/health")
+        finally:
+            middleware._busy.release()
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
+
+    def test_frame_name_without_qualname(self):
+        """Test stack frames are named by co_name where code objects have no co_qualname"""
+        from types import SimpleNamespace
+
+        from app.core.profiling import _frame_name
+
+        code = SimpleNamespace(co_filename="/elsewhere/module.py", co_name="handler", co_firstlineno=7)
+        assert _frame_name(SimpleNamespace(f_code=code)) == "handler (/elsewhere/module.py:7)"
+
+    def test_unknown_profiler_rejected(self):
+        """Test an unknown PROFILER value is reported"""
+        with pytest.raises(ValueError, match="Unknown profiler"):
+            ProfilingMiddleware(app, authorize=is_admin_token, profiler="perf")
+
+    def test_profiles_require_admin(self, client, courier_token, admin_token, store, reset_db):
+        """Test listing and downloading profiles is admin-only and names are validated"""
+        assert client.get("/profiles", headers={"Authorization": f"Bearer {courier_token}"}).status_code == 403
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        assert client.get("/profiles", headers=headers).json()["profiles"] == []
+        assert client.get("/profiles/..%2Fsecret.pstats", headers=headers).status_code == 404
+        assert client.get("/profiles/20260101T000000Z-GET-x.pstats", headers=headers).status_code == 404
+
+    def test_disabled_by_default(self):
+        """Test the profiling middleware is not installed unless enabled"""
+        assert not settings.PROFILING_ENABLED
+        assert all(middleware.cls is not ProfilingMiddleware for middleware in app.user_middleware)
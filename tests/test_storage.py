@@ -0,0 +1,1020 @@
+"""
+Storage Tests
+
+Tests for the shipment repositories and user stores, and the data structures backing them.
+"""
+
+import json
+import pickle
+import subprocess
+import sys
+import threading
+import tracemalloc
+from datetime import datetime
+
+import pytest
+
+from app.core.exceptions import LogixpressException
+from app.storage.id_allocator import IdAllocator
+from app.storage.indexes import SecondaryIndex, SortedIndex, TextIndex, plan_query, tokenize
+from app.storage.records import STATUS_CODES, ShipmentRecord, TrackingEventRecord
+from app.storage.users import normalize_email
+from app.storage.wal import WriteAheadLog
+
+
+class TestSecondaryIndex:
+    """Test secondary index maintenance"""
+
+    def test_add_and_get(self):
+        """Test adding IDs under a key"""
+        index = SecondaryIndex()
+        index.add("placed", 1)
+        index.add("placed", 2)
+        assert index.get("placed") == {1, 2}
+        assert index.get("delivered") == set()
+
+    def test_remove_drops_empty_posting(self):
+        """Test removing the last ID drops the key"""
+        index = SecondaryIndex()
+        index.add("placed", 1)
+        index.remove("placed", 1)
+        index.remove("missing", 1)
+        assert index.get("placed") == set()
+
+    def test_move(self):
+        """Test moving an ID between keys"""
+        index = SecondaryIndex()
+        index.add("placed", 1)
+        index.move("placed", "in_transit", 1)
+        index.move("in_transit", "in_transit", 1)
+        assert index.get("placed") == set()
+        assert index.get("in_transit") == {1}
+
+    def test_clear(self):
+        """Test clearing the index"""
+        index = SecondaryIndex()
+        index.add(11002, 1)
+        index.clear()
+        assert index.get(11002) == set()
+
+
+class TestSortedIndex:
+    """Test the ordered index used for keyset pagination"""
+
+    def test_add_keeps_order(self):
+        """Test in-order and out-of-order inserts"""
+        index = SortedIndex()
+        for key in (3, 5, 1, 4):
+            index.add(key)
+        assert list(index.scan()) == [1, 3, 4, 5]
+        assert len(index) == 4
+
+    def test_scan_after(self, monkeypatch):
+        """Test scans resume strictly after a key, across chunks"""
+        monkeypatch.setattr(SortedIndex, "SCAN_CHUNK", 2)
+        index = SortedIndex()
+        index.rebuild([5, 1, 3, 2, 4])
+        assert list(index.scan(after=2)) == [3, 4, 5]
+        assert list(index.scan(after=5)) == []
+
+    def test_remove(self):
+        """Test removing present and missing keys"""
+        index = SortedIndex()
+        index.rebuild([(2, 1), (1, 2)])
+        index.remove((2, 1))
+        index.remove((9, 9))
+        assert list(index.scan()) == [(1, 2)]
+        index.clear()
+        assert len(index) == 0
+        index.remove((1, 2))
+
+    def test_blocks_ranges_and_reverse(self, monkeypatch):
+        """Test range counts and scans in both directions stay exact as blocks split and empty"""
+        monkeypatch.setattr(SortedIndex, "BLOCK_SIZE", 2)
+        monkeypatch.setattr(SortedIndex, "SCAN_CHUNK", 3)
+        index = SortedIndex()
+        for key in (5, 1, 9, 3, 7, 2, 8, 6, 4, 0):
+            index.add(key)
+        for key in (0, 1, 2, 8):
+            index.remove(key)
+        assert list(index.scan()) == [3, 4, 5, 6, 7, 9]
+        counts = [index.count(), index.count(4, 9), index.count(low=6), index.count(high=5), index.count(9, 4)]
+        assert counts == [6, 4, 3, 2, 0]
+        assert list(index.scan(after=4, high=9)) == [5, 6, 7]
+        assert list(index.scan(after=1, low=5)) == [5, 6, 7, 9]
+        assert list(index.scan(reverse=True)) == [9, 7, 6, 5, 4, 3]
+        assert list(index.scan(after=9, low=4, reverse=True)) == [7, 6, 5, 4]
+        assert list(index.scan(after=10, high=6, reverse=True)) == [5, 4, 3]
+        assert list(index.scan(after=3, reverse=True)) == []
+        assert list(SortedIndex().scan(reverse=True)) == []
+
+
+class TestQueryPlanner:
+    """Test posting intersection"""
+
+    def test_no_filters(self):
+        """Test no filters means no restriction"""
+        assert plan_query([]) is None
+
+    def test_single_posting(self):
+        """Test a single filter returns its posting"""
+        assert plan_query([{1, 2, 3}]) == {1, 2, 3}
+
+    def test_intersection(self):
+        """Test postings are intersected"""
+        assert plan_query([{1, 2, 3, 4}, {2, 4, 6}, {4, 2}]) == {2, 4}
+
+    def test_empty_posting_short_circuits(self):
+        """Test an empty posting yields no matches"""
+        assert plan_query([{1, 2}, set(), {1}]) == set()
+
+
+class TestTextIndex:
+    """Test the inverted index behind full-text search"""
+
+    def test_tokenize(self):
+        """Test words are case-folded and stripped of accents and punctuation"""
+        assert tokenize("Jl. Sudirman No.12, JAKARTA-Selatan") == ["jl", "sudirman", "no", "12", "jakarta", "selatan"]
+        assert tokenize("Café_Ökonomie") == ["cafe", "okonomie"]
+        assert tokenize(" -- ") == []
+
+    def test_ranked_and_query(self):
+        """Test every word must match and weightier fields rank first"""
+        index = TextIndex((3.0, 1.0))
+        index.add(1, ("Budi", "Copper wires to Jakarta"))
+        index.add(2, ("Copper Jakarta", "Steel"))
+        index.add(3, ("Ani", "Jakarta Selatan"))
+        assert index.search("copper jakarta", 10) == [2, 1]
+        assert index.search("jakarta", 2) == [2, 1]
+        assert index.search("copper selatan", 10) == []
+        assert index.search("unknown", 10) == []
+        assert index.search("", 10) == []
+
+    def test_rare_word_probes_long_list(self):
+        """Test a rare word is matched against a much longer list by binary search"""
+        index = TextIndex((1.0,))
+        index.rebuild(
+            (shipment_id, (f"box {'rare' if shipment_id in (40, 41) else ''}",)) for shipment_id in range(100)
+        )
+        index.add(200, ("rare",))
+        assert index.search("rare box", 10) == [40, 41]
+        assert index.search("box", 3) == [0, 1, 2]
+
+    def test_incremental_updates(self):
+        """Test adding out of order, replacing and removing keep posting lists consistent"""
+        index = TextIndex((1.0,))
+        index.add(5, ("red box",))
+        index.add(2, ("red crate",))
+        assert index.search("red", 10) == [2, 5]
+        index.replace(5, ("red box",), ("blue box",))
+        assert index.search("red", 10) == [2]
+        assert index.search("blue box", 10) == [5]
+        index.remove(2, ("red crate",))
+        index.remove(2, ("red crate",))
+        assert index.search("red", 10) == []
+        index.rebuild([(7, ("green",)), (3, ("green",))])
+        assert (index.search("green", 10), index.search("blue", 10), len(index)) == ([3, 7], [], 2)
+        index.clear()
+        assert index.search("green", 10) == []
+        with pytest.raises(ValueError):
+            TextIndex((1.0,) * 5)
+
+    def test_single_word_on_long_list(self):
+        """Test a one-word query over a rank-grouped list matches ranking the whole list"""
+        grouped, plain = TextIndex((3.0, 1.0)), TextIndex((3.0, 1.0))
+        grouped.RANKED_MIN, plain.RANKED_MIN = 4, 10**9
+
+        def documents(shipment_id):
+            return ("box" if shipment_id % 3 else "crate", "box" if shipment_id % 2 else "crate")
+
+        for index in (grouped, plain):
+            index.rebuild((shipment_id, documents(shipment_id)) for shipment_id in range(0, 40, 2))
+            for shipment_id in range(39, 0, -2):
+                index.add(shipment_id, documents(shipment_id))
+            for shipment_id in range(0, 40, 5):
+                index.remove(shipment_id, documents(shipment_id))
+            index.replace(7, documents(7), ("box", "box"))
+        assert grouped._ranked
+        for limit in (1, 5, 40):
+            assert grouped.search("box", limit) == plain.search("box", limit)
+            assert grouped.search("crate", limit) == plain.search("crate", limit)
+
+
+class TestIdAllocator:
+    """Test block-reserving ID allocation"""
+
+    def test_monotonic_allocation(self):
+        """Test IDs are consecutive starting at start"""
+        allocator = IdAllocator(start=100, block_size=3)
+        assert [allocator.allocate() for _ in range(7)] == list(range(100, 107))
+
+    def test_allocate_block(self):
+        """Test block allocation never overlaps single allocations"""
+        allocator = IdAllocator(start=1, block_size=10)
+        first = allocator.allocate()
+        block = allocator.allocate_block(5)
+        large = allocator.allocate_block(50)
+        after = allocator.allocate()
+        ids = [first, *block, *large, after]
+        assert len(set(ids)) == len(ids)
+        assert list(block) == list(range(2, 7))
+
+    def test_ensure_above(self):
+        """Test existing IDs are skipped"""
+        allocator = IdAllocator(start=1, block_size=10)
+        allocator.allocate()
+        allocator.ensure_above(500)
+        assert allocator.allocate() == 501
+        allocator.ensure_above(10)
+        assert allocator.allocate() == 502
+
+    def test_persisted_high_water_mark_survives_restart(self, tmp_path):
+        """Test a new allocator on the same file never reuses IDs"""
+        path = tmp_path / "ids.hwm"
+        first = IdAllocator(start=100, block_size=10, path=path)
+        used = [first.allocate() for _ in range(3)]
+
+        restarted = IdAllocator(start=100, block_size=10, path=path)
+        assert restarted.allocate() > max(used)
+        assert path.read_text() == "120"
+
+    def test_workers_sharing_file_do_not_collide(self, tmp_path):
+        """Test two allocators on one file reserve disjoint blocks"""
+        path = tmp_path / "ids.hwm"
+        worker_a = IdAllocator(start=1, block_size=4, path=path)
+        worker_b = IdAllocator(start=1, block_size=4, path=path)
+        ids = []
+        for _ in range(10):
+            ids.append(worker_a.allocate())
+            ids.append(worker_b.allocate())
+        assert len(set(ids)) == len(ids)
+
+
+class TestWriteAheadLog:
+    """Test WAL append, snapshot and recovery"""
+
+    def test_recover_empty(self, tmp_path):
+        """Test recovering an empty directory"""
+        wal = WriteAheadLog(tmp_path)
+        assert wal.recover() == (None, [])
+        wal.close()
+
+    def test_append_and_recover(self, tmp_path):
+        """Test appended records are replayed in order"""
+        wal = WriteAheadLog(tmp_path, fsync_interval_ms=0)
+        for i in range(5):
+            wal.append({"op": "create", "id": i})
+        wal.close()
+
+        state, records = WriteAheadLog(tmp_path).recover()
+        assert state is None
+        assert [record["id"] for record in records] == [0, 1, 2, 3, 4]
+
+    def test_group_commit_flusher(self, tmp_path):
+        """Test batched appends are flushed by the background thread"""
+        wal = WriteAheadLog(tmp_path, fsync_interval_ms=1)
+        for i in range(100):
+            wal.append({"id": i})
+        wal.sync()
+        wal.close()
+        assert len(WriteAheadLog(tmp_path).recover()[1]) == 100
+
+    def test_snapshot_truncates_log(self, tmp_path):
+        """Test a snapshot supersedes earlier records"""
+        wal = WriteAheadLog(tmp_path, fsync_interval_ms=0, snapshot_every=3)
+        wal.recover()
+        for i in range(3):
+            wal.append({"id": i})
+        assert wal.should_snapshot()
+        wal.snapshot({"ids": [0, 1, 2]})
+        assert not wal.should_snapshot()
+        wal.append({"id": 3})
+        wal.close()
+
+        state, records = WriteAheadLog(tmp_path).recover()
+        assert state == {"ids": [0, 1, 2]}
+        assert records == [{"id": 3}]
+        assert len(list(tmp_path.glob("wal-*.log"))) == 1
+        assert len(list(tmp_path.glob("snapshot-*.pkl"))) == 1
+
+    def test_torn_tail_is_discarded(self, tmp_path):
+        """Test a partially written frame is dropped and appends continue"""
+        wal = WriteAheadLog(tmp_path, fsync_interval_ms=0)
+        wal.append({"id": 1})
+        wal.append({"id": 2})
+        wal.close()
+        segment = next(tmp_path.glob("wal-*.log"))
+        segment.write_bytes(segment.read_bytes()[:-3])
+
+        wal = WriteAheadLog(tmp_path, fsync_interval_ms=0)
+        assert wal.recover()[1] == [{"id": 1}]
+        wal.append({"id": 3})
+        wal.close()
+        assert WriteAheadLog(tmp_path).recover()[1] == [{"id": 1}, {"id": 3}]
+
+
+def _shipment_dict(status: str = "placed", destination_code: int = 11002) -> dict:
+    now = datetime(2024, 12, 1, 9, 0, 0)
+    return {
+        "package_details": {"content": "rods", "weight": 2.0, "dimensions": None, "fragile": False},
+        "recipient": {"name": "Ani", "email": "ani@example.com", "phone": "0812", "address": "Jakarta"},
+        "seller": {"name": "Store", "email": "store@example.com", "phone": "021"},
+        "destination_code": destination_code,
+        "current_status": status,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _event_dict(status: str = "placed") -> dict:
+    return {"location": "Hub", "description": "Scan", "status": status, "timestamp": datetime(2024, 12, 1, 10, 0, 0)}
+
+
+def _shipment(status: str = "placed", destination_code: int = 11002) -> ShipmentRecord:
+    return ShipmentRecord.from_dict(_shipment_dict(status, destination_code))
+
+
+def _event(status: str = "placed") -> TrackingEventRecord:
+    return TrackingEventRecord.from_dict(_event_dict(status))
+
+
+class TestShipmentRecord:
+    """Test the compact shipment record layout"""
+
+    def test_dict_round_trip(self):
+        """Test records convert losslessly to and from schema-shaped dicts"""
+        shipment = {**_shipment_dict("in_transit"), "tracking_events": [{"id": 4, **_event_dict("in_transit")}]}
+        record = ShipmentRecord.from_dict(shipment)
+        assert record.current_status == "in_transit"
+        assert record.status_code == STATUS_CODES["in_transit"]
+        assert record.to_dict() == shipment
+
+    def test_pickle_round_trip(self):
+        """Test records survive pickling as used by the WAL"""
+        record = _shipment()
+        record.tracking_events.append(_event())
+        assert pickle.loads(pickle.dumps(record)).to_dict() == record.to_dict()
+
+    def test_unpickles_records_without_version(self):
+        """Test records pickled before versions existed load at version 1"""
+        record = _shipment()
+        record.version = 5
+        constructor, args = record.__reduce__()
+        assert args[-1] == 5
+        assert constructor(*args[:-1]).version == 1
+
+    def test_memory_per_shipment(self):
+        """Test records take substantially less memory than the dict of dicts layout"""
+
+        def measure(build) -> float:
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            rows = [build(n) for n in range(2000)]
+            used = tracemalloc.get_traced_memory()[0] - before
+            tracemalloc.stop()
+            del rows
+            return used / 2000
+
+        def legacy(n: int) -> dict:
+            shipment = _shipment_dict(destination_code=n)
+            shipment["recipient"] = {**shipment["recipient"], "name": f"Recipient {n}"}
+            shipment["tracking_events"] = [{"id": n, **_event_dict()}]
+            return shipment
+
+        def compact(n: int) -> ShipmentRecord:
+            return ShipmentRecord.from_dict(legacy(n))
+
+        legacy_bytes, record_bytes = measure(legacy), measure(compact)
+        print(f"bytes per shipment: dict={legacy_bytes:.0f} record={record_bytes:.0f}")
+        assert record_bytes < legacy_bytes * 0.6
+
+
+class TestShipmentRepository:
+    """Contract tests run against every storage backend"""
+
+    def test_create_and_get(self, shipment_repository):
+        """Test a created shipment is readable with its first event"""
+        shipment_id = shipment_repository.create(_shipment(), _event())
+        stored = shipment_repository.get(shipment_id)
+        assert stored.recipient_name == "Ani"
+        assert stored.created_at == datetime(2024, 12, 1, 9, 0, 0)
+        assert [event.status for event in stored.tracking_events] == ["placed"]
+        assert shipment_repository.get(shipment_id + 1000) is None
+
+    def test_ids_are_unique(self, shipment_repository):
+        """Test IDs keep increasing"""
+        ids = [shipment_repository.create(_shipment(), _event()) for _ in range(3)]
+        assert ids == sorted(set(ids))
+
+    def test_list_filters(self, shipment_repository):
+        """Test status and destination filters, alone and combined"""
+        placed = shipment_repository.create(_shipment("placed", 1), _event())
+        transit = shipment_repository.create(_shipment("in_transit", 1), _event())
+        other = shipment_repository.create(_shipment("in_transit", 2), _event())
+
+        def ids(**filters):
+            return [shipment_id for shipment_id, _ in shipment_repository.list_shipments(**filters)]
+
+        assert ids() == [placed, transit, other]
+        assert ids(limit=1) == [placed]
+        assert ids(status="in_transit") == [transit, other]
+        assert ids(destination_code=1) == [placed, transit]
+        assert ids(status="in_transit", destination_code=2) == [other]
+
+    def test_keyset_pages(self, shipment_repository):
+        """Test paging by ID and by creation time, with and without filters"""
+        created = {}
+        for n in range(12):
+            shipment = _shipment("in_transit" if n % 3 else "placed", 1 + n % 2)
+            shipment.created_at = datetime(2024, 12, 1, 12 - n)
+            created[shipment_repository.create(shipment, _event())] = shipment.created_at
+
+        def walk(order_by, **filters):
+            keys, after = [], None
+            while True:
+                rows = shipment_repository.list_shipments(limit=5, order_by=order_by, after=after, **filters)
+                if not rows:
+                    return keys
+                shipment_id, shipment = rows[-1]
+                after = shipment_id if order_by == "id" else (shipment.created_at, shipment_id)
+                keys.extend(shipment_id for shipment_id, _ in rows)
+
+        by_id = sorted(created)
+        by_time = sorted(created, key=lambda shipment_id: (created[shipment_id], shipment_id))
+        assert walk("id") == by_id
+        assert walk("created_at") == by_time
+        for filters in ({"status": "in_transit"}, {"status": "placed", "destination_code": 1}, {"destination_code": 2}):
+            rows = dict(shipment_repository.list_shipments(limit=100, **filters))
+            assert walk("id", **filters) == [shipment_id for shipment_id in by_id if shipment_id in rows]
+            assert walk("created_at", **filters) == [shipment_id for shipment_id in by_time if shipment_id in rows]
+        assert walk("id", status="delivered") == []
+
+    def test_date_ranges_and_descending(self, shipment_repository):
+        """Test created/updated ranges combine with filters, every order and both directions"""
+        for n in range(12):
+            shipment = _shipment("in_transit" if n % 3 else "placed", 1 + n % 2)
+            shipment.created_at = shipment.updated_at = datetime(2024, 12, 1, 12 - n)
+            shipment_id = shipment_repository.create(shipment, _event())
+            if n % 4 == 0:
+                shipment_repository.add_event(shipment_id, _event("in_transit"), datetime(2024, 12, 2, n))
+        rows = dict(shipment_repository.list_shipments(limit=100))
+
+        def expected(order_by, descending, status=None, created_from=None, created_to=None, updated_since=None):
+            keys = [
+                shipment_id if order_by == "id" else (getattr(shipment, order_by), shipment_id)
+                for shipment_id, shipment in rows.items()
+                if (status is None or shipment.current_status == status)
+                and (created_from is None or shipment.created_at >= created_from)
+                and (created_to is None or shipment.created_at < created_to)
+                and (updated_since is None or shipment.updated_at >= updated_since)
+            ]
+            return [key if order_by == "id" else key[1] for key in sorted(keys, reverse=descending)]
+
+        def walk(limit, order_by, descending, **filters):
+            ids, after = [], None
+            while True:
+                page = shipment_repository.list_shipments(
+                    limit=limit, order_by=order_by, after=after, descending=descending, **filters
+                )
+                if not page:
+                    return ids
+                shipment_id, shipment = page[-1]
+                after = shipment_id if order_by == "id" else (getattr(shipment, order_by), shipment_id)
+                ids.extend(shipment_id for shipment_id, _ in page)
+
+        for filters in (
+            {},
+            {"created_from": datetime(2024, 12, 1, 3), "created_to": datetime(2024, 12, 1, 9)},
+            {"updated_since": datetime(2024, 12, 1, 10)},
+            {"status": "in_transit", "created_to": datetime(2024, 12, 1, 8), "updated_since": datetime(2024, 12, 1, 2)},
+            {"created_from": datetime(2024, 12, 5)},
+        ):
+            for order_by in ("id", "created_at", "updated_at"):
+                for descending in (False, True):
+                    for limit in (1, 5, 100):
+                        assert walk(limit, order_by, descending, **filters) == expected(order_by, descending, **filters)
+        """Test updates overwrite fields and append the event"""
+        shipment_id = shipment_repository.create(_shipment(), _event())
+        shipment_repository.update(
+            shipment_id, {"status_code": STATUS_CODES["in_transit"], "destination_code": 7}, _event("in_transit")
+        )
+        stored = shipment_repository.get(shipment_id)
+        assert stored.current_status == "in_transit"
+        assert stored.destination_code == 7
+        assert len(stored.tracking_events) == 2
+        assert shipment_repository.list_shipments(status="in_transit", destination_code=7)[0][0] == shipment_id
+
+    def test_add_event(self, shipment_repository):
+        """Test events move the shipment status"""
+        shipment_id = shipment_repository.create(_shipment(), _event())
+        event = shipment_repository.add_event(shipment_id, _event("in_transit"), datetime(2024, 12, 2))
+        assert event.status == "in_transit"
+        assert [e.id for e in shipment_repository.get_events(shipment_id)][-1] == event.id
+        assert shipment_repository.get(shipment_id).updated_at == datetime(2024, 12, 2)
+        assert shipment_repository.get_counts()["by_status"] == {"in_transit": 1}
+        assert shipment_repository.add_event(99999, _event(), datetime(2024, 12, 2)) is None
+        assert shipment_repository.get_events(99999) is None
+
+    def test_versions_follow_writes(self, shipment_repository):
+        """Test every write bumps the shipment version and load starts a new generation"""
+        shipment_id = shipment_repository.create(_shipment(), _event())
+        assert shipment_repository.get_version(shipment_id) == shipment_repository.get(shipment_id).version == 1
+        shipment_repository.update(shipment_id, {"destination_code": 7})
+        shipment_repository.update(shipment_id, {"status_code": STATUS_CODES["in_transit"]}, _event("in_transit"))
+        assert shipment_repository.get_version(shipment_id) == 3
+        shipment_repository.add_event(shipment_id, _event("delivered"), datetime(2024, 12, 2))
+        shipment_repository.add_events(
+            [(shipment_id, _event("returned"))], datetime(2024, 12, 3), lambda statuses, transitions: [None]
+        )
+        assert shipment_repository.get(shipment_id).version == 5
+        assert shipment_repository.get_version(99999) is None
+
+        generation = shipment_repository.generation
+        shipment_repository.load({shipment_id: {**_shipment_dict(), "tracking_events": []}})
+        assert shipment_repository.generation != generation
+        assert shipment_repository.get_version(shipment_id) == 1
+
+    def test_update_compare_and_set(self, shipment_repository):
+        """Test an update with an expected version only applies while the shipment is at that version"""
+        shipment_id = shipment_repository.create(_shipment(), _event())
+        assert shipment_repository.update(shipment_id, {"destination_code": 7}, expected_version=1) is True
+        event = _event("in_transit")
+        assert shipment_repository.update(shipment_id, {"destination_code": 8}, event, expected_version=1) is False
+        shipment = shipment_repository.get(shipment_id)
+        assert (shipment.version, shipment.destination_code, len(shipment.tracking_events)) == (2, 7, 1)
+        assert shipment_repository.update(shipment_id, {"destination_code": 8}) is True
+        assert shipment_repository.update(99999, {"destination_code": 8}) is False
+
+    def test_seed_only_fills_empty_store(self, shipment_repository):
+        """Test seeding loads an empty store and leaves one holding shipments alone"""
+        assert shipment_repository.seed({50000: {**_shipment_dict(), "tracking_events": []}}) is True
+        assert shipment_repository.seed({60000: {**_shipment_dict(), "tracking_events": []}}) is False
+        assert [shipment_id for shipment_id, _ in shipment_repository.list_shipments()] == [50000]
+        assert shipment_repository.create(_shipment(), _event()) > 50000
+
+    def test_events_since(self, shipment_repository):
+        """Test fetching the events after a known one, with and without a limit"""
+        shipment_id = shipment_repository.create(_shipment(), _event())
+        for status in ("in_transit", "out_for_delivery", "delivered"):
+            shipment_repository.add_event(shipment_id, _event(status), datetime(2024, 12, 2))
+        ids = [event.id for event in shipment_repository.get_events(shipment_id)]
+
+        def since(since_event_id=None, limit=None):
+            return [event.id for event in shipment_repository.get_events(shipment_id, since_event_id, limit)]
+
+        assert since(ids[1]) == ids[2:]
+        assert since(ids[0], limit=2) == ids[1:3]
+        assert since(limit=1) == ids[:1]
+        assert since(ids[-1]) == []
+        assert since(ids[1] + 1) == [i for i in ids if i > ids[1] + 1]
+        assert shipment_repository.get_events(99999, ids[0]) is None
+
+    def test_search(self, shipment_repository):
+        """Test full-text search follows creates, updates and deletes"""
+
+        def shipment(name, address, content, seller="Store"):
+            record = _shipment()
+            record.recipient_name, record.recipient_address, record.content = name, address, content
+            record.seller_name = seller
+            return record
+
+        wires = shipment_repository.create(shipment("Ahmad", "Jl. Kemang, Jakarta Selatan", "copper wires"), _event())
+        [pipes, named] = shipment_repository.create_many(
+            [
+                (shipment("Budi", "Bandung", "copper pipes", seller="Jakarta Copper"), _event()),
+                (shipment("Copper Jakarta", "Bogor", "wood"), _event()),
+            ]
+        )
+
+        def search(query, limit=10):
+            return [shipment_id for shipment_id, _ in shipment_repository.search(query, limit)]
+
+        assert search("copper wires Jakarta Selatan") == [wires]
+        assert search("JAKARTA copper") == [named, pipes, wires]
+        assert search("jakarta copper", limit=1) == [named]
+        assert search('selatan" OR *') == []
+        assert search("") == []
+        assert shipment_repository.search("wires")[0][1].recipient_name == "Ahmad"
+
+        shipment_repository.update(wires, {"recipient_address": "Surabaya", "content": "copper coils"})
+        shipment_repository.update(wires, {"status_code": STATUS_CODES["in_transit"]})
+        assert search("selatan") == []
+        assert search("surabaya coils") == [wires]
+        shipment_repository.delete(pipes)
+        assert search("copper") == [named, wires]
+
+    def test_delete(self, shipment_repository):
+        """Test deleting a shipment"""
+        shipment_id = shipment_repository.create(_shipment(), _event())
+        assert shipment_repository.delete(shipment_id) is True
+        assert shipment_repository.delete(shipment_id) is False
+        assert shipment_repository.get(shipment_id) is None
+        assert shipment_repository.get_counts() == {"total_shipments": 0, "by_status": {}, "by_destination": {}}
+
+    def test_load_replaces_contents(self, shipment_repository):
+        """Test load replaces everything and keeps IDs above loaded ones"""
+        shipment_repository.create(_shipment(), _event())
+        shipment_repository.load(
+            {50000: {**_shipment_dict("delivered"), "tracking_events": [{"id": 9, **_event_dict()}]}}
+        )
+        assert shipment_repository.get_counts()["by_status"] == {"delivered": 1}
+        assert shipment_repository.create(_shipment(), _event()) > 50000
+        assert shipment_repository.get_events(50000)[0].id == 9
+        assert shipment_repository.add_event(50000, _event(), datetime(2024, 12, 2)).id > 9
+
+    def test_create_many(self, shipment_repository):
+        """Test a batch gets consecutive IDs and numbered events"""
+        single = shipment_repository.create(_shipment(), _event())
+        ids = shipment_repository.create_many([(_shipment("placed", 3), _event()) for _ in range(3)])
+        assert ids == list(range(ids[0], ids[0] + 3))
+        assert ids[0] > single
+        event_ids = [shipment_repository.get_events(shipment_id)[0].id for shipment_id in ids]
+        assert len(set(event_ids)) == 3
+        assert shipment_repository.get_counts()["by_destination"] == {11002: 1, 3: 3}
+        assert shipment_repository.create_many([]) == []
+
+    def test_add_events(self, shipment_repository):
+        """Test a batch is validated in one call against the statuses read before writing"""
+        first = shipment_repository.create(_shipment(), _event())
+        second = shipment_repository.create(_shipment(), _event())
+        calls = []
+
+        def validate(statuses, transitions):
+            calls.append((statuses, transitions))
+            placed = STATUS_CODES["placed"]
+            return [
+                None if shipment_id in statuses and code != placed else LogixpressException("rejected")
+                for shipment_id, code in transitions
+            ]
+
+        events = [
+            (first, _event("in_transit")),
+            (99999, _event("in_transit")),
+            (first, _event("placed")),
+            (first, _event("delivered")),
+            (second, _event("returned")),
+        ]
+        results = shipment_repository.add_events(events, datetime(2024, 12, 3), validate)
+        assert [r.detail if isinstance(r, LogixpressException) else r.status for r in results] == [
+            "in_transit",
+            "rejected",
+            "rejected",
+            "delivered",
+            "returned",
+        ]
+        placed = STATUS_CODES["placed"]
+        assert calls == [({first: placed, second: placed}, [(i, event.status_code) for i, event in events])]
+        assert [e.status for e in shipment_repository.get_events(first)] == ["placed", "in_transit", "delivered"]
+        assert len({r.id for r in results if not isinstance(r, LogixpressException)}) == 3
+        assert shipment_repository.get(second).updated_at == datetime(2024, 12, 3)
+        assert shipment_repository.get_counts()["by_status"] == {"delivered": 1, "returned": 1}
+
+    def test_iter_shipments(self, shipment_repository):
+        """Test streaming batches with events and filters"""
+        ids = [shipment_repository.create(_shipment("placed", 1 + n % 2), _event()) for n in range(5)]
+        shipment_repository.add_event(ids[0], _event("in_transit"), datetime(2025, 1, 1))
+        shipment_repository.add_event(ids[4], _event("in_transit"), datetime(2025, 1, 1))
+
+        batches = list(shipment_repository.iter_shipments(batch_size=2))
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert [len(shipment.tracking_events) for batch in batches for _, shipment in batch] == [2, 1, 1, 1, 2]
+
+        def streamed(**filters):
+            return [shipment_id for batch in shipment_repository.iter_shipments(**filters) for shipment_id, _ in batch]
+
+        assert streamed(status="in_transit") == [ids[0], ids[4]]
+        assert streamed(destination_code=2) == [ids[1], ids[3]]
+        assert streamed(status="placed", destination_code=1, batch_size=1) == [ids[2]]
+        assert streamed(updated_since=datetime(2024, 12, 31)) == [ids[0], ids[4]]
+
+    def test_counters_follow_writes(self, shipment_repository):
+        """Test counters track creates, updates, events and deletes"""
+        first = shipment_repository.create(_shipment("placed", 1), _event())
+        second = shipment_repository.create(_shipment("placed", 1), _event())
+        shipment_repository.update(first, {"status_code": STATUS_CODES["in_transit"], "destination_code": 2})
+        shipment_repository.add_event(second, _event("out_for_delivery"), datetime(2024, 12, 2))
+        shipment_repository.create(_shipment("placed", 2), _event())
+        shipment_repository.delete(second)
+
+        expected = {"total_shipments": 2, "by_status": {"in_transit": 1, "placed": 1}, "by_destination": {2: 2}}
+        assert shipment_repository.get_counts() == expected
+        assert shipment_repository.recount() == expected
+
+    def test_recount_repairs_drift(self, shipment_repository):
+        """Test recount rebuilds counters from the stored shipments"""
+        shipment_repository.create(_shipment("placed", 1), _event())
+        if shipment_repository.blocking:
+            with shipment_repository.transaction() as conn:
+                conn.execute("UPDATE shipment_counters SET count = 5")
+        else:
+            shipment_repository.counters.add(STATUS_CODES["delivered"], 9)
+        assert shipment_repository.get_counts()["total_shipments"] != 1
+
+        expected = {"total_shipments": 1, "by_status": {"placed": 1}, "by_destination": {1: 1}}
+        assert shipment_repository.recount() == expected
+        assert shipment_repository.get_counts() == expected
+
+    def test_recover(self, shipment_repository):
+        """Test recover reports whether persisted state exists"""
+        if shipment_repository.blocking:
+            assert shipment_repository.recover() is False
+            shipment_repository.create(_shipment(), _event())
+            assert shipment_repository.recover() is True
+        else:
+            assert shipment_repository.recover() is False
+
+
+def _user(username, email, role="customer"):
+    return {"username": username, "email": email, "hashed_password": "$2b$hash", "role": role, "disabled": False}
+
+
+class TestUserStore:
+    """Contract tests run against every user store backend"""
+
+    def test_add_and_get(self, user_store):
+        """Test a stored user reads back unchanged"""
+        assert user_store.add(_user("alice", "Alice@Example.com")) is None
+        assert user_store.get("alice") == _user("alice", "Alice@Example.com")
+        assert user_store.get("bob") is None
+
+    def test_email_uniqueness_is_case_insensitive(self, user_store):
+        """Test emails collide after trimming and case-folding"""
+        user_store.add(_user("alice", "Alice@Example.com"))
+        assert user_store.find_conflict("bob", " alice@EXAMPLE.com ") == "email"
+        assert user_store.add(_user("bob", "ALICE@example.com")) == "email"
+        assert user_store.get("bob") is None
+
+    def test_username_conflict(self, user_store):
+        """Test a taken username is reported before the email"""
+        user_store.add(_user("alice", "alice@example.com"))
+        assert user_store.find_conflict("alice", "alice@example.com") == "username"
+        assert user_store.add(_user("alice", "other@example.com")) == "username"
+        assert user_store.find_conflict("bob", "bob@example.com") is None
+
+    def test_update(self, user_store):
+        """Test role and disabled changes, and unknown users"""
+        user_store.add(_user("alice", "alice@example.com"))
+        updated = user_store.update("alice", {"role": "courier", "disabled": True})
+        assert (updated["role"], updated["disabled"]) == ("courier", True)
+        assert user_store.get("alice")["disabled"] is True
+        assert user_store.update("ghost", {"disabled": True}) is None
+
+    def test_load_replaces_users_and_index(self, user_store):
+        """Test load drops previous users and their emails"""
+        user_store.add(_user("alice", "alice@example.com"))
+        user_store.load({"bob": _user("bob", "bob@example.com")})
+        assert user_store.get("alice") is None
+        assert user_store.find_conflict("carol", "alice@example.com") is None
+        assert user_store.find_conflict("carol", "BOB@example.com") == "email"
+
+    def test_concurrent_registrations_with_same_email(self, user_store):
+        """Test exactly one of many racing adds with one email succeeds"""
+        barrier = threading.Barrier(8)
+        results = []
+
+        def register(index):
+            barrier.wait()
+            results.append(user_store.add(_user(f"user{index}", "Same@Example.com")))
+
+        threads = [threading.Thread(target=register, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results.count(None) == 1
+        assert results.count("email") == 7
+
+    def test_normalize_email(self):
+        """Test normalization trims and case-folds"""
+        assert normalize_email("  Straße@Example.COM ") == "strasse@example.com"
+
+    def test_changes_reach_other_processes(self, tmp_path):
+        """Test a user updated through one SQLite store is reported to a store watching the same database"""
+        from app.storage.users import SQLiteUserStore
+
+        writer = SQLiteUserStore(tmp_path / "users.db")
+        watcher = SQLiteUserStore(tmp_path / "users.db")
+        writer.add(_user("alice", "alice@example.com"))
+        changed = threading.Event()
+        usernames = []
+
+        def on_change(username):
+            usernames.append(username)
+            changed.set()
+
+        watcher.watch_changes(on_change, 0.01)
+        try:
+            writer.update("ghost", {"disabled": True})
+            writer.update("alice", {"disabled": True})
+            assert changed.wait(5)
+        finally:
+            watcher.close()
+            writer.close()
+        assert usernames == ["alice"]
+
+
+class TestSQLiteMigrations:
+    """Test databases created by older versions are upgraded in place"""
+
+    def test_adds_version_and_search_index(self, tmp_path):
+        """Test reopening a database without versions or a search index"""
+        import sqlite3
+
+        from app.storage.sqlite import SQLiteShipmentRepository
+
+        path = tmp_path / "old.db"
+        repository = SQLiteShipmentRepository(path)
+        shipment_id = repository.create(_shipment(), _event())
+        repository.close()
+        conn = sqlite3.connect(path)
+        for trigger in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER tr_shipments_fts_{trigger}")
+        conn.execute("DROP TABLE shipments_fts")
+        conn.execute("ALTER TABLE shipments DROP COLUMN version")
+        conn.close()
+
+        repository = SQLiteShipmentRepository(path)
+        assert repository.get_version(shipment_id) == 1
+        assert [found for found, _ in repository.search("ani jakarta rods")] == [shipment_id]
+        repository.close()
+
+
+# One worker process: seeds, creates shipments, updates a shared one and races to move 12701 on
+_WORKER_SCRIPT = """
+import json, sys
+from app.api.schemas.shipment import PackageDetails, Recipient, Seller, ShipmentCreate, ShipmentUpdate
+from app.core.exceptions import InvalidStatusTransition
+from app.services.shipment import ShipmentService, initialize_storage
+from app.storage import set_shipment_repository
+from app.storage.sqlite import SQLiteShipmentRepository
+
+repository = SQLiteShipmentRepository(sys.argv[1], id_block_size=3)
+initialize_storage(repository)
+set_shipment_repository(repository)
+order = ShipmentCreate(
+    package_details=PackageDetails(content="rods", weight=1.0),
+    recipient=Recipient(name="Ani", email="ani@example.com", phone="0812", address="Jakarta"),
+    seller=Seller(name="Store", email="store@example.com", phone="021"),
+    destination_code=11002,
+)
+ids = [ShipmentService.create_shipment(order)["id"] for _ in range(10)]
+for code in range(10):
+    ShipmentService.update_shipment(12702, ShipmentUpdate(destination_code=20000 + code))
+try:
+    ShipmentService.update_shipment(12701, ShipmentUpdate(current_status="in_transit"))
+    moved = 1
+except InvalidStatusTransition:
+    moved = 0
+print(json.dumps({"ids": ids, "moved": moved}))
+"""
+
+
+class TestSharedDatabase:
+    """Test several worker processes sharing one SQLite database"""
+
+    def test_workers_share_one_store(self, tmp_path):
+        """Test concurrent workers seed once, allocate disjoint IDs and lose no writes"""
+        from app.config import PROJECT_DIR
+        from app.storage.sqlite import SQLiteShipmentRepository
+
+        path = tmp_path / "shared.db"
+        workers = [
+            subprocess.Popen([sys.executable, "-c", _WORKER_SCRIPT, str(path)], cwd=PROJECT_DIR, stdout=subprocess.PIPE)
+            for _ in range(3)
+        ]
+        results = [json.loads(worker.communicate(timeout=120)[0]) for worker in workers]
+        assert all(worker.returncode == 0 for worker in workers)
+
+        ids = [shipment_id for result in results for shipment_id in result["ids"]]
+        assert len(set(ids)) == 30 and min(ids) > 12703
+        assert sum(result["moved"] for result in results) == 1
+        repository = SQLiteShipmentRepository(path)
+        assert repository.get_counts()["total_shipments"] == 33
+        assert repository.get_version(12702) == 31
+        assert [event.status for event in repository.get(12701).tracking_events] == ["placed", "in_transit"]
+        repository.close()
+
+    def test_generation_is_shared(self, tmp_path):
+        """Test every repository on a database sees load() start a new generation"""
+        from app.storage.sqlite import SQLiteShipmentRepository
+
+        worker_a = SQLiteShipmentRepository(tmp_path / "shared.db")
+        worker_b = SQLiteShipmentRepository(tmp_path / "shared.db")
+        other = SQLiteShipmentRepository(tmp_path / "other.db")
+        generation = worker_a.generation
+        assert worker_b.generation == generation != other.generation
+        worker_b.load({})
+        assert worker_a.generation == worker_b.generation != generation
+        for repository in (worker_a, worker_b, other):
+            repository.close()
+
+    def test_loaded_ids_are_reserved_for_every_worker(self, tmp_path):
+        """Test another worker's next IDs come after the shipments one worker seeded"""
+        from app.storage.sqlite import SQLiteShipmentRepository
+
+        worker_a = SQLiteShipmentRepository(tmp_path / "shared.db")
+        worker_b = SQLiteShipmentRepository(tmp_path / "shared.db")
+        assert worker_a.seed({50000: {**_shipment_dict(), "tracking_events": []}}) is True
+        assert worker_b.create(_shipment(), _event()) > 50000
+        worker_a.close()
+        worker_b.close()
+
+    def test_get_reads_one_snapshot(self, tmp_path):
+        """Test a shipment and its events are read in one transaction, unaffected by a concurrent write"""
+        from app.storage.sqlite import SQLiteShipmentRepository
+
+        reader = SQLiteShipmentRepository(tmp_path / "shared.db")
+        writer = SQLiteShipmentRepository(tmp_path / "shared.db")
+        shipment_id = reader.create(_shipment(), _event())
+        with reader.read_transaction() as conn:
+            version = conn.execute("SELECT version FROM shipments WHERE id = ?", (shipment_id,)).fetchone()[0]
+            writer.add_event(shipment_id, _event("in_transit"), datetime.now())
+            events = conn.execute("SELECT COUNT(*) FROM tracking_events WHERE shipment_id = ?", (shipment_id,))
+            assert (version, events.fetchone()[0]) == (1, 1)
+        shipment = reader.get(shipment_id)
+        assert (shipment.version, len(shipment.tracking_events)) == (2, 2)
+        reader.close()
+        writer.close()
+
+    def test_live_messages_are_pruned(self, tmp_path):
+        """Test sending prunes messages older than the retention period"""
+        from app.storage.sqlite import SQLiteLiveRelay, SQLiteShipmentRepository
+
+        repository = SQLiteShipmentRepository(tmp_path / "live.db")
+        relay = SQLiteLiveRelay(repository.pool, 0.01, retention_seconds=-1)
+        relay.PRUNE_EVERY = 3
+        relay.send_many([(1, "{}"), (2, "{}")])
+        relay.send_many([(1, "{}"), (2, "{}")])
+        with repository.pool.connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM live_messages").fetchone()[0] == 0
+        assert repository.live_relay(0.5).poll_seconds == 0.5
+        repository.close()
+
+
+class TestStorageFactory:
+    """Test backend selection"""
+
+    def test_backends(self, tmp_path, monkeypatch):
+        """Test STORAGE_BACKEND picks the repository class"""
+        from app.config import settings
+        from app.storage import create_shipment_repository
+        from app.storage.memory import InMemoryShipmentRepository
+        from app.storage.sqlite import SQLiteShipmentRepository
+
+        monkeypatch.setattr(settings, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(settings, "STORAGE_BACKEND", "memory")
+        assert isinstance(create_shipment_repository(), InMemoryShipmentRepository)
+
+        monkeypatch.setattr(settings, "STORAGE_BACKEND", "sqlite")
+        repository = create_shipment_repository()
+        assert isinstance(repository, SQLiteShipmentRepository)
+        assert (tmp_path / "logixpress.db").exists()
+        repository.close()
+
+        monkeypatch.setattr(settings, "STORAGE_BACKEND", "nosql")
+        with pytest.raises(ValueError):
+            create_shipment_repository()
+
+    def test_user_store_backends(self, tmp_path, monkeypatch):
+        """Test STORAGE_BACKEND picks the user store class"""
+        from app.config import settings
+        from app.storage import create_user_store
+        from app.storage.users import InMemoryUserStore, SQLiteUserStore
+
+        monkeypatch.setattr(settings, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(settings, "STORAGE_BACKEND", "memory")
+        assert isinstance(create_user_store(), InMemoryUserStore)
+
+        monkeypatch.setattr(settings, "STORAGE_BACKEND", "sqlite")
+        store = create_user_store()
+        assert isinstance(store, SQLiteUserStore)
+        store.close()
+
+        monkeypatch.setattr(settings, "STORAGE_BACKEND", "nosql")
+        with pytest.raises(ValueError):
+            create_user_store()
+
+    def test_user_store_seeded_on_first_use(self, tmp_path, monkeypatch):
+        """Test seed accounts are added once, without touching registered users"""
+        from app.config import settings
+        from app.storage import get_user_store, set_user_store
+
+        original = get_user_store()
+        monkeypatch.setattr(settings, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(settings, "STORAGE_BACKEND", "sqlite")
+        try:
+            set_user_store(None)
+            store = get_user_store()
+            assert store.get("admin")["role"] == "admin"
+            store.add(_user("alice", "alice@example.com"))
+            store.close()
+
+            # A second worker opening the same database re-seeds without wiping anyone
+            set_user_store(None)
+            store = get_user_store()
+            assert store.get("alice") is not None
+            assert store.get("courier") is not None
+            store.close()
+        finally:
+            set_user_store(original)
@@ -2,9 +2,19 @@
 Tracking Tests
 
 Tests for tracking event operations and history.
-Covers: adding events, retrieving history, permissions.
+Covers: adding events, retrieving history, permissions, live updates.
 """
 
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.core.exceptions import ValidationError
+from app.core.tracking_hub import SubscriptionClosed, TrackingHub, get_tracking_hub, sse_events
 
 
 class TestTrackingOperations:
@@ -59,17 +69,46 @@ class TestTrackingOperations:
 
     def test_add_tracking_event_updates_shipment_status(self, client, courier_token, admin_token, reset_db):
         """Test adding tracking event updates shipment status"""
-        # Add tracking event
-        client.post(
-            "/shipment/12701/tracking",
-            json={"location": "On delivery vehicle", "description": "Out for delivery", "status": "out_for_delivery"},
-            headers={"Authorization": f"Bearer {courier_token}"},
-        )
+        # Add tracking events
+        for status in ("in_transit", "out_for_delivery"):
+            client.post(
+                "/shipment/12701/tracking",
+                json={"location": "On delivery vehicle", "description": "Scan", "status": status},
+                headers={"Authorization": f"Bearer {courier_token}"},
+            )
 
         # Check shipment status updated
         response = client.get("/shipment/12701", headers={"Authorization": f"Bearer {admin_token}"})
         assert response.json()["current_status"] == "out_for_delivery"
 
+    def test_add_tracking_event_invalid_transition(self, client, courier_token, admin_token, reset_db):
+        """Test tracking events go through the status workflow like status updates"""
+        headers = {"Authorization": f"Bearer {courier_token}"}
+        response = client.post(
+            "/shipment/12701/tracking",
+            json={"location": "Hub", "description": "Delivered", "status": "delivered"},
+            headers=headers,
+        )
+        assert response.status_code == 400
+        assert "Invalid status transition from 'placed' to 'delivered'" in response.json()["detail"]
+
+        # Repeating the current status is a plain scan
+        response = client.post(
+            "/shipment/12701/tracking",
+            json={"location": "Hub", "description": "Scan", "status": "placed"},
+            headers=headers,
+        )
+        assert response.status_code == 201
+        response = client.post(
+            "/shipment/99999/tracking",
+            json={"location": "Hub", "description": "Scan", "status": "placed"},
+            headers=headers,
+        )
+        assert response.status_code == 404
+
+        history = client.get("/shipment/12701/tracking", headers={"Authorization": f"Bearer {admin_token}"}).json()
+        assert [event["status"] for event in history] == ["placed", "placed"]
+
     def test_add_tracking_event_invalid_status(self, client, courier_token, reset_db):
         """Test adding tracking event with invalid status"""
         response = client.post(
@@ -103,3 +142,269 @@ class TestTrackingOperations:
         # Check chronological order (oldest first)
         for i in range(len(events) - 1):
             assert events[i]["timestamp"] <= events[i + 1]["timestamp"]
+
+    def test_tracking_history_since_event_id(self, client, courier_token, admin_token, reset_db):
+        """Test polling with since_event_id returns only new events, paged by limit"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        response = client.get("/shipment/12701/tracking", headers=headers)
+        last_event_id = int(response.headers["X-Last-Event-Id"])
+        assert last_event_id == response.json()[-1]["id"]
+
+        # Nothing new: empty list, same cursor
+        response = client.get(f"/shipment/12701/tracking?since_event_id={last_event_id}", headers=headers)
+        assert response.json() == []
+        assert response.headers["X-Last-Event-Id"] == str(last_event_id)
+
+        for i in range(3):
+            client.post(
+                "/shipment/12701/tracking",
+                json={"location": f"Location {i}", "description": f"Event {i}", "status": "in_transit"},
+                headers={"Authorization": f"Bearer {courier_token}"},
+            )
+
+        locations = []
+        for expected in (2, 1, 0):
+            response = client.get(f"/shipment/12701/tracking?since_event_id={last_event_id}&limit=2", headers=headers)
+            assert len(response.json()) == expected
+            locations += [event["location"] for event in response.json()]
+            last_event_id = int(response.headers["X-Last-Event-Id"])
+        assert locations == ["Location 0", "Location 1", "Location 2"]
+
+        assert client.get("/shipment/12701/tracking?limit=0", headers=headers).status_code == 422
+        assert client.get("/shipment/99999/tracking?since_event_id=1", headers=headers).status_code == 404
+
+
+class TestTrackingBatch:
+    """Test batched tracking event ingestion"""
+
+    def test_batch_as_courier(self, client, courier_token, admin_token, reset_db):
+        """Test a scanner queue is applied with per-event results"""
+        scans = [
+            {"shipment_id": 12701, "location": "Hub", "description": "Picked up", "status": "in_transit"},
+            {"shipment_id": 12701, "location": "Van", "description": "Out", "status": "out_for_delivery"},
+            {"shipment_id": 12701, "location": "Hub", "description": "Back", "status": "placed"},
+            {"shipment_id": 99999, "location": "Hub", "description": "Scan", "status": "in_transit"},
+        ]
+        response = client.post(
+            "/shipments/tracking/batch", json=scans, headers={"Authorization": f"Bearer {courier_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["accepted"], data["rejected"]) == (2, 2)
+        assert [item["event_id"] is not None for item in data["results"]] == [True, True, False, False]
+
+        shipment = client.get("/shipment/12701", headers={"Authorization": f"Bearer {admin_token}"}).json()
+        assert shipment["current_status"] == "out_for_delivery"
+        assert len(shipment["tracking_events"]) == 3
+
+    def test_batch_malformed_items_rejected_individually(self, client, courier_token, reset_db):
+        """Test items with a non-integer shipment_id or that are not objects only reject themselves"""
+        scans = [
+            {"shipment_id": "abc", "location": "Hub", "description": "Scan", "status": "in_transit"},
+            "not an object",
+            None,
+            {"shipment_id": 12701, "location": "Hub", "description": "Scan", "status": "in_transit"},
+        ]
+        response = client.post(
+            "/shipments/tracking/batch", json=scans, headers={"Authorization": f"Bearer {courier_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["accepted"], data["rejected"]) == (1, 3)
+        assert [item["shipment_id"] for item in data["results"]] == [None, None, None, 12701]
+        assert "shipment_id" in data["results"][0]["error"]
+        assert data["results"][1]["error"].startswith("Input should be a valid dictionary")
+
+    def test_batch_as_customer_forbidden(self, client, customer_token, reset_db):
+        """Test customers cannot ingest scans"""
+        response = client.post(
+            "/shipments/tracking/batch",
+            json=[{"shipment_id": 12701, "location": "Hub", "description": "Scan", "status": "in_transit"}],
+            headers={"Authorization": f"Bearer {customer_token}"},
+        )
+        assert response.status_code == 403
+
+    def test_batch_empty(self, client, courier_token, reset_db):
+        """Test an empty batch is rejected"""
+        response = client.post(
+            "/shipments/tracking/batch", json=[], headers={"Authorization": f"Bearer {courier_token}"}
+        )
+        assert response.status_code == 422
+
+
+class TestLiveTracking:
+    """Test the tracking hub and the SSE/WebSocket endpoints"""
+
+    def test_websocket_receives_updates(self, client, admin_token, courier_token, reset_db):
+        """Test events, batch scans and status updates are pushed to WebSocket subscribers"""
+        courier = {"Authorization": f"Bearer {courier_token}"}
+        with client.websocket_connect(f"/shipments/live/ws?id=12701&access_token={admin_token}") as websocket:
+            client.post(
+                "/shipment/12701/tracking",
+                json={"location": "Hub", "description": "Scan", "status": "in_transit"},
+                headers=courier,
+            )
+            message = websocket.receive_json()
+            assert (message["type"], message["shipment_id"]) == ("tracking_event", 12701)
+            assert message["event"]["location"] == "Hub"
+
+            client.post(
+                "/shipments/tracking/batch",
+                json=[{"shipment_id": 12701, "location": "Van", "description": "Load", "status": "out_for_delivery"}],
+                headers=courier,
+            )
+            assert websocket.receive_json()["current_status"] == "out_for_delivery"
+
+            client.patch("/shipment/12701", json={"current_status": "delivered"}, headers=courier)
+            message = websocket.receive_json()
+            assert message["type"] == "shipment_updated"
+            assert message["event"]["status"] == "delivered"
+            assert get_tracking_hub().stats()["subscriptions"] == 1
+
+        deadline = time.monotonic() + 5
+        while get_tracking_hub().stats()["subscriptions"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert get_tracking_hub().stats()["subscriptions"] == 0
+
+    def test_websocket_rejected(self, client, admin_token, reset_db):
+        """Test bad tokens and unknown shipments close the handshake with 1008"""
+        for query in ("id=12701&access_token=invalid", f"id=99999&access_token={admin_token}", "id=12701"):
+            with pytest.raises(WebSocketDisconnect) as exc_info:
+                with client.websocket_connect(f"/shipments/live/ws?{query}") as websocket:
+                    websocket.receive_text()
+            assert exc_info.value.code == 1008
+
+    def test_sse_stream(self, client, admin_token, courier_token, reset_db):
+        """Test the SSE endpoint streams events published from other threads until the hub closes it"""
+        hub = get_tracking_hub()
+        result = {}
+        reader = threading.Thread(
+            target=lambda: result.update(
+                response=client.get("/shipments/live?id=12701", headers={"Authorization": f"Bearer {admin_token}"})
+            )
+        )
+        reader.start()
+        deadline = time.monotonic() + 5
+        while not hub.watching(12701) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        client.post(
+            "/shipment/12701/tracking",
+            json={"location": "Hub", "description": "Scan", "status": "in_transit"},
+            headers={"Authorization": f"Bearer {courier_token}"},
+        )
+        hub._loop.call_soon_threadsafe(hub.close_all)
+        reader.join(5)
+
+        response = result["response"]
+        assert response.headers["content-type"].startswith("text/event-stream")
+        data, close = response.text.strip().split("\n\n")
+        assert json.loads(data.removeprefix("data: "))["event"]["location"] == "Hub"
+        assert close == 'event: close\ndata: {"reason": "shutdown"}'
+        unknown = client.get("/shipments/live?id=99999", headers={"Authorization": f"Bearer {admin_token}"})
+        assert unknown.status_code == 404
+        assert client.get("/shipments/live?id=12701").status_code == 401
+
+    def test_slow_consumer_policies(self):
+        """Test full queues drop the oldest message (reporting the lag) or disconnect"""
+
+        async def scenario(policy):
+            hub = TrackingHub(queue_size=2, policy=policy)
+            subscription = hub.subscribe([1, 2])
+            for n in range(4):
+                hub.publish(1, {"type": "tracking_event", "n": n})
+            hub.publish(3, {"type": "tracking_event"})
+            received = []
+            try:
+                while True:
+                    message = await subscription.receive(timeout=0.01)
+                    if message is None:
+                        break
+                    received.append(json.loads(message))
+            except SubscriptionClosed as exc:
+                received.append(exc.reason)
+            return received, hub.stats()
+
+        received, stats = asyncio.run(scenario("drop_oldest"))
+        assert received == [
+            {"type": "lagged", "dropped": 2},
+            {"type": "tracking_event", "shipment_id": 1, "n": 2},
+            {"type": "tracking_event", "shipment_id": 1, "n": 3},
+        ]
+        assert (stats["published"], stats["delivered"], stats["dropped"], stats["subscriptions"]) == (4, 4, 2, 1)
+
+        received, stats = asyncio.run(scenario("disconnect"))
+        assert received == ["slow consumer"]
+        assert (stats["disconnected"], stats["subscriptions"], stats["shipments_watched"]) == (1, 0, 0)
+
+        with pytest.raises(ValueError):
+            TrackingHub(queue_size=2, policy="block")
+
+    def test_relay_between_workers(self, tmp_path):
+        """Test a subscriber on one worker gets what another worker publishes, and its own hub's messages once"""
+        from app.storage.sqlite import SQLiteLiveRelay, SQLiteShipmentRepository
+
+        repository = SQLiteShipmentRepository(tmp_path / "live.db")
+
+        async def scenario():
+            worker_a, worker_b = TrackingHub(queue_size=10), TrackingHub(queue_size=10)
+            worker_a.attach_relay(SQLiteLiveRelay(repository.pool, 0.01, origin=1))
+            worker_b.attach_relay(SQLiteLiveRelay(repository.pool, 0.01, origin=2))
+            assert not worker_a.watching(5) and worker_a.stats()["relay"]
+            subscription = worker_b.subscribe([5])
+            for _ in range(500):
+                if worker_a.watching(5):
+                    break
+                await asyncio.sleep(0.01)
+            assert worker_a.watching(5) and not worker_a.watching(6)
+            worker_a.publish(5, {"type": "tracking_event", "n": 1})
+            worker_a.publish(6, {"type": "tracking_event", "n": 2})
+            worker_b.publish(5, {"type": "tracking_event", "n": 3})
+            received = []
+            while (message := await subscription.receive(timeout=0.5)) is not None:
+                received.append(json.loads(message)["n"])
+
+            worker_b.unsubscribe(subscription)
+            for _ in range(500):
+                if not worker_a.watching(5):
+                    break
+                await asyncio.sleep(0.01)
+            assert not worker_a.watching(5)
+            worker_a.close_all()
+            worker_b.close_all()
+            return received, worker_b.relay
+
+        received, relay = asyncio.run(scenario())
+        assert received == [3, 1]
+        assert relay is None
+        with repository.pool.connection() as conn:
+            # Only the watched shipment was relayed, and stopping withdrew every watch
+            relayed = [row[0] for row in conn.execute("SELECT shipment_id FROM live_messages")]
+            assert relayed == [5]
+            assert conn.execute("SELECT COUNT(*) FROM live_watches").fetchone()[0] == 0
+        repository.close()
+
+    def test_sse_heartbeat_and_limits(self):
+        """Test idle SSE streams get heartbeats and subscriptions are bounded"""
+
+        async def scenario():
+            hub = TrackingHub(queue_size=2, max_shipments=2)
+            with pytest.raises(ValidationError):
+                hub.subscribe([1, 2, 3])
+            with pytest.raises(ValidationError):
+                hub.subscribe([])
+            # A stream subscribes only once it runs, so one never sent leaks nothing
+            await sse_events(hub, [1], heartbeat_seconds=0.01).aclose()
+            stream = sse_events(hub, [1], heartbeat_seconds=0.01)
+            unstarted = hub.stats()["subscriptions"]
+            heartbeat = await stream.__anext__()
+            hub.publish(1, {"type": "shipment_updated"})
+            data = await stream.__anext__()
+            started = hub.stats()["subscriptions"]
+            await stream.aclose()
+            return heartbeat, data, (unstarted, started, hub.stats()["subscriptions"])
+
+        heartbeat, data, subscriptions = asyncio.run(scenario())
+        assert heartbeat == ": heartbeat\n\n"
+        assert data == 'data: {"type": "shipment_updated", "shipment_id": 1}\n\n'
+        assert subscriptions == (0, 1, 0)